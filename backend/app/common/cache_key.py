@@ -1,8 +1,13 @@
 import hashlib
 import json
+import logging
+from datetime import date, datetime
+from enum import Enum
 
 from app.services.redis_client import redis_cache
 
+logger = logging.getLogger(__name__)
+
 
 def make_cache_key(prefix: str, params: dict):
     # params 要排序，否則兩個 dict 順序不同會造成不同 key
@@ -11,8 +16,69 @@ def make_cache_key(prefix: str, params: dict):
     return f"{prefix}:{h}"
 
 
-def clear_yield_trend_cache():
-    keys = redis_cache.keys("yield_trend:*")
-    if keys:
-        redis_cache.delete(*keys)
-        print(f"🧹 Cleared {len(keys)} trend cache keys")
+_SKIP = object()
+
+
+def _normalize(value):
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (list, tuple, set)):
+        items = [_normalize(v) for v in value]
+        return [v for v in items if v is not _SKIP]
+    if isinstance(value, dict):
+        return normalize_params(value)
+    if hasattr(value, "dict"):  # pydantic model
+        return normalize_params(value.dict())
+    # session、current user 這類 dependency 物件不列入
+    return _SKIP
+
+
+def normalize_params(params: dict) -> dict:
+    """把 handler 參數轉成可以穩定 json.dumps 的 dict（日期轉字串、略過 dependency 物件）。"""
+    out = {}
+    for key, value in params.items():
+        value = _normalize(value)
+        if value is not _SKIP:
+            out[key] = value
+    return out
+
+
+# /yield/trend 整個回應的快取；存入時 key 一起記在 TREND_INDEX 這個 set，清除時不必掃 keyspace
+TREND_PREFIX = "yield_trend"
+TREND_INDEX = "yield_trend-index"
+
+
+def _decode(value) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def store_yield_trend(key: str, body: str, ttl: int = 30):
+    pipe = redis_cache.pipeline()
+    pipe.set(key, body, ex=ttl)
+    pipe.sadd(TREND_INDEX, key)
+    # index 跟著最新的一筆延長；已經過期的 key 留在 index 裡，下次清除時一起 DEL（不存在的 key 不影響）
+    pipe.expire(TREND_INDEX, ttl)
+    pipe.execute()
+
+
+def clear_yield_trend_cache(*lot_ids: str):
+    """
+    整個回應的快取全部清掉；per-lot fragment 只清這些 lot 的，沒給 lot_id（seed 重建）時全部清掉。
+    要刪的 key 都從 index set 取（一次 pipeline 的 SMEMBERS + 一次 DEL）；同步 redis-py，async route 用 asyncio.to_thread 呼叫。
+    """
+    from app.services.trend_fragments import FRAGMENT_PREFIX, index_key
+
+    indexes = [TREND_INDEX] + [index_key(lot_id) for lot_id in lot_ids]
+    pipe = redis_cache.pipeline()
+    for index in indexes:
+        pipe.smembers(index)
+    keys = indexes + [_decode(m) for members in pipe.execute() for m in members or ()]
+    if not lot_ids:
+        # seed 重建才會走到：所有 lot 的 fragment 與 index
+        keys += list(redis_cache.scan_iter(f"{FRAGMENT_PREFIX}*", count=1000))
+    redis_cache.delete(*keys)
+    logger.info("cleared %d trend cache keys", len(keys))
@@ -1,15 +1,20 @@
 # app/celery_app.py
 import os
 from celery import Celery
-from opentelemetry.instrumentation.celery import CeleryInstrumentor
+from celery.signals import worker_process_init
 
 from app.config.config import settings
 
-from app.common.tracing import setup_tracing
 
-setup_tracing("factory-worker")
+@worker_process_init.connect
+def init_worker_tracing(**kwargs):
+    # 只在 worker process 裡設定 tracing；API 端 import celery_app（送 task 用）時不會覆蓋 API 的 tracer provider
+    from opentelemetry.instrumentation.celery import CeleryInstrumentor
 
-CeleryInstrumentor().instrument()
+    from app.common.tracing import setup_tracing
+
+    setup_tracing("factory-worker")
+    CeleryInstrumentor().instrument()
 
 
 # 在 docker-compose 裡 redis service 名稱就是 "redis"
@@ -24,3 +29,23 @@ celery_app = Celery(
 
 # 自動載入 tasks
 celery_app.autodiscover_tasks(["app.common.tasks"])
+
+# celery beat 排程（docker-compose 的 beat service）
+celery_app.conf.beat_schedule = {
+    "maintain-partitions": {
+        "task": "app.common.tasks.maintain_partitions",
+        "schedule": 24 * 60 * 60,
+    },
+    "compact-defect-details": {
+        "task": "app.common.tasks.compact_defect_details",
+        "schedule": 24 * 60 * 60,
+    },
+    "sweep-wafermap-tiles": {
+        "task": "app.common.tasks.sweep_wafermap_tiles",
+        "schedule": 24 * 60 * 60,
+    },
+    "cluster-pending-lots": {
+        "task": "app.common.tasks.cluster_pending_lots",
+        "schedule": settings.cluster_interval_seconds,
+    },
+}
@@ -2,15 +2,21 @@
 import logging
 from datetime import timedelta
 
-from aiobreaker import CircuitBreaker
+from aiobreaker import CircuitBreaker, CircuitBreakerState
+from fastapi import HTTPException
 from prometheus_client import Counter
 
+from app.common.concurrency import Overloaded
+
 logger = logging.getLogger(__name__)
 
 # Postgres 用的 breaker
+# HTTPException（400 帳密錯誤、401 token 無效、404 ...）是正常的回應，不算資料庫失敗
+# Overloaded 是我們自己在 bulkhead 擋掉的，request 根本沒送到資料庫
 postgres_breaker = CircuitBreaker(
     fail_max=5,  # 連續 5 次失敗就打開
     timeout_duration=timedelta(seconds=30),  # 30 秒後嘗試 half-open
+    exclude=[HTTPException, Overloaded],
     name="postgres_breaker",
 )
 
@@ -18,9 +24,14 @@ postgres_breaker = CircuitBreaker(
 mongo_breaker = CircuitBreaker(
     fail_max=5,
     timeout_duration=timedelta(seconds=30),
+    exclude=[HTTPException, Overloaded],
     name="mongo_breaker",
 )
 
+
+def open_breakers() -> list:
+    return [b.name for b in (postgres_breaker, mongo_breaker) if b.current_state == CircuitBreakerState.OPEN]
+
 circuit_open_counter = Counter(
     "circuit_open_total",
     "Total times circuit breaker opened",
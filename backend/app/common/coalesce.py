@@ -0,0 +1,88 @@
+# app/common/coalesce.py
+"""
+Request coalescing：同一個 process 內，參數相同、同時進行中的讀取只真正執行一次，
+其餘 request 等同一個結果（singleflight）。
+
+    @router.get("/dates")
+    @coalesce("filter.dates")
+    async def list_dates(session: AsyncSession = Depends(get_session)): ...
+
+key = 名稱 + normalize_params(handler 參數)；session / current user 這類 dependency 不列入 key，
+所以回傳內容會依使用者不同的 route 不要套用。
+
+共用的執行被 shield，leader 的 request 斷線時還會繼續跑；這時 FastAPI 會關掉 leader 的 request-scoped session，
+所以 handler 參數裡的 AsyncSession 換成在同一個 engine 上另外開、跟著共用執行結束的 session。
+"""
+import asyncio
+import functools
+from contextlib import AsyncExitStack
+from typing import Dict
+
+from prometheus_client import Counter
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.responses import Response
+
+from app.common.cache_key import make_cache_key, normalize_params
+from app.config.config import settings
+
+# coalesced ratio = follower / (leader + follower)
+COALESCED_REQUESTS = Counter(
+    "coalesced_requests_total",
+    "Reads served by a coalesced execution (leader = ran the query, follower = shared its result)",
+    ["endpoint", "role"],
+)
+
+_inflight: Dict[str, asyncio.Task] = {}
+
+
+def _share(result):
+    # Response 物件會被 middleware 改 header，follower 各自拿一份
+    if isinstance(result, Response):
+        return Response(content=result.body, status_code=result.status_code, headers=dict(result.headers))
+    return result
+
+
+def _on_done(key: str, task: asyncio.Task):
+    if _inflight.get(key) is task:
+        del _inflight[key]
+    # leader 被取消、又沒有 follower 時，避免 "exception was never retrieved"
+    if not task.cancelled():
+        task.exception()
+
+
+async def _run_detached(fn, args, kwargs):
+    """用自己的 session 執行，不依賴任何一個 request 的生命週期。"""
+    sessions = {k: v for k, v in kwargs.items() if isinstance(v, AsyncSession)}
+    if not sessions:
+        return await fn(*args, **kwargs)
+    async with AsyncExitStack() as stack:
+        own = {
+            k: await stack.enter_async_context(AsyncSession(bind=v.bind, expire_on_commit=False))
+            for k, v in sessions.items()
+        }
+        return await fn(*args, **{**kwargs, **own})
+
+
+def coalesce(name: str):
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            if not settings.coalesce_enabled:
+                return await fn(*args, **kwargs)
+
+            key = make_cache_key(f"coalesce:{name}", normalize_params(kwargs))
+            task = _inflight.get(key)
+            if task is not None:
+                COALESCED_REQUESTS.labels(endpoint=name, role="follower").inc()
+                return _share(await asyncio.shield(task))
+
+            task = asyncio.ensure_future(_run_detached(fn, args, kwargs))
+            _inflight[key] = task
+            task.add_done_callback(functools.partial(_on_done, key))
+            COALESCED_REQUESTS.labels(endpoint=name, role="leader").inc()
+            # shield：發起的 client 斷線時查詢繼續跑完，等待中的 follower 不受影響
+            return await asyncio.shield(task)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,161 @@
+# app/common/concurrency.py
+"""
+每個下游（Postgres / Mongo / Redis）各自一個 adaptive concurrency limit（bulkhead）：
+
+    async with mongo_bulkhead.slot():
+        docs = await collection.find(query).to_list(None)
+
+- limit 用 AIMD 調整：成功且 latency 低於目標時 limit += 1 / limit（約每一輪滿載 +1），
+  latency 超過目標或失敗時 limit *= 0.9（同一個 target 時間窗內最多降一次，避免一批慢回應把 limit 壓到底）
+- 超過 limit 的 request 在佇列裡等，佇列滿了或等超過 bulkhead_queue_timeout_ms 直接丟 Overloaded -> 503 + Retry-After，
+  不讓 request 堆在 connection pool 上一起 timeout
+- 同一個 task 已經拿到 slot 時再進入（例如 run 裡面又呼叫 slot）不會重複佔用
+- Postgres 的 slot 由 BulkheadSession 在借出連線時拿、還回 pool 時放（app.database.database），不走 slot()
+- 不碰下游的 request（/health、Redis cache hit）不受影響
+
+limit / in-flight / 佇列長度 / 被擋掉的數量都會輸出到 /metrics。
+"""
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Deque, FrozenSet
+
+from fastapi import HTTPException
+from prometheus_client import Counter, Gauge
+
+from app.config.config import settings
+
+# multiprocess（gunicorn）時各 worker 加總
+BULKHEAD_LIMIT = Gauge("bulkhead_limit", "Current adaptive concurrency limit", ["name"], multiprocess_mode="livesum")
+BULKHEAD_IN_FLIGHT = Gauge("bulkhead_in_flight", "Calls currently holding a slot", ["name"], multiprocess_mode="livesum")
+BULKHEAD_QUEUE = Gauge("bulkhead_queue_depth", "Calls waiting for a slot", ["name"], multiprocess_mode="livesum")
+BULKHEAD_SHED = Counter("bulkhead_shed_total", "Calls rejected because the bulkhead was full", ["name", "reason"])
+
+# 目前 task 已經持有的 bulkhead
+_held: ContextVar[FrozenSet[str]] = ContextVar("bulkheads_held", default=frozenset())
+
+
+class Overloaded(Exception):
+    def __init__(self, name: str, reason: str):
+        super().__init__(f"{name} bulkhead full ({reason})")
+        self.name = name
+        self.reason = reason
+
+
+class AdaptiveLimiter:
+    def __init__(self, name: str, max_limit: int, target_latency: float, min_limit: int = 1,
+                 max_queue: int = 50, queue_timeout: float = 0.5, backoff: float = 0.9):
+        self.name = name
+        self.min_limit = min_limit
+        self.max_limit = max(max_limit, min_limit)
+        self.limit = float(max(self.max_limit // 2, min_limit))
+        self.target_latency = target_latency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.backoff = backoff
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._last_decrease = 0.0
+        BULKHEAD_LIMIT.labels(name=name).set(self.limit)
+
+    @property
+    def capacity(self) -> int:
+        return int(self.limit)
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self):
+        if self.in_flight < self.capacity and not self._waiters:
+            self._took()
+            return
+        if len(self._waiters) >= self.max_queue:
+            self._shed("queue_full")
+
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append(fut)
+        BULKHEAD_QUEUE.labels(name=self.name).set(len(self._waiters))
+        try:
+            # release() 直接把 slot 交給排第一個的 waiter（in_flight 不減）
+            await asyncio.wait_for(fut, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._shed("queue_timeout")
+        finally:
+            if fut in self._waiters:
+                self._waiters.remove(fut)
+            BULKHEAD_QUEUE.labels(name=self.name).set(len(self._waiters))
+
+    def release(self, latency: float, ok: bool):
+        self.in_flight -= 1
+        self._adjust(latency, ok)
+        while self._waiters and self.in_flight < self.capacity:
+            fut = self._waiters.popleft()
+            if not fut.done():
+                self._took()
+                fut.set_result(True)
+        BULKHEAD_IN_FLIGHT.labels(name=self.name).set(self.in_flight)
+
+    @asynccontextmanager
+    async def slot(self):
+        held = _held.get()
+        if not settings.bulkhead_enabled or self.name in held:
+            yield
+            return
+
+        await self.acquire()
+        token = _held.set(held | {self.name})
+        start = time.perf_counter()
+        ok = True
+        try:
+            yield
+        except HTTPException:
+            raise
+        except Exception:
+            ok = False
+            raise
+        finally:
+            _held.reset(token)
+            self.release(time.perf_counter() - start, ok)
+
+    async def run(self, fn, *args, **kwargs):
+        """同步（blocking）的 client 呼叫：拿到 slot 後丟到 thread 執行，不卡住 event loop。"""
+        async with self.slot():
+            return await asyncio.to_thread(fn, *args, **kwargs)
+
+    def _took(self):
+        self.in_flight += 1
+        BULKHEAD_IN_FLIGHT.labels(name=self.name).set(self.in_flight)
+
+    def _shed(self, reason: str):
+        BULKHEAD_SHED.labels(name=self.name, reason=reason).inc()
+        raise Overloaded(self.name, reason)
+
+    def _adjust(self, latency: float, ok: bool):
+        now = time.monotonic()
+        if not ok or latency > self.target_latency:
+            if now - self._last_decrease >= self.target_latency:
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+                self._last_decrease = now
+        elif self.in_flight + 1 >= self.limit / 2:
+            # 只有 limit 真的有被用到時才往上加，閒置時不會一路漲到 max
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        BULKHEAD_LIMIT.labels(name=self.name).set(self.limit)
+
+
+def make_limiter(name: str, max_limit: int) -> AdaptiveLimiter:
+    return AdaptiveLimiter(
+        name,
+        max_limit=max_limit,
+        target_latency=settings.bulkhead_target_latency_ms.get(name, 250) / 1000,
+        max_queue=settings.bulkhead_queue_size,
+        queue_timeout=settings.bulkhead_queue_timeout_ms / 1000,
+    )
+
+
+# 上限預設等於各自的連線數：limit 以內的呼叫一定拿得到連線，不會在 pool 裡排隊
+# （postgres_bulkhead 在 app.database.database，跟 connection pool 大小放在一起）
+mongo_bulkhead = make_limiter("mongo", settings.bulkhead_mongo_max or settings.mongo_max_pool_size)
+redis_bulkhead = make_limiter("redis", settings.bulkhead_redis_max or settings.redis_max_connections)
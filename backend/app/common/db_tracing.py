@@ -1,9 +1,13 @@
 from opentelemetry.instrumentation.sqlalchemy import SQLAlchemyInstrumentor
 
+from app.config.config import settings
+
 
 def setup_sqlalchemy_tracing(engine):
+    # SQL commenter 會在每條 SQL 後面加上 traceparent，導致 statement 文字每次都不同、
+    # asyncpg 的 prepared statement cache 失效，預設關閉
     SQLAlchemyInstrumentor().instrument(
         engine=engine.sync_engine,
-        enable_commenter=True,
+        enable_commenter=settings.sql_commenter_enabled,
         commenter_options={}
     )
@@ -0,0 +1,65 @@
+# app/common/fanout.py
+"""
+同一個 request 裡平行查多個資料來源（fan-out），非必要的來源慢 / 掛掉時回傳部分結果：
+
+    summary, details = await asyncio.gather(
+        branch("db_summary", fetch_summary, breaker=postgres_breaker, default=[]),
+        branch("mongo_detail", fetch_details, breaker=mongo_breaker, default=[]),
+    )
+    degraded = [b.name for b in (summary, details) if b.degraded]
+
+每個 branch 有自己的 timeout；timeout / circuit open / 例外都不往外丟，回傳 default 並標記 degraded。
+timeout 也會計入 breaker 的失敗次數，持續變慢的來源會被 breaker 直接擋掉，不必每次都等滿 timeout。
+"""
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Optional
+
+from aiobreaker import CircuitBreaker, CircuitBreakerError
+from prometheus_client import Counter
+
+from app.common.circuit_breakers import circuit_open_counter
+from app.common.concurrency import Overloaded
+from app.config.config import settings
+
+logger = logging.getLogger(__name__)
+
+BRANCH_DEGRADED = Counter(
+    "fanout_branch_degraded_total",
+    "Fan-out branches answered with a default value instead of data",
+    ["branch", "reason"],
+)
+
+
+@dataclass
+class BranchResult:
+    name: str
+    value: Any
+    degraded: Optional[str] = None  # timeout / circuit_open / overloaded / error
+
+
+async def branch(name: str, fn: Callable[[], Awaitable[Any]], *, breaker: Optional[CircuitBreaker] = None,
+                 timeout: Optional[float] = None, default: Any = None) -> BranchResult:
+    if timeout is None:
+        timeout = settings.fanout_branch_timeout_ms / 1000
+
+    async def guarded():
+        return await asyncio.wait_for(fn(), timeout)
+
+    try:
+        value = await (breaker.call_async(guarded) if breaker else guarded())
+        return BranchResult(name, value)
+    except asyncio.TimeoutError:
+        reason = "timeout"
+    except CircuitBreakerError:
+        reason = "circuit_open"
+        circuit_open_counter.labels(name=breaker.name).inc()
+    except Overloaded:
+        reason = "overloaded"
+    except Exception:
+        logger.warning("fan-out branch %s failed", name, exc_info=True)
+        reason = "error"
+
+    BRANCH_DEGRADED.labels(branch=name, reason=reason).inc()
+    return BranchResult(name, default, reason)
@@ -0,0 +1,117 @@
+# app/common/logging_setup.py
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+from app.config.config import settings
+
+# LogRecord 內建欄位，其餘透過 extra={} 帶進來的都當成結構化欄位輸出
+_RESERVED_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {
+    "message",
+    "asctime",
+}
+
+_listener: Optional[QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """一行一筆 JSON，方便 Loki / ELK 直接解析。"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                payload[key] = value
+
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            payload["exc"] = record.exc_text
+
+        return json.dumps(payload, default=str, ensure_ascii=False)
+
+
+class _NonBlockingQueueHandler(QueueHandler):
+    """只在呼叫端做最少的工作（合併 args、序列化 traceback），格式化交給背景 listener。"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def setup_logging():
+    """
+    root logger 改成 QueueHandler -> 背景 QueueListener -> stdout。
+    request 路徑上只有 put_nowait，不會因為 stdout 寫入而卡住 event loop。
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    if settings.log_json:
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter("%(asctime)s | %(levelname)s | %(name)s | %(message)s")
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(formatter)
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for h in list(root.handlers):
+        root.removeHandler(h)
+    root.addHandler(_NonBlockingQueueHandler(log_queue))
+    root.setLevel(settings.log_level.upper())
+
+    # 個別 logger 的等級，例如 {"app.routers.yield_router": "DEBUG"}
+    for name, level in settings.log_levels.items():
+        logging.getLogger(name).setLevel(level.upper())
+
+    _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+    # gunicorn preload / celery prefork：fork 之後子 process 沒有 listener thread，要重新啟動
+    os.register_at_fork(after_in_child=_restart_listener)
+
+
+def _restart_listener():
+    global _listener
+    if _listener is None:
+        return
+    _listener = QueueListener(_listener.queue, *_listener.handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown_logging():
+    """把 queue 裡剩下的 log 寫完再停掉 listener。"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def should_log_access(route: str) -> bool:
+    """依 route 的抽樣比例決定這個 request 要不要寫 access log。"""
+    rate = settings.log_route_sample_rates.get(route, settings.log_access_sample_rate)
+    if rate <= 0.0:
+        return False
+    return rate >= 1.0 or random.random() < rate
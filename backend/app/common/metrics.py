@@ -0,0 +1,93 @@
+# app/common/metrics.py
+import os
+import random
+from typing import Dict, Optional
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    REGISTRY,
+    generate_latest,
+)
+
+from app.config.config import settings
+
+# gunicorn / 多 worker 時由啟動腳本設定，prometheus_client 會改寫到共享目錄
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+# 明確指定 bucket：dashboard API 多數落在 5ms ~ 2.5s 之間
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0,
+)
+
+# 沒有對應到任何 route 的請求（404、掃描器）統一歸到這個 label，避免 label 爆炸
+UNMATCHED_ROUTE = "<unmatched>"
+
+REQUEST_COUNT = Counter(
+    "http_requests_total",
+    "Total HTTP requests",
+    ["method", "endpoint", "http_status"]
+)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_latency_seconds",
+    "HTTP request latency",
+    ["endpoint"],
+    buckets=LATENCY_BUCKETS,
+)
+
+# endpoint function -> route template（例如 /update/{lot_id}），第一次查到後快取
+_route_templates: Dict[object, str] = {}
+
+
+def route_template(request) -> str:
+    """回傳 request 對應的 route template，而不是實際的 url path。"""
+    endpoint = request.scope.get("endpoint")
+    if endpoint is None:
+        return UNMATCHED_ROUTE
+
+    template = _route_templates.get(endpoint)
+    if template is None:
+        template = UNMATCHED_ROUTE
+        for route in request.app.routes:
+            if getattr(route, "endpoint", None) is endpoint:
+                template = route.path
+                break
+        _route_templates[endpoint] = template
+    return template
+
+
+def observe_request(method: str, endpoint: str, status_code: int, elapsed: float):
+    # counter 一律累加；latency 依 metrics_sample_rate 抽樣，降低高 RPS 時的成本
+    REQUEST_COUNT.labels(
+        method=method,
+        endpoint=endpoint,
+        http_status=status_code
+    ).inc()
+
+    rate = settings.metrics_sample_rate
+    if rate >= 1.0 or random.random() < rate:
+        REQUEST_LATENCY.labels(endpoint=endpoint).observe(elapsed)
+
+
+def render_metrics(registry: Optional[CollectorRegistry] = None):
+    """產生 /metrics 內容；multiprocess 模式下合併所有 worker 的資料。"""
+    if registry is None:
+        if MULTIPROC_DIR:
+            from prometheus_client import multiprocess
+
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+        else:
+            registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_worker_dead(pid: int):
+    """worker 結束時呼叫（gunicorn child_exit hook），清掉該 pid 的 live gauge 檔案。"""
+    if MULTIPROC_DIR:
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(pid)
@@ -0,0 +1,117 @@
+# app/common/profiler.py
+"""
+不依賴外部套件的 sampling profiler。
+
+背景 thread 每隔 interval 讀一次目標 thread（event loop 所在的 thread）的 stack，
+累計成 collapsed stack 格式（`a;b;c 42`），可直接丟給 flamegraph.pl 或 speedscope。
+
+注意：所有 request 共用同一個 event loop thread，
+「單一 request」模式量到的是該 request 進行期間 loop 上所有工作的 stack。
+"""
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from typing import Dict, Optional
+
+MAX_STORED_PROFILES = 20
+MAX_WINDOW_SECONDS = 60
+
+
+class ProfileSession:
+    def __init__(self, target_thread_id: int, interval: float, label: str):
+        self.id = uuid.uuid4().hex
+        self.label = label
+        self.interval = interval
+        self.target_thread_id = target_thread_id
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"profiler-{self.id[:8]}", daemon=True)
+
+    def start(self, duration: Optional[float] = None):
+        self._deadline = time.monotonic() + duration if duration else None
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    @property
+    def running(self) -> bool:
+        return self.finished_at is None
+
+    def _run(self):
+        while not self._stop.is_set():
+            if self._deadline is not None and time.monotonic() >= self._deadline:
+                break
+            frame = sys._current_frames().get(self.target_thread_id)
+            if frame is not None:
+                self.stacks[_collapse(frame)] += 1
+                self.samples += 1
+            self._stop.wait(self.interval)
+        self.finished_at = time.time()
+
+    def collapsed(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+    def summary(self) -> dict:
+        return {
+            "profile_id": self.id,
+            "label": self.label,
+            "running": self.running,
+            "samples": self.samples,
+            "interval_ms": self.interval * 1000,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+def _collapse(frame) -> str:
+    parts = []
+    while frame is not None:
+        code = frame.f_code
+        parts.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(parts))
+
+
+class Profiler:
+    def __init__(self):
+        self._sessions: "OrderedDict[str, ProfileSession]" = OrderedDict()
+        self._lock = threading.Lock()
+        # 等待下一個符合 path 的 request：path -> session
+        self.armed: Dict[str, ProfileSession] = {}
+
+    def _store(self, session: ProfileSession):
+        with self._lock:
+            self._sessions[session.id] = session
+            while len(self._sessions) > MAX_STORED_PROFILES:
+                self._sessions.popitem(last=False)
+
+    def profile_window(self, seconds: float, interval: float) -> ProfileSession:
+        seconds = min(seconds, MAX_WINDOW_SECONDS)
+        session = ProfileSession(threading.get_ident(), interval, f"window:{seconds}s")
+        self._store(session)
+        return session.start(duration=seconds)
+
+    def arm_request(self, path: str, interval: float) -> ProfileSession:
+        session = ProfileSession(threading.get_ident(), interval, f"request:{path}")
+        self._store(session)
+        self.armed[path] = session
+        return session
+
+    def take_armed(self, path: str) -> Optional[ProfileSession]:
+        """middleware 用：這個 path 有被 arm 的話取出（只會觸發一次）。"""
+        if not self.armed:
+            return None
+        return self.armed.pop(path, None)
+
+    def get(self, profile_id: str) -> Optional[ProfileSession]:
+        return self._sessions.get(profile_id)
+
+
+profiler = Profiler()
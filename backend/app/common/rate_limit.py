@@ -1,43 +1,181 @@
+# app/common/rate_limit.py
+"""
+Token bucket rate limit（Redis Lua script，一次呼叫內原子地檢查 + 扣除）。
+
+global_rate_limit middleware 的規則：
+- bucket 依身分：帶有效 JWT 的用 user:{sub}，額度看 token 裡的 role（rate_limit_tiers）；沒帶的退回 ip:{client_ip}
+- 每個 request 扣的 token 依 route 而不同（rate_limit_route_costs）：
+  cost = base + per_day * 查詢天數（date_from ~ date_to）+ per_lot * lots 數量
+- cost >= rate_limit_heavy_cost 的分析查詢另外扣全站共用的 heavy bucket，
+  大量 trend 查詢用完的是 heavy 額度，不會把 DB 吃滿讓產線的輕量查詢排不進來
+"""
+import math
 import time
+from dataclasses import dataclass
+from datetime import date
+from typing import List, Optional, Sequence, Tuple
 
+import jwt
 from fastapi import HTTPException
+from prometheus_client import Counter
+from starlette.requests import Request
+from starlette.routing import Match
 
+from app.config.config import settings
 from app.services.redis_client import redis_ratelimit
 
+RATE_LIMITED = Counter("rate_limited_total", "Requests rejected by the rate limiter", ["tier", "bucket"])
+
+# KEYS = 各個 bucket；ARGV = now, cost, 然後每個 bucket 的 capacity, refill_per_sec
+# 全部 bucket 都夠才扣；回傳 {allowed, 第一個不夠的 bucket index（1-based，0 = 無）, 剩餘 token..., retry_after}
+TOKEN_BUCKET_LUA = """
+local now = tonumber(ARGV[1])
+local cost = tonumber(ARGV[2])
+local tokens, caps, rates = {}, {}, {}
+local denied, retry = 0, 0
+for i, key in ipairs(KEYS) do
+    local cap = tonumber(ARGV[1 + i * 2])
+    local rate = tonumber(ARGV[2 + i * 2])
+    local state = redis.call('HMGET', key, 'tokens', 'timestamp')
+    local t = tonumber(state[1])
+    local ts = tonumber(state[2])
+    if t == nil then
+        t = cap
+        ts = now
+    end
+    t = math.min(cap, t + math.max(0, now - ts) * rate)
+    tokens[i], caps[i], rates[i] = t, cap, rate
+    local need = math.min(cost, cap)
+    if t < need then
+        if denied == 0 then denied = i end
+        retry = math.max(retry, (need - t) / rate)
+    end
+end
+local out = {denied == 0 and 1 or 0, denied}
+for i, key in ipairs(KEYS) do
+    if denied == 0 then
+        tokens[i] = tokens[i] - math.min(cost, caps[i])
+    end
+    redis.call('HSET', key, 'tokens', tokens[i], 'timestamp', now)
+    redis.call('EXPIRE', key, math.ceil(caps[i] / rates[i]) + 1)
+    table.insert(out, tostring(tokens[i]))
+end
+table.insert(out, tostring(retry))
+return out
+"""
+
+_script = None
+
+
+def _bucket_script():
+    # tests / benchmarks 會換掉 redis_ratelimit，client 變了就重新 register
+    global _script
+    if _script is None or _script.registered_client is not redis_ratelimit:
+        _script = redis_ratelimit.register_script(TOKEN_BUCKET_LUA)
+    return _script
+
+
+@dataclass
+class Bucket:
+    key: str
+    capacity: float
+    refill_per_sec: float
+    name: str = "user"
+
+
+@dataclass
+class Decision:
+    allowed: bool
+    remaining: float  # 第一個 bucket（使用者自己的）剩下的 token
+    retry_after: float
+    denied_by: Optional[str] = None
+
+
+def consume(buckets: Sequence[Bucket], cost: float, now: Optional[float] = None) -> Decision:
+    args: List[float] = [now if now is not None else time.time(), cost]
+    for b in buckets:
+        args += [b.capacity, b.refill_per_sec]
+    result = _bucket_script()(keys=[b.key for b in buckets], args=args)
+
+    allowed, denied = int(result[0]), int(result[1])
+    return Decision(
+        allowed=bool(allowed),
+        remaining=float(result[2]),
+        retry_after=float(result[-1]),
+        denied_by=buckets[denied - 1].name if denied else None,
+    )
+
 
 def rate_limiter(
     key: str,
     max_tokens: int = 10,
     refill_rate: float = 1.0,
+    cost: float = 1.0,
 ):
-    pipe = redis_ratelimit.pipeline()
-    now = time.time()
+    decision = consume([Bucket(key, max_tokens, refill_rate)], cost)
+    if not decision.allowed:
+        raise HTTPException(429, "Too Many Requests",
+                            headers={"Retry-After": str(max(math.ceil(decision.retry_after), 1))})
+
+
+# ---- middleware 用：身分、route cost ----
+
+def identity(request: Request) -> Tuple[str, str]:
+    """(bucket key, tier)。只驗 JWT 簽章與期限，不查 DB；無效的 token 視同沒帶。"""
+    auth = request.headers.get("authorization", "")
+    if auth.lower().startswith("bearer "):
+        try:
+            payload = jwt.decode(auth[7:], settings.jwt_secret_key, algorithms=[settings.jwt_algorithm])
+        except jwt.PyJWTError:
+            payload = None
+        if payload and payload.get("sub"):
+            # 舊 token 沒有 role claim：用最低的登入額度
+            role = payload.get("role") or "viewer"
+            return f"user:{payload['sub']}", role if role in settings.rate_limit_tiers else "viewer"
+    client_ip = request.client.host if request.client else "unknown"
+    return f"ip:{client_ip}", "anonymous"
+
+
+def match_route(request: Request) -> Optional[str]:
+    """middleware 執行時 router 還沒比對，自己找出 route template（/update/{lot_id} 這種，不是實際 path）。"""
+    for route in request.app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return getattr(route, "path", None)
+    return None
+
 
-    pipe.hgetall(key)
-    data = pipe.execute()[0]
+def _span_days(params) -> int:
+    try:
+        return (date.fromisoformat(params["date_to"]) - date.fromisoformat(params["date_from"])).days + 1
+    except (KeyError, ValueError):
+        return 0
 
-    if not data:
-        # 初始化
-        redis_ratelimit.hset(key, mapping={
-            "tokens": max_tokens - 1,
-            "timestamp": now
-        })
-        return
 
-    # 同時支援 bytes / str
-    tokens = float(data.get("tokens") or data.get(b"tokens") or 0)
-    last_ts = float(data.get("timestamp") or data.get(b"timestamp") or 0)
+def request_cost(route: Optional[str], params) -> float:
+    spec = settings.rate_limit_route_costs.get(route or "", {})
+    cost = spec.get("base", 1.0)
+    if spec.get("per_day"):
+        cost += spec["per_day"] * max(_span_days(params), 0)
+    if spec.get("per_lot"):
+        cost += spec["per_lot"] * len(params.getlist("lots"))
+    return cost
 
-    # 補充 token
-    delta = now - last_ts
-    tokens = min(max_tokens, tokens + delta * refill_rate)
 
-    if tokens < 1:
-        raise HTTPException(429, "Too Many Requests")
+def buckets_for(key: str, tier: str, cost: float) -> List[Bucket]:
+    limits = settings.rate_limit_tiers[tier]
+    buckets = [Bucket(f"rl:{key}", limits["capacity"], limits["refill_per_sec"])]
+    if cost >= settings.rate_limit_heavy_cost:
+        heavy = settings.rate_limit_heavy_pool
+        buckets.append(Bucket("rl:heavy", heavy["capacity"], heavy["refill_per_sec"], name="heavy"))
+    return buckets
 
-    tokens -= 1
 
-    redis_ratelimit.hset(key, mapping={
-        "tokens": tokens,
-        "timestamp": now
-    })
+def check_request(request: Request) -> Tuple[Decision, Bucket]:
+    key, tier = identity(request)
+    cost = request_cost(match_route(request), request.query_params)
+    buckets = buckets_for(key, tier, cost)
+    decision = consume(buckets, cost)
+    if not decision.allowed:
+        RATE_LIMITED.labels(tier=tier, bucket=decision.denied_by).inc()
+    return decision, buckets[0]
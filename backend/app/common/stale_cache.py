@@ -0,0 +1,124 @@
+# app/common/stale_cache.py
+"""
+Degraded mode：breaker 打開時回傳「最後一次成功」的結果，而不是 503。
+
+    @router.get("/dates", response_model=List[date])
+    @coalesce("filter.dates")
+    @stale_fallback("filter.dates")
+    @postgres_breaker
+    async def list_dates(...): ...
+
+handler 真的算出新結果時另外存一份長 TTL（lkg_ttl_seconds）的 last-known-good copy，跟 30 秒的一般快取分開；
+handler 因為 breaker 打開或 bulkhead 滿載（CircuitBreakerError / Overloaded / 503）失敗時改回傳這份 copy，並加上
+Warning: 110 與 X-Data-Staleness（距離存入的秒數）。沒有 copy 時照原本的錯誤往外丟。
+
+- 放在 coalesce 裡面：同一組 coalesced request 只有真正執行的那一個會存 / 讀 copy，follower 不會各寫一次
+- 從一般快取直接回傳的結果用 CachedResponse 包起來，不再存一次 copy
+- 讀寫 copy 都經過 redis_bulkhead（丟到 thread 執行），不卡住 event loop
+"""
+import functools
+import json
+import logging
+import time
+from typing import Callable, Optional
+
+from aiobreaker import CircuitBreakerError
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from prometheus_client import Counter
+from starlette.responses import Response
+
+from app.common.cache_key import make_cache_key, normalize_params
+from app.common.concurrency import Overloaded, redis_bulkhead
+from app.config.config import settings
+from app.services import redis_client
+
+logger = logging.getLogger(__name__)
+
+DEGRADED_RESPONSES = Counter(
+    "degraded_responses_total",
+    "Requests answered while a dependency was unavailable (stale = served last known good, unavailable = no copy)",
+    ["endpoint", "reason"],
+)
+
+# fan-out 的部分結果帶這個 header，不當成 last known good
+PARTIAL_HEADER = "X-Partial-Result"
+
+
+class CachedResponse(Response):
+    """從一般快取直接取出的回應：內容沒有變，不必再存一份 last known good。"""
+
+
+def _body_of(result) -> Optional[str]:
+    if isinstance(result, CachedResponse):
+        return None
+    if isinstance(result, Response):
+        if result.status_code != 200 or PARTIAL_HEADER.lower() in result.headers:
+            return None
+        return result.body.decode()
+    return json.dumps(jsonable_encoder(result))
+
+
+async def remember(key: str, result):
+    body = _body_of(result)
+    if body is None:
+        return
+    try:
+        await redis_bulkhead.run(
+            redis_client.redis_cache.set, key, json.dumps({"stored_at": time.time(), "body": body}),
+            ex=settings.lkg_ttl_seconds,
+        )
+    except Exception:
+        # Redis 掛掉不影響正常回應
+        logger.debug("store last known good failed", exc_info=True)
+
+
+async def load_stale(key: str) -> Optional[Response]:
+    try:
+        raw = await redis_bulkhead.run(redis_client.redis_cache.get, key)
+    except Exception:
+        return None
+    if not raw:
+        return None
+    entry = json.loads(raw)
+    staleness = max(int(time.time() - entry["stored_at"]), 0)
+    return Response(
+        content=entry["body"],
+        media_type="application/json",
+        headers={"Warning": '110 - "Response is Stale"', "X-Data-Staleness": str(staleness)},
+    )
+
+
+def _unavailable(exc: Exception) -> bool:
+    return isinstance(exc, (CircuitBreakerError, Overloaded)) or (
+        isinstance(exc, HTTPException) and exc.status_code == 503
+    )
+
+
+def stale_fallback(name: str, skip: Optional[Callable[[dict], bool]] = None):
+    """skip(kwargs) 為 True 的 request（例如 delta 查詢）不存、也不回傳 stale copy。"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            if skip and skip(kwargs):
+                return await fn(*args, **kwargs)
+
+            key = make_cache_key(f"lkg:{name}", normalize_params(kwargs))
+            try:
+                result = await fn(*args, **kwargs)
+            except Exception as exc:
+                if not _unavailable(exc):
+                    raise
+                stale = await load_stale(key)
+                if stale is None:
+                    DEGRADED_RESPONSES.labels(endpoint=name, reason="unavailable").inc()
+                    raise
+                DEGRADED_RESPONSES.labels(endpoint=name, reason="stale").inc()
+                return stale
+
+            await remember(key, result)
+            return result
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,36 @@
+# app/common/startup.py
+"""
+記錄 process 從開始 import 到可以接 request 之間，各階段花了多久。
+
+app.main 最先 import 這個模組，所以 imports 階段涵蓋了 main 的所有 import；
+之後 on_startup 裡每完成一步就 mark 一次，結果由 /health/startup 回傳。
+"""
+import time
+from typing import Dict, Optional
+
+
+class StartupTimer:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._last = self.started
+        self.phases: Dict[str, float] = {}
+        self.ready_at: Optional[float] = None
+
+    def mark(self, name: str):
+        """從上一次 mark（或建立時）到現在的時間記為 name 階段。"""
+        now = time.perf_counter()
+        self.phases[name] = self.phases.get(name, 0.0) + (now - self._last)
+        self._last = now
+
+    def ready(self):
+        self.ready_at = time.perf_counter()
+
+    def report(self) -> dict:
+        return {
+            "ready": self.ready_at is not None,
+            "total_ms": round(((self.ready_at or time.perf_counter()) - self.started) * 1000, 2),
+            "phases_ms": {name: round(secs * 1000, 2) for name, secs in self.phases.items()},
+        }
+
+
+startup_timer = StartupTimer()
@@ -1,4 +1,5 @@
 # app/tasks.py
+import asyncio
 from datetime import datetime
 from time import sleep
 
@@ -20,3 +21,114 @@ def recalc_yield_for_lots(lot_ids: list[str]) -> dict:
         "status": "recalculated",
         "finished_at": datetime.utcnow().isoformat() + "Z",
     }
+
+
+@celery_app.task
+def maintain_partitions() -> dict:
+    """每日（celery beat）：補齊未來月份的 partition、detach 超過保留期限的 partition。"""
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    from app.config.config import settings
+    from app.services.partitions import maintain
+
+    async def run():
+        # worker 裡每次 asyncio.run 都是新的 event loop，不能共用 API 那個 engine 的連線
+        bind = create_async_engine(settings.database_url)
+        try:
+            return await maintain(bind)
+        finally:
+            await bind.dispose()
+
+    return asyncio.run(run())
+
+
+@celery_app.task
+def compact_defect_details() -> dict:
+    """每日（celery beat）：過期 lot 的 defect_detail 原始點位搬到冷儲存、改存格子彙總。"""
+    from app.common.cache_key import clear_yield_trend_cache
+    from app.services.live_updates import publish_update
+    from app.services.retention import run_retention
+    from app.services.wafermap import bump_version as bump_wafermap_version
+
+    result = run_retention()
+    if result["lots"]:
+        # 壓縮過的 lot 點位從原始點變成彙總點，快取、wafer map tile 與 dashboard 都要重新查
+        clear_yield_trend_cache(*result["lot_ids"])
+        bump_wafermap_version(*result["lot_ids"])
+        publish_update({"kind": "reset", "reason": "compaction"})
+    return result
+
+
+@celery_app.task
+def sweep_wafermap_tiles() -> dict:
+    """每日（celery beat）：wafermap_cache = disk 時刪掉過期的 wafer map tile。"""
+    from app.services.wafermap import sweep_tiles
+
+    return {"removed": sweep_tiles()}
+
+
+@celery_app.task
+def cluster_pending_lots() -> dict:
+    """celery beat：ingest / detail add 標記過的 lot 重新計算 defect cluster。"""
+    from app.common.cache_key import clear_yield_trend_cache
+    from app.database.mongo import mongo_db
+    from app.services.clustering import run_pending
+
+    result = run_pending(mongo_db)
+    if result["lot_ids"]:
+        # trend 的 per-lot fragment 帶著 cluster 摘要
+        clear_yield_trend_cache(*result["lot_ids"])
+    return result
+
+
+@celery_app.task
+def cluster_lots(lot_ids: list) -> dict:
+    """指定的 lot 重新計算 defect cluster（補算歷史資料、調整參數後重算）。"""
+    from app.common.cache_key import clear_yield_trend_cache
+    from app.database.mongo import mongo_db
+    from app.services.clustering import cluster_lot
+
+    clusters = sum(len(cluster_lot(mongo_db, lot_id)["clusters"]) for lot_id in lot_ids)
+    if lot_ids:
+        clear_yield_trend_cache(*lot_ids)
+    return {"lots": len(lot_ids), "clusters": clusters}
+
+
+@celery_app.task(bind=True)
+def build_trend_report(self, params: dict) -> dict:
+    """POST /reports/trend：分段計算 /yield/trend 的結果，gzip 後存起來；task id 就是 job id。"""
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    from app.config.config import settings
+    from app.database.mongo import mongo_db
+    from app.services.reports import compute_trend_report, release_job, store_report
+
+    job_id = self.request.id
+
+    def progress(done: int, total: int, stage: str):
+        self.update_state(state="PROGRESS", meta={
+            "done": done, "total": total, "percent": round(done * 100 / total), "stage": stage,
+        })
+
+    async def run():
+        bind = create_async_engine(settings.database_url)
+        try:
+            return await compute_trend_report(params, async_sessionmaker(bind, expire_on_commit=False),
+                                              mongo_db, progress)
+        finally:
+            await bind.dispose()
+
+    try:
+        result = asyncio.run(run())
+        size = store_report(job_id, result)
+    finally:
+        # 成功或失敗都釋放 dedup key，之後相同的 request 會重新計算
+        release_job(params)
+
+    return {
+        "job_id": job_id,
+        "result_url": f"/reports/trend/{job_id}",
+        "bytes": size,
+        "dates": len(result["dates"]),
+        "defect_details": len(result["defect_details"]),
+    }
@@ -0,0 +1,61 @@
+# app/common/timing.py
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from prometheus_client import Histogram
+
+from app.common.metrics import LATENCY_BUCKETS
+
+# 目前 request 的 phase -> 累計秒數；沒有在 request 裡（例如 Celery task）時為 None
+_phases: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_phases", default=None)
+
+PHASE_LATENCY = Histogram(
+    "http_request_phase_seconds",
+    "Time spent in each named phase of a request",
+    ["endpoint", "phase"],
+    buckets=LATENCY_BUCKETS,
+)
+
+
+def start_request_timing() -> Dict[str, float]:
+    """middleware 在 call_next 之前呼叫；回傳的 dict 會被 handler 裡的 phase() 填入。"""
+    phases: Dict[str, float] = {}
+    _phases.set(phases)
+    return phases
+
+
+@contextmanager
+def phase(name: str):
+    """
+    記錄一段程式花的時間：
+
+        with phase("db_yield"):
+            result = await session.execute(stmt)
+
+    同名 phase 出現多次時會累加。
+    """
+    phases = _phases.get()
+    if phases is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        phases[name] = phases.get(name, 0.0) + (time.perf_counter() - start)
+
+
+def server_timing_header(phases: Dict[str, float], total: Optional[float] = None) -> str:
+    """轉成 Server-Timing header，例如 `db_yield;dur=12.3, aggregate;dur=0.8`（單位 ms）。"""
+    parts = [f"{name};dur={secs * 1000:.2f}" for name, secs in phases.items()]
+    if total is not None:
+        parts.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(parts)
+
+
+def observe_phases(endpoint: str, phases: Dict[str, float]):
+    for name, secs in phases.items():
+        PHASE_LATENCY.labels(endpoint=endpoint, phase=name).observe(secs)
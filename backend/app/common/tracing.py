@@ -1,14 +1,274 @@
-from opentelemetry import trace
+import threading
+from collections import OrderedDict
+from typing import Callable, List
+
+from opentelemetry import propagate, trace
 from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
 from opentelemetry.sdk.resources import Resource
-from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace import ReadableSpan, SpanProcessor, TracerProvider
 from opentelemetry.sdk.trace.export import BatchSpanProcessor
+from opentelemetry.sdk.trace.sampling import (
+    Decision,
+    ParentBased,
+    Sampler,
+    SamplingResult,
+    TraceIdRatioBased,
+)
+from opentelemetry.trace import SpanContext, SpanKind, Status, StatusCode, TraceFlags
+
+from app.config.config import settings
+
+# tail sampling 判斷函式：收到整條 trace（本 process 內）的 span，回傳 True 代表要保留
+TailSamplingHook = Callable[[List[ReadableSpan]], bool]
+
+_tail_hooks: List[TailSamplingHook] = []
+
+
+def register_tail_sampling_hook(hook: TailSamplingHook):
+    _tail_hooks.append(hook)
+
+
+def _is_slow(spans: List[ReadableSpan]) -> bool:
+    threshold_ns = settings.trace_tail_latency_ms * 1_000_000
+    return any(
+        s.end_time is not None and s.start_time is not None
+        and s.end_time - s.start_time >= threshold_ns
+        for s in spans
+    )
+
+
+def _has_error(spans: List[ReadableSpan]) -> bool:
+    for s in spans:
+        if s.status.status_code == StatusCode.ERROR:
+            return True
+        code = (s.attributes or {}).get("http.status_code") or (s.attributes or {}).get(
+            "http.response.status_code"
+        )
+        if isinstance(code, int) and code >= 500:
+            return True
+    return False
+
+
+register_tail_sampling_hook(_is_slow)
+register_tail_sampling_hook(_has_error)
+
+
+class _RecordOnlyRatioSampler(Sampler):
+    """
+    跟 TraceIdRatioBased 一樣做 head sampling，但沒被抽中的 trace 仍然 RECORD_ONLY，
+    讓 TailSamplingSpanProcessor 有機會在結束時把慢的 / 出錯的 trace 撈回來。
+    """
+
+    def __init__(self, rate: float):
+        self._ratio = TraceIdRatioBased(rate)
+
+    def should_sample(self, parent_context, trace_id, name, kind=None, attributes=None, links=None, trace_state=None):
+        result = self._ratio.should_sample(
+            parent_context, trace_id, name, kind, attributes, links, trace_state
+        )
+        if result.decision == Decision.DROP:
+            return SamplingResult(Decision.RECORD_ONLY, attributes, result.trace_state)
+        return result
+
+    def get_description(self) -> str:
+        return f"RecordOnlyRatio{{{self._ratio.rate}}}"
+
+
+class _RecordOnlySampler(Sampler):
+    """parent 沒被抽中時，子 span 也只 RECORD_ONLY，整條 trace 才能一起被 tail sampling 撈回。"""
+
+    def should_sample(self, parent_context, trace_id, name, kind=None, attributes=None, links=None, trace_state=None):
+        return SamplingResult(Decision.RECORD_ONLY, attributes, trace_state)
+
+    def get_description(self) -> str:
+        return "RecordOnly"
+
+
+def _as_sampled(span: ReadableSpan) -> ReadableSpan:
+    ctx = span.context
+    sampled_ctx = SpanContext(
+        ctx.trace_id,
+        ctx.span_id,
+        ctx.is_remote,
+        TraceFlags(TraceFlags.SAMPLED),
+        ctx.trace_state,
+    )
+    return ReadableSpan(
+        name=span.name,
+        context=sampled_ctx,
+        parent=span.parent,
+        resource=span.resource,
+        attributes=span.attributes,
+        events=span.events,
+        links=span.links,
+        kind=span.kind,
+        status=span.status,
+        start_time=span.start_time,
+        end_time=span.end_time,
+        instrumentation_scope=span.instrumentation_scope,
+    )
+
+
+class TailSamplingSpanProcessor(SpanProcessor):
+    """
+    已被 head sampling 抽中的 span 直接交給下游；其餘 span 先暫存在記憶體，
+    等本地 root span 結束時跑 hooks，決定整條 trace 要不要補送。
+    暫存的 trace 數量有上限，超過時丟掉最舊的，記憶體不會無限成長。
+    """
+
+    def __init__(self, delegate: SpanProcessor, max_traces: int = 1024, max_spans_per_trace: int = 256):
+        self._delegate = delegate
+        self._max_traces = max_traces
+        self._max_spans = max_spans_per_trace
+        self._pending: "OrderedDict[int, List[ReadableSpan]]" = OrderedDict()
+        self._lock = threading.Lock()
 
+    def on_start(self, span, parent_context=None):
+        self._delegate.on_start(span, parent_context=parent_context)
 
-def setup_tracing(service_name: str):
+    def on_end(self, span: ReadableSpan):
+        if span.context.trace_flags.sampled:
+            self._delegate.on_end(span)
+            return
+
+        trace_id = span.context.trace_id
+        is_local_root = span.parent is None or span.parent.is_remote
+
+        with self._lock:
+            spans = self._pending.get(trace_id)
+            if spans is None:
+                spans = []
+                self._pending[trace_id] = spans
+                if len(self._pending) > self._max_traces:
+                    self._pending.popitem(last=False)
+            if len(spans) < self._max_spans:
+                spans.append(span)
+            if not is_local_root:
+                return
+            self._pending.pop(trace_id, None)
+
+        if any(hook(spans) for hook in _tail_hooks):
+            for s in spans:
+                self._delegate.on_end(_as_sampled(s))
+
+    def shutdown(self):
+        self._delegate.shutdown()
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return self._delegate.force_flush(timeout_millis)
+
+
+def build_span_processor(exporter) -> SpanProcessor:
+    processor = BatchSpanProcessor(
+        exporter,
+        max_queue_size=settings.otel_bsp_max_queue_size,
+        max_export_batch_size=settings.otel_bsp_max_export_batch_size,
+        schedule_delay_millis=settings.otel_bsp_schedule_delay_millis,
+        export_timeout_millis=settings.otel_bsp_export_timeout_millis,
+    )
+    if settings.trace_tail_sampling:
+        processor = TailSamplingSpanProcessor(processor)
+    return processor
+
+
+def build_sampler() -> Sampler:
+    # ParentBased：上游已決定要不要 trace 就沿用，只有 root span 才依比例抽樣
+    ratio = settings.trace_sample_ratio
+    if settings.trace_tail_sampling:
+        record_only = _RecordOnlySampler()
+        return ParentBased(
+            root=_RecordOnlyRatioSampler(ratio),
+            remote_parent_not_sampled=record_only,
+            local_parent_not_sampled=record_only,
+        )
+    return ParentBased(root=TraceIdRatioBased(ratio))
+
+
+def setup_tracing(service_name: str, exporter=None):
     provider = TracerProvider(
-        resource=Resource.create({"service.name": service_name})
+        resource=Resource.create({"service.name": service_name}),
+        sampler=build_sampler(),
     )
-    exporter = OTLPSpanExporter(endpoint="http://jaeger:4318/v1/traces")
-    provider.add_span_processor(BatchSpanProcessor(exporter))
+    if exporter is None:
+        exporter = OTLPSpanExporter(endpoint=settings.otel_exporter_otlp_traces_endpoint)
+    provider.add_span_processor(build_span_processor(exporter))
     trace.set_tracer_provider(provider)
+    return provider
+
+
+class LeanTracingMiddleware:
+    """
+    低成本的 server span middleware（純 ASGI，不經過 BaseHTTPMiddleware）。
+    沒被抽樣到的 request 只付出一次 sampler 判斷，不收集任何 attribute；
+    有被抽樣（或 tail sampling RECORD_ONLY）時才補上 route / status 等資訊。
+    """
+
+    def __init__(self, app, excluded_urls: str = ""):
+        self.app = app
+        self.excluded = tuple(u.strip() for u in excluded_urls.split(",") if u.strip())
+        self.tracer = trace.get_tracer(__name__)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or (self.excluded and scope["path"].startswith(self.excluded)):
+            await self.app(scope, receive, send)
+            return
+
+        carrier = {}
+        for key, value in scope["headers"]:
+            if key in (b"traceparent", b"tracestate"):
+                carrier[key.decode()] = value.decode()
+        ctx = propagate.extract(carrier) if carrier else None
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        with self.tracer.start_as_current_span(
+            scope["method"], context=ctx, kind=SpanKind.SERVER,
+            record_exception=True, set_status_on_exception=True,
+        ) as span:
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                if span.is_recording():
+                    from starlette.requests import Request
+
+                    from app.common.metrics import route_template
+
+                    route = route_template(Request(scope))
+                    span.update_name(f"{scope['method']} {route}")
+                    span.set_attribute("http.request.method", scope["method"])
+                    span.set_attribute("http.route", route)
+                    span.set_attribute("http.response.status_code", status_code)
+                    if status_code >= 500:
+                        span.set_status(Status(StatusCode.ERROR))
+
+
+def instrument_fastapi(app):
+    if settings.trace_mode == "lean":
+        # 在 startup 時呼叫：middleware stack 已經建好，不能再 add_middleware；
+        # 跟 FastAPIInstrumentor.instrument_app 一樣包住 build_middleware_stack，已經建好的話重建一次
+        build = app.build_middleware_stack
+        excluded_urls = settings.trace_excluded_urls
+
+        def build_with_tracing():
+            return LeanTracingMiddleware(build(), excluded_urls=excluded_urls)
+
+        app.build_middleware_stack = build_with_tracing
+        if app.middleware_stack is not None:
+            app.middleware_stack = app.build_middleware_stack()
+        return
+
+    from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
+
+    # 預設不產生每個 ASGI receive / send 的 internal span，一個 request 只留一個 server span
+    exclude_spans = None if settings.trace_asgi_internal_spans else ["receive", "send"]
+    FastAPIInstrumentor().instrument_app(
+        app,
+        excluded_urls=settings.trace_excluded_urls,
+        exclude_spans=exclude_spans,
+    )
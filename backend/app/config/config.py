@@ -1,4 +1,6 @@
 # app/database.py
+from typing import Dict
+
 from pydantic import BaseSettings
 
 
@@ -17,6 +19,134 @@ class Settings(BaseSettings):
     REDIS_BROKER_URL: str
     REDIS_BACKEND_URL: str
 
+    # ---- Observability ----
+    metrics_sample_rate: float = 1.0  # latency histogram 抽樣比例（counter 不抽樣）
+    log_level: str = "INFO"
+    log_json: bool = True
+    log_levels: Dict[str, str] = {}  # 個別 logger 等級，例如 {"app.routers.yield_router": "DEBUG"}
+    log_access_sample_rate: float = 0.0  # access log 預設抽樣比例，0 = 不寫
+    log_route_sample_rates: Dict[str, float] = {}  # 依 route template 覆寫，例如 {"/yield/trend": 0.1}
+
+    # ---- Tracing ----
+    otel_exporter_otlp_traces_endpoint: str = "http://jaeger:4318/v1/traces"
+    trace_sample_ratio: float = 1.0  # root span 抽樣比例（ParentBased）
+    trace_tail_sampling: bool = False  # 沒抽中的 trace 若變慢 / 出錯仍補送
+    trace_tail_latency_ms: int = 1000
+    otel_bsp_max_queue_size: int = 2048
+    otel_bsp_max_export_batch_size: int = 512
+    otel_bsp_schedule_delay_millis: int = 5000
+    otel_bsp_export_timeout_millis: int = 30000
+    sql_commenter_enabled: bool = False
+    trace_mode: str = "lean"  # lean = 自家輕量 middleware；full = FastAPIInstrumentor
+    trace_asgi_internal_spans: bool = False  # ASGI receive / send 各自開 span，成本高
+    trace_excluded_urls: str = "/health,/metrics,/stream"  # /stream 是長連線，不當成一般 request 追蹤
+    server_timing_enabled: bool = True  # 回傳 Server-Timing header（各 phase 耗時）
+    profiling_enabled: bool = False  # 開放 admin 的 /debug/profile/*
+
+    # ---- Server（python -m app.server / gunicorn.conf.py） ----
+    web_concurrency: int = 0  # worker 數，0 = 依可用 CPU 數
+    max_workers: int = 16
+    graceful_timeout: int = 30  # SIGTERM 後等 in-flight request 做完的秒數
+    db_pool_size: int = 5  # 每個 worker 的連線數
+    db_max_overflow: int = 10
+    db_total_connections: int = 0  # >0 時依 worker 數平分，取代 db_pool_size / db_max_overflow
+    mongo_max_pool_size: int = 50  # 每個 worker
+    redis_max_connections: int = 50  # 每個 worker、每個 Redis client
+
+    # ---- Load shedding（app.common.concurrency） ----
+    bulkhead_enabled: bool = True
+    bulkhead_postgres_max: int = 0  # 每個 worker 的並行上限，0 = pool_size + max_overflow
+    bulkhead_mongo_max: int = 0  # 0 = mongo_max_pool_size
+    bulkhead_redis_max: int = 0  # 0 = redis_max_connections
+    bulkhead_target_latency_ms: Dict[str, int] = {"postgres": 250, "mongo": 250, "redis": 20}  # 超過就調降 limit
+    bulkhead_queue_size: int = 50  # 每個 bulkhead 最多排隊的呼叫數，超過直接 503
+    bulkhead_queue_timeout_ms: int = 500  # 排隊超過這個時間直接 503
+    shed_retry_after_seconds: int = 1
+    redis_socket_timeout: float = 1.0  # Redis 呼叫是同步的，卡住會拖住整個 event loop
+
+    # ---- Rate limiting（app.common.rate_limit） ----
+    # 每個身分一個 bucket：capacity = 最多可累積的 token，refill_per_sec = 每秒補回的 token
+    rate_limit_tiers: Dict[str, Dict[str, float]] = {
+        "anonymous": {"capacity": 120, "refill_per_sec": 2},
+        "viewer": {"capacity": 300, "refill_per_sec": 5},
+        "engineer": {"capacity": 600, "refill_per_sec": 10},
+        "admin": {"capacity": 1200, "refill_per_sec": 20},
+    }
+    # route template -> cost；沒列出的 route 扣 1
+    rate_limit_route_costs: Dict[str, Dict[str, float]] = {
+        "/yield/trend": {"base": 5, "per_day": 0.5, "per_lot": 0.05},
+        "/yield/list": {"base": 5},
+        "/summary/list": {"base": 5},
+        "/detail/list": {"base": 10},
+        "/defects/region": {"base": 3},
+        "/ingest/lot": {"base": 2},
+        "/seed/sql": {"base": 50},
+        "/reports/trend": {"base": 5},  # 只排入 queue，計算在 worker
+    }
+    rate_limit_heavy_cost: float = 20  # cost 達到這個值的 request 另外扣全站共用的 heavy bucket
+    rate_limit_heavy_pool: Dict[str, float] = {"capacity": 2000, "refill_per_sec": 20}
+
+    # ---- Read path ----
+    coalesce_enabled: bool = True  # 相同參數的並行讀取只查一次（app.common.coalesce）
+    delta_skew_ms: int = 5000  # /yield/trend?since= 往前多看的時間，涵蓋未 commit 的寫入與時鐘誤差
+    lkg_ttl_seconds: int = 24 * 60 * 60  # trend / filter 的 last known good copy，breaker 打開時回傳（app.common.stale_cache）
+    trend_fragment_ttl_seconds: int = 120  # /yield/trend 的 per-lot fragment（app.services.trend_fragments），lot 有變動時清掉
+    fanout_branch_timeout_ms: int = 2000  # /yield/trend 平行查詢中非必要來源（summary / Mongo）的 timeout，超過回傳部分結果
+
+    # ---- Live updates（/stream/yield） ----
+    live_updates_redis: bool = True  # false = 只通知本 process 的連線（單 worker / 開發用）
+    live_queue_size: int = 100  # 每條連線最多暫存的 update，滿了改送 reset
+    live_heartbeat_seconds: int = 15
+    live_retry_ms: int = 3000  # EventSource 斷線後重連的間隔
+
+    # ---- Partitioning（yield_record / defect_summary 依月份，Postgres） ----
+    partition_months_back: int = 12  # 維護時往前補齊的月份數（歷史資料匯入用）
+    partition_months_ahead: int = 3  # 預先建立的未來月份數
+    partition_retention_months: int = 0  # >0 時超過這個月數的 partition 會被 detach，0 = 全部保留
+    partition_drop_detached: bool = False  # detach 後直接 DROP（預設留著給人備份 / 歸檔）
+
+    # ---- Retention（Mongo defect_detail，app.services.retention） ----
+    retention_hot_days: int = 90  # 超過的 lot 原始點位搬到冷儲存、改存格子彙總，0 = 不壓縮
+    retention_cell_size: float = 5.0  # 彙總格子邊長（座標單位，wafer map 是 0~100）
+    retention_cold_target: str = "collection"  # collection = defect_detail_cold；archive = gzip JSONL 檔
+    retention_archive_dir: str = "/data/defect_archive"
+    retention_batch_lots: int = 500  # 每次最多壓縮的 lot 數
+
+    # ---- Reports（POST /reports/trend，app.services.reports） ----
+    report_chunk_days: int = 7  # yield / summary 每段查幾天
+    report_lot_batch: int = 500  # Mongo 點位每批查幾個 lot
+    report_storage: str = "redis"  # redis = REDIS_CACHE_URL；disk = report_dir（API 與 worker 要掛同一個目錄）
+    report_dir: str = "/data/reports"
+    report_ttl_seconds: int = 24 * 60 * 60  # 結果保留時間
+    report_job_timeout_seconds: int = 60 * 60  # 相同參數的 job 去重最多維持多久（worker 掛掉時不會一直卡住）
+
+    # ---- SPC（/spc/*，app.services.spc） ----
+    # product -> yield（%）規格界限，"*" = 沒有個別設定的 product
+    spc_spec_limits: Dict[str, Dict[str, float]] = {"*": {"lsl": 90.0, "usl": 100.0}}
+    sketch_compression: int = 100  # yield 分佈 t-digest 的 δ，越大越準、每天的 sketch 越大（約 δ/2 個 centroid）
+
+    # ---- Wafer map（/wafermap/*.png，app.services.wafermap） ----
+    wafermap_tile_size: int = 256  # 每張 tile 的邊長（px）
+    wafermap_max_zoom: int = 4  # z = 0 整片 wafer 一張，z 每加 1 邊長切成兩倍
+    wafermap_point_radius: int = 2  # 點的半徑（px）；aggregate 點依 count 再加大
+    wafermap_cache: str = "redis"  # redis = REDIS_CACHE_URL；disk = wafermap_dir（多個 worker 與 celery worker 要掛同一個目錄）
+    wafermap_dir: str = "/data/wafermap"
+    wafermap_ttl_seconds: int = 7 * 24 * 60 * 60  # tile 保留多久；舊版本的 tile 沒人讀：Redis 到期自然清掉，disk 由每日的 sweep_wafermap_tiles 刪掉
+
+    # ---- Defect clustering（/defects/clusters，app.services.clustering） ----
+    cluster_cell_size: float = 2.0  # 分格邊長（座標單位，wafer 直徑 100 -> 50 × 50 格）
+    cluster_min_cell_points: int = 3  # core 格最少的點數
+    cluster_density_factor: float = 3.0  # core 格至少要是該片 wafer 平均每格點數的幾倍（背景均勻散佈的點不會連成 cluster）
+    cluster_min_points: int = 10  # 點數少於這個的 cluster 不列出
+    cluster_edge_radius: float = 40.0  # 點到圓心的平均距離 ≥ 這個值 -> edge
+    cluster_center_radius: float = 15.0  # 重心距圓心 ≤ 這個值 -> center
+    cluster_scratch_elongation: float = 4.0  # 主軸 / 次軸標準差 ≥ 這個值 -> scratch
+    cluster_interval_seconds: int = 60  # celery beat 處理待算清單的間隔
+    cluster_batch_lots: int = 200  # 每次最多算幾個 lot
+
+    # ---- Startup ----
+    fast_boot: bool = False  # true = 啟動時不建 table / 預設帳號，改跑 python -m app.tools.bootstrap
+
     class Config:
         env_file = ".env"
 
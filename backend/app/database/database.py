@@ -1,12 +1,129 @@
 # app/database/database.py
 import os
+import time
 
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import Session
 
+from app.common.concurrency import make_limiter
 from ..config.config import settings
 
-engine = create_async_engine(settings.database_url, echo=False, future=True)
+
+def pool_options(database_url: str) -> dict:
+    """
+    每個 worker 的 connection pool 大小。
+    設了 db_total_connections 時依 worker 數平分，整體連線數不會隨 worker 數暴增。
+    """
+    if database_url.startswith("sqlite"):
+        return {}
+    if settings.db_total_connections > 0:
+        per_worker = max(settings.db_total_connections // max(settings.web_concurrency, 1), 1)
+        return {"pool_size": per_worker, "max_overflow": 0}
+    return {"pool_size": settings.db_pool_size, "max_overflow": settings.db_max_overflow}
+
+
+def _pool_connections() -> int:
+    options = pool_options(settings.database_url)
+    return options.get("pool_size", 5) + options.get("max_overflow", 0)
+
+
+postgres_bulkhead = make_limiter("postgres", settings.bulkhead_postgres_max or _pool_connections())
+
+
+_SLOT = "postgres_bulkhead_slot"
+
+
+def _release_slot(session: Session):
+    held = session.info.pop(_SLOT, None)
+    if held is not None:
+        postgres_bulkhead.release(time.perf_counter() - held["since"], held["ok"])
+
+
+class BulkheadSyncSession(Session):
+    """BulkheadSession 底下的 sync Session；slot 的狀態記在 session.info，交易結束（連線還回 pool）時放掉。"""
+
+
+@event.listens_for(BulkheadSyncSession, "after_transaction_end")
+def _return_slot(session: Session, transaction):
+    # commit / rollback / close，包含 async with session.begin() 結束時；savepoint 結束連線還在用，不放
+    if transaction.parent is None:
+        _release_slot(session)
+
+
+class BulkheadSession(AsyncSession):
+    """
+    postgres bulkhead 的 slot 跟著連線走：session 第一次跟 Postgres 來回（從 pool 借出連線）時拿，
+    交易結束或 session 關閉、連線還回 pool 時才放；滿了直接丟 Overloaded（503）。
+    slot 記在 session 上而不是 task 的 ContextVar，同一個 request 平行開的 session 各自佔一個，
+    in-flight 的數量就是實際借出的連線數。
+    """
+    sync_session_class = BulkheadSyncSession
+
+    async def _checkout(self):
+        info = self.sync_session.info
+        if settings.bulkhead_enabled and _SLOT not in info:
+            await postgres_bulkhead.acquire()
+            info[_SLOT] = {"since": time.perf_counter(), "ok": True}
+
+    async def _in_slot(self, method, *args, **kwargs):
+        await self._checkout()
+        try:
+            return await method(*args, **kwargs)
+        except Exception:
+            if _SLOT in self.sync_session.info:
+                self.sync_session.info[_SLOT]["ok"] = False
+            raise
+
+    async def execute(self, *args, **kwargs):
+        return await self._in_slot(super().execute, *args, **kwargs)
+
+    async def scalar(self, *args, **kwargs):
+        return await self._in_slot(super().scalar, *args, **kwargs)
+
+    async def scalars(self, *args, **kwargs):
+        return await self._in_slot(super().scalars, *args, **kwargs)
+
+    async def stream(self, *args, **kwargs):
+        return await self._in_slot(super().stream, *args, **kwargs)
+
+    async def get(self, *args, **kwargs):
+        return await self._in_slot(super().get, *args, **kwargs)
+
+    async def merge(self, *args, **kwargs):
+        return await self._in_slot(super().merge, *args, **kwargs)
+
+    async def delete(self, *args, **kwargs):
+        return await self._in_slot(super().delete, *args, **kwargs)
+
+    async def flush(self, *args, **kwargs):
+        return await self._in_slot(super().flush, *args, **kwargs)
+
+    async def refresh(self, *args, **kwargs):
+        return await self._in_slot(super().refresh, *args, **kwargs)
+
+    async def connection(self, *args, **kwargs):
+        return await self._in_slot(super().connection, *args, **kwargs)
+
+    async def run_sync(self, *args, **kwargs):
+        return await self._in_slot(super().run_sync, *args, **kwargs)
+
+    async def commit(self):
+        # 還有沒 flush 的物件時 commit 會先 flush，要有連線
+        if self.in_transaction() or self.new or self.dirty or self.deleted:
+            return await self._in_slot(super().commit)
+        return await super().commit()
+
+    async def close(self):
+        try:
+            await super().close()
+        finally:
+            # 拿到 slot 後還沒開始交易就失敗的呼叫也要放掉
+            _release_slot(self.sync_session)
+
+
+engine = create_async_engine(settings.database_url, echo=False, future=True, **pool_options(settings.database_url))
 
 DATABASE_URL = os.getenv(
     "DATABASE_URL"
@@ -14,7 +131,7 @@ DATABASE_URL = os.getenv(
 
 AsyncSessionLocal = async_sessionmaker(
     bind=engine,
-    class_=AsyncSession,
+    class_=BulkheadSession,
     expire_on_commit=False,
 )
 
@@ -22,3 +139,8 @@ AsyncSessionLocal = async_sessionmaker(
 async def get_session() -> AsyncSession:
     async with AsyncSessionLocal() as session:
         yield session
+
+
+def get_session_factory() -> async_sessionmaker:
+    """同一個 request 裡要平行查詢時用：每個並行的查詢各自開一個 session（一個 session 不能同時跑兩個查詢）。"""
+    return AsyncSessionLocal
@@ -1,8 +1,15 @@
 # app/database/mongo.py
-from pymongo import MongoClient
+from pymongo import AsyncMongoClient, MongoClient
 import os
 
+from ..config.config import settings
+
 MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017")
 
-client = MongoClient(MONGO_URL)
+# connect=False：第一次查詢才連線，gunicorn preload 時 master 不會在 fork 前開連線 / 背景 thread
+client = MongoClient(MONGO_URL, connect=False, maxPoolSize=settings.mongo_max_pool_size)
 mongo_db = client["factorydb"]
+
+# asyncio 版本：平行 fan-out（/yield/trend）時不佔用 threadpool；同樣第一次查詢才連線
+async_client = AsyncMongoClient(MONGO_URL, maxPoolSize=settings.mongo_max_pool_size)
+async_mongo_db = async_client["factorydb"]
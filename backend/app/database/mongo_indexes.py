@@ -0,0 +1,50 @@
+# app/database/mongo_indexes.py
+"""
+Mongo 的 index 定義。bootstrap（python -m app.tools.bootstrap / 非 FAST_BOOT 啟動）與 /seed/sql drop collection 之後建立；
+create_indexes 對已存在、定義相同的 index 不做事，可以重複執行。
+
+查詢對應的 index（benchmarks/mongo_plans.py 會用 explain() 檢查，出現 COLLSCAN 就失敗）：
+    /yield/trend           {lot_id: {$in}} + DEFECT_POINT_PROJECTION    lot_type_points（covered）
+    /yield/trend?since=    {lot_id: {$in}, created_at: {$gt}}           lot_created_at
+    /detail/by_lot         {lot_id}                                     lot_type_points 的前綴
+    /defects/region 分頁    {region_cell: {$in}, lot_id: {$in}} 依 (region_cell, lot_id, _id) 排序    cell_lot_id
+    /defects/region 筆數    {location: {$geoWithin}, lot_id: {$in}}      location_2d_lot
+    retention              {created_at: {$lt}}                          created_at
+"""
+from typing import Dict, List
+
+from pymongo import ASCENDING, GEO2D, IndexModel
+
+# /yield/trend 畫 wafer map 只需要這些欄位；全部都在 lot_type_points 裡、又排除 _id，
+# Mongo 直接從 index 回傳結果，不必讀 document（image_path / extra 等大欄位也不會進記憶體）
+DEFECT_POINT_FIELDS = ("lot_id", "defect_type", "wafer", "location.x", "location.y", "severity")
+DEFECT_POINT_PROJECTION = {"_id": 0, **{f: 1 for f in DEFECT_POINT_FIELDS}}
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    "defect_detail": [
+        # lot_id + defect_type 開頭：前綴涵蓋所有只用 lot_id 的查詢，所以不另外建單獨的 lot_id index
+        IndexModel([(f, ASCENDING) for f in DEFECT_POINT_FIELDS], name="lot_type_points"),
+        IndexModel([("lot_id", ASCENDING), ("wafer", ASCENDING)], name="lot_wafer"),
+        IndexModel([("lot_id", ASCENDING), ("created_at", ASCENDING)], name="lot_created_at"),
+        # location {x, y} 當平面座標（legacy coordinate pair）；lot_id 接在後面，跨很多 lot 的區域查詢不用回頭讀 document 比對 lot
+        IndexModel([("location", GEO2D), ("lot_id", ASCENDING)], name="location_2d_lot"),
+        # 區域分頁的 keyset：排序順序由 index 提供（app.services.regions）
+        IndexModel([("region_cell", ASCENDING), ("lot_id", ASCENDING), ("_id", ASCENDING)], name="cell_lot_id"),
+        IndexModel([("created_at", ASCENDING)], name="created_at"),
+    ],
+    "defect_detail_agg": [
+        IndexModel([("lot_id", ASCENDING), ("defect_type", ASCENDING), ("wafer", ASCENDING), ("cell", ASCENDING)],
+                   name="lot_type_wafer_cell", unique=True),
+    ],
+    "defect_clusters": [
+        IndexModel([("lot_id", ASCENDING)], name="lot_id", unique=True),
+    ],
+    "defect_compaction_log": [
+        IndexModel([("lot_id", ASCENDING), ("compacted_at", ASCENDING)], name="lot_compacted_at"),
+    ],
+}
+
+
+def ensure_indexes(db) -> Dict[str, List[str]]:
+    """回傳 {collection: [index name]}。"""
+    return {name: db[name].create_indexes(models) for name, models in INDEXES.items()}
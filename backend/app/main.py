@@ -1,42 +1,56 @@
 # app/main.py
+from app.common.startup import startup_timer  # 最先 import，imports 階段才量得到全部
+
 import logging
+import math
 import time
 
+from aiobreaker import CircuitBreakerError
 from dotenv import load_dotenv
 from fastapi import FastAPI, Depends, HTTPException
 from fastapi import Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
-from opentelemetry.instrumentation.redis import RedisInstrumentor
-from prometheus_client import Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from starlette.responses import JSONResponse
 
-from app.common.db_tracing import setup_sqlalchemy_tracing
-from app.common.rate_limit import rate_limiter
-from app.common.tracing import setup_tracing
+from app.common.circuit_breakers import circuit_open_counter, open_breakers
+from app.common.concurrency import Overloaded
+from app.common.logging_setup import setup_logging, should_log_access
+from app.common.metrics import observe_request, render_metrics, route_template
+from app.common.profiler import profiler
+from app.common.rate_limit import check_request
+from app.common.timing import observe_phases, server_timing_header, start_request_timing
+from app.config.config import settings
 from app.database.database import engine, get_session
-from app.models.base import Base
-from app.models.user import User, Role
+from app.database.mongo import async_client as async_mongo_client
+from app.models.user import User
 from app.routers.auth_router import router as auth_router
+from app.routers.cluster_router import router as cluster_router
+from app.routers.debug_router import router as debug_router
 from app.routers.detail_router import router as detail_router
+from app.routers.distribution_router import router as distribution_router
 from app.routers.filter_router import router as filter_router
+from app.routers.ingest_router import router as ingest_router
 from app.routers.lot_router import router as lot_router
+from app.routers.region_router import router as region_router
+from app.routers.report_router import router as report_router
 from app.routers.seed_router import router as seed_router
+from app.routers.spc_router import router as spc_router
+from app.routers.stream_router import router as stream_router
 from app.routers.summary_router import router as summary_router
 from app.routers.task_router import router as task_router
 from app.routers.user_router import router as user_router
+from app.routers.wafermap_router import router as wafermap_router
 from app.routers.yield_router import router as yield_router
 from app.services.redis_client import redis_ratelimit
-from app.tools.create_user import create_user
+from app.tools.bootstrap import bootstrap
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s | %(levelname)s | %(name)s | %(message)s"
-)
+setup_logging()
+startup_timer.mark("imports")
 
 logger = logging.getLogger(__name__)
+access_logger = logging.getLogger("app.access")
 
 load_dotenv()
 
@@ -70,30 +84,66 @@ app.add_middleware(
 #     allow_credentials=True,
 # )
 
+@app.exception_handler(CircuitBreakerError)
+async def circuit_open_handler(request: Request, exc: CircuitBreakerError):
+    # breaker 套在整個 handler 外層，打開時 handler 根本不會執行，在這裡統一轉成 503
+    for name in open_breakers() or ["unknown"]:
+        circuit_open_counter.labels(name=name).inc()
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Database temporarily unavailable (circuit open)."},
+        headers={"Retry-After": "30"},
+    )
+
+
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    # bulkhead 滿了：馬上回 503，請 client 稍後重試，而不是排在 connection pool 上一起 timeout
+    return JSONResponse(
+        status_code=503,
+        content={"detail": f"Service overloaded ({exc.name}), please retry."},
+        headers={"Retry-After": str(settings.shed_retry_after_seconds)},
+    )
+
+
 @app.on_event("startup")
 async def on_startup():
+    # imports 之後到這裡：建 app、掛 router / middleware、server 起來
+    startup_timer.mark("app_setup")
     logger.info("Application starting up...")
 
     if not DISABLE_TRACING:
+        # OpenTelemetry 只在要用時才 import，關掉 tracing 的環境不用付 import 成本
+        from opentelemetry.instrumentation.redis import RedisInstrumentor
+
+        from app.common.db_tracing import setup_sqlalchemy_tracing
+        from app.common.tracing import instrument_fastapi, setup_tracing
+
         setup_tracing("factory-backend")
-        FastAPIInstrumentor().instrument_app(app)
+        instrument_fastapi(app)
         RedisInstrumentor().instrument()
         setup_sqlalchemy_tracing(engine)
+        startup_timer.mark("tracing")
     else:
         logger.info("Tracing disabled on this environment.")
 
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-
-        await create_user("admin", "admin", Role.admin)
-        await create_user("eng", "eng", Role.engineer)
-        await create_user("op", "op", Role.viewer)
+    if settings.fast_boot:
+        # 建 table / 預設帳號改由部署步驟 `python -m app.tools.bootstrap` 負責
+        logger.info("Fast boot: skipping schema creation and default users.")
+    else:
+        await bootstrap()
+        startup_timer.mark("bootstrap")
 
+    startup_timer.ready()
+    logger.info("Application ready", extra=startup_timer.report())
 
 
 @app.on_event("shutdown")
 async def on_shutdown():
     logger.info("Application shutting down...")
+    # in-flight request 都結束後才會跑到這裡（gunicorn graceful_timeout / uvicorn 收到 SIGTERM）
+    await engine.dispose()
+    await async_mongo_client.close()
 
 
 # 掛上各個 router
@@ -106,14 +156,28 @@ app.include_router(filter_router)
 app.include_router(seed_router)
 app.include_router(user_router)
 app.include_router(task_router)
+app.include_router(debug_router)
+app.include_router(ingest_router)
+app.include_router(stream_router)
+app.include_router(report_router)
+app.include_router(spc_router)
+app.include_router(distribution_router)
+app.include_router(wafermap_router)
+app.include_router(region_router)
+app.include_router(cluster_router)
 
 
 @app.get("/health")
 async def health():
-    logger.info("Application health...")
     return {"status": "ok"}
 
 
+@app.get("/health/startup")
+async def health_startup():
+    """import / 啟動各階段耗時（ms）。"""
+    return startup_timer.report()
+
+
 @app.get("/health/db")
 async def healthz_db(session: AsyncSession = Depends(get_session)):
     try:
@@ -137,57 +201,65 @@ if not os.getenv("DISABLE_REDIS", "false").lower() == "true":
     @app.middleware("http")
     async def global_rate_limit(request: Request, call_next):
         path = request.url.path
-        logger.info("Application global_rate_limit...")
         # 你可以排除 health check
         if path.startswith("/health"):
             return await call_next(request)
 
-        client_ip = request.client.host
-        key = f"ip:{client_ip}:{path}"
-
-        try:
-            rate_limiter(key, max_tokens=100000, refill_rate=100000)
-            logger.info(f"Application global_rate_limit {key}...")
-        except HTTPException as e:
-            return JSONResponse(status_code=e.status_code, content={"detail": e.detail})
-
-        return await call_next(request)
+        # 依 JWT sub（沒有時用 IP）+ role 額度，扣 route 對應的 cost
+        decision, bucket = check_request(request)
+        headers = {
+            "X-RateLimit-Limit": str(int(bucket.capacity)),
+            "X-RateLimit-Remaining": str(max(int(decision.remaining), 0)),
+        }
+        if not decision.allowed:
+            headers["Retry-After"] = str(max(math.ceil(decision.retry_after), 1))
+            return JSONResponse(status_code=429, content={"detail": "Too Many Requests"}, headers=headers)
+
+        response = await call_next(request)
+        response.headers.update(headers)
+        return response
 else:
     logger.info("Rate limiter disabled.")
 
 @app.middleware("http")
 async def prometheus_middleware(request: Request, call_next):
-    start = time.time()
+    start = time.perf_counter()
+    phases = start_request_timing()
+    profile = profiler.take_armed(request.url.path)
+    if profile is not None:
+        profile.start()
 
-    response = await call_next(request)
-
-    process_time = time.time() - start
-    endpoint = request.url.path
-
-    REQUEST_LATENCY.labels(endpoint=endpoint).observe(process_time)
-    REQUEST_COUNT.labels(
-        method=request.method,
-        endpoint=endpoint,
-        http_status=response.status_code
-    ).inc()
+    try:
+        response = await call_next(request)
+    finally:
+        if profile is not None:
+            profile.stop()
+
+    process_time = time.perf_counter() - start
+    # 用 route template 當 label（/update/{lot_id}），避免每個 lot / task id 都長出一條 time series
+    endpoint = route_template(request)
+    observe_request(request.method, endpoint, response.status_code, process_time)
+
+    if phases:
+        observe_phases(endpoint, phases)
+        if settings.server_timing_enabled:
+            response.headers["Server-Timing"] = server_timing_header(phases, process_time)
+
+    if should_log_access(endpoint):
+        access_logger.info(
+            "request",
+            extra={
+                "method": request.method,
+                "route": endpoint,
+                "status": response.status_code,
+                "duration_ms": round(process_time * 1000, 2),
+            },
+        )
 
     return response
 
 
-REQUEST_COUNT = Counter(
-    "http_requests_total",
-    "Total HTTP requests",
-    ["method", "endpoint", "http_status"]
-)
-
-REQUEST_LATENCY = Histogram(
-    "http_request_latency_seconds",
-    "HTTP request latency",
-    ["endpoint"]
-)
-
-
 @app.get("/metrics")
 async def metrics():
-    data = generate_latest()
-    return Response(data, media_type=CONTENT_TYPE_LATEST)
+    data, content_type = render_metrics()
+    return Response(data, media_type=content_type)
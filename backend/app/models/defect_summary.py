@@ -1,12 +1,21 @@
-from sqlalchemy import Column, String, Integer, ForeignKey
+from datetime import datetime
+
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey
 
 from .base import Base
+from .partitioning import partitioned_by
 
 
 class DefectSummary(Base):
     __tablename__ = "defect_summary"
+    __table_args__ = partitioned_by("timestamp")
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     lot_id = Column(String, ForeignKey("lot.lot_id"), index=True)
     defect_type = Column(String)
     count = Column(Integer)
+    # 檢測時間（跟該 lot 的 YieldRecord.timestamp 相同），partition key；
+    # 沒有預設值：寫入端忘了帶量測時間要直接失敗，而不是落到寫入當天的 partition
+    timestamp = Column(DateTime, nullable=False, index=True)
+    # delta sync（/yield/trend?since=）用的變更時間
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
@@ -0,0 +1,41 @@
+# app/models/partitioning.py
+"""
+Postgres 原生 range partitioning（依月份）。
+
+Postgres 要求 primary key 包含 partition key，但 SQLite（測試）的自動遞增 id 只支援單一欄位 PK，
+所以 model 上 PK 仍然只有 id，只在產生 Postgres DDL 時把 partition key 補進 PRIMARY KEY。
+"""
+from datetime import date, datetime, time, timedelta
+from typing import Tuple
+
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.schema import PrimaryKeyConstraint
+
+
+def partitioned_by(column: str) -> dict:
+    """當作 __table_args__：Postgres 建成 PARTITION BY RANGE (column)。"""
+    return {
+        "postgresql_partition_by": f"RANGE ({column})",
+        "info": {"partition_key": column},
+    }
+
+
+@compiles(PrimaryKeyConstraint, "postgresql")
+def _primary_key_with_partition_key(constraint, compiler, **kw):
+    ddl = compiler.visit_primary_key_constraint(constraint, **kw)
+    key = constraint.table.info.get("partition_key") if constraint.table is not None else None
+    if not key or key in constraint.columns:
+        return ddl
+    # "PRIMARY KEY (id)" -> "PRIMARY KEY (id, timestamp)"
+    head, _, tail = ddl.rpartition(")")
+    return f"{head}, {compiler.preparer.quote(key)}){tail}"
+
+
+def timestamp_range(date_from: date, date_to: date) -> Tuple[datetime, datetime]:
+    """
+    日期區間（含頭尾）-> [start, end) 的 timestamp 範圍。
+    直接比較 timestamp 欄位（而不是 func.date(timestamp)）planner 才能做 partition pruning / 用 index。
+    """
+    start = datetime.combine(date_from, time.min)
+    end = datetime.combine(date_to + timedelta(days=1), time.min)
+    return start, end
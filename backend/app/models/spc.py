@@ -0,0 +1,36 @@
+from datetime import datetime
+
+from sqlalchemy import Column, Date, DateTime, Float, Integer, String
+
+from .base import Base
+
+
+class SpcDailyStat(Base):
+    """
+    SPC 用的每日 sufficient statistics（每個 station / product / 天一筆），ingest 時累加，
+    /spc/* 只讀這張表，不必回頭掃 yield_record。
+    """
+    __tablename__ = "spc_daily_stat"
+
+    station = Column(String, primary_key=True)
+    product = Column(String, primary_key=True)
+    day = Column(Date, primary_key=True)
+
+    # yield_rate（%）的 count / sum / sum of squares / min / max：平均、變異數、全距
+    n = Column(Integer, nullable=False, default=0)
+    sum_yield = Column(Float, nullable=False, default=0.0)
+    sumsq_yield = Column(Float, nullable=False, default=0.0)
+    min_yield = Column(Float)
+    max_yield = Column(Float)
+
+    # 相鄰兩個 lot 的 moving range（依 timestamp 順序）；跨天的那一段用前一天的 last 與當天的 first 在查詢時補上
+    first_yield = Column(Float)
+    last_yield = Column(Float)
+    sum_mr = Column(Float, nullable=False, default=0.0)
+    n_mr = Column(Integer, nullable=False, default=0)
+
+    # p-chart：檢測數與不良數
+    inspected = Column(Integer, nullable=False, default=0)
+    defective = Column(Integer, nullable=False, default=0)
+
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -3,14 +3,19 @@ from datetime import datetime
 from sqlalchemy import Column, String, Integer, Float, DateTime, ForeignKey
 
 from .base import Base
+from .partitioning import partitioned_by
 
 
 class YieldRecord(Base):
     __tablename__ = "yield_record"
+    # Postgres 依月份 partition，查詢要用 timestamp 範圍條件才能 pruning
+    __table_args__ = partitioned_by("timestamp")
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     lot_id = Column(String, ForeignKey("lot.lot_id"), index=True)
     good = Column(Integer)
     total = Column(Integer)
     yield_rate = Column(Float)
-    timestamp = Column(DateTime, default=datetime.utcnow)
+    timestamp = Column(DateTime, default=datetime.utcnow, index=True)
+    # delta sync（/yield/trend?since=）用的變更時間
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
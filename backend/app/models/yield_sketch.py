@@ -0,0 +1,22 @@
+from datetime import datetime
+
+from sqlalchemy import Column, Date, DateTime, Float, Integer, LargeBinary, String
+
+from .base import Base
+
+
+class YieldSketch(Base):
+    """每個 station / product / 天的 lot yield 分佈（t-digest，app.services.tdigest），查詢時合併。"""
+    __tablename__ = "yield_sketch"
+
+    station = Column(String, primary_key=True)
+    product = Column(String, primary_key=True)
+    day = Column(Date, primary_key=True)
+
+    count = Column(Integer, nullable=False, default=0)
+    min_yield = Column(Float)
+    max_yield = Column(Float)
+    # (mean, weight) float64 little-endian 連續排列
+    centroids = Column(LargeBinary, nullable=False, default=b"")
+
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -20,8 +20,8 @@ class TokenResponse(BaseModel):
     username: str
     role: Role
 
-@postgres_breaker
 @router.post("/login", response_model=TokenResponse)
+@postgres_breaker
 async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
     session: AsyncSession = Depends(get_session),
@@ -44,7 +44,8 @@ async def login(
             detail="Incorrect username or password",
         )
 
-    token = create_access_token({"sub": user.username})
+    # role 放進 token：rate limit 不用查 DB 就能決定額度
+    token = create_access_token({"sub": user.username, "role": Role(user.role).value})
     return TokenResponse(
         access_token=token,
         token_type="bearer",
@@ -0,0 +1,62 @@
+# app/routers/cluster_router.py
+from typing import List, Optional
+
+from aiobreaker import CircuitBreakerError
+from fastapi import APIRouter, HTTPException, Query
+from starlette import status
+
+from app.common.circuit_breakers import circuit_open_counter, mongo_breaker
+from app.common.concurrency import mongo_bulkhead
+from app.database.mongo import mongo_db
+from app.services.clustering import cluster_lot, load_clusters, mark_pending
+
+router = APIRouter(prefix="/defects", tags=["Defect Clusters (Mongo)"])
+
+# 還沒算過的 lot 最多幾個在 request 裡直接算，其餘交給 worker
+INLINE_LIMIT = 5
+
+
+def _view(doc: dict, wafer: Optional[int], signature: Optional[str]) -> dict:
+    clusters = [
+        c for c in doc.get("clusters", [])
+        if (wafer is None or c["wafer"] == wafer) and (signature is None or c["signature"] == signature)
+    ]
+    return {
+        "computed_at": doc["computed_at"].isoformat() if doc.get("computed_at") else None,
+        "point_count": doc.get("point_count", 0),
+        "clusters": clusters,
+    }
+
+
+@router.get("/clusters")
+@mongo_breaker
+async def get_clusters(
+        lots: List[str] = Query(),
+        wafer: Optional[int] = None,
+        signature: Optional[str] = None,
+        refresh: bool = False,
+):
+    """
+    lot 的 defect cluster 摘要（signature = scratch / edge / center / cluster），讀 worker 預先算好的結果：
+    - 還沒算過的 lot：少量的話直接算並存起來，超過 INLINE_LIMIT 個的放進待算清單，列在 pending
+    - refresh=true：指定的 lot 全部重新計算（同樣受 INLINE_LIMIT 限制）
+    """
+    lots = sorted(set(lots))
+    try:
+        docs = {} if refresh else await mongo_bulkhead.run(load_clusters, mongo_db, lots)
+        missing = [lot_id for lot_id in lots if lot_id not in docs]
+        for lot_id in missing[:INLINE_LIMIT]:
+            docs[lot_id] = await mongo_bulkhead.run(cluster_lot, mongo_db, lot_id)
+    except CircuitBreakerError:
+        circuit_open_counter.labels(name="mongo_breaker").inc()
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Database temporarily unavailable (circuit open)."
+        )
+
+    pending = missing[INLINE_LIMIT:]
+    mark_pending(*pending)
+    return {
+        "lots": {lot_id: _view(doc, wafer, signature) for lot_id, doc in sorted(docs.items())},
+        "pending": pending,
+    }
@@ -0,0 +1,53 @@
+# app/routers/debug_router.py
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+from app.auth.security import require_role
+from app.common.profiler import profiler
+from app.config.config import settings
+
+router = APIRouter(
+    prefix="/debug/profile",
+    tags=["Debug"],
+    dependencies=[Depends(require_role(["admin"]))],
+)
+
+
+def _ensure_enabled():
+    # 預設關閉，要在環境變數 PROFILING_ENABLED=true 才開放
+    if not settings.profiling_enabled:
+        raise HTTPException(404, "Profiling is disabled")
+
+
+@router.post("/window")
+async def profile_window(
+    seconds: float = Query(10, gt=0),
+    interval_ms: float = Query(5, ge=1),
+):
+    """在接下來 seconds 秒內持續取樣 event loop thread。"""
+    _ensure_enabled()
+    session = profiler.profile_window(seconds, interval_ms / 1000)
+    return session.summary()
+
+
+@router.post("/request")
+async def profile_next_request(
+    path: str,
+    interval_ms: float = Query(1, ge=0.1),
+):
+    """只取樣下一個打到 path 的 request（例如 /yield/trend）。"""
+    _ensure_enabled()
+    session = profiler.arm_request(path, interval_ms / 1000)
+    return session.summary()
+
+
+@router.get("/{profile_id}")
+async def get_profile(profile_id: str, format: str = Query("summary", regex="^(summary|collapsed)$")):
+    """format=collapsed 回傳 flamegraph.pl / speedscope 可讀的 collapsed stack 文字。"""
+    _ensure_enabled()
+    session = profiler.get(profile_id)
+    if session is None:
+        raise HTTPException(404, f"profile {profile_id} not found")
+    if format == "collapsed":
+        return PlainTextResponse(session.collapsed())
+    return session.summary()
@@ -1,16 +1,32 @@
+import asyncio
+import logging
+from datetime import datetime
 from typing import Optional, Dict
 
 from aiobreaker import CircuitBreakerError
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
 
 from app.common.cache_key import clear_yield_trend_cache
 from app.common.circuit_breakers import mongo_breaker, circuit_open_counter
+from app.common.coalesce import coalesce
+from app.common.concurrency import mongo_bulkhead
+from app.database.database import get_session
 from app.database.mongo import mongo_db
+from app.models.lot import Lot
+from app.services.clustering import mark_pending as mark_clusters_pending
+from app.services.live_updates import publish_update
+from app.services.regions import region_cell
+from app.services.retention import AGG
+from app.services.trend import to_aggregate_points, to_defect_points
+from app.services.wafermap import bump_version as bump_wafermap_version
 
 router = APIRouter(prefix="/detail", tags=["Defect Detail (Mongo)"])
 
+logger = logging.getLogger(__name__)
+
 
 # --------- Pydantic Schema（放在 router 裡） ---------
 
@@ -33,14 +49,27 @@ class DefectDetailOut(DefectDetailIn):
     id: str
 
 
+class DefectAggregateOut(BaseModel):
+    lot_id: str
+    defect_type: str
+    wafer: Optional[int] = None
+    x: float
+    y: float
+    severity: Optional[str] = None
+    count: int
+
+
 # --------- API ---------
 
 @router.post("/add", response_model=DefectDetailOut)
 @mongo_breaker
-async def add_detail(data: DefectDetailIn):
+async def add_detail(data: DefectDetailIn, session: AsyncSession = Depends(get_session)):
     doc = data.dict()
+    doc["created_at"] = datetime.utcnow()  # delta sync 用
+    doc["region_cell"] = region_cell(data.location.x, data.location.y)  # 區域查詢的分頁用
     try:
-        result = mongo_db["defect_detail"].insert_one(doc)
+        # pymongo 是同步的：在 mongo bulkhead 的 slot 裡丟到 thread 跑，不卡 event loop
+        result = await mongo_bulkhead.run(mongo_db["defect_detail"].insert_one, doc)
     except CircuitBreakerError:
         circuit_open_counter.labels(name="mongo_breaker").inc()
         raise HTTPException(
@@ -48,7 +77,25 @@ async def add_detail(data: DefectDetailIn):
             detail="Database temporarily unavailable (circuit open)."
         )
 
-    clear_yield_trend_cache()
+    await asyncio.to_thread(clear_yield_trend_cache, data.lot_id)
+    bump_wafermap_version(data.lot_id)
+    mark_clusters_pending(data.lot_id)
+
+    # 訂閱條件是 station / product，用 lot 查回來（primary key 查詢）。點位已經寫進 Mongo：
+    # Postgres 這時失敗不能變成 500（client 重送會多一個點，mongo_breaker 也會把它算成 Mongo 的失敗），
+    # 查不到就推播不帶 station / product 的更新
+    try:
+        lot = await session.get(Lot, data.lot_id)
+    except Exception:
+        logger.warning("lot lookup for live update failed", exc_info=True, extra={"lot_id": data.lot_id})
+        lot = None
+    publish_update({
+        "kind": "defect",
+        "lot_id": data.lot_id,
+        "station": lot.station if lot else None,
+        "product": lot.product if lot else None,
+        "defect_points": [{**to_defect_points([doc])[0], "id": str(result.inserted_id)}],
+    })
 
     return DefectDetailOut(
         id=str(result.inserted_id),
@@ -57,10 +104,11 @@ async def add_detail(data: DefectDetailIn):
 
 
 @router.get("/by_lot", response_model=list[DefectDetailOut])
+@coalesce("detail.by_lot")
 @mongo_breaker
 async def get_by_lot(lot_id: str):
     try:
-        docs = list(mongo_db["defect_detail"].find({"lot_id": lot_id}))
+        docs = await mongo_bulkhead.run(lambda: list(mongo_db["defect_detail"].find({"lot_id": lot_id})))
     except CircuitBreakerError:
         circuit_open_counter.labels(name="mongo_breaker").inc()
         raise HTTPException(
@@ -76,10 +124,11 @@ async def get_by_lot(lot_id: str):
     return out
 
 @router.get("/list", response_model=list[DefectDetailOut])
+@coalesce("detail.list")
 @mongo_breaker
 async def get_by_lot():
     try:
-        docs = list(mongo_db["defect_detail"].find())
+        docs = await mongo_bulkhead.run(lambda: list(mongo_db["defect_detail"].find()))
     except CircuitBreakerError:
         circuit_open_counter.labels(name="mongo_breaker").inc()
         raise HTTPException(
@@ -92,4 +141,21 @@ async def get_by_lot():
         d["id"] = str(d.pop("_id"))
         out.append(DefectDetailOut(**d))
 
-    return out
\ No newline at end of file
+    return out
+
+
+@router.get("/aggregate", response_model=list[DefectAggregateOut])
+@coalesce("detail.aggregate")
+@mongo_breaker
+async def get_aggregate(lot_id: str):
+    """retention 壓縮過的 lot：格子彙總後的點位（原始點位在冷儲存）。"""
+    try:
+        docs = await mongo_bulkhead.run(lambda: list(mongo_db[AGG].find({"lot_id": lot_id})))
+    except CircuitBreakerError:
+        circuit_open_counter.labels(name="mongo_breaker").inc()
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Database temporarily unavailable (circuit open)."
+        )
+
+    return to_aggregate_points(docs)
@@ -0,0 +1,86 @@
+# app/routers/distribution_router.py
+from datetime import date
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.common.circuit_breakers import postgres_breaker
+from app.common.coalesce import coalesce
+from app.database.database import get_session
+from app.services.yield_sketch import load_merged
+
+router = APIRouter(prefix="/distribution", tags=["Yield Distribution"])
+
+
+def _check_range(date_from: date, date_to: date):
+    if date_to < date_from:
+        raise HTTPException(status_code=400, detail="date_to must not be earlier than date_from")
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(value, 3)
+
+
+@router.get("/percentiles")
+@coalesce("distribution.percentiles")
+@postgres_breaker
+async def yield_percentiles(
+        station: str,
+        date_from: date,
+        date_to: date,
+        product: Optional[str] = None,
+        q: List[float] = Query([0.05, 0.5, 0.95]),
+        session: AsyncSession = Depends(get_session),
+):
+    """
+    lot yield 的 percentile（每日 t-digest 合併後估計，誤差見 app.services.tdigest）。
+    q 可以給多個，0 ~ 1；沒給 product 時合併該 station 的所有 product。
+    """
+    _check_range(date_from, date_to)
+    if any(not 0 <= v <= 1 for v in q):
+        raise HTTPException(status_code=400, detail="q must be between 0 and 1")
+
+    digest, days = await load_merged(session, station, product, date_from, date_to)
+    return {
+        "station": station,
+        "product": product,
+        "days": days,
+        "count": int(digest.count),
+        "min": _round(digest.min) if digest.count else None,
+        "max": _round(digest.max) if digest.count else None,
+        "percentiles": {f"p{v * 100:g}": _round(digest.quantile(v)) for v in q},
+        "approximate": True,
+    }
+
+
+@router.get("/histogram")
+@coalesce("distribution.histogram")
+@postgres_breaker
+async def yield_histogram(
+        station: str,
+        date_from: date,
+        date_to: date,
+        product: Optional[str] = None,
+        bins: int = Query(20, ge=1, le=200),
+        lo: float = 0.0,
+        hi: float = 100.0,
+        session: AsyncSession = Depends(get_session),
+):
+    """[lo, hi] 等寬切 bins 格的估計 lot 數（最後一格包含 hi）。"""
+    _check_range(date_from, date_to)
+    if hi <= lo:
+        raise HTTPException(status_code=400, detail="hi must be greater than lo")
+
+    digest, days = await load_merged(session, station, product, date_from, date_to)
+    width = (hi - lo) / bins
+    edges = [lo + i * width for i in range(bins)] + [hi]
+    return {
+        "station": station,
+        "product": product,
+        "days": days,
+        "count": int(digest.count),
+        "edges": [round(e, 6) for e in edges],
+        "counts": [round(c, 1) for c in digest.histogram(edges)],
+        "approximate": True,
+    }
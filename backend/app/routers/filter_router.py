@@ -10,16 +10,21 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
 
 from app.common.circuit_breakers import postgres_breaker, circuit_open_counter
+from app.common.coalesce import coalesce
+from app.common.stale_cache import stale_fallback
 from app.database.database import get_session
 from app.models.yield_record import YieldRecord
 from app.models.lot import Lot
+from app.models.partitioning import timestamp_range
 
 router = APIRouter(prefix="/filter", tags=["Filter"])
 
 
 # ---- 1) 取得有資料的所有日期列表 ----
-@postgres_breaker
 @router.get("/dates", response_model=List[date])
+@coalesce("filter.dates")
+@stale_fallback("filter.dates")
+@postgres_breaker
 async def list_dates(session: AsyncSession = Depends(get_session)):
     stmt = select(func.date(YieldRecord.timestamp)).distinct().order_by(
         func.date(YieldRecord.timestamp)
@@ -36,16 +41,18 @@ async def list_dates(session: AsyncSession = Depends(get_session)):
 
 
 # ---- 2) 日期區間 -> 機台列表 ----
-@postgres_breaker
 @router.get("/machines", response_model=List[str])
+@coalesce("filter.machines")
+@stale_fallback("filter.machines")
+@postgres_breaker
 async def list_machines(
     date_from: date, date_to: date, session: AsyncSession = Depends(get_session)
 ):
+    start, end = timestamp_range(date_from, date_to)
     # 先找該區間內的 lot_id
     sub = (
         select(YieldRecord.lot_id)
-        .where(func.date(YieldRecord.timestamp) >= date_from)
-        .where(func.date(YieldRecord.timestamp) <= date_to)
+        .where(YieldRecord.timestamp >= start, YieldRecord.timestamp < end)
         .distinct()
         .subquery()
     )
@@ -68,18 +75,20 @@ async def list_machines(
 
 
 # ---- 3) 日期區間 + 機台 -> Recipe 列表 ----
-@postgres_breaker
 @router.get("/recipes", response_model=List[str])
+@coalesce("filter.recipes")
+@stale_fallback("filter.recipes")
+@postgres_breaker
 async def list_recipes(
     date_from: date,
     date_to: date,
     station: str,
     session: AsyncSession = Depends(get_session),
 ):
+    start, end = timestamp_range(date_from, date_to)
     sub = (
         select(YieldRecord.lot_id)
-        .where(func.date(YieldRecord.timestamp) >= date_from)
-        .where(func.date(YieldRecord.timestamp) <= date_to)
+        .where(YieldRecord.timestamp >= start, YieldRecord.timestamp < end)
         .distinct()
         .subquery()
     )
@@ -104,8 +113,10 @@ async def list_recipes(
 
 
 # ---- 4) 日期區間 + 機台 + Recipe -> Lot 列表 ----
-@postgres_breaker
 @router.get("/lots", response_model=List[str])
+@coalesce("filter.lots")
+@stale_fallback("filter.lots")
+@postgres_breaker
 async def list_lots(
     date_from: date,
     date_to: date,
@@ -113,10 +124,10 @@ async def list_lots(
     product: str,
     session: AsyncSession = Depends(get_session),
 ):
+    start, end = timestamp_range(date_from, date_to)
     sub = (
         select(YieldRecord.lot_id)
-        .where(func.date(YieldRecord.timestamp) >= date_from)
-        .where(func.date(YieldRecord.timestamp) <= date_to)
+        .where(YieldRecord.timestamp >= start, YieldRecord.timestamp < end)
         .distinct()
         .subquery()
     )
@@ -0,0 +1,137 @@
+# app/routers/ingest_router.py
+import asyncio
+from datetime import datetime
+from typing import List, Optional
+
+from aiobreaker import CircuitBreakerError
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette import status
+
+from app.auth.security import require_role
+from app.common.cache_key import clear_yield_trend_cache
+from app.common.circuit_breakers import postgres_breaker, circuit_open_counter
+from app.common.concurrency import mongo_bulkhead
+from app.database.database import get_session
+from app.database.mongo import mongo_db
+from app.models.defect_summary import DefectSummary
+from app.models.lot import Lot
+from app.models.yield_record import YieldRecord
+from app.services.clustering import mark_pending as mark_clusters_pending
+from app.services.live_updates import publish_update
+from app.services.partitions import ensure_partition_for
+from app.services.regions import region_cell
+from app.services.spc_stats import record_lot
+from app.services.trend import to_defect_points
+from app.services.wafermap import bump_version as bump_wafermap_version
+from app.services.yield_sketch import add_lot as add_to_sketch
+
+router = APIRouter(prefix="/ingest", tags=["Ingest"])
+
+
+class DefectPointIn(BaseModel):
+    x: float
+    y: float
+    wafer: Optional[int] = None
+    severity: Optional[str] = None
+
+
+class DefectIn(BaseModel):
+    defect_type: str
+    count: int
+    points: List[DefectPointIn] = []
+
+
+class LotIngest(BaseModel):
+    lot_id: str
+    station: str
+    product: str
+    total: int
+    good: int
+    timestamp: Optional[datetime] = None
+    defects: List[DefectIn] = []
+
+
+@router.post("/lot", dependencies=[Depends(require_role(["admin", "engineer"]))])
+@postgres_breaker
+async def ingest_lot(data: LotIngest, session: AsyncSession = Depends(get_session)):
+    """
+    一個 lot 的完整檢測結果：Lot + YieldRecord + DefectSummary（Postgres，同一個 transaction）
+    + defect_detail 點位（Mongo），完成後推播給訂閱中的 dashboard。
+    """
+    if await session.get(Lot, data.lot_id):
+        raise HTTPException(400, f"Lot {data.lot_id} already exists")
+
+    now = datetime.utcnow()
+    ts = data.timestamp or now
+    yield_rate = round(data.good / data.total * 100, 2) if data.total > 0 else 0
+    # 補送舊資料時該月份可能還沒有 partition
+    await ensure_partition_for(ts)
+
+    session.add(Lot(lot_id=data.lot_id, product=data.product, station=data.station,
+                    total=data.total, good=data.good))
+    # 先 flush Lot，確保 FK 存在
+    try:
+        await session.flush()
+        session.add(YieldRecord(lot_id=data.lot_id, total=data.total, good=data.good,
+                                yield_rate=yield_rate, timestamp=ts))
+        session.add_all([
+            DefectSummary(lot_id=data.lot_id, defect_type=d.defect_type, count=d.count, timestamp=ts)
+            for d in data.defects
+        ])
+        # SPC 每日統計、yield 分佈 sketch 跟 yield record 同一個 transaction 累加
+        await record_lot(session, data.station, data.product, ts, yield_rate, data.total, data.good)
+        await add_to_sketch(session, data.station, data.product, ts.date(), yield_rate)
+        await session.commit()
+    except CircuitBreakerError:
+        circuit_open_counter.labels(name="postgres_breaker").inc()
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Database temporarily unavailable (circuit open)."
+        )
+
+    docs = [
+        {
+            "lot_id": data.lot_id,
+            "defect_type": d.defect_type,
+            "location": {"x": p.x, "y": p.y},
+            "region_cell": region_cell(p.x, p.y),
+            "severity": p.severity,
+            "wafer": p.wafer,
+            "image_path": None,
+            "extra": {},
+            "created_at": now,
+        }
+        for d in data.defects
+        for p in d.points
+    ]
+    points = []
+    if docs:
+        await mongo_bulkhead.run(mongo_db["defect_detail"].insert_many, docs)
+        # insert_many 會把 _id 填回 dict；帶上 id 讓 client 跟 delta sync 的結果去重
+        points = [{**p, "id": str(d.get("_id"))} for d, p in zip(docs, to_defect_points(docs))]
+        bump_wafermap_version(data.lot_id)
+        mark_clusters_pending(data.lot_id)
+
+    await asyncio.to_thread(clear_yield_trend_cache, data.lot_id)
+
+    day = ts.date().isoformat()
+    publish_update({
+        "kind": "ingest",
+        "lot_id": data.lot_id,
+        "station": data.station,
+        "product": data.product,
+        "date": day,
+        "yield_point": {"lot_id": data.lot_id, "date": day, "yield_rate": yield_rate},
+        "pareto_delta": [{"defect_type": d.defect_type, "delta": d.count} for d in data.defects],
+        "defect_points": points,
+    })
+
+    return {
+        "status": "ok",
+        "lot_id": data.lot_id,
+        "yield_rate": yield_rate,
+        "defect_summary_count": len(data.defects),
+        "defect_detail_count": len(docs),
+    }
@@ -1,7 +1,10 @@
+import asyncio
+from datetime import datetime
+
 from aiobreaker import CircuitBreakerError
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, update
 from pydantic import BaseModel
 from typing import Optional
 
@@ -9,9 +12,14 @@ from starlette import status
 
 from app.common.cache_key import clear_yield_trend_cache
 from app.common.circuit_breakers import postgres_breaker, circuit_open_counter
+from app.common.coalesce import coalesce
 from app.database.database import get_session
+from app.models.defect_summary import DefectSummary
 from app.models.lot import Lot
 from app.models.yield_record import YieldRecord
+from app.services.live_updates import publish_update
+from app.services.spc_stats import rebuild_days as rebuild_spc_days
+from app.services.yield_sketch import rebuild_days as rebuild_sketch_days
 
 router = APIRouter(tags=["Lot"])
 
@@ -53,12 +61,14 @@ async def add_lot(
             detail="Database temporarily unavailable (circuit open)."
         )
 
-    clear_yield_trend_cache()
+    await asyncio.to_thread(clear_yield_trend_cache, lot_id)
+    publish_update({"kind": "lot", "lot_id": lot_id, "station": station, "product": product})
     return {"status": "ok"}
 
 
 # Read All
 @router.get("/list")
+@coalesce("lot.list")
 @postgres_breaker
 async def list_lot(session: AsyncSession = Depends(get_session)):
     query = select(Lot)
@@ -96,11 +106,25 @@ async def update_lot(
     # 2. 更新有傳入的欄位
     update_data = payload.dict(exclude_unset=True)
 
+    moved = any(key in ("station", "product") and getattr(lot, key) != value for key, value in update_data.items())
+    before = (lot.station, lot.product)
     for key, value in update_data.items():
         setattr(lot, key, value)
 
     # 3. commit
     try:
+        if moved:
+            # 換了 station / product：這個 lot 的資料對 delta sync 來說都變了（新條件的 client 要加上、舊的要拿掉）
+            now = datetime.utcnow()
+            await session.execute(update(YieldRecord).where(YieldRecord.lot_id == lot_id).values(updated_at=now))
+            await session.execute(update(DefectSummary).where(DefectSummary.lot_id == lot_id).values(updated_at=now))
+            # 每日統計、yield sketch 以 (station, product, day) 為 key：原本與新的 key 在這個 lot 有資料的那幾天都重算
+            days = {ts.date() for ts in (await session.execute(
+                select(YieldRecord.timestamp).where(YieldRecord.lot_id == lot_id)
+            )).scalars()}
+            affected = [key + (day,) for key in (before, (lot.station, lot.product)) for day in days]
+            await rebuild_spc_days(session, affected)
+            await rebuild_sketch_days(session, affected)
         await session.commit()
         await session.refresh(lot)
     except CircuitBreakerError:
@@ -110,7 +134,12 @@ async def update_lot(
             detail="Database temporarily unavailable (circuit open)."
         )
 
-    clear_yield_trend_cache()
+    await asyncio.to_thread(clear_yield_trend_cache, lot_id)
+    publish_update({"kind": "lot", "lot_id": lot_id, "station": lot.station, "product": lot.product,
+                    "changes": update_data})
+    if moved:
+        # 原本 station / product 的 dashboard 收不到這個 lot 的消息，也沒辦法用 delta 拿掉它：整個重新查詢
+        publish_update({"kind": "reset", "reason": "lot_moved"})
     return {
         "status": "updated",
         "lot_id": lot_id,
@@ -160,6 +189,8 @@ async def delete_lot(lot_id: str, session: AsyncSession = Depends(get_session)):
             detail="Database temporarily unavailable (circuit open)."
         )
 
-    clear_yield_trend_cache()
+    await asyncio.to_thread(clear_yield_trend_cache, lot_id)
+    publish_update({"kind": "lot", "lot_id": lot_id, "station": lot.station, "product": lot.product,
+                    "deleted": True})
     return {"status": "deleted", "lot_id": lot_id}
 
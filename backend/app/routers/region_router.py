@@ -0,0 +1,163 @@
+# app/routers/region_router.py
+from datetime import date
+from typing import List, Optional, Tuple
+
+from aiobreaker import CircuitBreakerError
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel, Field, root_validator, validator
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette import status
+
+from app.common.circuit_breakers import circuit_open_counter, mongo_breaker
+from app.common.concurrency import mongo_bulkhead
+from app.database.database import get_session
+from app.database.mongo import mongo_db
+from app.models.lot import Lot
+from app.models.partitioning import timestamp_range
+from app.models.yield_record import YieldRecord
+from app.services.regions import count_by_type, decode_cursor, find_page, region_filter, shape_cells, shape_filter
+
+router = APIRouter(prefix="/defects", tags=["Defect Region (Mongo)"])
+
+SHAPES = ("box", "circle", "ring", "polygon")
+
+
+# --------- Pydantic Schema（放在 router 裡） ---------
+
+class Box(BaseModel):
+    x_min: float
+    y_min: float
+    x_max: float
+    y_max: float
+
+    @root_validator(skip_on_failure=True)
+    def ordered(cls, values):
+        if values["x_max"] < values["x_min"] or values["y_max"] < values["y_min"]:
+            raise ValueError("box max must not be less than min")
+        return values
+
+
+class Circle(BaseModel):
+    x: float
+    y: float
+    r: float = Field(..., gt=0)
+
+
+class Ring(BaseModel):
+    """以 wafer 圓心 (50, 50) 為中心；edge ring 例如 r_min = 45、r_max = 50。"""
+    r_min: float = Field(0, ge=0)
+    r_max: float = Field(..., gt=0)
+
+    @root_validator(skip_on_failure=True)
+    def ordered(cls, values):
+        if values["r_max"] <= values["r_min"]:
+            raise ValueError("r_max must be greater than r_min")
+        return values
+
+
+class RegionQuery(BaseModel):
+    # 區域：四種擇一
+    box: Optional[Box] = None
+    circle: Optional[Circle] = None
+    ring: Optional[Ring] = None
+    polygon: Optional[List[Tuple[float, float]]] = None
+
+    # 範圍：lots 直接指定；或用 station / product / 日期從 Postgres 找出 lot；都沒給 = 所有 lot
+    lots: Optional[List[str]] = None
+    station: Optional[str] = None
+    product: Optional[str] = None
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
+    defect_type: Optional[List[str]] = None
+    wafer: Optional[int] = None
+
+    limit: int = Field(500, ge=1, le=5000)
+    cursor: Optional[str] = None  # 上一頁回傳的 next_cursor
+
+    @validator("polygon")
+    def enough_vertices(cls, v):
+        if v is not None and len(v) < 3:
+            raise ValueError("polygon needs at least 3 vertices")
+        return v
+
+    @root_validator(skip_on_failure=True)
+    def one_shape(cls, values):
+        given = [s for s in SHAPES if values.get(s) is not None]
+        if len(given) != 1:
+            raise ValueError("exactly one of box / circle / ring / polygon is required")
+        return values
+
+
+def _shape(q: RegionQuery) -> dict:
+    """shape_filter / shape_cells 的參數。"""
+    if q.box:
+        return {"box": (q.box.x_min, q.box.y_min, q.box.x_max, q.box.y_max)}
+    if q.circle:
+        return {"circle": (q.circle.x, q.circle.y, q.circle.r)}
+    if q.ring:
+        return {"ring": (q.ring.r_min, q.ring.r_max)}
+    return {"polygon": q.polygon}
+
+
+async def _lot_scope(q: RegionQuery, session: AsyncSession) -> Optional[List[str]]:
+    """None = 不限 lot。"""
+    if q.lots is not None:
+        return sorted(set(q.lots))
+    if not (q.station or q.product or q.date_from or q.date_to):
+        return None
+    stmt = select(Lot.lot_id)
+    if q.station:
+        stmt = stmt.where(Lot.station == q.station)
+    if q.product:
+        stmt = stmt.where(Lot.product == q.product)
+    if q.date_from or q.date_to:
+        in_range = select(YieldRecord.lot_id)
+        if q.date_from:
+            in_range = in_range.where(YieldRecord.timestamp >= timestamp_range(q.date_from, q.date_from)[0])
+        if q.date_to:
+            in_range = in_range.where(YieldRecord.timestamp < timestamp_range(q.date_to, q.date_to)[1])
+        stmt = stmt.where(Lot.lot_id.in_(in_range))
+    return [row[0] for row in (await session.execute(stmt.distinct())).all()]
+
+
+# --------- API ---------
+
+@router.post("/region")
+@mongo_breaker
+async def query_region(q: RegionQuery, session: AsyncSession = Depends(get_session)):
+    """
+    區域內的 defect 點位（box / circle / ring / polygon），在 Mongo 端用 location 的 2d index 篩選：
+    - 分頁：回傳的 next_cursor 放進下一次的 cursor；沒有下一頁時是 null
+    - count / by_defect_type 只在第一頁（沒有 cursor）計算
+    """
+    if q.cursor is not None:
+        try:
+            decode_cursor(q.cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    lot_ids = await _lot_scope(q, session)
+    if lot_ids == []:
+        return {"count": 0, "by_defect_type": {}, "items": [], "next_cursor": None}
+
+    shape = _shape(q)
+    flt = region_filter(shape_filter(**shape), lot_ids, q.defect_type, q.wafer)
+    try:
+        items, next_cursor = await mongo_bulkhead.run(find_page, mongo_db, flt, shape_cells(**shape), q.limit, q.cursor)
+        by_type = None
+        if q.cursor is None:
+            by_type = await mongo_bulkhead.run(count_by_type, mongo_db, flt)
+    except CircuitBreakerError:
+        circuit_open_counter.labels(name="mongo_breaker").inc()
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Database temporarily unavailable (circuit open)."
+        )
+
+    return {
+        "count": sum(by_type.values()) if by_type is not None else None,
+        "by_defect_type": by_type,
+        "items": items,
+        "next_cursor": next_cursor,
+    }
@@ -0,0 +1,69 @@
+# app/routers/report_router.py
+import asyncio
+import gzip
+import uuid
+from datetime import date
+from typing import List
+
+from fastapi import APIRouter, HTTPException, Request, Response
+from pydantic import BaseModel
+from starlette import status
+
+from app.common.cache_key import normalize_params
+from app.services.reports import claim_job, load_report, release_job
+
+# Celery 在第一次送 task 時才 import，不拖慢 API 啟動
+
+router = APIRouter(prefix="/reports", tags=["Reports"])
+
+
+class TrendReportRequest(BaseModel):
+    date_from: date
+    date_to: date
+    station: str
+    product: str
+    lots: List[str] = []
+
+
+@router.post("/trend", status_code=status.HTTP_202_ACCEPTED)
+async def enqueue_trend_report(req: TrendReportRequest):
+    """
+    跟 /yield/trend 同樣的查詢，改由 Celery worker 分段計算（範圍大、超過 HTTP timeout 的查詢用這個）：
+    - 馬上回傳 job_id；進度看 /tasks/status/{job_id}，做完後從 /reports/trend/{job_id} 下載
+    - 相同參數的 job 還在跑時回傳同一個 job_id，不重複計算
+    """
+    if req.date_to < req.date_from:
+        raise HTTPException(status_code=400, detail="date_to must not be earlier than date_from")
+
+    params = normalize_params(req.dict())
+    # lots 順序 / 重複不影響結果，排序後再算 dedup key
+    params["lots"] = sorted(set(params["lots"]))
+
+    job_id, created = claim_job(params, uuid.uuid4().hex)
+    if created:
+        from app.common.tasks import build_trend_report
+
+        try:
+            build_trend_report.apply_async(args=[params], task_id=job_id)
+        except Exception:
+            release_job(params)
+            raise
+
+    return {
+        "job_id": job_id,
+        "status": "queued" if created else "in_progress",
+        "deduplicated": not created,
+        "status_url": f"/tasks/status/{job_id}",
+        "result_url": f"/reports/trend/{job_id}",
+    }
+
+
+@router.get("/trend/{job_id}")
+async def download_trend_report(job_id: str, request: Request):
+    blob = await asyncio.to_thread(load_report, job_id)
+    if blob is None:
+        raise HTTPException(status_code=404, detail="Report not found (not finished yet, or expired)")
+    # 存的就是 gzip：client 接受的話原樣送出，不必解壓再壓
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        return Response(content=blob, media_type="application/json", headers={"Content-Encoding": "gzip"})
+    return Response(content=gzip.decompress(blob), media_type="application/json")
@@ -1,6 +1,6 @@
 # app/routers/seed_router.py
-import random
-from datetime import datetime, timedelta, date
+import asyncio
+from datetime import date, datetime
 
 from aiobreaker import CircuitBreakerError
 from fastapi import APIRouter, Depends, HTTPException
@@ -12,18 +12,22 @@ from app.common.cache_key import clear_yield_trend_cache
 from app.common.circuit_breakers import postgres_breaker, mongo_breaker, circuit_open_counter
 from app.database.database import get_session
 from app.database.mongo import mongo_db
+from app.database.mongo_indexes import ensure_indexes
 from app.models.lot import Lot
 from app.models.yield_record import YieldRecord
 from app.models.defect_summary import DefectSummary
 from app.auth.security import require_role
+from app.services.clustering import CLUSTERS, mark_pending as mark_clusters_pending
+from app.services.live_updates import publish_update
+from app.services.retention import AGG, COLD, HOT, LOG
+from app.services.seed_data import generate_seed_data
+from app.services.spc_stats import rebuild as rebuild_spc_stats
+from app.services.wafermap import reset_versions as reset_wafermap_versions
+from app.services.yield_sketch import rebuild as rebuild_yield_sketches
 
 
 router = APIRouter(prefix="/seed", tags=["Seed / 測試資料"])
 
-MACHINES = ["AOI-01", "AOI-02", "AOI-03"]
-RECIPES = ["PKG-A", "PKG-B", "PKG-C"]
-DEFECT_TYPES = ["Scratch", "Particle", "Bridge", "Crack"]
-
 
 @router.get("/sql", dependencies=[Depends(require_role(["admin"]))])
 @postgres_breaker
@@ -43,10 +47,12 @@ async def seed_sql(session: AsyncSession = Depends(get_session)):
         )
 
 
-    # 2) 清空 Mongo
+    # 2) 清空 Mongo：drop 是 O(1)，delete_many({}) 要逐筆刪、資料越多越慢
+    #    retention 的彙總 / 冷儲存 / 紀錄、cluster 結果也一起清掉，否則新的 LOT id 會對到舊 lot 的彙總
     try:
-        coll = mongo_db["defect_detail"]
-        coll.delete_many({})
+        for name in (HOT, AGG, COLD, LOG, CLUSTERS):
+            mongo_db[name].drop()
+        coll = mongo_db[HOT]
     except CircuitBreakerError:
         circuit_open_counter.labels(name="postgres_breaker").inc()
         raise HTTPException(
@@ -54,93 +60,11 @@ async def seed_sql(session: AsyncSession = Depends(get_session)):
             detail="Database temporarily unavailable (circuit open)."
         )
 
-    lots_to_insert = []
-    yield_to_insert = []
-    summary_to_insert = []
-    defect_docs = []
-
-    today = date.today()
-    base_date = today - timedelta(days=6)  # 最近 7 天
-    lot_index = 1000
-
-    for d_offset in range(7):
-        cur_date = base_date + timedelta(days=d_offset)
-        for machine in MACHINES:
-            for recipe in RECIPES:
-                # 每個 machine/recipe 每天隨機 1~3 lot
-                for _ in range(random.randint(1, 3)):
-                    lot_id = f"LOT{lot_index:05d}"
-                    lot_index += 1
-
-                    total = random.randint(500, 1200)
-                    # 製造一個合理的總缺陷數
-                    total_defect = random.randint(0, int(total * 0.2))
-                    good = total - total_defect
-                    yield_rate = round(good / total * 100, 2) if total > 0 else 0
-
-                    lots_to_insert.append(
-                        Lot(
-                            lot_id=lot_id,
-                            product=recipe,
-                            station=machine,
-                            total=total,
-                            good=good,
-                        )
-                    )
-
-                    # timestamp 一律放當天中午
-                    ts = datetime.combine(cur_date, datetime.min.time()) + timedelta(
-                        hours=12
-                    )
-
-                    yield_to_insert.append(
-                        YieldRecord(
-                            lot_id=lot_id,
-                            total=total,
-                            good=good,
-                            yield_rate=yield_rate,
-                            timestamp=ts,
-                        )
-                    )
-
-                    # 把 total_defect 分配到不同 defect_type
-                    remain = total_defect
-                    for defect_type in DEFECT_TYPES:
-                        if remain <= 0:
-                            count = 0
-                        else:
-                            # 隨機切一個份額
-                            count = random.randint(0, remain)
-                        remain -= count
-
-                        if count <= 0:
-                            continue
-
-                        summary_to_insert.append(
-                            DefectSummary(
-                                lot_id=lot_id,
-                                defect_type=defect_type,
-                                count=count,
-                            )
-                        )
-
-                        # Mongo 只放一小部分點 (最多 50 點)，避免太大
-                        sample_count = min(count, 50)
-                        for _ in range(sample_count):
-                            defect_docs.append(
-                                {
-                                    "lot_id": lot_id,
-                                    "defect_type": defect_type,
-                                    "location": {
-                                        "x": round(random.uniform(0, 100), 2),
-                                        "y": round(random.uniform(0, 100), 2),
-                                    },
-                                    "severity": random.choice(["L", "M", "H"]),
-                                    "wafer": random.randint(1, 25),
-                                    "image_path": None,
-                                    "extra": {},
-                                }
-                            )
+    data = generate_seed_data(date.today())
+    lots_to_insert = data.lots
+    yield_to_insert = data.yields
+    summary_to_insert = data.summaries
+    defect_docs = data.defect_docs
 
     # 3) 先插 Lot，確保 FK 存在
     session.add_all(lots_to_insert)
@@ -158,6 +82,10 @@ async def seed_sql(session: AsyncSession = Depends(get_session)):
     session.add_all(yield_to_insert)
     session.add_all(summary_to_insert)
     try:
+        await session.flush()
+        # seed 不經過 ingest，SPC 每日統計與 yield 分佈 sketch 整個重算
+        await rebuild_spc_stats(session)
+        await rebuild_yield_sketches(session)
         await session.commit()
     except CircuitBreakerError:
         circuit_open_counter.labels(name="postgres_breaker").inc()
@@ -167,8 +95,11 @@ async def seed_sql(session: AsyncSession = Depends(get_session)):
         )
 
 
-    # 5) Mongo insert_many
+    # 5) Mongo insert_many（created_at 給 delta sync 用）
     if defect_docs:
+        created_at = datetime.utcnow()
+        for doc in defect_docs:
+            doc["created_at"] = created_at
         try:
             coll.insert_many(defect_docs)
         except CircuitBreakerError:
@@ -178,7 +109,15 @@ async def seed_sql(session: AsyncSession = Depends(get_session)):
                 detail="Database temporarily unavailable (circuit open)."
             )
 
-    clear_yield_trend_cache()
+    # drop 會連 index 一起刪掉；資料灌完再建，比邊插入邊維護 index 快
+    ensure_indexes(mongo_db)
+
+    await asyncio.to_thread(clear_yield_trend_cache)
+    reset_wafermap_versions()
+    # 新資料的 cluster 交給 worker 批次計算
+    mark_clusters_pending(*sorted({d["lot_id"] for d in defect_docs}))
+    # 資料整個重建，訂閱中的 dashboard 直接重新查詢
+    publish_update({"kind": "reset", "reason": "reseed"})
     return {
         "status": "ok",
         "lot_count": len(lots_to_insert),
@@ -0,0 +1,86 @@
+# app/routers/spc_router.py
+from datetime import date
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.common.circuit_breakers import postgres_breaker
+from app.common.coalesce import coalesce
+from app.config.config import settings
+from app.database.database import get_session
+from app.services.spc_stats import load_daily
+
+# NumPy 在第一次查 /spc 時才 import（app.services.spc），不拖慢 API 啟動
+
+router = APIRouter(prefix="/spc", tags=["SPC"])
+
+
+async def _daily(session: AsyncSession, station: str, product: str, date_from: date, date_to: date):
+    from app.services import spc
+
+    if date_to < date_from:
+        raise HTTPException(status_code=400, detail="date_to must not be earlier than date_from")
+    rows = await load_daily(session, station, product, date_from, date_to)
+    return spc, spc.to_arrays(rows)
+
+
+@router.get("/xbar_r")
+@coalesce("spc.xbar_r")
+@postgres_breaker
+async def xbar_r_chart(station: str, product: str, date_from: date, date_to: date,
+                       session: AsyncSession = Depends(get_session)):
+    """每天一個 subgroup 的 X-bar / R 管制圖（yield %），rules = 觸發的 Western Electric rule。"""
+    spc, a = await _daily(session, station, product, date_from, date_to)
+    chart = spc.xbar_r(a)
+    return {
+        "station": station,
+        "product": product,
+        "center": spc.clean(chart["center"]),
+        "sigma": spc.clean(chart["sigma"]),
+        "points": spc.points(
+            a["day"],
+            {k: chart[k] for k in ("mean", "ucl", "lcl", "range", "r_cl", "r_ucl", "r_lcl")},
+            chart["rules"],
+            extra={"n": a["n"]},
+        ),
+    }
+
+
+@router.get("/p_chart")
+@coalesce("spc.p_chart")
+@postgres_breaker
+async def p_chart(station: str, product: str, date_from: date, date_to: date,
+                  session: AsyncSession = Depends(get_session)):
+    """每天的不良率（(total - good) / total）p-chart。"""
+    spc, a = await _daily(session, station, product, date_from, date_to)
+    chart = spc.p_chart(a)
+    return {
+        "station": station,
+        "product": product,
+        "center": spc.clean(chart["center"]),
+        "points": spc.points(
+            a["day"],
+            {k: chart[k] for k in ("p", "ucl", "lcl")},
+            chart["rules"],
+            extra={"inspected": a["inspected"], "defective": a["defective"]},
+        ),
+    }
+
+
+@router.get("/capability")
+@coalesce("spc.capability")
+@postgres_breaker
+async def process_capability(station: str, product: str, date_from: date, date_to: date,
+                             lsl: Optional[float] = None, usl: Optional[float] = None,
+                             session: AsyncSession = Depends(get_session)):
+    """Cp / Cpk（within σ）與 Pp / Ppk（整體 σ）；規格界限預設取 spc_spec_limits。"""
+    spec = settings.spc_spec_limits.get(product) or settings.spc_spec_limits["*"]
+    lsl = spec["lsl"] if lsl is None else lsl
+    usl = spec["usl"] if usl is None else usl
+    if usl <= lsl:
+        raise HTTPException(status_code=400, detail="usl must be greater than lsl")
+
+    spc, a = await _daily(session, station, product, date_from, date_to)
+    result = spc.capability(a, lsl, usl)
+    return {"station": station, "product": product, **{k: spc.clean(v) for k, v in result.items()}}
@@ -0,0 +1,54 @@
+# app/routers/stream_router.py
+import asyncio
+from datetime import date
+from typing import List, Optional
+
+from fastapi import APIRouter, Query
+from starlette.responses import StreamingResponse
+
+from app.config.config import settings
+from app.services.live_updates import YieldFilter, format_sse, hub
+
+router = APIRouter(prefix="/stream", tags=["Live Updates"])
+
+
+@router.get("/yield")
+async def stream_yield(
+    station: Optional[str] = None,
+    product: Optional[str] = None,
+    lots: List[str] = Query(default=[]),
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+):
+    """
+    Server-Sent Events：訂閱條件跟 /yield/trend 相同，只推送之後新增 / 變動的資料。
+    收到 `event: reset` 時 client 應重新呼叫 /yield/trend。
+    """
+    flt = YieldFilter(
+        station=station,
+        product=product,
+        lots=set(lots),
+        date_from=date_from.isoformat() if date_from else None,
+        date_to=date_to.isoformat() if date_to else None,
+    )
+    sub = hub.subscribe(flt)
+
+    async def events():
+        try:
+            yield f"retry: {settings.live_retry_ms}\n\n"
+            while True:
+                try:
+                    update = await asyncio.wait_for(sub.queue.get(), timeout=settings.live_heartbeat_seconds)
+                except asyncio.TimeoutError:
+                    # 讓 proxy / load balancer 不會把閒置連線切掉
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_sse(update)
+        finally:
+            hub.unsubscribe(sub)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -6,6 +6,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
 
 from app.common.circuit_breakers import postgres_breaker, circuit_open_counter
+from app.common.coalesce import coalesce
 from app.database.database import get_session
 from app.models.defect_summary import DefectSummary
 
@@ -18,8 +19,12 @@ class DefectSummaryOut(BaseModel):
     defect_type: str
     count: int
 
+    class Config:
+        orm_mode = True
+
 
 @router.get("/list", response_model=list[DefectSummaryOut])
+@coalesce("summary.list")
 @postgres_breaker
 async def list_summary(session: AsyncSession = Depends(get_session)):
     try:
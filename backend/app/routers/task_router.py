@@ -1,10 +1,8 @@
 # app/routers/task_router.py
-from celery.result import AsyncResult
 from fastapi import APIRouter
 from pydantic import BaseModel
 
-from app.common.celery_app import celery_app
-from app.common.tasks import recalc_yield_for_lots
+# Celery 在第一次送 / 查 task 時才 import，不拖慢 API 啟動
 
 router = APIRouter(prefix="/tasks", tags=["Tasks"])
 
@@ -19,6 +17,8 @@ async def enqueue_recalc(req: RecalcRequest):
     丟非同步工作給 Celery worker：
     - 回傳 task_id，之後可以設計 /tasks/status/{task_id} 來查狀態。
     """
+    from app.common.tasks import recalc_yield_for_lots
+
     async_result = recalc_yield_for_lots.delay(req.lots)
     return {
         "task_id": async_result.id,
@@ -28,9 +28,17 @@ async def enqueue_recalc(req: RecalcRequest):
 
 @router.get("/status/{task_id}")
 async def get_task_status(task_id: str):
+    from celery.result import AsyncResult
+
+    from app.common.celery_app import celery_app
+
     res = AsyncResult(task_id, app=celery_app)
-    return {
+    body = {
         "task_id": task_id,
         "state": res.state,
         "result": res.result if res.successful() else None,
     }
+    if res.state == "PROGRESS":
+        # 分段執行的 task（例如 /reports/trend）用 update_state 回報的 {done, total, percent, stage}
+        body["progress"] = res.info
+    return body
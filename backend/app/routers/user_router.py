@@ -9,6 +9,7 @@ from starlette import status
 
 from app.auth.security import hash_password
 from app.common.circuit_breakers import postgres_breaker, circuit_open_counter
+from app.common.coalesce import coalesce
 
 from app.database.database import get_session
 
@@ -56,6 +57,7 @@ async def create_user(username: str, password: str, role: Role,
 
 # Read All
 @router.get("/list")
+@coalesce("user.list")
 @postgres_breaker
 async def list_user(session: AsyncSession = Depends(get_session)):
     query = select(User)
@@ -0,0 +1,92 @@
+# app/routers/wafermap_router.py
+import asyncio
+from enum import Enum
+from typing import List, Optional
+
+from aiobreaker import CircuitBreakerError
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from starlette import status
+
+from app.common.circuit_breakers import circuit_open_counter, mongo_breaker
+from app.common.concurrency import mongo_bulkhead, redis_bulkhead
+from app.config.config import settings
+from app.database.mongo import mongo_db
+from app.services.wafermap import (
+    SEVERITY_COLORS, encode_png, get_version, load_points, load_tile, render_tile, store_tile, tile_cache_counter,
+    tile_key, type_color,
+)
+
+router = APIRouter(prefix="/wafermap", tags=["Wafer Map"])
+
+
+class ColorBy(str, Enum):
+    defect_type = "defect_type"
+    severity = "severity"
+
+
+def _hex(rgb) -> str:
+    return "#%02x%02x%02x" % tuple(rgb)
+
+
+def _parse_wafer(wafer: str) -> Optional[int]:
+    """數字 = 該片 wafer；all = 整個 lot 疊在一起（包含沒有填 wafer 的點）。"""
+    if wafer == "all":
+        return None
+    if not wafer.isdigit():
+        raise HTTPException(status_code=400, detail="wafer must be a number or 'all'")
+    return int(wafer)
+
+
+async def _tile(request: Request, lot_id: str, wafer: str, z: int, x: int, y: int, color_by: ColorBy) -> Response:
+    wafer_no = _parse_wafer(wafer)
+    if not 0 <= z <= settings.wafermap_max_zoom or not (0 <= x < 1 << z and 0 <= y < 1 << z):
+        raise HTTPException(status_code=404, detail="Tile out of range")
+
+    version = await redis_bulkhead.run(get_version, lot_id)
+    headers = {"ETag": f'"{version}"', "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        tile_cache_counter.labels(result="not_modified").inc()
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    key = tile_key(lot_id, version, wafer, color_by.value, z, x, y)
+    png = await asyncio.to_thread(load_tile, key)
+    if png is not None:
+        tile_cache_counter.labels(result="hit").inc()
+        return Response(content=png, media_type="image/png", headers=headers)
+
+    tile_cache_counter.labels(result="miss").inc()
+    try:
+        points = await mongo_breaker.call_async(mongo_bulkhead.run, load_points, mongo_db, lot_id, wafer_no)
+    except CircuitBreakerError:
+        circuit_open_counter.labels(name="mongo_breaker").inc()
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Database temporarily unavailable (circuit open)."
+        )
+
+    # rasterize + 壓縮是 CPU 工作，丟到 thread，不卡 event loop
+    png = await asyncio.to_thread(lambda: encode_png(render_tile(points, z, x, y, color_by.value)))
+    await asyncio.to_thread(store_tile, key, png)
+    return Response(content=png, media_type="image/png", headers=headers)
+
+
+@router.get("/legend")
+async def wafermap_legend(defect_type: List[str] = Query([])):
+    """PNG 裡的顏色對照：severity 固定、defect_type 依名稱決定（所有 lot 一樣）。"""
+    return {
+        "severity": {k: _hex(v) for k, v in SEVERITY_COLORS.items()},
+        "defect_type": {t: _hex(type_color(t)) for t in defect_type},
+    }
+
+
+@router.get("/{lot_id}/{wafer}.png")
+async def wafermap_image(request: Request, lot_id: str, wafer: str, color_by: ColorBy = ColorBy.defect_type):
+    """整片 wafer 一張圖（= zoom 0 的 tile）。"""
+    return await _tile(request, lot_id, wafer, 0, 0, 0, color_by)
+
+
+@router.get("/{lot_id}/{wafer}/{z}/{x}/{y}.png")
+async def wafermap_tile(request: Request, lot_id: str, wafer: str, z: int, x: int, y: int,
+                        color_by: ColorBy = ColorBy.defect_type):
+    """zoom z 的第 (x, y) 張 tile：x 往右、y 往下，0 ~ 2^z - 1。"""
+    return await _tile(request, lot_id, wafer, z, x, y, color_by)
@@ -1,30 +1,46 @@
 # backend/app/routers/yield_router.py
 
+import asyncio
 import json
-from datetime import date
-from typing import List
+import logging
+from datetime import date, datetime
+from typing import List, Optional
 from urllib import request
 
 from aiobreaker import CircuitBreakerError
-from fastapi import APIRouter, Depends, Query, HTTPException, status
-from sqlalchemy import select, func
-from sqlalchemy.ext.asyncio import AsyncSession
-
-from app.common.cache_key import make_cache_key
-from app.common.circuit_breakers import postgres_breaker, circuit_open_counter
-from app.database.database import get_session
-from app.database.mongo import mongo_db
+from fastapi import APIRouter, Depends, Query, HTTPException, Response, status
+from sqlalchemy import select, func, or_
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.common.cache_key import TREND_PREFIX, make_cache_key, store_yield_trend
+from app.common.circuit_breakers import mongo_breaker, postgres_breaker, circuit_open_counter
+from app.common.coalesce import coalesce
+from app.common.concurrency import mongo_bulkhead, redis_bulkhead
+from app.common.fanout import branch
+from app.common.stale_cache import PARTIAL_HEADER, CachedResponse, stale_fallback
+from app.database.database import get_session, get_session_factory
+from app.database.mongo import async_mongo_db, mongo_db
+from app.database.mongo_indexes import DEFECT_POINT_PROJECTION
 from app.models.defect_summary import DefectSummary
 from app.models.lot import Lot
+from app.models.partitioning import timestamp_range
 from app.models.yield_record import YieldRecord
+from app.services.change_tracking import current_version, parse_since
+from app.services.clustering import CLUSTERS
 from app.services.redis_client import redis_cache
-from app.common.rate_limit import rate_limiter
+from app.services.retention import AGG
+from app.services.trend import aggregate_daily_yield, aggregate_pareto, count_daily, to_defect_points
+from app.services.trend_fragments import (
+    build_fragments, canonical_lots, load_fragments, merge_fragments, store_fragments,
+)
+from app.common.timing import phase
 
 router = APIRouter(prefix="/yield", tags=["Yield & Trend"])
 
 
 # ---- 原本的簡單列表 API（保留） ----
 @router.get("/list")
+@coalesce("yield.list")
 @postgres_breaker
 async def list_yield(session: AsyncSession = Depends(get_session)):
     stmt = select(YieldRecord).order_by(YieldRecord.timestamp.desc())
@@ -51,17 +67,12 @@ async def list_yield(session: AsyncSession = Depends(get_session)):
         for r in rows
     ]
 
-import logging
-
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s | %(levelname)s | %(name)s | %(message)s"
-)
-
 logger = logging.getLogger(__name__)
 
 # ---- 新：多天區間 + 機台 + Recipe + Lot IDs 的 Trend + Defect 資訊 ----
 @router.get("/trend")
+@coalesce("yield.trend")
+@stale_fallback("yield.trend", skip=lambda kwargs: kwargs.get("since"))
 @postgres_breaker
 async def yield_trend(
         date_from: date,
@@ -69,10 +80,24 @@ async def yield_trend(
         station: str,
         product: str,
         lots: List[str] = Query(),
+        since: Optional[str] = None,
         session: AsyncSession = Depends(get_session),
+        session_factory: async_sessionmaker = Depends(get_session_factory),
 ):
-    logger.info("Application yield_trend...")
+    # 先取版本號再查詢：回應的資料至少新到這個版本
+    version = current_version()
+
+    # ---------------- delta sync：只回傳 since 之後變動的部分，不走 cache ----------------
+    if since:
+        try:
+            since_ts = parse_since(since)
+        except ValueError:
+            raise HTTPException(400, "since must be a version (epoch ms) or an ISO timestamp")
+        return await _trend_delta(session, date_from, date_to, station, product, lots, since_ts, version)
+
     # ---------------- CACHE KEY 組合 ----------------
+    # lots 排序去重：順序不同的同一組 lot 共用同一個 key
+    lots = canonical_lots(lots)
     params = {
         "date_from": date_from.isoformat(),
         "date_to": date_to.isoformat(),
@@ -80,33 +105,52 @@ async def yield_trend(
         "product": product,
         "lots": lots,
     }
-    cache_key = make_cache_key("yield_trend", params)
+    cache_key = make_cache_key(TREND_PREFIX, params)
 
     # ---------------- 嘗試從 Redis 取 Cache ----------------
-    cached = redis_cache.get(cache_key)
+    with phase("cache"):
+        # cache hit 只用到 Redis：Postgres / Mongo 滿載時照樣很快回應
+        cached = await redis_bulkhead.run(redis_cache.get, cache_key)
+    debug = logger.isEnabledFor(logging.DEBUG)
     if cached:
-        logger.info("[CACHE HIT]" + cache_key)
-        logger.info("Application yield_trend... Finished")
-        return json.loads(cached)
-    logger.info("[CACHE MISS]" + cache_key)
-
-    # ---------------- 1) 依日期 / station / product / lot_ids 取得 yield ----------------
-    stmt = (
-        select(YieldRecord, Lot)
-        .join(Lot, Lot.lot_id == YieldRecord.lot_id)
-        .where(func.date(YieldRecord.timestamp) >= date_from)
-        .where(func.date(YieldRecord.timestamp) <= date_to)
-    )
+        if debug:
+            logger.debug("yield_trend cache hit", extra={"cache_key": cache_key})
+        # cache 裡已經是 JSON，直接回傳，不必 loads 再讓 FastAPI dumps 一次；last known good 不必再存一次
+        return CachedResponse(content=cached, media_type="application/json")
+    if debug:
+        logger.debug("yield_trend cache miss", extra={"cache_key": cache_key})
 
-    if station:
-        stmt = stmt.where(Lot.station == station)
-    if product:
-        stmt = stmt.where(Lot.product == product)
-    if lots:
-        stmt = stmt.where(Lot.lot_id.in_(lots))
+    # timestamp 範圍條件（不包 func.date），Postgres 才能只掃區間內的 partition
+    start, end = timestamp_range(date_from, date_to)
 
     try:
-        result = await session.execute(stmt)
+        # ---------------- 1) lot 範圍：沒指定 lots 就用區間內符合條件的 lot ----------------
+        lot_ids = lots
+        if not lot_ids:
+            lot_stmt = (
+                select(YieldRecord.lot_id)
+                .join(Lot, Lot.lot_id == YieldRecord.lot_id)
+                .where(YieldRecord.timestamp >= start, YieldRecord.timestamp < end)
+            )
+            if station:
+                lot_stmt = lot_stmt.where(Lot.station == station)
+            if product:
+                lot_stmt = lot_stmt.where(Lot.product == product)
+            with phase("db_yield"):
+                lot_ids = sorted((await session.execute(lot_stmt.distinct())).scalars().all())
+
+        # ---------------- 2) per-lot fragment：一次取回，只計算缺的 lot ----------------
+        with phase("cache"):
+            fragments = await redis_bulkhead.run(load_fragments, lot_ids, params["date_from"], params["date_to"])
+        missing = [lot_id for lot_id in lot_ids if lot_id not in fragments]
+        degraded = []
+        if missing:
+            computed, degraded = await _compute_fragments(session, session_factory, missing, start, end)
+            fragments.update(computed)
+            # 部分結果不快取：缺的部分下次重新計算
+            if not degraded:
+                with phase("cache"):
+                    await redis_bulkhead.run(store_fragments, computed, params["date_from"], params["date_to"])
     except CircuitBreakerError:
         circuit_open_counter.labels(name="postgres_breaker").inc()
         raise HTTPException(
@@ -114,78 +158,206 @@ async def yield_trend(
             detail="Database temporarily unavailable (circuit open)."
         )
 
-    rows = result.all()
+    with phase("aggregate"):
+        merged = merge_fragments([fragments[lot_id] for lot_id in lot_ids], station, product)
 
-    if not rows:
+    if merged is None:
         return {
+            "version": version,
             "dates": [],
             "avg_yield": [],
+            "daily_counts": [],
             "defect_pareto": [],
             "defect_details": [],
+            "defect_clusters": [],
         }
 
-    # 用 rows 決定實際使用的 lot_ids（這裡不會包含額外 lot）
-    used_lot_ids = sorted({r[0].lot_id for r in rows})
+    # ---------------- 最終組合結果 ----------------
+    result2 = {"version": version, **merged}
+    # 部分結果：標出缺了哪些部分，client 可以稍後重查
+    if degraded:
+        result2["partial"] = True
+        result2["degraded"] = degraded
 
-    # ---------------- 2) daily avg yield ----------------
-    daily_map = {}
-    for yr, _lot in rows:
-        d_str = yr.timestamp.date().isoformat()
-        daily_map.setdefault(d_str, []).append(float(yr.yield_rate))
+    with phase("serialize"):
+        body = json.dumps(result2)
 
-    dates = sorted(daily_map.keys())
-    avg_yield = [
-        round(sum(vals) / len(vals), 2)
-        for d, vals in sorted(daily_map.items())
-    ]
+    # ---------------- 寫入 Redis Cache（設定 30 秒；部分結果不快取） ----------------
+    if degraded:
+        return Response(content=body, media_type="application/json", headers={PARTIAL_HEADER: ",".join(degraded)})
+    with phase("cache"):
+        await redis_bulkhead.run(store_yield_trend, cache_key, body)
+    return Response(content=body, media_type="application/json")
+
+
+async def _compute_fragments(
+        session: AsyncSession,
+        session_factory: async_sessionmaker,
+        lot_ids: List[str],
+        start: datetime,
+        end: datetime,
+):
+    """
+    缺 fragment 的 lot 一起查：yield（必要）、summary 與 Mongo 三個查詢同時發出（各用自己的 session / async Mongo
+    client），延遲是最慢的那一個；summary / Mongo 慢或 breaker 打開時回傳 (fragments, degraded 的來源)。
+    yield 不加 station / product 條件，fragment 才能給不同條件的 request 共用，合併時再篩。
+    """
+    async def fetch_yield():
+        stmt = (
+            select(YieldRecord.lot_id, YieldRecord.timestamp, YieldRecord.yield_rate, Lot.station, Lot.product)
+            .join(Lot, Lot.lot_id == YieldRecord.lot_id)
+            .where(YieldRecord.timestamp >= start, YieldRecord.timestamp < end, YieldRecord.lot_id.in_(lot_ids))
+        )
+        with phase("db_yield"):
+            return (await session.execute(stmt)).all()
+
+    async def fetch_summary():
+        ds_stmt = (
+            select(DefectSummary.lot_id, DefectSummary.defect_type, func.sum(DefectSummary.count))
+            .where(DefectSummary.lot_id.in_(lot_ids), DefectSummary.timestamp >= start, DefectSummary.timestamp < end)
+            .group_by(DefectSummary.lot_id, DefectSummary.defect_type)
+        )
+        async with session_factory() as summary_session:
+            with phase("db_summary"):
+                return (await summary_session.execute(ds_stmt)).all()
 
-    # ---------------- 3) Defect Summary（PostgreSQL） ----------------
-    ds_stmt = select(DefectSummary).where(
-        DefectSummary.lot_id.in_(lots if lots else used_lot_ids)
+    async def fetch_details():
+        flt = {"lot_id": {"$in": list(lot_ids)}}
+        with phase("mongo_detail"):
+            async with mongo_bulkhead.slot():
+                # covered query：只從 index 取畫圖需要的欄位；已經過 retention 壓縮的舊 lot 只剩格子彙總；
+                # cluster 是 worker 預先算好的摘要（每個 lot 一筆）
+                return await asyncio.gather(
+                    async_mongo_db["defect_detail"].find(flt, DEFECT_POINT_PROJECTION).to_list(None),
+                    async_mongo_db[AGG].find(flt, {"_id": 0, "cell": 0}).to_list(None),
+                    async_mongo_db[CLUSTERS].find(flt, {"_id": 0}).to_list(None),
+                )
+
+    rows, summary, details = await asyncio.gather(
+        fetch_yield(),
+        branch("db_summary", fetch_summary, breaker=postgres_breaker, default=[]),
+        branch("mongo_detail", fetch_details, breaker=mongo_breaker, default=([], [], [])),
     )
+    with phase("aggregate"):
+        fragments = build_fragments(lot_ids, rows, summary.value, *details.value)
+    return fragments, [b.name for b in (summary, details) if b.degraded]
 
-    ds_rows = (await session.execute(ds_stmt)).scalars().all()
 
-    pareto_map = {}
-    for r in ds_rows:
-        pareto_map[r.defect_type] = pareto_map.get(r.defect_type, 0) + r.count
+async def _trend_delta(
+        session: AsyncSession,
+        date_from: date,
+        date_to: date,
+        station: str,
+        product: str,
+        lots: List[str],
+        since: datetime,
+        version: int,
+) -> dict:
+    """
+    since 之後有變動的部分：
+    - 有 YieldRecord 變動的日期，整天重新計算（client 直接覆蓋那幾天）
+    - 有 DefectSummary 變動的 defect_type，回傳該 type 目前的總數
+    - since 之後新增的 defect_detail 點位（帶 id，client 以 id 去重）
+    指定的 lot 在 since 之後換了 station / product（不再符合條件）時，delta 沒辦法表示移除，回傳 reset 請 client 重查。
+    """
+    start, end = timestamp_range(date_from, date_to)
+    conditions = [YieldRecord.timestamp >= start, YieldRecord.timestamp < end]
 
-    defect_pareto = [
-        {"defect_type": k, "count": v}
-        for k, v in pareto_map.items()
-    ]
-    defect_pareto.sort(key=lambda x: x["count"], reverse=True)
+    # ---------------- 0) 指定的 lot 有沒有移出條件（update_lot 會一起更新該 lot 資料的 updated_at） ----------------
+    moved_out = []
+    if station:
+        moved_out.append(Lot.station != station)
+    if product:
+        moved_out.append(Lot.product != product)
+    if lots and moved_out:
+        with phase("db_yield"):
+            moved = (await session.execute(
+                select(YieldRecord.lot_id)
+                .join(Lot, Lot.lot_id == YieldRecord.lot_id)
+                .where(*conditions, YieldRecord.lot_id.in_(lots), YieldRecord.updated_at > since, or_(*moved_out))
+                .limit(1)
+            )).first()
+        if moved:
+            return {"delta": True, "reset": True, "version": version}
+    if station:
+        conditions.append(Lot.station == station)
+    if product:
+        conditions.append(Lot.product == product)
+    if lots:
+        conditions.append(Lot.lot_id.in_(lots))
+
+    # ---------------- 1) 變動的日期 -> 重算 ----------------
+    with phase("db_yield"):
+        changed_days = (await session.execute(
+            select(func.date(YieldRecord.timestamp))
+            .join(Lot, Lot.lot_id == YieldRecord.lot_id)
+            .where(*conditions, YieldRecord.updated_at > since)
+            .distinct()
+        )).scalars().all()
+
+        day_rows = []
+        if changed_days:
+            day_rows = (await session.execute(
+                select(YieldRecord.timestamp, YieldRecord.yield_rate)
+                .join(Lot, Lot.lot_id == YieldRecord.lot_id)
+                .where(*conditions, func.date(YieldRecord.timestamp).in_(changed_days))
+            )).all()
 
-    # ---------------- 4) Mongo defect_detail ----------------
-    lot_filter = lots if lots else used_lot_ids
+    with phase("aggregate"):
+        day_rates = [(ts.date().isoformat(), rate) for ts, rate in day_rows]
+        dates, avg_yield = aggregate_daily_yield(day_rates)
+        counts = count_daily(d for d, _rate in day_rates)
 
+    # ---------------- 2) lot 範圍（跟完整查詢一樣：沒指定 lots 就用區間內符合條件的 lot） ----------------
+    lot_ids = lots
+    if not lot_ids:
+        with phase("db_yield"):
+            lot_ids = (await session.execute(
+                select(YieldRecord.lot_id)
+                .join(Lot, Lot.lot_id == YieldRecord.lot_id)
+                .where(*conditions)
+                .distinct()
+            )).scalars().all()
+
+    # ---------------- 3) 變動的 defect_type -> 目前總數 ----------------
+    defect_pareto = []
+    summary_range = (DefectSummary.timestamp >= start, DefectSummary.timestamp < end)
+    if lot_ids:
+        with phase("db_summary"):
+            changed_types = (await session.execute(
+                select(DefectSummary.defect_type)
+                .where(DefectSummary.lot_id.in_(lot_ids), *summary_range, DefectSummary.updated_at > since)
+                .distinct()
+            )).scalars().all()
+            if changed_types:
+                ds_rows = (await session.execute(
+                    select(DefectSummary.defect_type, DefectSummary.count)
+                    .where(DefectSummary.lot_id.in_(lot_ids), *summary_range,
+                           DefectSummary.defect_type.in_(changed_types))
+                )).all()
+                defect_pareto = aggregate_pareto((t, c) for t, c in ds_rows)
+
+    # ---------------- 4) 新增的 defect_detail 點位 ----------------
     defect_details = []
-    if lot_filter:
-        coll = mongo_db["defect_detail"]
-        mongo_docs = list(coll.find({"lot_id": {"$in": lot_filter}}))
-
-        for d in mongo_docs:
-            loc = d.get("location") or {}
-            defect_details.append(
-                {
-                    "lot_id": d.get("lot_id"),
-                    "defect_type": d.get("defect_type"),
-                    "x": loc.get("x"),
-                    "y": loc.get("y"),
-                    "severity": d.get("severity"),
-                    "wafer": d.get("wafer"),
-                }
-            )
+    if lot_ids:
+        with phase("mongo_detail"):
+            # 要帶 _id 給 client 去重，這個查詢不是 covered，但 lot_created_at 只會讀到新的點位
+            docs = await mongo_bulkhead.run(lambda: list(mongo_db["defect_detail"].find(
+                {"lot_id": {"$in": list(lot_ids)}, "created_at": {"$gt": since}},
+                {**DEFECT_POINT_PROJECTION, "_id": 1},
+            )))
+        with phase("aggregate"):
+            defect_details = [
+                {**point, "id": str(doc.get("_id"))}
+                for doc, point in zip(docs, to_defect_points(docs))
+            ]
 
-    # ---------------- 最終組合結果 ----------------
-    result2 = {
+    return {
+        "delta": True,
+        "version": version,
         "dates": dates,
         "avg_yield": avg_yield,
+        "daily_counts": [counts[d] for d in dates],
         "defect_pareto": defect_pareto,
         "defect_details": defect_details,
     }
-
-    # ---------------- 寫入 Redis Cache（設定 30 秒） ----------------
-    redis_cache.set(cache_key, json.dumps(result2), ex=30)
-    logger.info("Application yield_trend... Finished")
-    return result2
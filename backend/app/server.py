@@ -0,0 +1,109 @@
+# app/server.py
+"""
+正式環境的多 worker 啟動方式：
+
+    python -m app.server
+
+有裝 gunicorn 時用 gunicorn + UvicornWorker（設定在 gunicorn.conf.py），
+否則退回 uvicorn 內建的多 worker 模式。worker 數預設等於可用 CPU 數。
+"""
+import os
+import shutil
+import sys
+import tempfile
+
+from app.config.config import settings
+
+GUNICORN_CONF = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "gunicorn.conf.py")
+
+
+def available_cpus() -> int:
+    # container 限制 CPU affinity 時 os.cpu_count() 會高估
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def worker_count() -> int:
+    if settings.web_concurrency > 0:
+        return settings.web_concurrency
+    return max(1, min(available_cpus(), settings.max_workers))
+
+
+def prepare_metrics_dir() -> str:
+    """
+    多 process 共用的 prometheus 目錄；必須在任何 worker import prometheus_client 之前設定。
+    啟動時清空，避免殘留上一次執行的 pid 檔案。
+    """
+    path = os.environ.setdefault(
+        "PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "factory_prometheus")
+    )
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def bootstrap_once():
+    """
+    FAST_BOOT 沒開時，在 master 先建好 table / 預設帳號，並讓 worker 跳過這一步，
+    避免多個 worker 同時 create_all。
+    """
+    if settings.fast_boot:
+        return
+
+    import asyncio
+
+    from app.database.database import engine
+    from app.tools.bootstrap import bootstrap
+
+    async def run():
+        await bootstrap()
+        await engine.dispose()
+
+    asyncio.run(run())
+    settings.fast_boot = True
+    os.environ["FAST_BOOT"] = "true"
+
+
+def init_worker_process():
+    """
+    fork 之後在 worker 裡呼叫（gunicorn post_fork）。
+    preload 時 master 可能已經建立 engine；丟掉繼承來的連線，不關閉 master 的 socket。
+    Mongo（connect=False）與 Redis（pool 會檢查 pid）不需要額外處理。
+    """
+    from app.database.database import engine
+
+    engine.sync_engine.dispose(close=False)
+
+
+def main():
+    workers = worker_count()
+    port = os.getenv("PORT", "8000")
+    # uvicorn 的 worker 是 spawn 出來的，靠環境變數讓它們拿到相同的設定
+    os.environ["WEB_CONCURRENCY"] = str(workers)
+    prepare_metrics_dir()
+    bootstrap_once()
+
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        import uvicorn
+
+        uvicorn.run(
+            "app.main:app",
+            host="0.0.0.0",
+            port=int(port),
+            workers=workers,
+            timeout_graceful_shutdown=settings.graceful_timeout,
+        )
+        return
+
+    os.execvp(
+        sys.executable,
+        [sys.executable, "-m", "gunicorn", "app.main:app", "-c", GUNICORN_CONF],
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+# app/services/change_tracking.py
+"""
+delta sync 的版本號：UTC epoch 毫秒。
+
+version 在查詢開始前取得，所以回應裡的資料一定「至少」新到這個版本；
+下一次用 since=version 查詢時再往前多看 delta_skew_ms，
+涵蓋查詢當下還沒 commit 的寫入與多台機器之間的時鐘誤差（重複的資料 client 端以 id / 日期覆蓋即可）。
+"""
+from datetime import datetime, timedelta, timezone
+
+from app.config.config import settings
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def current_version() -> int:
+    return to_version(datetime.utcnow())
+
+
+def to_version(ts: datetime) -> int:
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return int((ts - _EPOCH) / timedelta(milliseconds=1))
+
+
+def parse_since(since: str) -> datetime:
+    """
+    since 可以是上一次回應的 version（epoch ms）或 ISO timestamp；
+    回傳實際要查的起點（已扣掉 skew window，naive UTC，跟 DB 欄位一致）。
+    """
+    if since.isdigit():
+        ts = _EPOCH + timedelta(milliseconds=int(since))
+    else:
+        ts = datetime.fromisoformat(since)
+        if ts.tzinfo is not None:
+            ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts - timedelta(milliseconds=settings.delta_skew_ms)
@@ -0,0 +1,262 @@
+# app/services/clustering.py
+"""
+defect 點位的空間 cluster 與 signature（scratch / edge / center）判斷，每個 lot、每片 wafer 各自計算。
+
+演算法（grid-based DBSCAN，全部用 NumPy 一次處理整個 lot 的所有 wafer）：
+1. 點位依 cluster_cell_size 分格（wafer × gy × gx），np.bincount 算每格的點數（aggregate 點依 count 加權）
+2. 密度門檻 = max(cluster_min_cell_points, cluster_density_factor × 該片 wafer 的平均每格點數)，超過的是 core 格
+3. 相鄰（8 連通）的 core 格用 label propagation + pointer jumping 合併成 connected component
+4. 每個 component 的點數、重心、範圍、共變異矩陣都用 bincount 算；點數 < cluster_min_points 的不列出
+5. signature：點到 wafer 圓心的平均距離 ≥ cluster_edge_radius -> edge；
+   主軸 / 次軸標準差比 ≥ cluster_scratch_elongation -> scratch；重心距圓心 ≤ cluster_center_radius -> center；其他 -> cluster
+
+結果存在 Mongo defect_clusters（每個 lot 一筆），/defects/clusters 與 /yield/trend 直接讀。
+ingest / detail add 只把 lot 放進待算清單（Redis set），由 celery beat 的 cluster_pending_lots 批次計算；
+同一個 lot 短時間內多次寫入只會算一次。
+"""
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from app.config.config import settings
+from app.services import redis_client
+from app.services.retention import AGG, HOT
+
+logger = logging.getLogger(__name__)
+
+CLUSTERS = "defect_clusters"
+PENDING_KEY = "clusters:pending"
+
+WAFER_CENTER = 50.0
+WAFER_RADIUS = 50.0
+
+
+# ---- 點位 ----
+
+class LotPoints:
+    """一個 lot 的點位（平行 array）；wafer 沒填的點算在 wafer = -1。"""
+
+    def __init__(self, x, y, wafer, weight, defect_type: List[Optional[str]]):
+        self.x = np.asarray(x, dtype=float)
+        self.y = np.asarray(y, dtype=float)
+        self.wafer = np.asarray(wafer, dtype=np.int64)
+        self.weight = np.asarray(weight, dtype=float)
+        self.defect_type = defect_type
+
+    def __len__(self):
+        return self.x.size
+
+
+def to_lot_points(raw: Iterable[dict], agg: Iterable[dict] = ()) -> LotPoints:
+    """defect_detail（原始點）+ defect_detail_agg（格子重心，權重 = count）。"""
+    xs, ys, wafers, weights, types = [], [], [], [], []
+    for d in raw:
+        loc = d.get("location") or {}
+        xs.append(loc.get("x") or 0.0)
+        ys.append(loc.get("y") or 0.0)
+        wafers.append(d.get("wafer") if d.get("wafer") is not None else -1)
+        weights.append(1.0)
+        types.append(d.get("defect_type"))
+    for d in agg:
+        count = d.get("count") or 1
+        xs.append(d.get("sum_x", 0.0) / count)
+        ys.append(d.get("sum_y", 0.0) / count)
+        wafers.append(d.get("wafer") if d.get("wafer") is not None else -1)
+        weights.append(float(count))
+        types.append(d.get("defect_type"))
+    return LotPoints(xs, ys, wafers, weights, types)
+
+
+def load_lot_points(db, lot_id: str) -> LotPoints:
+    """同步（pymongo）。"""
+    raw = db[HOT].find({"lot_id": lot_id}, {"_id": 0, "defect_type": 1, "wafer": 1, "location.x": 1, "location.y": 1})
+    agg = db[AGG].find({"lot_id": lot_id}, {"_id": 0, "cell": 0, "severity": 0})
+    return to_lot_points(raw, agg)
+
+
+# ---- connected components ----
+
+def label_components(dense: np.ndarray) -> np.ndarray:
+    """
+    dense: (wafer, gy, gx) bool -> 同形狀的 component label（0 .. n-1），非 core 格 = -1。
+    只在同一片 wafer 的平面上 8 連通。
+    """
+    n_wafer, rows, cols = dense.shape
+    none = dense.size  # 比所有 index 都大，取 min 時不影響結果
+    labels = np.where(dense, np.arange(dense.size).reshape(dense.shape), none)
+    while True:
+        # 每格取 3×3 鄰居中最小的 label
+        padded = np.pad(labels, ((0, 0), (1, 1), (1, 1)), constant_values=none)
+        smallest = labels.copy()
+        for dy in (0, 1, 2):
+            for dx in (0, 1, 2):
+                np.minimum(smallest, padded[:, dy:dy + rows, dx:dx + cols], out=smallest)
+        smallest = np.where(dense, smallest, none)
+        # pointer jumping：label 本身也是某個 core 格的 index，直接跳到那一格的 label，長條狀的 component 收斂得快
+        flat = smallest.ravel()
+        core = flat < none
+        flat[core] = flat[flat[core]]
+        if np.array_equal(smallest, labels):
+            break
+        labels = smallest
+
+    out = np.full(labels.shape, -1, dtype=np.int64)
+    core = labels < none
+    _unique, out[core] = np.unique(labels[core], return_inverse=True)
+    return out
+
+
+def _disc_cells(grid: int, cell_size: float) -> int:
+    """格子中心落在 wafer 圓內的格數（算平均密度用）。"""
+    centers = (np.arange(grid) + 0.5) * cell_size - WAFER_CENTER
+    return int(((centers[np.newaxis, :] ** 2 + centers[:, np.newaxis] ** 2) <= WAFER_RADIUS ** 2).sum())
+
+
+def _signature(mean_radius: float, center_radius: float, elongation: float) -> str:
+    if mean_radius >= settings.cluster_edge_radius:
+        return "edge"
+    if elongation >= settings.cluster_scratch_elongation:
+        return "scratch"
+    if center_radius <= settings.cluster_center_radius:
+        return "center"
+    return "cluster"
+
+
+def cluster_points(points: LotPoints, cell_size: Optional[float] = None) -> List[dict]:
+    """回傳每個 cluster 的摘要（依 wafer、點數由多到少排序）。"""
+    if not len(points):
+        return []
+    cell_size = cell_size or settings.cluster_cell_size
+    grid = int(np.ceil(2 * WAFER_RADIUS / cell_size))
+
+    wafer_ids, wafer_idx = np.unique(points.wafer, return_inverse=True)
+    n_wafer = wafer_ids.size
+    gx = np.clip((points.x // cell_size).astype(np.int64), 0, grid - 1)
+    gy = np.clip((points.y // cell_size).astype(np.int64), 0, grid - 1)
+    cell = (wafer_idx * grid + gy) * grid + gx
+
+    w = points.weight
+    counts = np.bincount(cell, weights=w, minlength=n_wafer * grid * grid).reshape(n_wafer, grid, grid)
+    expected = counts.sum(axis=(1, 2)) / _disc_cells(grid, cell_size)
+    threshold = np.maximum(settings.cluster_min_cell_points, settings.cluster_density_factor * expected)
+    labels = label_components(counts >= threshold[:, np.newaxis, np.newaxis])
+
+    flat = labels.ravel()
+    n = int(flat.max()) + 1
+    if n == 0:
+        return []
+    core_cells = np.nonzero(flat >= 0)[0]
+    cells = np.bincount(flat[core_cells], minlength=n)
+    cluster_wafer = np.empty(n, dtype=np.int64)
+    cluster_wafer[flat[core_cells]] = wafer_ids[core_cells // (grid * grid)]
+
+    cid = flat[cell]
+    member = cid >= 0
+    cid, x, y, w = cid[member], points.x[member], points.y[member], w[member]
+
+    def total(values):
+        return np.bincount(cid, weights=values, minlength=n)
+
+    weight = total(w)
+    mx, my = total(w * x) / weight, total(w * y) / weight
+    var_x = np.maximum(total(w * x * x) / weight - mx ** 2, 0)
+    var_y = np.maximum(total(w * y * y) / weight - my ** 2, 0)
+    cov = total(w * x * y) / weight - mx * my
+    # 2×2 共變異矩陣的特徵值 / 主軸方向（封閉解）
+    half_trace, det_part = (var_x + var_y) / 2, np.sqrt(((var_x - var_y) / 2) ** 2 + cov ** 2)
+    major, minor = half_trace + det_part, np.maximum(half_trace - det_part, 0)
+    elongation = np.sqrt(major / np.maximum(minor, 1e-6))
+    angle = np.degrees(0.5 * np.arctan2(2 * cov, var_x - var_y))
+    mean_radius = total(w * np.hypot(x - WAFER_CENTER, y - WAFER_CENTER)) / weight
+    center_radius = np.hypot(mx - WAFER_CENTER, my - WAFER_CENTER)
+
+    x_min, x_max, y_min, y_max = (np.full(n, np.inf), np.full(n, -np.inf), np.full(n, np.inf), np.full(n, -np.inf))
+    np.minimum.at(x_min, cid, x)
+    np.maximum.at(x_max, cid, x)
+    np.minimum.at(y_min, cid, y)
+    np.maximum.at(y_max, cid, y)
+
+    # 每個 cluster 最多的 defect_type
+    types = np.array([t or "unknown" for t in points.defect_type], dtype=object)[member].astype(str)
+    type_names, type_idx = np.unique(types, return_inverse=True)
+    by_type = np.bincount(cid * type_names.size + type_idx, weights=w,
+                          minlength=n * type_names.size).reshape(n, type_names.size)
+    dominant = type_names[by_type.argmax(axis=1)]
+
+    clusters = []
+    for i in np.nonzero(weight >= settings.cluster_min_points)[0]:
+        clusters.append({
+            "wafer": None if cluster_wafer[i] < 0 else int(cluster_wafer[i]),
+            "signature": _signature(mean_radius[i], center_radius[i], elongation[i]),
+            "count": int(round(weight[i])),
+            "cells": int(cells[i]),
+            "x": round(float(mx[i]), 2),
+            "y": round(float(my[i]), 2),
+            "x_min": round(float(x_min[i]), 2),
+            "x_max": round(float(x_max[i]), 2),
+            "y_min": round(float(y_min[i]), 2),
+            "y_max": round(float(y_max[i]), 2),
+            "radius": round(float(mean_radius[i]), 2),
+            "elongation": round(float(elongation[i]), 2),
+            "angle": round(float(angle[i]), 1),
+            "defect_type": str(dominant[i]),
+        })
+    clusters.sort(key=lambda c: (c["wafer"] is None, c["wafer"] or 0, -c["count"]))
+    return clusters
+
+
+# ---- 結果存放（Mongo defect_clusters） ----
+
+def cluster_lot(db, lot_id: str) -> dict:
+    """重算一個 lot 並存起來（同步，worker / endpoint 的 thread 裡跑）。"""
+    points = load_lot_points(db, lot_id)
+    doc = {
+        "lot_id": lot_id,
+        "computed_at": datetime.utcnow(),
+        "point_count": int(points.weight.sum()) if len(points) else 0,
+        "wafer_count": int(np.unique(points.wafer).size) if len(points) else 0,
+        "cell_size": settings.cluster_cell_size,
+        "clusters": cluster_points(points),
+    }
+    db[CLUSTERS].replace_one({"lot_id": lot_id}, doc, upsert=True)
+    return doc
+
+
+def load_clusters(db, lot_ids: List[str]) -> Dict[str, dict]:
+    docs = db[CLUSTERS].find({"lot_id": {"$in": lot_ids}}, {"_id": 0})
+    return {d["lot_id"]: d for d in docs}
+
+
+def flatten(docs: Iterable[dict]) -> List[dict]:
+    """每個 lot 一筆的 document -> 扁平的 cluster 清單（帶 lot_id），/yield/trend 用。"""
+    return [{"lot_id": d["lot_id"], **c} for d in docs for c in d.get("clusters", [])]
+
+
+# ---- 待算清單（Redis set） ----
+
+def mark_pending(*lot_ids: str):
+    if lot_ids:
+        redis_client.redis_cache.sadd(PENDING_KEY, *lot_ids)
+
+
+def pop_pending(limit: int) -> List[str]:
+    lot_ids = redis_client.redis_cache.spop(PENDING_KEY, limit) or []
+    return [v.decode() if isinstance(v, bytes) else v for v in lot_ids]
+
+
+def run_pending(db, limit: Optional[int] = None) -> dict:
+    """celery beat：把待算清單裡的 lot 算完；失敗的 lot 放回清單下次再算。"""
+    lot_ids = pop_pending(limit or settings.cluster_batch_lots)
+    done, clusters = [], 0
+    for lot_id in lot_ids:
+        try:
+            clusters += len(cluster_lot(db, lot_id)["clusters"])
+            done.append(lot_id)
+        except Exception:
+            logger.exception("clustering failed for lot %s", lot_id)
+            mark_pending(lot_id)
+    if done:
+        logger.info("clustered %d lots (%d clusters)", len(done), clusters)
+    return {"lots": len(done), "clusters": clusters, "lot_ids": done}
@@ -0,0 +1,142 @@
+# app/services/live_updates.py
+"""
+即時更新（/stream/yield）：
+
+    寫入路徑 publish_update() -> Redis channel -> 每個 worker 一條 subscriber 連線 -> 本地符合 filter 的 SSE 連線
+
+每個 SSE 連線只是一個 asyncio.Queue，閒置時不佔 DB / Redis 連線，
+一個 worker 可以掛上千條。Redis 不可用時退回只通知本 process 的連線。
+
+update 格式（kind 之外的欄位視情況出現）：
+    kind           ingest / lot / defect / reset
+    lot_id, station, product, date
+    yield_point    {"lot_id", "date", "yield_rate"}
+    pareto_delta   [{"defect_type", "delta"}]
+    defect_points  [to_defect_points 的格式]
+"""
+import asyncio
+import json
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Optional, Set
+
+import redis
+
+from app.config.config import settings
+from app.services import redis_client
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "live:yield"
+
+
+@dataclass
+class YieldFilter:
+    station: Optional[str] = None
+    product: Optional[str] = None
+    lots: Set[str] = field(default_factory=set)
+    date_from: Optional[str] = None
+    date_to: Optional[str] = None
+
+    def matches(self, update: dict) -> bool:
+        if update.get("kind") == "reset":
+            return True
+        if self.station and update.get("station") != self.station:
+            return False
+        if self.product and update.get("product") != self.product:
+            return False
+        if self.lots and update.get("lot_id") not in self.lots:
+            return False
+        day = update.get("date")
+        if day and self.date_from and day < self.date_from:
+            return False
+        if day and self.date_to and day > self.date_to:
+            return False
+        return True
+
+
+class Subscription:
+    def __init__(self, flt: YieldFilter, maxsize: int):
+        self.filter = flt
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+
+    def offer(self, update: dict):
+        try:
+            self.queue.put_nowait(update)
+        except asyncio.QueueFull:
+            # client 跟不上：丟掉累積的 update，請它整個重新查詢
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({"kind": "reset", "reason": "overflow"})
+
+
+class LiveHub:
+    def __init__(self):
+        self._subs: Set[Subscription] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self.use_redis = settings.live_updates_redis and not redis_client.USE_FAKE_REDIS
+
+    @property
+    def connections(self) -> int:
+        return len(self._subs)
+
+    def subscribe(self, flt: YieldFilter) -> Subscription:
+        self._ensure_listener()
+        sub = Subscription(flt, settings.live_queue_size)
+        self._subs.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        self._subs.discard(sub)
+
+    def dispatch(self, update: dict):
+        """在 event loop thread 上執行：把 update 分給符合 filter 的連線。"""
+        for sub in list(self._subs):
+            if sub.filter.matches(update):
+                sub.offer(update)
+
+    # ---------------- Redis subscriber ----------------
+    def _ensure_listener(self):
+        if not self.use_redis or self._thread is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._thread = threading.Thread(target=self._listen, name="live-updates", daemon=True)
+        self._thread.start()
+
+    def _listen(self):
+        backoff = 1.0
+        while True:
+            try:
+                client = redis.Redis.from_url(settings.REDIS_CACHE_URL)
+                pubsub = client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(CHANNEL)
+                backoff = 1.0
+                for message in pubsub.listen():
+                    update = json.loads(message["data"])
+                    self._loop.call_soon_threadsafe(self.dispatch, update)
+            except Exception:
+                logger.warning("live update subscriber disconnected, retrying", exc_info=True)
+                threading.Event().wait(backoff)
+                backoff = min(backoff * 2, 30.0)
+
+
+hub = LiveHub()
+
+
+def publish_update(update: dict):
+    """寫入路徑呼叫；失敗不影響寫入本身。"""
+    payload = json.dumps(update, default=str)
+    if hub.use_redis:
+        try:
+            redis_client.redis_cache.publish(CHANNEL, payload)
+            return
+        except Exception:
+            logger.warning("live update publish failed, delivering locally only", exc_info=True)
+    hub.dispatch(json.loads(payload))
+
+
+def format_sse(update: dict) -> str:
+    event = "reset" if update.get("kind") == "reset" else "update"
+    return f"event: {event}\ndata: {json.dumps(update, default=str)}\n\n"
@@ -0,0 +1,231 @@
+# app/services/partitions.py
+"""
+yield_record / defect_summary 的月份 partition 維護（只在 Postgres 上動作，其他 dialect 直接跳過）。
+
+    <table>_y2025m01   [2025-01-01, 2025-02-01)
+    <table>_default    沒有對應月份 partition 的資料先落在這裡
+
+- ensure_partitions：建立往前 / 往後幾個月的 partition（bootstrap、每日 celery beat）
+- ensure_partition_for：寫入前確認該月份 partition 存在（ingest 用，process 內快取）
+- detach_expired：超過保留月數的 partition detach（可選擇直接 drop）
+- migrate_to_partitioned：既有的一般 table 轉成 partitioned table（舊資料留在 <table>_legacy）
+"""
+import logging
+import re
+from datetime import date, datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import text
+
+from app.config.config import settings
+from app.database.database import engine
+from app.models.base import Base
+
+logger = logging.getLogger(__name__)
+
+_NAME_RE = re.compile(r"_y(\d{4})m(\d{2})$")
+
+# ensure_partition_for 已確認過的 (table, month)
+_known: Set[Tuple[str, date]] = set()
+
+
+def partitioned_tables() -> Dict[str, str]:
+    """{table name: partition key}，來源是 model 上的 partitioned_by()。"""
+    return {
+        name: table.info["partition_key"]
+        for name, table in Base.metadata.tables.items()
+        if table.info.get("partition_key")
+    }
+
+
+def month_start(d) -> date:
+    if isinstance(d, datetime):
+        d = d.date()
+    return d.replace(day=1)
+
+
+def add_months(month: date, n: int) -> date:
+    index = month.year * 12 + (month.month - 1) + n
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_y{month.year}m{month.month:02d}"
+
+
+def partition_month(name: str) -> Optional[date]:
+    """partition_name 的反向；default / legacy 之類的回傳 None。"""
+    m = _NAME_RE.search(name)
+    return date(int(m.group(1)), int(m.group(2)), 1) if m else None
+
+
+async def is_partitioned(conn, table: str) -> bool:
+    relkind = await conn.scalar(text("SELECT relkind FROM pg_class WHERE relname = :t"), {"t": table})
+    return relkind == "p"
+
+
+async def list_partitions(conn, table: str) -> List[str]:
+    result = await conn.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = :t ORDER BY c.relname"
+        ),
+        {"t": table},
+    )
+    return [row[0] for row in result]
+
+
+async def create_month_partition(conn, table: str, key: str, month: date) -> str:
+    """
+    建立單一月份的 partition。default partition 裡已經有這個月份的資料時，
+    Postgres 不允許直接建，要先 detach default、把資料搬進新 partition 再 attach 回去。
+    """
+    name = partition_name(table, month)
+    col = f'"{key}"'
+    default = f"{table}_default"
+    start, end = month.isoformat(), add_months(month, 1).isoformat()
+    bounds = {"s": month, "e": add_months(month, 1)}
+    create = f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} FOR VALUES FROM ('{start}') TO ('{end}')"
+
+    stranded = await conn.scalar(
+        text(f"SELECT EXISTS (SELECT 1 FROM {default} WHERE {col} >= :s AND {col} < :e)"), bounds
+    )
+    if not stranded:
+        await conn.execute(text(create))
+        return name
+
+    await conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {default}"))
+    await conn.execute(text(create))
+    await conn.execute(text(f"INSERT INTO {name} SELECT * FROM {default} WHERE {col} >= :s AND {col} < :e"), bounds)
+    await conn.execute(text(f"DELETE FROM {default} WHERE {col} >= :s AND {col} < :e"), bounds)
+    await conn.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {default} DEFAULT"))
+    logger.info("moved rows of %s out of %s", name, default)
+    return name
+
+
+async def ensure_partitions(conn, today: Optional[date] = None,
+                            months_back: Optional[int] = None, months_ahead: Optional[int] = None) -> List[str]:
+    """建立 [today - months_back, today + months_ahead] 的月份 partition + default partition，回傳新建的名稱。"""
+    if conn.dialect.name != "postgresql":
+        return []
+    current = month_start(today or datetime.utcnow())
+    back = settings.partition_months_back if months_back is None else months_back
+    ahead = settings.partition_months_ahead if months_ahead is None else months_ahead
+
+    created = []
+    for table, key in partitioned_tables().items():
+        if not await is_partitioned(conn, table):
+            logger.warning("%s is not partitioned yet, run: python -m app.tools.partitions migrate", table)
+            continue
+        await conn.execute(text(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT"))
+        existing = set(await list_partitions(conn, table))
+        for n in range(-back, ahead + 1):
+            month = add_months(current, n)
+            if partition_name(table, month) not in existing:
+                created.append(await create_month_partition(conn, table, key, month))
+    return created
+
+
+async def ensure_partition_for(ts: datetime, bind=engine):
+    """
+    ingest 寫入前呼叫：該月份的 partition 通常已由每日維護預先建好，這裡只是保險。
+    失敗只記 log，資料會落到 default partition，下次維護時會被搬到正確的 partition。
+    """
+    if bind.dialect.name != "postgresql":
+        return
+    month = month_start(ts)
+    tables = partitioned_tables()
+    if all((table, month) in _known for table in tables):
+        return
+    try:
+        async with bind.begin() as conn:
+            for table, key in tables.items():
+                if not await is_partitioned(conn, table):
+                    continue
+                if partition_name(table, month) not in await list_partitions(conn, table):
+                    await create_month_partition(conn, table, key, month)
+        _known.update((table, month) for table in tables)
+    except Exception:
+        logger.warning("ensure partition for %s failed", month, exc_info=True)
+
+
+async def detach_expired(conn, today: Optional[date] = None, retention_months: Optional[int] = None,
+                         drop: Optional[bool] = None) -> List[str]:
+    """整個月份都早於保留期限的 partition detach（drop=True 時直接刪除），回傳處理的名稱。"""
+    retention = settings.partition_retention_months if retention_months is None else retention_months
+    drop = settings.partition_drop_detached if drop is None else drop
+    if conn.dialect.name != "postgresql" or retention <= 0:
+        return []
+    cutoff = add_months(month_start(today or datetime.utcnow()), -retention)
+
+    detached = []
+    for table in partitioned_tables():
+        for name in await list_partitions(conn, table):
+            month = partition_month(name)
+            if month is None or add_months(month, 1) > cutoff:
+                continue
+            await conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+            if drop:
+                await conn.execute(text(f"DROP TABLE {name}"))
+            detached.append(name)
+    return detached
+
+
+async def maintain(bind=engine, today: Optional[date] = None) -> dict:
+    """每日維護：補齊 partition + 處理過期 partition。"""
+    async with bind.begin() as conn:
+        created = await ensure_partitions(conn, today)
+        detached = await detach_expired(conn, today)
+    if created or detached:
+        logger.info("partition maintenance: created=%s detached=%s", created, detached)
+    return {"created": created, "detached": detached}
+
+
+async def migrate_to_partitioned(conn, table: str) -> bool:
+    """
+    既有的一般 table 轉成 partitioned table（已經是 partitioned 時不做事）：
+    1. 舊 table 連同 index / sequence 改名成 *_legacy
+    2. 依 model 建新的 partitioned table + 涵蓋舊資料月份的 partition
+    3. 資料複製過去、sequence 接續原本的 id
+    舊 table 保留，確認無誤後再手動 DROP TABLE <table>_legacy。
+    """
+    if await is_partitioned(conn, table):
+        return False
+    key = partitioned_tables()[table]
+    col = f'"{key}"'
+    legacy = f"{table}_legacy"
+
+    await conn.execute(text(f"ALTER TABLE {table} RENAME TO {legacy}"))
+    indexes = await conn.execute(text("SELECT indexname FROM pg_indexes WHERE tablename = :t"), {"t": legacy})
+    for (index,) in indexes.fetchall():
+        await conn.execute(text(f"ALTER INDEX {index} RENAME TO {index}_legacy"))
+    sequence = await conn.scalar(text("SELECT pg_get_serial_sequence(:t, 'id')"), {"t": legacy})
+    if sequence:
+        await conn.execute(text(f"ALTER SEQUENCE {sequence} RENAME TO {legacy}_id_seq"))
+
+    # partition key 不能是 NULL 落點不明的資料：舊 defect_summary 沒有 timestamp，用對應 lot 的量測時間補
+    if table == "defect_summary":
+        await conn.execute(text(
+            f"UPDATE {legacy} ds SET {col} = yr.timestamp FROM yield_record yr "
+            f"WHERE ds.{col} IS NULL AND yr.lot_id = ds.lot_id"
+        ))
+    await conn.execute(text(f"UPDATE {legacy} SET {col} = COALESCE(updated_at, now()) WHERE {col} IS NULL"))
+
+    await conn.run_sync(lambda sync_conn: Base.metadata.tables[table].create(sync_conn))
+    await conn.execute(text(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT"))
+    first, last = (await conn.execute(text(f"SELECT min({col}), max({col}) FROM {legacy}"))).one()
+    if first is not None:
+        month, end = month_start(first), month_start(last)
+        while month <= end:
+            await create_month_partition(conn, table, key, month)
+            month = add_months(month, 1)
+
+    columns = ", ".join(f'"{c.name}"' for c in Base.metadata.tables[table].columns)
+    await conn.execute(text(f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {legacy}"))
+    await conn.execute(text(
+        f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE((SELECT max(id) FROM {table}), 1))"
+    ))
+    logger.info("migrated %s to a partitioned table, old rows kept in %s", table, legacy)
+    return True
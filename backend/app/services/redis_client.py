@@ -32,5 +32,12 @@ if USE_FAKE_REDIS:
     redis_ratelimit = FakeRedis()
 
 else:
-    redis_cache = redis.Redis.from_url(settings.REDIS_CACHE_URL)
-    redis_ratelimit = redis.Redis.from_url(settings.REDIS_RATELIMIT_URL)
+    # redis-py 的 connection pool 會檢查 pid，fork 後的 worker 自動重建連線
+    # socket timeout：Redis 變慢時呼叫端最多卡 redis_socket_timeout 秒，不會把 worker thread 全部佔住
+    _options = dict(
+        max_connections=settings.redis_max_connections,
+        socket_timeout=settings.redis_socket_timeout,
+        socket_connect_timeout=settings.redis_socket_timeout,
+    )
+    redis_cache = redis.Redis.from_url(settings.REDIS_CACHE_URL, **_options)
+    redis_ratelimit = redis.Redis.from_url(settings.REDIS_RATELIMIT_URL, **_options)
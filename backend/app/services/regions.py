@@ -0,0 +1,212 @@
+# app/services/regions.py
+"""
+defect 點位的區域查詢（POST /defects/region）：在 Mongo 端用 location 的 2d index 篩，不必把整個 lot 的點抓回 client。
+
+區域（座標跟 defect_detail.location 一樣是 0 ~ 100，wafer 圓心 (50, 50)）：
+- box：x_min / y_min / x_max / y_max，象限就是一個 box               -> $geoWithin $box
+- circle：圓心 + 半徑                                                -> $geoWithin $center
+- ring：以 wafer 圓心為中心的環（edge ring = r_min ~ 50）             -> 外圓 $geoWithin + $nor 內圓
+- polygon：3 個以上的頂點（legacy 平面座標）                          -> $geoWithin $polygon
+
+分頁：每個點寫入時另外存 region_cell（座標切成 REGION_GRID x REGION_GRID 格的格子編號），依
+(region_cell, lot_id, _id) 排序、用 cell_lot_id index 做 keyset（cursor 是上一頁最後一筆的這三個值）。
+區域先換算成涵蓋的格子，index 只掃這些格子、照 index 順序回傳，不必先找出區域內所有的點再 SORT；
+每一頁只讀到這一頁的點加上邊界格子裡不在區域內的點。筆數與各 defect_type 的數量只在第一頁計算。
+只查 hot 的 defect_detail：retention 壓縮過的 lot 原始點位在冷儲存，沒有個別座標。
+"""
+import base64
+import math
+from typing import Dict, List, Optional, Tuple
+
+from bson import json_util
+from pymongo import ASCENDING
+
+from app.services.retention import HOT
+
+WAFER_CENTER = (50.0, 50.0)
+
+REGION_GRID = 10
+CELL_SIZE = 100.0 / REGION_GRID
+REGION_INDEX = "cell_lot_id"
+REGION_SORT = [("region_cell", ASCENDING), ("lot_id", ASCENDING), ("_id", ASCENDING)]
+
+POINT_PROJECTION = {"lot_id": 1, "defect_type": 1, "wafer": 1, "location": 1, "severity": 1, "region_cell": 1}
+
+
+# ---- 格子編號 ----
+
+def _grid_index(v: float) -> int:
+    # 超出 0 ~ 100 的座標歸到最邊的格子
+    return min(max(int(v // CELL_SIZE), 0), REGION_GRID - 1)
+
+
+def region_cell(x: Optional[float], y: Optional[float]) -> Optional[int]:
+    """寫入 defect_detail 時存進 region_cell。"""
+    if x is None or y is None:
+        return None
+    return _grid_index(x) * REGION_GRID + _grid_index(y)
+
+
+# 補欄位前寫入的舊點位：bootstrap 用同樣的算法在 Mongo 端補上（update pipeline）
+def _grid_expr(field: str) -> dict:
+    return {"$min": [{"$max": [{"$floor": {"$divide": [field, CELL_SIZE]}}, 0]}, REGION_GRID - 1]}
+
+
+REGION_CELL_BACKFILL = [{"$set": {"region_cell": {"$add": [
+    {"$multiply": [_grid_expr("$location.x"), REGION_GRID]}, _grid_expr("$location.y"),
+]}}}]
+
+
+def backfill_region_cells(db) -> int:
+    """還沒有 region_cell 的點補上；回傳更新的筆數。可以重複執行。"""
+    return db[HOT].update_many({"region_cell": {"$exists": False}}, REGION_CELL_BACKFILL).modified_count
+
+
+def _cells_in_box(x_min: float, y_min: float, x_max: float, y_max: float) -> List[Tuple[int, int]]:
+    return [(gx, gy)
+            for gx in range(_grid_index(x_min), _grid_index(x_max) + 1)
+            for gy in range(_grid_index(y_min), _grid_index(y_max) + 1)]
+
+
+def _distance_range(gx: int, gy: int, cx: float, cy: float) -> Tuple[float, float]:
+    """格子 (gx, gy) 內的點到 (cx, cy) 的最近 / 最遠距離。"""
+    x0, y0 = gx * CELL_SIZE, gy * CELL_SIZE
+    x1, y1 = x0 + CELL_SIZE, y0 + CELL_SIZE
+    nearest = math.hypot(min(max(cx, x0), x1) - cx, min(max(cy, y0), y1) - cy)
+    farthest = math.hypot(max(abs(cx - x0), abs(cx - x1)), max(abs(cy - y0), abs(cy - y1)))
+    return nearest, farthest
+
+
+def shape_cells(box: Optional[Tuple[float, float, float, float]] = None,
+                circle: Optional[Tuple[float, float, float]] = None,
+                ring: Optional[Tuple[float, float]] = None,
+                polygon: Optional[List[Tuple[float, float]]] = None) -> List[int]:
+    """跟 shape_filter 同樣的參數；回傳可能有區域內的點的格子（排序過，保守地多不會少）。"""
+    if box is not None:
+        cells = _cells_in_box(*box)
+    elif circle is not None:
+        x, y, r = circle
+        cells = [c for c in _cells_in_box(x - r, y - r, x + r, y + r) if _distance_range(*c, x, y)[0] <= r]
+    elif ring is not None:
+        r_min, r_max = ring
+        cx, cy = WAFER_CENTER
+        cells = []
+        for c in _cells_in_box(cx - r_max, cy - r_max, cx + r_max, cy + r_max):
+            nearest, farthest = _distance_range(*c, cx, cy)
+            # 整格都在內圓裡的格子不會有環上的點
+            if nearest <= r_max and farthest >= r_min:
+                cells.append(c)
+    elif polygon is not None:
+        xs, ys = [p[0] for p in polygon], [p[1] for p in polygon]
+        cells = _cells_in_box(min(xs), min(ys), max(xs), max(ys))
+    else:
+        raise ValueError("one of box / circle / ring / polygon is required")
+    return sorted(gx * REGION_GRID + gy for gx, gy in cells)
+
+
+def shape_filter(box: Optional[Tuple[float, float, float, float]] = None,
+                 circle: Optional[Tuple[float, float, float]] = None,
+                 ring: Optional[Tuple[float, float]] = None,
+                 polygon: Optional[List[Tuple[float, float]]] = None) -> dict:
+    """四種區域擇一，回傳 location 的 filter。"""
+    if box is not None:
+        x_min, y_min, x_max, y_max = box
+        return {"location": {"$geoWithin": {"$box": [[x_min, y_min], [x_max, y_max]]}}}
+    if circle is not None:
+        x, y, r = circle
+        return {"location": {"$geoWithin": {"$center": [[x, y], r]}}}
+    if ring is not None:
+        r_min, r_max = ring
+        center = list(WAFER_CENTER)
+        outer = {"location": {"$geoWithin": {"$center": [center, r_max]}}}
+        if r_min <= 0:
+            return outer
+        # 外圓走 index，內圓在 index 篩出來的 document 上排除
+        return {"$and": [outer, {"$nor": [{"location": {"$geoWithin": {"$center": [center, r_min]}}}]}]}
+    if polygon is not None:
+        return {"location": {"$geoWithin": {"$polygon": [list(p) for p in polygon]}}}
+    raise ValueError("one of box / circle / ring / polygon is required")
+
+
+def region_filter(shape: dict, lot_ids: Optional[List[str]] = None, defect_types: Optional[List[str]] = None,
+                  wafer: Optional[int] = None) -> dict:
+    flt = dict(shape)
+    if lot_ids is not None:
+        flt["lot_id"] = {"$in": lot_ids}
+    if defect_types:
+        flt["defect_type"] = {"$in": defect_types}
+    if wafer is not None:
+        flt["wafer"] = wafer
+    return flt
+
+
+# ---- 分頁 cursor：(region_cell, lot_id, _id) 用 extended JSON 包起來，ObjectId 與其他型別都能原樣還原 ----
+
+def encode_cursor(doc: dict) -> str:
+    last = [doc.get("region_cell"), doc.get("lot_id"), doc["_id"]]
+    return base64.urlsafe_b64encode(json_util.dumps(last).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[int, str, object]:
+    try:
+        cell, lot_id, last_id = json_util.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except Exception:
+        raise ValueError("invalid cursor")
+    return cell, lot_id, last_id
+
+
+def page_queries(flt: dict, cells: List[int], after: Optional[str] = None) -> List[dict]:
+    """
+    (region_cell, lot_id, _id) 的 keyset 拆成最多三段；每段在 index 前綴上都是等值、$in 或範圍，
+    依 REGION_SORT 排序時結果直接照 index 順序回來（沒有 SORT stage）。
+    """
+    if after is None:
+        return [{**flt, "region_cell": {"$in": cells}}]
+    cell, lot_id, last_id = decode_cursor(after)
+    later_cells = [c for c in cells if c > cell]
+    queries = [
+        # 同一格、同一個 lot 剩下的點
+        {**flt, "region_cell": cell, "lot_id": lot_id, "_id": {"$gt": last_id}},
+        # 同一格、後面的 lot（有指定 lot 範圍時跟 $in 一起用）
+        {**flt, "region_cell": cell, "lot_id": {**flt.get("lot_id", {}), "$gt": lot_id}},
+    ]
+    if later_cells:
+        queries.append({**flt, "region_cell": {"$in": later_cells}})
+    return queries
+
+
+def find_page(db, flt: dict, cells: List[int], limit: int,
+              after: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+    """同步（pymongo）；flt 是 region_filter 的結果、cells 是 shape_cells。回傳 (這一頁的點, 下一頁的 cursor 或 None)。"""
+    docs = []
+    for query in page_queries(flt, cells, after):
+        # 多拿一筆判斷還有沒有下一頁；hint 固定走 cell_lot_id，planner 不會改用 2d index 再排序
+        docs += db[HOT].find(query, POINT_PROJECTION, sort=REGION_SORT, limit=limit + 1 - len(docs),
+                             hint=REGION_INDEX)
+        if len(docs) > limit:
+            break
+    more = len(docs) > limit
+    docs = docs[:limit]
+    points = [
+        {
+            "id": str(d["_id"]),
+            "lot_id": d.get("lot_id"),
+            "defect_type": d.get("defect_type"),
+            "wafer": d.get("wafer"),
+            "x": (d.get("location") or {}).get("x"),
+            "y": (d.get("location") or {}).get("y"),
+            "severity": d.get("severity"),
+        }
+        for d in docs
+    ]
+    return points, encode_cursor(docs[-1]) if more else None
+
+
+def count_by_type(db, flt: dict) -> Dict[str, int]:
+    """區域內各 defect_type 的點數（在 Mongo 端 group，不取回 document 內容）。"""
+    rows = db[HOT].aggregate([
+        {"$match": flt},
+        {"$group": {"_id": "$defect_type", "count": {"$sum": 1}}},
+    ])
+    counts = {r["_id"]: r["count"] for r in rows}
+    return dict(sorted(counts.items(), key=lambda kv: kv[1], reverse=True))
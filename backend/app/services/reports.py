@@ -0,0 +1,197 @@
+# app/services/reports.py
+"""
+大範圍 /yield/trend 的非同步報表（POST /reports/trend -> celery task app.common.tasks.build_trend_report）。
+
+結果跟 /yield/trend 同格式，但分段計算：
+- yield / defect summary 依 report_chunk_days 天切成多段查（每段只掃對應的月份 partition）
+- Mongo 點位依 report_lot_batch 個 lot 一批查
+每段做完回報一次進度（/tasks/status 的 progress），結果 gzip 後存 Redis 或 report_dir 的檔案，保留 report_ttl_seconds。
+
+相同參數的 job 執行中時，再送一次拿到的是同一個 job id（dedup key = make_cache_key("report:trend", params)）。
+"""
+import gzip
+import json
+import os
+import time
+from datetime import date, timedelta
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import func, select
+
+from app.common.cache_key import make_cache_key
+from app.config.config import settings
+from app.database.mongo_indexes import DEFECT_POINT_PROJECTION
+from app.models.defect_summary import DefectSummary
+from app.models.lot import Lot
+from app.models.partitioning import timestamp_range
+from app.models.yield_record import YieldRecord
+from app.services import redis_client
+from app.services.change_tracking import current_version
+from app.services.clustering import CLUSTERS, flatten as flatten_clusters
+from app.services.retention import AGG
+from app.services.trend import (
+    aggregate_daily_yield, aggregate_pareto, count_daily, to_aggregate_points, to_defect_points,
+)
+
+Progress = Callable[[int, int, str], None]
+
+
+def day_chunks(date_from: date, date_to: date, days: int) -> Iterator[Tuple[date, date]]:
+    """[date_from, date_to] 切成每段最多 days 天（兩端都包含）。"""
+    start = date_from
+    while start <= date_to:
+        end = min(start + timedelta(days=days - 1), date_to)
+        yield start, end
+        start = end + timedelta(days=1)
+
+
+def batches(items: List[str], size: int) -> Iterator[List[str]]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+async def compute_trend_report(params: dict, session_factory, mongo_db,
+                               progress: Optional[Progress] = None) -> dict:
+    date_from = date.fromisoformat(params["date_from"])
+    date_to = date.fromisoformat(params["date_to"])
+    station, product, lots = params.get("station"), params.get("product"), params.get("lots") or []
+    version = current_version()
+
+    windows = list(day_chunks(date_from, date_to, settings.report_chunk_days))
+    # 段數：yield、summary 各 len(windows) 段 + Mongo 的 lot 批數（沒指定 lots 時要等 yield 查完才知道，先估 1）
+    total = len(windows) * 2 + max(len(list(batches(lots, settings.report_lot_batch))), 1)
+    done = 0
+
+    def step(stage: str):
+        nonlocal done
+        done += 1
+        if progress:
+            progress(done, total, stage)
+
+    # ---- 1) yield：一段一段查，只保留彙總需要的 (day, rate) 與 lot ----
+    day_rates: List[Tuple[str, float]] = []
+    lot_ids = set()
+    async with session_factory() as session:
+        for chunk_from, chunk_to in windows:
+            start, end = timestamp_range(chunk_from, chunk_to)
+            stmt = (
+                select(YieldRecord.timestamp, YieldRecord.yield_rate, YieldRecord.lot_id)
+                .join(Lot, Lot.lot_id == YieldRecord.lot_id)
+                .where(YieldRecord.timestamp >= start, YieldRecord.timestamp < end)
+            )
+            if station:
+                stmt = stmt.where(Lot.station == station)
+            if product:
+                stmt = stmt.where(Lot.product == product)
+            if lots:
+                stmt = stmt.where(Lot.lot_id.in_(lots))
+            for ts, rate, lot_id in (await session.execute(stmt)).all():
+                day_rates.append((ts.date().isoformat(), rate))
+                lot_ids.add(lot_id)
+            step("yield")
+
+        if not day_rates:
+            return {"version": version, "dates": [], "avg_yield": [], "daily_counts": [],
+                    "defect_pareto": [], "defect_details": [], "defect_clusters": []}
+
+        # ---- 2) summary：同樣的時間段，每段先在 DB 端 group by ----
+        lot_list = lots or sorted(lot_ids)
+        lot_batches = list(batches(lot_list, settings.report_lot_batch))
+        total = len(windows) * 2 + len(lot_batches)
+        pareto_items = []
+        for chunk_from, chunk_to in windows:
+            start, end = timestamp_range(chunk_from, chunk_to)
+            for batch in lot_batches:
+                stmt = (
+                    select(DefectSummary.defect_type, func.sum(DefectSummary.count))
+                    .where(
+                        DefectSummary.lot_id.in_(batch),
+                        DefectSummary.timestamp >= start,
+                        DefectSummary.timestamp < end,
+                    )
+                    .group_by(DefectSummary.defect_type)
+                )
+                pareto_items.extend((await session.execute(stmt)).all())
+            step("summary")
+
+    # ---- 3) Mongo 點位：每批 lot 一次 ----
+    defect_details, defect_clusters = [], []
+    for batch in lot_batches:
+        flt = {"lot_id": {"$in": batch}}
+        defect_details += to_defect_points(mongo_db["defect_detail"].find(flt, DEFECT_POINT_PROJECTION))
+        defect_details += to_aggregate_points(mongo_db[AGG].find(flt, {"_id": 0, "cell": 0}))
+        defect_clusters += flatten_clusters(mongo_db[CLUSTERS].find(flt, {"_id": 0}))
+        step("mongo_detail")
+
+    dates, avg_yield = aggregate_daily_yield(day_rates)
+    counts = count_daily(d for d, _rate in day_rates)
+    return {
+        "version": version,
+        "dates": dates,
+        "avg_yield": avg_yield,
+        "daily_counts": [counts[d] for d in dates],
+        "defect_pareto": aggregate_pareto(pareto_items),
+        "defect_details": defect_details,
+        "defect_clusters": defect_clusters,
+    }
+
+
+# ---- 結果存放（gzip 過的 JSON） ----
+
+def _blob_key(job_id: str) -> str:
+    return f"report:blob:{job_id}"
+
+
+def _blob_path(job_id: str) -> str:
+    return os.path.join(settings.report_dir, f"{job_id}.json.gz")
+
+
+def store_report(job_id: str, result: dict) -> int:
+    blob = gzip.compress(json.dumps(result).encode())
+    if settings.report_storage == "disk":
+        os.makedirs(settings.report_dir, exist_ok=True)
+        tmp = _blob_path(job_id) + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(blob)
+        # 寫完再改名，下載端不會讀到寫一半的檔
+        os.replace(tmp, _blob_path(job_id))
+    else:
+        redis_client.redis_cache.set(_blob_key(job_id), blob, ex=settings.report_ttl_seconds)
+    return len(blob)
+
+
+def load_report(job_id: str) -> Optional[bytes]:
+    """gzip 過的結果；不存在或過期時回傳 None。"""
+    if settings.report_storage == "disk":
+        path = _blob_path(job_id)
+        if not os.path.exists(path):
+            return None
+        if os.path.getmtime(path) < time.time() - settings.report_ttl_seconds:
+            os.remove(path)
+            return None
+        with open(path, "rb") as f:
+            return f.read()
+    return redis_client.redis_cache.get(_blob_key(job_id))
+
+
+# ---- 相同參數的 job 去重 ----
+
+def dedup_key(params: dict) -> str:
+    return make_cache_key("report:trend", params)
+
+
+def claim_job(params: dict, job_id: str) -> Tuple[str, bool]:
+    """(job id, 是否為新 job)。已經有相同參數的 job 在跑時回傳那個 job 的 id。"""
+    key = dedup_key(params)
+    # TTL = job 的時間上限：worker 掛掉沒有 release 時，之後的 request 還是能重新送出
+    if redis_client.redis_cache.set(key, job_id, nx=True, ex=settings.report_job_timeout_seconds):
+        return job_id, True
+    existing = redis_client.redis_cache.get(key)
+    if existing is None:
+        # 剛好在兩個呼叫之間做完、釋放了：重新搶一次
+        return claim_job(params, job_id)
+    return existing.decode() if isinstance(existing, bytes) else existing, False
+
+
+def release_job(params: dict):
+    redis_client.redis_cache.delete(dedup_key(params))
@@ -0,0 +1,168 @@
+# app/services/retention.py
+"""
+Mongo defect_detail 的保留政策（每日 celery beat：app.common.tasks.compact_defect_details）。
+
+created_at 早於 retention_hot_days 的 lot：
+    1. 原始點位搬到冷儲存：defect_detail_cold collection，或 archive 目錄下的 gzip JSONL
+    2. 依 (lot, defect_type, wafer, 格子) 彙總成 defect_detail_agg（每個 lot 的筆數有上限，跟點數無關）
+    3. 從 defect_detail 刪掉原始點位
+    4. defect_compaction_log 記錄這次壓縮了什麼
+
+hot collection 只留最近的 lot，/yield/trend、/detail/by_lot 的查詢量不會隨歷史資料變大；
+舊 lot 在 trend 上改用 aggregate 點（帶 count）。
+步驟 2 寫完、步驟 3 之前中斷的話，下次重跑同一批點會被重複計數（原始點位一律保留在冷儲存，可以重建）。
+"""
+import gzip
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional, Tuple
+
+from bson import json_util
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from app.config.config import settings
+from app.database.mongo import mongo_db
+from app.database.mongo_indexes import ensure_indexes
+
+logger = logging.getLogger(__name__)
+
+HOT = "defect_detail"
+AGG = "defect_detail_agg"
+COLD = "defect_detail_cold"
+LOG = "defect_compaction_log"
+
+
+def cell_of(x: float, y: float, cell_size: float) -> Tuple[int, int]:
+    return int((x or 0) // cell_size), int((y or 0) // cell_size)
+
+
+def downsample(docs: Iterable[dict], cell_size: float) -> List[dict]:
+    """
+    原始點位 -> 每個 (lot_id, defect_type, wafer, 格子) 一筆：
+    count、各 severity 的數量，location 用格子內點位的重心（畫 wafer map 時位置不會全部擠在格線上）。
+    """
+    cells = {}
+    for d in docs:
+        loc = d.get("location") or {}
+        x, y = loc.get("x") or 0.0, loc.get("y") or 0.0
+        key = (d.get("lot_id"), d.get("defect_type"), d.get("wafer"), cell_of(x, y, cell_size))
+        cell = cells.get(key)
+        if cell is None:
+            cell = cells[key] = {"count": 0, "sum_x": 0.0, "sum_y": 0.0, "severity": {}}
+        cell["count"] += 1
+        cell["sum_x"] += x
+        cell["sum_y"] += y
+        severity = d.get("severity") or "unknown"
+        cell["severity"][severity] = cell["severity"].get(severity, 0) + 1
+
+    return [
+        {
+            "lot_id": lot_id,
+            "defect_type": defect_type,
+            "wafer": wafer,
+            # 純量 "x,y"：unique index 裡的陣列欄位會被拆成個別元素（multikey），不同格子會互相衝突
+            "cell": "%d,%d" % cell_xy,
+            "count": c["count"],
+            "sum_x": c["sum_x"],
+            "sum_y": c["sum_y"],
+            "severity": c["severity"],
+        }
+        for (lot_id, defect_type, wafer, cell_xy), c in cells.items()
+    ]
+
+
+def write_archive(directory: str, lot_id: str, docs: List[dict]) -> str:
+    """一個 lot、一次壓縮一個檔（同一個 lot 之後補進來的點位會是另一個檔）。"""
+    lot_dir = os.path.join(directory, lot_id)
+    os.makedirs(lot_dir, exist_ok=True)
+    path = os.path.join(lot_dir, f"{datetime.utcnow():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}.jsonl.gz")
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        for doc in docs:
+            # json_util 保留 ObjectId / datetime 型別，可以原樣 insert 回 Mongo
+            f.write(json_util.dumps(doc) + "\n")
+    return path
+
+
+def read_archive(path: str) -> List[dict]:
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return [json_util.loads(line) for line in f if line.strip()]
+
+
+def lots_due(db, cutoff: datetime, limit: int) -> List[str]:
+    """有早於 cutoff 的原始點位的 lot（沒有 created_at 的舊資料一律視為過期）。"""
+    pipeline = [
+        {"$match": {"$or": [{"created_at": {"$lt": cutoff}}, {"created_at": {"$exists": False}}]}},
+        {"$group": {"_id": "$lot_id"}},
+        {"$limit": limit},
+    ]
+    return [row["_id"] for row in db[HOT].aggregate(pipeline)]
+
+
+def compact_lot(db, lot_id: str, target: str, archive_dir: str, cell_size: float) -> Optional[dict]:
+    docs = list(db[HOT].find({"lot_id": lot_id}))
+    if not docs:
+        return None
+
+    # 1) 冷儲存（先寫，後面任何一步失敗原始資料都還在）
+    archive_path = None
+    if target == "archive":
+        archive_path = write_archive(archive_dir, lot_id, docs)
+    else:
+        try:
+            db[COLD].insert_many(docs, ordered=False)
+        except BulkWriteError as exc:
+            # 上次中斷時已經搬過的點位（_id 重複）略過
+            if any(e.get("code") != 11000 for e in exc.details.get("writeErrors", [])):
+                raise
+
+    # 2) 彙總，跟既有的 aggregate 合併（同一個 lot 晚到的點位）
+    cells = downsample(docs, cell_size)
+    db[AGG].bulk_write([
+        UpdateOne(
+            {"lot_id": c["lot_id"], "defect_type": c["defect_type"], "wafer": c["wafer"], "cell": c["cell"]},
+            {"$inc": {"count": c["count"], "sum_x": c["sum_x"], "sum_y": c["sum_y"],
+                      **{f"severity.{k}": v for k, v in c["severity"].items()}}},
+            upsert=True,
+        )
+        for c in cells
+    ], ordered=False)
+
+    # 3) hot collection 只刪這次讀到的點位（壓縮期間新寫入的留到下次）
+    db[HOT].delete_many({"_id": {"$in": [d["_id"] for d in docs]}})
+
+    # 4) 紀錄
+    entry = {
+        "lot_id": lot_id,
+        "raw_count": len(docs),
+        "aggregate_cells": len(cells),
+        "target": target,
+        "archive_path": archive_path,
+        "cell_size": cell_size,
+        "compacted_at": datetime.utcnow(),
+    }
+    db[LOG].insert_one(dict(entry))
+    return entry
+
+
+def run_retention(db=mongo_db, now: Optional[datetime] = None) -> dict:
+    """壓縮一批過期的 lot；retention_hot_days = 0 時不做事。"""
+    if settings.retention_hot_days <= 0:
+        return {"lots": 0, "raw_count": 0, "lot_ids": []}
+    cutoff = (now or datetime.utcnow()) - timedelta(days=settings.retention_hot_days)
+    # aggregate 的 unique index 是 upsert 合併的前提；worker 可能比 bootstrap 先跑
+    ensure_indexes(db)
+
+    compacted = []
+    for lot_id in lots_due(db, cutoff, settings.retention_batch_lots):
+        entry = compact_lot(db, lot_id, settings.retention_cold_target, settings.retention_archive_dir,
+                            settings.retention_cell_size)
+        if entry:
+            compacted.append(entry)
+
+    raw_count = sum(e["raw_count"] for e in compacted)
+    if compacted:
+        logger.info("compacted %d lots (%d raw points) older than %s", len(compacted), raw_count, cutoff)
+    return {"lots": len(compacted), "raw_count": raw_count, "lot_ids": [e["lot_id"] for e in compacted]}
@@ -0,0 +1,101 @@
+# app/services/seed_data.py
+import random
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Sequence, Tuple
+
+from app.models.defect_summary import DefectSummary
+from app.models.lot import Lot
+from app.models.yield_record import YieldRecord
+from app.services.regions import region_cell
+
+MACHINES = ["AOI-01", "AOI-02", "AOI-03"]
+RECIPES = ["PKG-A", "PKG-B", "PKG-C"]
+DEFECT_TYPES = ["Scratch", "Particle", "Bridge", "Crack"]
+
+
+@dataclass
+class SeedData:
+    lots: List[Lot] = field(default_factory=list)
+    yields: List[YieldRecord] = field(default_factory=list)
+    summaries: List[DefectSummary] = field(default_factory=list)
+    defect_docs: List[dict] = field(default_factory=list)
+
+    @property
+    def lot_ids(self) -> List[str]:
+        return [lot.lot_id for lot in self.lots]
+
+
+def generate_seed_data(
+    end_date: date,
+    days: int = 7,
+    machines: Sequence[str] = MACHINES,
+    recipes: Sequence[str] = RECIPES,
+    lots_per_combo: Tuple[int, int] = (1, 3),
+    max_points_per_defect: int = 50,
+    lot_start: int = 1000,
+    seed: Optional[int] = None,
+) -> SeedData:
+    """
+    產生測試資料：最近 days 天，每個 machine/recipe 每天隨機 lots_per_combo 個 lot。
+    給固定 seed 時結果可重現（benchmark 用）。
+    """
+    rng = random.Random(seed)
+    data = SeedData()
+
+    base_date = end_date - timedelta(days=days - 1)
+    lot_index = lot_start
+
+    for d_offset in range(days):
+        cur_date = base_date + timedelta(days=d_offset)
+        # timestamp 一律放當天中午
+        ts = datetime.combine(cur_date, datetime.min.time()) + timedelta(hours=12)
+
+        for machine in machines:
+            for recipe in recipes:
+                for _ in range(rng.randint(*lots_per_combo)):
+                    lot_id = f"LOT{lot_index:05d}"
+                    lot_index += 1
+
+                    total = rng.randint(500, 1200)
+                    # 製造一個合理的總缺陷數
+                    total_defect = rng.randint(0, int(total * 0.2))
+                    good = total - total_defect
+                    yield_rate = round(good / total * 100, 2) if total > 0 else 0
+
+                    data.lots.append(
+                        Lot(lot_id=lot_id, product=recipe, station=machine, total=total, good=good)
+                    )
+                    data.yields.append(
+                        YieldRecord(lot_id=lot_id, total=total, good=good, yield_rate=yield_rate, timestamp=ts)
+                    )
+
+                    # 把 total_defect 分配到不同 defect_type
+                    remain = total_defect
+                    for defect_type in DEFECT_TYPES:
+                        count = rng.randint(0, remain) if remain > 0 else 0
+                        remain -= count
+                        if count <= 0:
+                            continue
+
+                        data.summaries.append(
+                            DefectSummary(lot_id=lot_id, defect_type=defect_type, count=count, timestamp=ts)
+                        )
+
+                        # Mongo 只放一小部分點，避免太大
+                        for _ in range(min(count, max_points_per_defect)):
+                            x, y = round(rng.uniform(0, 100), 2), round(rng.uniform(0, 100), 2)
+                            data.defect_docs.append(
+                                {
+                                    "lot_id": lot_id,
+                                    "defect_type": defect_type,
+                                    "location": {"x": x, "y": y},
+                                    "region_cell": region_cell(x, y),
+                                    "severity": rng.choice(["L", "M", "H"]),
+                                    "wafer": rng.randint(1, 25),
+                                    "image_path": None,
+                                    "extra": {},
+                                }
+                            )
+
+    return data
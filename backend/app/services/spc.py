@@ -0,0 +1,157 @@
+# app/services/spc.py
+"""
+SPC 計算（NumPy），輸入是 spc_daily_stat 的每日統計，每天（subgroup）一個點：
+
+- X-bar / R：subgroup 大小 n_i 每天不同，σ 用 mean(R_i / d2(n_i)) 估計，每個點各自的界限 CL ± 3σ/√n_i；
+  每天都只有一個 lot 時沒有全距，改用 moving range：σ = MR̄ / 1.128
+- p-chart：p̄ = Σ不良 / Σ檢測，界限 p̄ ± 3√(p̄(1-p̄)/n_i)
+- Cp / Cpk 用上面的 within σ，Pp / Ppk 用整體標準差
+- Western Electric rules（1：超出 3σ；2：連續 3 點有 2 點在同側 2σ 外；3：連續 5 點有 4 點在同側 1σ 外；
+  4：連續 8 點在中心線同側），標在觸發的那個點上
+
+每個點的計算都只用到該天的統計值，跟 lot 數量無關。
+"""
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# 管制圖常數 d2 / d3，index = subgroup 大小（2..25）；更大的 subgroup 用 25 的常數
+MAX_SUBGROUP = 25
+D2 = np.array([np.nan, np.nan,
+               1.128, 1.693, 2.059, 2.326, 2.534, 2.704, 2.847, 2.970, 3.078, 3.173, 3.258,
+               3.336, 3.407, 3.472, 3.532, 3.588, 3.640, 3.689, 3.735, 3.778, 3.819, 3.858, 3.895, 3.931])
+D3 = np.array([np.nan, np.nan,
+               0.853, 0.888, 0.880, 0.864, 0.848, 0.833, 0.820, 0.808, 0.797, 0.787, 0.778,
+               0.770, 0.763, 0.756, 0.750, 0.744, 0.739, 0.734, 0.729, 0.724, 0.720, 0.716, 0.712, 0.708])
+
+_COUNTS = ("n", "n_mr", "inspected", "defective")
+_VALUES = ("sum_yield", "sumsq_yield", "min_yield", "max_yield", "first_yield", "last_yield", "sum_mr")
+
+
+def to_arrays(rows: Sequence) -> Dict[str, np.ndarray]:
+    """SpcDailyStat rows（依 day 排序）-> 每個欄位一個 array（次數是 int，其他是 float）。"""
+    arrays = {f: np.array([getattr(r, f) for r in rows], dtype=np.int64) for f in _COUNTS}
+    arrays.update({f: np.array([getattr(r, f) for r in rows], dtype=float) for f in _VALUES})
+    arrays["day"] = np.array([r.day.isoformat() for r in rows])
+    return arrays
+
+
+def _ratio(num: np.ndarray, den: np.ndarray) -> np.ndarray:
+    out = np.full(np.shape(num), np.nan)
+    np.divide(num, den, out=out, where=den > 0)
+    return out
+
+
+def sigma_within(a: Dict[str, np.ndarray]) -> float:
+    n = a["n"]
+    grouped = n >= 2
+    if grouped.any():
+        size = np.minimum(n[grouped], MAX_SUBGROUP).astype(int)
+        return float(np.mean((a["max_yield"][grouped] - a["min_yield"][grouped]) / D2[size]))
+    # 每天只有一個 lot：individuals / moving range，跨天的 MR = |當天 first - 前一天 last|
+    cross = np.abs(a["first_yield"][1:] - a["last_yield"][:-1])
+    total_mr = a["sum_mr"].sum() + cross.sum()
+    count = a["n_mr"].sum() + cross.size
+    return float(total_mr / count / D2[2]) if count else float("nan")
+
+
+def western_electric(z: np.ndarray) -> List[List[int]]:
+    """z = (x - CL) / σ_point；回傳每個點觸發的 rule 編號。"""
+    flags = {rule: np.zeros(z.size, dtype=bool) for rule in (1, 2, 3, 4)}
+    with np.errstate(invalid="ignore"):
+        flags[1] = np.abs(z) > 3
+
+        def window_rule(rule: int, size: int, need: int, limit: float):
+            if z.size < size:
+                return
+            for side in (z > limit, z < -limit):
+                hit = sliding_window_view(side, size).sum(axis=1) >= need
+                flags[rule][size - 1:] |= hit
+
+        window_rule(2, 3, 2, 2)
+        window_rule(3, 5, 4, 1)
+        window_rule(4, 8, 8, 0)
+    return [[rule for rule in (1, 2, 3, 4) if flags[rule][i]] for i in range(z.size)]
+
+
+def xbar_r(a: Dict[str, np.ndarray]) -> dict:
+    n = a["n"]
+    mean = _ratio(a["sum_yield"], n)
+    center = float(a["sum_yield"].sum() / n.sum()) if n.sum() else float("nan")
+    sigma = sigma_within(a)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        sigma_mean = sigma / np.sqrt(n)
+        z = (mean - center) / sigma_mean
+
+    size = np.minimum(n, MAX_SUBGROUP).astype(int)
+    has_range = n >= 2
+    d2 = np.where(has_range, D2[np.maximum(size, 2)], np.nan)
+    d3 = np.where(has_range, D3[np.maximum(size, 2)], np.nan)
+    return {
+        "center": center,
+        "sigma": sigma,
+        "mean": mean,
+        "ucl": center + 3 * sigma_mean,
+        "lcl": center - 3 * sigma_mean,
+        "range": np.where(has_range, a["max_yield"] - a["min_yield"], np.nan),
+        "r_cl": d2 * sigma,
+        "r_ucl": (d2 + 3 * d3) * sigma,
+        "r_lcl": np.maximum((d2 - 3 * d3) * sigma, 0),
+        "rules": western_electric(z),
+    }
+
+
+def p_chart(a: Dict[str, np.ndarray]) -> dict:
+    inspected = a["inspected"]
+    p = _ratio(a["defective"], inspected)
+    p_bar = float(a["defective"].sum() / inspected.sum()) if inspected.sum() else float("nan")
+    with np.errstate(invalid="ignore", divide="ignore"):
+        sigma = np.sqrt(p_bar * (1 - p_bar) / inspected)
+        z = (p - p_bar) / sigma
+    return {
+        "center": p_bar,
+        "p": p,
+        "ucl": np.minimum(p_bar + 3 * sigma, 1.0),
+        "lcl": np.maximum(p_bar - 3 * sigma, 0.0),
+        "rules": western_electric(z),
+    }
+
+
+def capability(a: Dict[str, np.ndarray], lsl: float, usl: float) -> dict:
+    total = a["n"].sum()
+    mean = float(a["sum_yield"].sum() / total) if total else float("nan")
+    overall = float("nan")
+    if total > 1:
+        # Σx² - Nμ²，浮點誤差可能讓它略小於 0
+        overall = float(np.sqrt(max(a["sumsq_yield"].sum() - total * mean * mean, 0.0) / (total - 1)))
+    within = sigma_within(a) if total else float("nan")
+
+    def indices(sigma: float):
+        if not sigma or np.isnan(sigma):
+            return None, None
+        return (usl - lsl) / (6 * sigma), min(usl - mean, mean - lsl) / (3 * sigma)
+
+    cp, cpk = indices(within)
+    pp, ppk = indices(overall)
+    return {"n": int(total), "mean": mean, "sigma_within": within, "sigma_overall": overall,
+            "lsl": lsl, "usl": usl, "cp": cp, "cpk": cpk, "pp": pp, "ppk": ppk}
+
+
+def clean(value, digits: int = 4):
+    """NumPy / NaN -> JSON 可以表示的值（NaN 變 null）。"""
+    if isinstance(value, np.ndarray):
+        return [clean(v, digits) for v in value.tolist()]
+    if isinstance(value, (float, np.floating)):
+        return None if np.isnan(value) or np.isinf(value) else round(float(value), digits)
+    return value
+
+
+def points(days: np.ndarray, series: Dict[str, np.ndarray], rules: List[List[int]],
+           extra: Optional[Dict[str, np.ndarray]] = None) -> List[dict]:
+    columns = {k: clean(v) for k, v in {**series, **(extra or {})}.items()}
+    return [
+        {"day": day, **{k: col[i] for k, col in columns.items()}, "rules": rules[i]}
+        for i, day in enumerate(days.tolist())
+    ]
@@ -0,0 +1,168 @@
+# app/services/spc_stats.py
+"""
+SPC 每日統計（spc_daily_stat）的維護：
+
+- record_lot：ingest 時在同一個 transaction 裡用 INSERT ... ON CONFLICT DO UPDATE 累加，
+  多個 worker 同時寫入同一天也不會互相覆蓋
+- rebuild：從 yield_record 整個重算（seed、匯入歷史資料、或統計懷疑有誤時）
+- rebuild_days：只重算指定的 (station, product, day)（lot 換了 station / product、補送的 lot 比當天已有的早）
+- load_daily：/spc/* 讀取區間內的每日統計
+
+moving range 一律依 (timestamp, id) 的順序：record_lot 只在新的 lot 是當天最晚的時候直接累加，
+否則重算那一天，所以累加與重算的結果相同。
+
+計算管制界限 / Cp / Cpk 的部分在 app.services.spc（NumPy）。
+"""
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.lot import Lot
+from app.models.partitioning import timestamp_range
+from app.models.spc import SpcDailyStat
+from app.models.yield_record import YieldRecord
+
+_KEY = ["station", "product", "day"]
+
+
+def _dialect_insert(session: AsyncSession):
+    name = session.bind.dialect.name
+    if name == "postgresql":
+        return postgresql.insert, func.least, func.greatest
+    # SQLite（測試）：多參數的 min / max 就是 least / greatest
+    return sqlite.insert, func.min, func.max
+
+
+def _yield_rows(*conditions):
+    """rebuild / rebuild_days 讀的 yield_record，依 moving range 的順序排好。"""
+    return (
+        select(Lot.station, Lot.product, YieldRecord.timestamp, YieldRecord.yield_rate,
+               YieldRecord.total, YieldRecord.good)
+        .join(Lot, Lot.lot_id == YieldRecord.lot_id)
+        .where(YieldRecord.yield_rate.is_not(None), *conditions)
+        .order_by(YieldRecord.timestamp, YieldRecord.id)
+    )
+
+
+async def record_lot(session: AsyncSession, station: str, product: str, ts: datetime,
+                     yield_rate: float, total: int, good: int):
+    """
+    累加一個 lot；呼叫端負責 commit（跟 YieldRecord 同一個 transaction，YieldRecord 要先 add）。
+    當天已經有比這個 lot 晚的 lot 時改成重算那一天。先 upsert 再檢查：拿到那一天的 row lock 之後才查，
+    同時寫入同一天、先 commit 的 lot 都看得到。
+    """
+    day = ts.date()
+    insert, least, greatest = _dialect_insert(session)
+    x = float(yield_rate)
+    stmt = insert(SpcDailyStat).values(
+        station=station, product=product, day=day,
+        n=1, sum_yield=x, sumsq_yield=x * x, min_yield=x, max_yield=x,
+        first_yield=x, last_yield=x, sum_mr=0.0, n_mr=0,
+        inspected=total, defective=max(total - good, 0),
+    )
+    t, new = SpcDailyStat, stmt.excluded
+    stmt = stmt.on_conflict_do_update(
+        index_elements=_KEY,
+        set_={
+            "n": t.n + 1,
+            "sum_yield": t.sum_yield + new.sum_yield,
+            "sumsq_yield": t.sumsq_yield + new.sumsq_yield,
+            "min_yield": least(t.min_yield, new.min_yield),
+            "max_yield": greatest(t.max_yield, new.max_yield),
+            "sum_mr": t.sum_mr + func.abs(new.last_yield - t.last_yield),
+            "n_mr": t.n_mr + 1,
+            "last_yield": new.last_yield,
+            "inspected": t.inspected + new.inspected,
+            "defective": t.defective + new.defective,
+            "updated_at": func.now(),
+        },
+    )
+    await session.execute(stmt)
+
+    _, end = timestamp_range(day, day)
+    later = (await session.execute(
+        select(YieldRecord.id)
+        .join(Lot, Lot.lot_id == YieldRecord.lot_id)
+        .where(Lot.station == station, Lot.product == product, YieldRecord.yield_rate.is_not(None),
+               YieldRecord.timestamp > ts, YieldRecord.timestamp < end)
+        .limit(1)
+    )).first()
+    if later is not None:
+        await rebuild_days(session, [(station, product, day)])
+
+
+def fold(stats: Dict[Tuple[str, str, date], dict], station: str, product: str, day: date,
+         yield_rate: float, total: int, good: int):
+    """record_lot 的 Python 版（rebuild 用），依相同規則累加到 stats。"""
+    x = float(yield_rate)
+    s = stats.get((station, product, day))
+    if s is None:
+        stats[(station, product, day)] = dict(
+            station=station, product=product, day=day,
+            n=1, sum_yield=x, sumsq_yield=x * x, min_yield=x, max_yield=x,
+            first_yield=x, last_yield=x, sum_mr=0.0, n_mr=0,
+            inspected=total or 0, defective=max((total or 0) - (good or 0), 0),
+        )
+        return
+    s["n"] += 1
+    s["sum_yield"] += x
+    s["sumsq_yield"] += x * x
+    s["min_yield"] = min(s["min_yield"], x)
+    s["max_yield"] = max(s["max_yield"], x)
+    s["sum_mr"] += abs(x - s["last_yield"])
+    s["n_mr"] += 1
+    s["last_yield"] = x
+    s["inspected"] += total or 0
+    s["defective"] += max((total or 0) - (good or 0), 0)
+
+
+async def rebuild(session: AsyncSession) -> int:
+    """依 timestamp 順序重算全部的每日統計；回傳筆數。呼叫端負責 commit。"""
+    stats: Dict[Tuple[str, str, date], dict] = {}
+    # 逐批讀，不把整張 yield_record 載進記憶體
+    result = await session.stream(_yield_rows().execution_options(yield_per=5000))
+    async for station, product, ts, rate, total, good in result:
+        fold(stats, station, product, ts.date(), rate, total, good)
+
+    await session.execute(delete(SpcDailyStat))
+    if stats:
+        session.add_all(SpcDailyStat(**s) for s in stats.values())
+    return len(stats)
+
+
+async def rebuild_days(session: AsyncSession, keys: Iterable[Tuple[str, str, date]]) -> int:
+    """只重算這些 (station, product, day)；沒有資料的那一筆直接刪掉。回傳重建的筆數。呼叫端負責 commit。"""
+    rebuilt = 0
+    for station, product, day in sorted(set(keys)):
+        start, end = timestamp_range(day, day)
+        stats: Dict[Tuple[str, str, date], dict] = {}
+        rows = await session.execute(_yield_rows(
+            Lot.station == station, Lot.product == product, YieldRecord.timestamp >= start, YieldRecord.timestamp < end,
+        ))
+        for row_station, row_product, ts, rate, total, good in rows:
+            fold(stats, row_station, row_product, ts.date(), rate, total, good)
+
+        await session.execute(delete(SpcDailyStat).where(
+            SpcDailyStat.station == station, SpcDailyStat.product == product, SpcDailyStat.day == day,
+        ))
+        session.add_all(SpcDailyStat(**s) for s in stats.values())
+        rebuilt += len(stats)
+    return rebuilt
+
+
+async def load_daily(session: AsyncSession, station: str, product: str,
+                     date_from: date, date_to: date) -> List[SpcDailyStat]:
+    stmt = (
+        select(SpcDailyStat)
+        .where(
+            SpcDailyStat.station == station,
+            SpcDailyStat.product == product,
+            SpcDailyStat.day >= date_from,
+            SpcDailyStat.day <= date_to,
+        )
+        .order_by(SpcDailyStat.day)
+    )
+    return list((await session.execute(stmt)).scalars())
@@ -0,0 +1,169 @@
+# app/services/tdigest.py
+"""
+Merging t-digest（Dunning & Ertl），給 yield 分佈的 percentile / histogram 用。
+
+- 一個 digest = 一串依 mean 排序的 centroid（mean, weight）+ 精確的 count / min / max
+- 可以合併：把多個 digest 的 centroid 放在一起再壓縮一次，結果跟直接把所有值加進同一個 digest 的誤差同一等級
+- 大小跟資料量無關：compression = δ 時約 δ/2 個 centroid（scale function k1），尾端的 centroid 比較小，
+  所以 p1 / p99 比 p50 準
+
+誤差（δ = 100）：
+- percentile 的 rank error（|F(估計值) - q|）一般在 0.1% 以內，上限以 0.5% 看待；p0 / p100 是精確的 min / max
+- histogram 每個 bin 的筆數誤差 ≤ 2 × rank error × 總筆數（兩端 cdf 各自的誤差），稀疏的 bin 相對誤差會比較大
+tests/test_distribution.py 用產生的資料（一年、約 4 萬個 lot）對照精確值驗證。
+"""
+import math
+import sys
+from array import array
+from bisect import bisect_right
+from typing import Iterable, List, Optional, Tuple
+
+Centroid = Tuple[float, float]  # (mean, weight)
+
+
+class TDigest:
+    def __init__(self, compression: float = 100, centroids: Optional[List[Centroid]] = None,
+                 count: float = 0, min_value: float = math.inf, max_value: float = -math.inf):
+        self.compression = compression
+        self.centroids: List[Centroid] = list(centroids or [])
+        self.count = count
+        self.min = min_value
+        self.max = max_value
+        self._buffer: List[Centroid] = []
+
+    # ---- 寫入 ----
+
+    def add(self, x: float, weight: float = 1.0):
+        x = float(x)
+        self._buffer.append((x, weight))
+        self.count += weight
+        self.min = min(self.min, x)
+        self.max = max(self.max, x)
+        if len(self._buffer) > self.compression * 5:
+            self.compress()
+
+    def merge(self, other: "TDigest"):
+        if not other.count:
+            return
+        self._buffer.extend(other.centroids)
+        self._buffer.extend(other._buffer)
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @classmethod
+    def merged(cls, digests: Iterable["TDigest"], compression: float = 100) -> "TDigest":
+        out = cls(compression)
+        for d in digests:
+            out.merge(d)
+        out.compress()
+        return out
+
+    # ---- 壓縮 ----
+
+    def _k(self, q: float) -> float:
+        return self.compression / (2 * math.pi) * math.asin(2 * q - 1)
+
+    def _q_limit(self, q: float) -> float:
+        # k(q) + 1 對應的 q：目前這個 centroid 最多能延伸到的位置
+        k = self._k(q) + 1
+        if k >= self.compression / 4:
+            return 1.0
+        return (math.sin(k * 2 * math.pi / self.compression) + 1) / 2
+
+    def compress(self):
+        if not self._buffer:
+            return
+        items = sorted(self.centroids + self._buffer)
+        self._buffer = []
+        total = sum(w for _m, w in items)
+
+        out: List[Centroid] = []
+        mean, weight = items[0]
+        before = 0.0  # 目前 centroid 之前的累積 weight
+        limit = self._q_limit(0.0)
+        for m, w in items[1:]:
+            if (before + weight + w) / total <= limit:
+                weight += w
+                mean += (m - mean) * w / weight
+            else:
+                out.append((mean, weight))
+                before += weight
+                limit = self._q_limit(before / total)
+                mean, weight = m, w
+        out.append((mean, weight))
+        self.centroids = out
+
+    # ---- 查詢 ----
+
+    def _anchors(self) -> Tuple[List[float], List[float]]:
+        """(累積 weight 位置, 值)：min 在 0、每個 centroid 在自己的中心、max 在 count，中間線性內插。"""
+        self.compress()
+        positions, values = [0.0], [self.min]
+        cumulative = 0.0
+        for m, w in self.centroids:
+            positions.append(cumulative + w / 2)
+            values.append(m)
+            cumulative += w
+        positions.append(cumulative)
+        values.append(self.max)
+        return positions, values
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        q = min(max(q, 0.0), 1.0)
+        positions, values = self._anchors()
+        target = q * self.count
+        i = min(max(bisect_right(positions, target) - 1, 0), len(positions) - 2)
+        span = positions[i + 1] - positions[i]
+        if span <= 0:
+            return values[i + 1]
+        return values[i] + (target - positions[i]) / span * (values[i + 1] - values[i])
+
+    def cdf(self, x: float) -> float:
+        """≤ x 的比例（估計）。"""
+        if not self.count or x < self.min:
+            return 0.0
+        if x >= self.max:
+            return 1.0
+        positions, values = self._anchors()
+        i = min(max(bisect_right(values, x) - 1, 0), len(values) - 2)
+        span = values[i + 1] - values[i]
+        if span <= 0:
+            return positions[i + 1] / self.count
+        return (positions[i] + (x - values[i]) / span * (positions[i + 1] - positions[i])) / self.count
+
+    def histogram(self, edges: List[float]) -> List[float]:
+        """每個 [edges[i], edges[i+1]) 區間的估計筆數；最後一格包含右端點。"""
+        cdf = [self.cdf(e) for e in edges]
+        # 範圍涵蓋 min / max 時兩端是精確的：等於 min 的值算進第一格、等於 max 的值算進最後一格
+        if edges and edges[0] <= self.min:
+            cdf[0] = 0.0
+        if edges and edges[-1] >= self.max:
+            cdf[-1] = 1.0
+        return [(hi - lo) * self.count for lo, hi in zip(cdf, cdf[1:])]
+
+    # ---- 序列化（DB 的 bytea / BLOB） ----
+
+    def to_bytes(self) -> bytes:
+        self.compress()
+        flat = array("d")
+        for m, w in self.centroids:
+            flat.extend((m, w))
+        # 一律存 little-endian，不同架構的 worker 讀得到同樣的值
+        if sys.byteorder == "big":
+            flat.byteswap()
+        return flat.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes, count: float, min_value: float, max_value: float,
+                   compression: float = 100) -> "TDigest":
+        flat = array("d")
+        flat.frombytes(data or b"")
+        if sys.byteorder == "big":
+            flat.byteswap()
+        centroids = list(zip(flat[0::2], flat[1::2]))
+        return cls(compression, centroids, count,
+                   min_value if min_value is not None else math.inf,
+                   max_value if max_value is not None else -math.inf)
@@ -0,0 +1,76 @@
+# app/services/trend.py
+"""
+/yield/trend 的純 Python 彙總邏輯，跟 DB / Mongo 存取分開，方便 benchmark 與重用。
+"""
+from typing import Iterable, List, Tuple
+
+
+def aggregate_daily_yield(records: Iterable[Tuple[str, float]]) -> Tuple[List[str], List[float]]:
+    """(date_str, yield_rate) -> (排序後的 dates, 每天平均 yield)。"""
+    daily_map = {}
+    for d_str, rate in records:
+        daily_map.setdefault(d_str, []).append(float(rate))
+
+    dates = sorted(daily_map.keys())
+    avg_yield = [round(sum(daily_map[d]) / len(daily_map[d]), 2) for d in dates]
+    return dates, avg_yield
+
+
+def count_daily(dates: Iterable[str]) -> dict:
+    """date_str -> 該天的 record 數；client 收到即時 yield 點時用來重算平均。"""
+    counts = {}
+    for d_str in dates:
+        counts[d_str] = counts.get(d_str, 0) + 1
+    return counts
+
+
+def aggregate_pareto(items: Iterable[Tuple[str, int]]) -> List[dict]:
+    """(defect_type, count) -> 依 count 由大到小排序的 Pareto。"""
+    pareto_map = {}
+    for defect_type, count in items:
+        pareto_map[defect_type] = pareto_map.get(defect_type, 0) + count
+
+    defect_pareto = [{"defect_type": k, "count": v} for k, v in pareto_map.items()]
+    defect_pareto.sort(key=lambda x: x["count"], reverse=True)
+    return defect_pareto
+
+
+def to_defect_points(docs: Iterable[dict]) -> List[dict]:
+    """Mongo defect_detail document -> 前端畫 wafer map 用的扁平 point。"""
+    points = []
+    for d in docs:
+        loc = d.get("location") or {}
+        points.append(
+            {
+                "lot_id": d.get("lot_id"),
+                "defect_type": d.get("defect_type"),
+                "x": loc.get("x"),
+                "y": loc.get("y"),
+                "severity": d.get("severity"),
+                "wafer": d.get("wafer"),
+            }
+        )
+    return points
+
+
+def to_aggregate_points(docs: Iterable[dict]) -> List[dict]:
+    """
+    defect_detail_agg（retention 壓縮後的格子）-> 跟 to_defect_points 同格式，多一個 count；
+    位置是格子內點位的重心，severity 取數量最多的那個。
+    """
+    points = []
+    for d in docs:
+        count = d.get("count") or 1
+        severity = d.get("severity") or {}
+        points.append(
+            {
+                "lot_id": d.get("lot_id"),
+                "defect_type": d.get("defect_type"),
+                "x": round(d.get("sum_x", 0.0) / count, 2),
+                "y": round(d.get("sum_y", 0.0) / count, 2),
+                "severity": max(severity, key=severity.get) if severity else None,
+                "wafer": d.get("wafer"),
+                "count": count,
+            }
+        )
+    return points
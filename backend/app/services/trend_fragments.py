@@ -0,0 +1,147 @@
+# app/services/trend_fragments.py
+"""
+/yield/trend 的 per-lot fragment 快取：整個回應的 cache key 是整串 lots 的 hash，[A, B, C] 跟 [A, B, C, D]
+完全沒有共用；改成每個 lot 在日期區間內的結果各存一份，request 一次 MGET 取回、合併，只計算缺的 lot。
+
+fragment（Redis trend:frag:{lot_id}:{date_from}:{date_to}，JSON）：
+- station / product：合併時只有符合條件的 lot 計入 yield（跟原本 join Lot 的條件一樣）
+- yield：{day: [yield_rate, ...]}，保留每筆 rate，合併後的每日平均跟直接查詢完全相同
+- pareto：{defect_type: count}
+- points：defect_detail 原始點 + retention 壓縮後的格子點（to_defect_points / to_aggregate_points）
+- clusters：defect_clusters 的摘要（clustering.flatten）
+
+lot 的資料有變動（ingest / detail add / lot 修改 / 壓縮 / 重新 cluster）時由 clear_yield_trend_cache(lot_id) 清掉；
+每個 lot 另外有一個 Redis set（trend:frag-index:{lot_id}）記著它的 fragment key，清除時不必 KEYS / SCAN 整個 keyspace。
+"""
+import json
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from prometheus_client import Counter, Histogram
+
+from app.config.config import settings
+from app.services import redis_client
+from app.services.clustering import flatten as flatten_clusters
+from app.services.trend import (
+    aggregate_daily_yield, aggregate_pareto, count_daily, to_aggregate_points, to_defect_points,
+)
+
+FRAGMENT_PREFIX = "trend:frag"
+INDEX_PREFIX = "trend:frag-index"
+
+fragment_counter = Counter(
+    "trend_fragment_total",
+    "Per-lot /yield/trend fragments by cache result",
+    ["result"],  # hit / miss
+)
+
+merge_seconds = Histogram(
+    "trend_fragment_merge_seconds",
+    "Time spent merging per-lot fragments into a /yield/trend response",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+
+
+def canonical_lots(lots: Iterable[str]) -> List[str]:
+    """順序、重複都不影響結果；cache key 與 fragment 都用這個。"""
+    return sorted(set(lots))
+
+
+def fragment_key(lot_id: str, date_from: str, date_to: str) -> str:
+    return f"{FRAGMENT_PREFIX}:{lot_id}:{date_from}:{date_to}"
+
+
+def index_key(lot_id: str) -> str:
+    return f"{INDEX_PREFIX}:{lot_id}"
+
+
+def empty_fragment() -> dict:
+    return {"station": None, "product": None, "yield": {}, "pareto": {}, "points": [], "clusters": []}
+
+
+# ---- 讀寫（同步 redis-py，router 用 redis_bulkhead.run 呼叫） ----
+
+def load_fragments(lot_ids: List[str], date_from: str, date_to: str) -> Dict[str, dict]:
+    """一次 MGET；回傳有快取的 lot -> fragment。"""
+    if not lot_ids:
+        return {}
+    values = redis_client.redis_cache.mget([fragment_key(lot_id, date_from, date_to) for lot_id in lot_ids])
+    found = {lot_id: json.loads(v) for lot_id, v in zip(lot_ids, values) if v is not None}
+    fragment_counter.labels(result="hit").inc(len(found))
+    fragment_counter.labels(result="miss").inc(len(lot_ids) - len(found))
+    return found
+
+
+def store_fragments(fragments: Dict[str, dict], date_from: str, date_to: str):
+    if not fragments:
+        return
+    ttl = settings.trend_fragment_ttl_seconds
+    pipe = redis_client.redis_cache.pipeline()
+    for lot_id, fragment in fragments.items():
+        key = fragment_key(lot_id, date_from, date_to)
+        pipe.set(key, json.dumps(fragment), ex=ttl)
+        # index 跟著最新的 fragment 延長，不會比它記著的 fragment 先過期
+        pipe.sadd(index_key(lot_id), key)
+        pipe.expire(index_key(lot_id), ttl)
+    pipe.execute()
+
+
+# ---- 計算與合併 ----
+
+def build_fragments(
+        lot_ids: List[str],
+        yield_rows: Iterable[Tuple],
+        summary_rows: Iterable[Tuple],
+        defect_docs: Iterable[dict],
+        agg_docs: Iterable[dict],
+        cluster_docs: Iterable[dict],
+) -> Dict[str, dict]:
+    """
+    缺的 lot 一起查回來的結果 -> 每個 lot 一份 fragment：
+    - yield_rows：(lot_id, timestamp, yield_rate, station, product)
+    - summary_rows：(lot_id, defect_type, count)
+    """
+    fragments = {lot_id: empty_fragment() for lot_id in lot_ids}
+    for lot_id, ts, rate, station, product in yield_rows:
+        fragment = fragments[lot_id]
+        fragment["station"], fragment["product"] = station, product
+        fragment["yield"].setdefault(ts.date().isoformat(), []).append(float(rate))
+    for lot_id, defect_type, count in summary_rows:
+        pareto = fragments[lot_id]["pareto"]
+        pareto[defect_type] = pareto.get(defect_type, 0) + int(count)
+    for point in to_defect_points(defect_docs) + to_aggregate_points(agg_docs):
+        if point["lot_id"] in fragments:
+            fragments[point["lot_id"]]["points"].append(point)
+    for cluster in flatten_clusters(cluster_docs):
+        if cluster["lot_id"] in fragments:
+            fragments[cluster["lot_id"]]["clusters"].append(cluster)
+    return fragments
+
+
+@merge_seconds.time()
+def merge_fragments(fragments: List[dict], station: Optional[str], product: Optional[str]) -> Optional[dict]:
+    """
+    依 lot 順序合併成 /yield/trend 的內容（不含 version）；沒有符合 station / product 的 yield 時回傳 None。
+    Pareto / 點位 / cluster 跟原本一樣涵蓋所有指定的 lot。
+    """
+    day_rates = [
+        (day, rate)
+        for fragment in fragments
+        if (not station or fragment["station"] == station) and (not product or fragment["product"] == product)
+        for day, rates in fragment["yield"].items()
+        for rate in rates
+    ]
+    if not day_rates:
+        return None
+
+    dates, avg_yield = aggregate_daily_yield(day_rates)
+    counts = count_daily(day for day, _rate in day_rates)
+    return {
+        "dates": dates,
+        "avg_yield": avg_yield,
+        "daily_counts": [counts[d] for d in dates],
+        "defect_pareto": aggregate_pareto(
+            (defect_type, count) for fragment in fragments for defect_type, count in fragment["pareto"].items()
+        ),
+        "defect_details": [point for fragment in fragments for point in fragment["points"]],
+        "defect_clusters": [cluster for fragment in fragments for cluster in fragment["clusters"]],
+    }
@@ -0,0 +1,291 @@
+# app/services/wafermap.py
+"""
+Wafer map 的 server 端 rasterize（/wafermap/*.png）：前端不必再用 Chart.js 畫上千個點，只要貼一張 PNG。
+
+- 座標跟 defect_detail.location 一樣是 0 ~ 100（wafer 圓心 (50, 50)、半徑 50），y 軸朝上
+- zoom z：整片 wafer 切成 2^z × 2^z 張 tile（x 往右、y 往下，跟一般地圖 tile 一樣），每張 wafermap_tile_size px；
+  z = 0 就是整張圖
+- 點的顏色依 defect_type（名稱 hash 到固定色盤，每張 tile、每次 request 都一樣）或 severity；
+  所有點的 pixel 位置用 NumPy 一次算完、整批寫入，不逐點畫
+- retention 壓縮過的 lot 用 defect_detail_agg 的格子重心，半徑依 count 加大
+
+快取：每個 lot 一個內容版本（Redis wafermap:version:{lot_id}，ingest / detail add / 壓縮 / seed 時換新），
+tile 以 (lot, 版本, wafer, 著色方式, z, x, y) 存 Redis 或 wafermap_dir；版本換了舊 tile 不會再被讀到，
+Redis 等 TTL 過期，wafermap_dir 由 sweep_tiles（celery beat）刪掉超過 TTL 的檔案。
+回應的 ETag 就是版本：瀏覽器帶 If-None-Match 重看時只讀一次版本號、回 304。
+"""
+import hashlib
+import os
+import struct
+import tempfile
+import time
+import uuid
+import zlib
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from prometheus_client import Counter
+
+from app.config.config import settings
+from app.services import redis_client
+from app.services.retention import AGG, HOT
+
+WAFER_CENTER = 50.0
+WAFER_RADIUS = 50.0
+
+BACKGROUND = (255, 255, 255)
+WAFER_FILL = (236, 239, 243)
+WAFER_EDGE = (150, 156, 166)
+
+# defect_type 用的色盤（分得開的顏色），名稱 crc32 取餘數
+PALETTE = np.array([
+    (31, 119, 180), (255, 127, 14), (44, 160, 44), (214, 39, 40), (148, 103, 189),
+    (140, 86, 75), (227, 119, 194), (23, 190, 207), (188, 189, 34), (127, 127, 127),
+], dtype=np.uint8)
+
+# severity 由輕到重；重的最後畫，重疊時在最上面
+SEVERITY_COLORS: Dict[str, Tuple[int, int, int]] = {
+    "unknown": (127, 127, 127),
+    "L": (240, 200, 30),
+    "M": (255, 127, 14),
+    "H": (214, 39, 40),
+}
+
+tile_cache_counter = Counter(
+    "wafermap_tile_total",
+    "Wafer map tile requests by cache result",
+    ["result"],  # hit / miss / not_modified
+)
+
+
+def type_color(defect_type: Optional[str]) -> Tuple[int, int, int]:
+    idx = zlib.crc32((defect_type or "").encode()) % len(PALETTE)
+    return tuple(int(c) for c in PALETTE[idx])
+
+
+# ---- 點位 ----
+
+class Points:
+    """一個 wafer 的點位，全部是平行的 array。"""
+
+    def __init__(self, x: np.ndarray, y: np.ndarray, defect_type: List[Optional[str]],
+                 severity: List[Optional[str]], count: np.ndarray):
+        self.x, self.y, self.count = x, y, count
+        self.defect_type, self.severity = defect_type, severity
+
+    def __len__(self):
+        return self.x.size
+
+
+def to_points(raw: Iterable[dict], agg: Iterable[dict]) -> Points:
+    """defect_detail（原始點）+ defect_detail_agg（格子重心、帶 count）-> Points。"""
+    xs, ys, types, severities, counts = [], [], [], [], []
+    for d in raw:
+        loc = d.get("location") or {}
+        xs.append(loc.get("x") or 0.0)
+        ys.append(loc.get("y") or 0.0)
+        types.append(d.get("defect_type"))
+        severities.append(d.get("severity"))
+        counts.append(1)
+    for d in agg:
+        count = d.get("count") or 1
+        severity = d.get("severity") or {}
+        xs.append(d.get("sum_x", 0.0) / count)
+        ys.append(d.get("sum_y", 0.0) / count)
+        types.append(d.get("defect_type"))
+        severities.append(max(severity, key=severity.get) if severity else None)
+        counts.append(count)
+    return Points(np.array(xs, dtype=float), np.array(ys, dtype=float), types, severities,
+                  np.array(counts, dtype=np.int64))
+
+
+def load_points(db, lot_id: str, wafer: Optional[int]) -> Points:
+    """同步（pymongo）；wafer = None 時是整個 lot 的所有 wafer。"""
+    flt = {"lot_id": lot_id}
+    if wafer is not None:
+        flt["wafer"] = wafer
+    raw = db[HOT].find(flt, {"_id": 0, "defect_type": 1, "location.x": 1, "location.y": 1, "severity": 1})
+    agg = db[AGG].find(flt, {"_id": 0, "cell": 0})
+    return to_points(raw, agg)
+
+
+# ---- rasterize ----
+
+def _colors(points: Points, color_by: str) -> Tuple[np.ndarray, np.ndarray]:
+    """(每個點的 RGB, 繪製順序)。"""
+    if color_by == "severity":
+        names = list(SEVERITY_COLORS)
+        rank = np.array([names.index(s) if s in SEVERITY_COLORS else 0 for s in points.severity], dtype=np.int64)
+        table = np.array(list(SEVERITY_COLORS.values()), dtype=np.uint8)
+        return table[rank], np.argsort(rank, kind="stable")
+    table = {t: type_color(t) for t in set(points.defect_type)}
+    colors = np.array([table[t] for t in points.defect_type], dtype=np.uint8).reshape(-1, 3)
+    return colors, np.arange(len(points))
+
+
+def _background(size: int, scale: float, left: int, top: int) -> np.ndarray:
+    """wafer 圓盤：每個 pixel 中心換回座標判斷在圓內、圓周上或外面。"""
+    img = np.empty((size, size, 3), dtype=np.uint8)
+    img[:] = BACKGROUND
+    u = (left + np.arange(size) + 0.5) / scale - WAFER_CENTER
+    v = WAFER_CENTER - (top + np.arange(size) + 0.5) / scale
+    dist = np.sqrt(u[np.newaxis, :] ** 2 + v[:, np.newaxis] ** 2)
+    edge = 1.0 / scale  # 圓周畫 1 px 寬
+    img[dist <= WAFER_RADIUS] = WAFER_FILL
+    img[np.abs(dist - WAFER_RADIUS) <= edge / 2 + 1e-9] = WAFER_EDGE
+    return img
+
+
+def render_tile(points: Points, z: int = 0, tx: int = 0, ty: int = 0, color_by: str = "defect_type",
+                size: Optional[int] = None, radius: Optional[int] = None) -> np.ndarray:
+    """回傳 (size, size, 3) uint8 RGB。"""
+    size = size or settings.wafermap_tile_size
+    radius = settings.wafermap_point_radius if radius is None else radius
+    scale = size * (1 << z) / (2 * WAFER_RADIUS)  # 座標 1 單位 = 幾 px
+    left, top = tx * size, ty * size
+    img = _background(size, scale, left, top)
+    if not len(points):
+        return img
+
+    # aggregate 點：count 每多一個數量級半徑 +1，最多 +3
+    r = radius + np.minimum(np.log10(np.maximum(points.count, 1)).astype(np.int64), 3)
+    px = np.floor(points.x * scale).astype(np.int64) - left
+    py = np.floor((2 * WAFER_RADIUS - points.y) * scale).astype(np.int64) - top
+    colors, order = _colors(points, color_by)
+
+    # 只留會碰到這張 tile 的點（跨 tile 邊界的點兩邊都畫）
+    near = (px + r >= 0) & (px - r < size) & (py + r >= 0) & (py - r < size)
+    keep = order[near[order]]
+    px, py, r, colors = px[keep], py[keep], r[keep], colors[keep]
+
+    # 對圓盤 kernel 的每個 offset 一次寫入所有點；同一個 pixel 後寫的蓋掉先寫的（order 決定誰在上面）
+    r_max = int(r.max()) if r.size else 0
+    for dy in range(-r_max, r_max + 1):
+        for dx in range(-r_max, r_max + 1):
+            d2 = dx * dx + dy * dy
+            x, y = px + dx, py + dy
+            hit = (d2 <= r * r) & (x >= 0) & (x < size) & (y >= 0) & (y < size)
+            img[y[hit], x[hit]] = colors[hit]
+    return img
+
+
+def encode_png(img: np.ndarray) -> bytes:
+    """RGB 8-bit PNG（每列 filter type 0，zlib 壓縮）；不另外裝影像套件。"""
+    height, width, _ = img.shape
+    rows = np.concatenate([np.zeros((height, 1), dtype=np.uint8), img.reshape(height, width * 3)], axis=1)
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+    return b"".join([
+        b"\x89PNG\r\n\x1a\n",
+        chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)),
+        chunk(b"IDAT", zlib.compress(rows.tobytes(), 6)),
+        chunk(b"IEND", b""),
+    ])
+
+
+# ---- 內容版本 ----
+
+def _version_key(lot_id: str) -> str:
+    return f"wafermap:version:{lot_id}"
+
+
+def _decode(value) -> str:
+    return value.decode() if isinstance(value, bytes) else str(value)
+
+
+def _new_version() -> str:
+    # 隨機值而不是時間或計數器：同一毫秒內的兩次更新、seed 清掉之後重新建立，都不會拿到用過的版本
+    return uuid.uuid4().hex[:16]
+
+
+def get_version(lot_id: str) -> str:
+    """
+    lot 目前的內容版本；第一次看到的 lot 建立一個。
+    版本跟 tile 一樣有 TTL：URL 裡任意的 lot_id（不需要登入）不會永久留下 key；過期後只是換一個新版本、重新畫。
+    """
+    version = redis_client.redis_cache.get(_version_key(lot_id))
+    if version is None:
+        redis_client.redis_cache.set(_version_key(lot_id), _new_version(), nx=True,
+                                     ex=settings.wafermap_ttl_seconds)
+        version = redis_client.redis_cache.get(_version_key(lot_id))
+    return _decode(version)
+
+
+def bump_version(*lot_ids: str):
+    """lot 的 defect 點位變了：換新版本，之前畫好的 tile 不再被讀到。"""
+    version = _new_version()
+    for lot_id in lot_ids:
+        redis_client.redis_cache.set(_version_key(lot_id), version, ex=settings.wafermap_ttl_seconds)
+
+
+def reset_versions():
+    """seed 重建全部資料：所有 lot 下次被看到時重新建立版本。"""
+    keys = redis_client.redis_cache.keys("wafermap:version:*")
+    if keys:
+        redis_client.redis_cache.delete(*keys)
+
+
+# ---- tile 快取（Redis 或 wafermap_dir） ----
+
+def tile_key(lot_id: str, version: str, wafer: str, color_by: str, z: int, x: int, y: int) -> str:
+    return f"wafermap:tile:{lot_id}:{version}:{wafer}:{color_by}:{z}:{x}:{y}"
+
+
+def _tile_path(key: str) -> str:
+    # lot_id 來自 URL，檔名用 hash，不會組出目錄外的路徑
+    return os.path.join(settings.wafermap_dir, hashlib.sha1(key.encode()).hexdigest() + ".png")
+
+
+def load_tile(key: str) -> Optional[bytes]:
+    if settings.wafermap_cache == "disk":
+        path = _tile_path(key)
+        try:
+            if os.path.getmtime(path) < time.time() - settings.wafermap_ttl_seconds:
+                return None
+            with open(path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            # 還沒畫過，或剛好被 sweep_tiles 刪掉
+            return None
+    return redis_client.redis_cache.get(key)
+
+
+def store_tile(key: str, png: bytes):
+    if settings.wafermap_cache == "disk":
+        os.makedirs(settings.wafermap_dir, exist_ok=True)
+        # 每次寫入各自一個暫存檔（同一個 process 的多個 thread 同時畫同一張 tile 也不會共用），
+        # 寫完再改名：讀的人不會讀到寫一半的檔
+        with tempfile.NamedTemporaryFile(dir=settings.wafermap_dir, suffix=".tmp", delete=False) as f:
+            f.write(png)
+        try:
+            # NamedTemporaryFile 建的檔是 0600；掛同一個目錄的其他 worker 也要讀得到
+            os.chmod(f.name, 0o644)
+            os.replace(f.name, _tile_path(key))
+        except OSError:
+            os.remove(f.name)
+            raise
+    else:
+        redis_client.redis_cache.set(key, png, ex=settings.wafermap_ttl_seconds)
+
+
+def sweep_tiles(now: Optional[float] = None) -> int:
+    """
+    disk 模式：刪掉超過 wafermap_ttl_seconds 的 tile 與寫到一半留下的暫存檔，回傳刪掉的檔案數。
+    版本換掉之後舊 tile 不會再被讀到，不掃的話會一直留在目錄裡。
+    """
+    if settings.wafermap_cache != "disk" or not os.path.isdir(settings.wafermap_dir):
+        return 0
+    cutoff = (now or time.time()) - settings.wafermap_ttl_seconds
+    removed = 0
+    with os.scandir(settings.wafermap_dir) as entries:
+        for entry in entries:
+            try:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+                    removed += 1
+            except FileNotFoundError:
+                # 同時有另一個 tile 寫入改名蓋掉
+                pass
+    return removed
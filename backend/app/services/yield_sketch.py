@@ -0,0 +1,116 @@
+# app/services/yield_sketch.py
+"""
+yield 分佈 sketch（yield_sketch table）的維護與查詢：
+
+- add_lot：ingest 時把一個 lot 的 yield 加進當天的 t-digest（同一個 transaction，row lock 避免同時寫入互相覆蓋）
+- rebuild：從 yield_record 整個重算（seed、匯入歷史資料）
+- rebuild_days：只重算指定的 (station, product, day)；lot 換了 station / product 時用（t-digest 沒辦法拿掉一個值）
+- load_merged：把區間內每天的 digest 合併成一個；成本跟天數成正比，跟 lot 數無關
+"""
+from collections import defaultdict
+from datetime import date
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config.config import settings
+from app.models.lot import Lot
+from app.models.partitioning import timestamp_range
+from app.models.yield_record import YieldRecord
+from app.models.yield_sketch import YieldSketch
+from app.services.tdigest import TDigest
+
+
+def to_digest(row: YieldSketch) -> TDigest:
+    return TDigest.from_bytes(row.centroids, row.count, row.min_yield, row.max_yield,
+                              compression=settings.sketch_compression)
+
+
+def _store(row: YieldSketch, digest: TDigest):
+    row.centroids = digest.to_bytes()
+    row.count = int(digest.count)
+    row.min_yield = digest.min
+    row.max_yield = digest.max
+
+
+async def add_lot(session: AsyncSession, station: str, product: str, day: date, yield_rate: float):
+    """呼叫端負責 commit（跟 YieldRecord 同一個 transaction）。"""
+    insert = postgresql.insert if session.bind.dialect.name == "postgresql" else sqlite.insert
+    # 先確保那一天的 row 存在，再 SELECT ... FOR UPDATE：同一天的 ingest 依序更新
+    await session.execute(
+        insert(YieldSketch)
+        .values(station=station, product=product, day=day, count=0, centroids=b"")
+        .on_conflict_do_nothing(index_elements=["station", "product", "day"])
+    )
+    stmt = (
+        select(YieldSketch)
+        .where(YieldSketch.station == station, YieldSketch.product == product, YieldSketch.day == day)
+        .with_for_update()
+        .execution_options(populate_existing=True)
+    )
+    row = (await session.execute(stmt)).scalar_one()
+    digest = to_digest(row)
+    digest.add(yield_rate)
+    _store(row, digest)
+
+
+async def rebuild(session: AsyncSession) -> int:
+    """重算全部的 sketch；回傳筆數。呼叫端負責 commit。"""
+    stmt = (
+        select(Lot.station, Lot.product, YieldRecord.timestamp, YieldRecord.yield_rate)
+        .join(Lot, Lot.lot_id == YieldRecord.lot_id)
+        .where(YieldRecord.yield_rate.is_not(None))
+    )
+    digests: Dict[Tuple[str, str, date], TDigest] = defaultdict(lambda: TDigest(settings.sketch_compression))
+    result = await session.stream(stmt.execution_options(yield_per=5000))
+    async for station, product, ts, rate in result:
+        digests[(station, product, ts.date())].add(rate)
+
+    await session.execute(delete(YieldSketch))
+    for (station, product, day), digest in digests.items():
+        row = YieldSketch(station=station, product=product, day=day)
+        _store(row, digest)
+        session.add(row)
+    return len(digests)
+
+
+async def rebuild_days(session: AsyncSession, keys: Iterable[Tuple[str, str, date]]) -> int:
+    """只重算這些 (station, product, day)；沒有資料的那一筆直接刪掉。回傳重建的筆數。呼叫端負責 commit。"""
+    rebuilt = 0
+    for station, product, day in sorted(set(keys)):
+        start, end = timestamp_range(day, day)
+        rates = (await session.execute(
+            select(YieldRecord.yield_rate)
+            .join(Lot, Lot.lot_id == YieldRecord.lot_id)
+            .where(Lot.station == station, Lot.product == product, YieldRecord.yield_rate.is_not(None),
+                   YieldRecord.timestamp >= start, YieldRecord.timestamp < end)
+        )).scalars().all()
+
+        await session.execute(delete(YieldSketch).where(
+            YieldSketch.station == station, YieldSketch.product == product, YieldSketch.day == day,
+        ))
+        if rates:
+            digest = TDigest(settings.sketch_compression)
+            for rate in rates:
+                digest.add(rate)
+            row = YieldSketch(station=station, product=product, day=day)
+            _store(row, digest)
+            session.add(row)
+            rebuilt += 1
+    return rebuilt
+
+
+async def load_merged(session: AsyncSession, station: str, product: Optional[str],
+                      date_from: date, date_to: date) -> Tuple[TDigest, int]:
+    """(合併後的 digest, 合併了幾個每日 sketch)。product = None 時合併該 station 的所有 product。"""
+    stmt = select(YieldSketch).where(
+        YieldSketch.station == station,
+        YieldSketch.day >= date_from,
+        YieldSketch.day <= date_to,
+    )
+    if product:
+        stmt = stmt.where(YieldSketch.product == product)
+    rows = list((await session.execute(stmt)).scalars())
+    return TDigest.merged((to_digest(r) for r in rows), compression=settings.sketch_compression), len(rows)
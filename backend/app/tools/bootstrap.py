@@ -0,0 +1,141 @@
+# tools/bootstrap.py
+"""
+一次性的部署步驟：建 table（Postgres 另外建月份 partition）+ 建預設帳號 + 建 Mongo index（並補舊點位的 region_cell）。
+
+FAST_BOOT=true 時 API 啟動不再做這些事，改成部署時（或 container 啟動前）先跑：
+
+    python -m app.tools.bootstrap
+"""
+import asyncio
+import logging
+import time
+from typing import Dict, Sequence, Tuple
+
+from pymongo import MongoClient
+from sqlalchemy import select, text
+
+from app.auth.security import hash_password
+from app.database.database import AsyncSessionLocal, engine
+from app.database.mongo import MONGO_URL, mongo_db
+from app.database.mongo_indexes import ensure_indexes
+from app.models.base import Base
+from app.models.spc import SpcDailyStat  # noqa: F401  create_all 才看得到 spc_daily_stat
+from app.models.yield_sketch import YieldSketch  # noqa: F401
+from app.models.user import Role, User
+from app.services.partitions import ensure_partitions
+from app.services.regions import backfill_region_cells
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_USERS: Sequence[Tuple[str, str, Role]] = (
+    ("admin", "admin", Role.admin),
+    ("eng", "eng", Role.engineer),
+    ("op", "op", Role.viewer),
+)
+
+
+# create_all 只會建新 table，既有 table 新增的欄位在這裡補上（Postgres，可重複執行）
+POSTGRES_MIGRATIONS = (
+    # delta sync 的變更時間
+    "ALTER TABLE yield_record ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT (now() AT TIME ZONE 'utc')",
+    "CREATE INDEX IF NOT EXISTS ix_yield_record_updated_at ON yield_record (updated_at)",
+    "ALTER TABLE defect_summary ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT (now() AT TIME ZONE 'utc')",
+    "CREATE INDEX IF NOT EXISTS ix_defect_summary_updated_at ON defect_summary (updated_at)",
+    # partition key（尚未轉成 partitioned table 的舊 table 先補欄位 / index，轉換見 app.tools.partitions）
+    "ALTER TABLE defect_summary ADD COLUMN IF NOT EXISTS timestamp TIMESTAMP",
+    "CREATE INDEX IF NOT EXISTS ix_defect_summary_timestamp ON defect_summary (timestamp)",
+    # 補欄位前的舊資料 timestamp 是 NULL，會被 trend / report 的 timestamp 範圍條件濾掉：用對應 lot 的量測時間補
+    'UPDATE defect_summary ds SET "timestamp" = yr.timestamp FROM yield_record yr '
+    'WHERE ds."timestamp" IS NULL AND yr.lot_id = ds.lot_id',
+    "CREATE INDEX IF NOT EXISTS ix_yield_record_timestamp ON yield_record (timestamp)",
+)
+
+
+async def init_schema(bind=engine):
+    async with bind.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        if conn.dialect.name == "postgresql":
+            for statement in POSTGRES_MIGRATIONS:
+                await conn.execute(text(statement))
+            await ensure_partitions(conn)
+
+
+async def ensure_default_users(session_factory=AsyncSessionLocal, users=DEFAULT_USERS) -> list:
+    """
+    一次 SELECT 查出已存在的帳號，只替缺少的帳號做 PBKDF2 hash，
+    全部已存在時（一般重啟的情況）不會做任何 hash。回傳新建的 username。
+    """
+    usernames = [username for username, _, _ in users]
+
+    async with session_factory() as session:
+        async with session.begin():
+            result = await session.execute(select(User.username).where(User.username.in_(usernames)))
+            existing = set(result.scalars().all())
+
+            missing = [u for u in users if u[0] not in existing]
+            for username, password, role in missing:
+                session.add(User(username=username, password_hash=hash_password(password), role=role))
+
+    return [username for username, _, _ in missing]
+
+
+def ensure_mongo_indexes() -> dict:
+    # 用獨立、用完就關的 client：gunicorn master 跑完 bootstrap 才 fork，不留下連線 / 背景 thread
+    client = MongoClient(MONGO_URL, serverSelectionTimeoutMS=5000)
+    try:
+        db = client[mongo_db.name]
+        backfilled = backfill_region_cells(db)
+        if backfilled:
+            logger.info("backfilled region_cell on %d defect points", backfilled)
+        return ensure_indexes(db)
+    finally:
+        client.close()
+
+
+async def bootstrap(bind=engine, session_factory=AsyncSessionLocal) -> Dict[str, float]:
+    """建 table + 預設帳號 + Mongo index，回傳各步驟耗時（秒）。"""
+    timings = {}
+
+    start = time.perf_counter()
+    await init_schema(bind)
+    timings["schema"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    await ensure_default_users(session_factory)
+    timings["default_users"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    try:
+        await asyncio.to_thread(ensure_mongo_indexes)
+    except Exception:
+        # Mongo 暫時連不上不擋 API 啟動；查詢只是變慢，下次 bootstrap / /seed/sql 會補建
+        logger.warning("ensure mongo indexes failed", exc_info=True)
+    timings["mongo_indexes"] = time.perf_counter() - start
+
+    return timings
+
+
+async def wait_for_postgres(bind=engine, attempts: int = 30, delay: float = 2.0):
+    """部署時 DB 可能還在啟動：最多重試 attempts 次，還是連不上就把最後的錯誤丟出去。"""
+    for attempt in range(1, attempts + 1):
+        try:
+            async with bind.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+            return
+        except Exception:
+            if attempt == attempts:
+                raise
+            logger.warning("database not ready (attempt %d/%d), retrying in %.0fs", attempt, attempts, delay)
+            await asyncio.sleep(delay)
+
+
+async def main():
+    await wait_for_postgres()
+    timings = await bootstrap()
+    for step, secs in timings.items():
+        print(f"✅ {step}: {secs * 1000:.1f} ms")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
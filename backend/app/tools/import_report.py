@@ -0,0 +1,55 @@
+# tools/import_report.py
+"""
+列出 import app.main 時，每個直接 import 的模組（含其相依）各花多少時間：
+
+    python -m app.tools.import_report [--top 20]
+
+用 `python -X importtime` 在子 process 量，不會被目前 process 已 import 的模組影響。
+"""
+import argparse
+import re
+import subprocess
+import sys
+from typing import List, Tuple
+
+_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def import_breakdown(module: str = "app.main") -> Tuple[int, List[Tuple[str, int]]]:
+    """回傳 (總 import 時間 µs, [(直接 import 的模組, 累計 µs), ...])，由大到小。"""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, check=True,
+    )
+
+    total = 0
+    children = []
+    for line in proc.stderr.splitlines():
+        m = _LINE.match(line)
+        if not m:
+            continue
+        cumulative, depth, name = int(m.group(2)), len(m.group(3)), m.group(4)
+        if name == module:
+            total = cumulative
+        # importtime 每一層多縮排 2 格；module 本身是 1 格，直接 import 的是 3 格
+        elif depth == 3:
+            children.append((name, cumulative))
+
+    children.sort(key=lambda c: c[1], reverse=True)
+    return total, children
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+
+    total, children = import_breakdown(args.module)
+    print(f"import {args.module}: {total / 1000:.1f} ms")
+    for name, us in children[: args.top]:
+        print(f"  {us / 1000:8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
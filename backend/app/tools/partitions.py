@@ -0,0 +1,50 @@
+# tools/partitions.py
+"""
+手動操作月份 partition（Postgres）：
+
+    python -m app.tools.partitions list       # 列出各 table 的 partition
+    python -m app.tools.partitions maintain   # 跟每日 celery beat 做的事一樣
+    python -m app.tools.partitions migrate    # 既有的一般 table 轉成 partitioned table（停機時執行）
+"""
+import argparse
+import asyncio
+
+from app.database.database import engine
+from app.services import partitions
+
+
+async def run(command: str):
+    if engine.dialect.name != "postgresql":
+        print(f"❗ partitioning needs Postgres (current: {engine.dialect.name})")
+        return
+
+    if command == "maintain":
+        result = await partitions.maintain()
+        print(f"✅ created: {result['created'] or '-'}  detached: {result['detached'] or '-'}")
+    elif command == "migrate":
+        # yield_record 先轉：defect_summary 補 timestamp 時會查 yield_record
+        for table in sorted(partitions.partitioned_tables(), key=lambda t: t != "yield_record"):
+            async with engine.begin() as conn:
+                migrated = await partitions.migrate_to_partitioned(conn, table)
+            print(f"✅ {table}: {'migrated' if migrated else 'already partitioned'}")
+        await partitions.maintain()
+
+    async with engine.connect() as conn:
+        for table in partitions.partitioned_tables():
+            names = await partitions.list_partitions(conn, table)
+            print(f"{table}: {len(names)} partitions")
+            for name in names:
+                print(f"  {name}")
+
+    await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["list", "maintain", "migrate"])
+    args = parser.parse_args()
+    asyncio.run(run(args.command))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+# tools/spc.py
+"""
+從 yield_record 重算 SPC 每日統計（spc_daily_stat）與 yield 分佈 sketch（yield_sketch）：
+
+    python -m app.tools.spc rebuild
+
+第一次部署 /spc/*、/distribution/*（既有資料沒有經過 ingest 累加）、或匯入歷史資料後執行。
+"""
+import argparse
+import asyncio
+
+from app.database.database import AsyncSessionLocal, engine
+from app.services import spc_stats, yield_sketch
+
+
+async def run():
+    async with AsyncSessionLocal() as session:
+        stats = await spc_stats.rebuild(session)
+        sketches = await yield_sketch.rebuild(session)
+        await session.commit()
+    print(f"✅ rebuilt spc_daily_stat: {stats} rows, yield_sketch: {sketches} rows (station / product / day)")
+    await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["rebuild"])
+    parser.parse_args()
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# benchmarks/clustering.py
+"""
+app.services.clustering 的效能與正確性檢查（不需要 Mongo）：
+
+    python -m benchmarks.clustering --points 100000 --wafers 25
+
+產生一個 lot：每片 wafer 均勻散佈的背景點，再依序在 wafer 上放 scratch / edge / center 三種 signature，
+量 cluster_points 的時間，並列出每種 signature 找到幾個（應該跟放進去的一樣）。
+"""
+import argparse
+import json
+import sys
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from app.services.clustering import LotPoints, cluster_points
+from benchmarks.core import bench_sync
+
+SIGNATURES = ("scratch", "edge", "center")
+
+
+def _uniform_disc(rng, n: int) -> Tuple[np.ndarray, np.ndarray]:
+    r = 48 * np.sqrt(rng.random(n))
+    theta = rng.random(n) * 2 * np.pi
+    return 50 + r * np.cos(theta), 50 + r * np.sin(theta)
+
+
+def _signature_points(rng, kind: str, n: int) -> Tuple[np.ndarray, np.ndarray]:
+    if kind == "scratch":
+        # 一條斜的細線
+        angle = rng.random() * np.pi
+        t = rng.uniform(-20, 20, n)
+        cx, cy = 50 + rng.uniform(-8, 8), 50 + rng.uniform(-8, 8)
+        return (cx + t * np.cos(angle) + rng.normal(0, 0.3, n),
+                cy + t * np.sin(angle) + rng.normal(0, 0.3, n))
+    if kind == "edge":
+        # 外圈一段弧
+        start = rng.random() * 2 * np.pi
+        theta = start + rng.uniform(0, 0.8, n)
+        r = rng.uniform(44, 48, n)
+        return 50 + r * np.cos(theta), 50 + r * np.sin(theta)
+    # center：圓心附近的一團
+    return 50 + rng.normal(0, 3, n), 50 + rng.normal(0, 3, n)
+
+
+def synthetic_lot(points: int = 100_000, wafers: int = 25, seed: int = 49) -> Tuple[LotPoints, Dict[int, str]]:
+    """(點位, 每片 wafer 放了哪種 signature)；signature 佔 15% 的點，其餘是背景。"""
+    rng = np.random.default_rng(seed)
+    per_wafer = points // wafers
+    xs, ys, ws, types = [], [], [], []
+    planted = {}
+    for wafer in range(1, wafers + 1):
+        kind = SIGNATURES[(wafer - 1) % len(SIGNATURES)]
+        planted[wafer] = kind
+        n_sig = int(per_wafer * 0.15)
+        bx, by = _uniform_disc(rng, per_wafer - n_sig)
+        sx, sy = _signature_points(rng, kind, n_sig)
+        xs += [bx, sx]
+        ys += [by, sy]
+        ws.append(np.full(per_wafer, wafer))
+        types += ["Particle"] * (per_wafer - n_sig) + [kind.capitalize()] * n_sig
+    return LotPoints(np.concatenate(xs), np.concatenate(ys), np.concatenate(ws), np.ones(len(types)), types), planted
+
+
+def found_signatures(clusters: List[dict]) -> Dict[int, List[str]]:
+    out: Dict[int, List[str]] = {}
+    for c in clusters:
+        out.setdefault(c["wafer"], []).append(c["signature"])
+    return out
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--points", type=int, default=100_000)
+    parser.add_argument("--wafers", type=int, default=25)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--output", help="結果寫成 JSON 檔")
+    args = parser.parse_args(argv)
+
+    lot, planted = synthetic_lot(args.points, args.wafers)
+    result = bench_sync(f"clustering.cluster_points_{args.points // 1000}k", lambda: cluster_points(lot),
+                        number=1, rounds=args.rounds)
+    found = found_signatures(cluster_points(lot))
+    missed = [w for w, kind in planted.items() if kind not in found.get(w, [])]
+    extra = sum(len(v) for v in found.values()) - (len(planted) - len(missed))
+
+    print(f"{result['name']:<36} median {result['median_us'] / 1000:>9.1f} ms   p95 {result['p95_us'] / 1000:>9.1f} ms")
+    print(f"planted {len(planted)} signatures, missed {len(missed)} {missed or ''}, extra clusters {extra}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"result": result, "missed": missed, "extra": extra}, f, indent=2)
+    return 1 if missed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+# benchmarks/core.py
+import json
+import platform
+import statistics
+import subprocess
+import time
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional
+
+
+def summarize(name: str, samples: List[float], ops_per_sample: int = 1) -> dict:
+    """samples 是每一輪的秒數；回傳每個 op 的 median / p95 / min（微秒）。"""
+    per_op = sorted(s / ops_per_sample for s in samples)
+    p95_index = min(len(per_op) - 1, int(round(0.95 * (len(per_op) - 1))))
+    return {
+        "name": name,
+        "rounds": len(per_op),
+        "ops_per_round": ops_per_sample,
+        "median_us": round(statistics.median(per_op) * 1e6, 3),
+        "p95_us": round(per_op[p95_index] * 1e6, 3),
+        "min_us": round(per_op[0] * 1e6, 3),
+        "ops_per_sec": round(1 / statistics.median(per_op), 1) if per_op[0] > 0 else None,
+    }
+
+
+def bench_sync(name: str, fn: Callable[[], object], number: int = 100, rounds: int = 20, warmup: int = 2) -> dict:
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append(time.perf_counter() - start)
+    return summarize(name, samples, number)
+
+
+async def bench_async(name: str, fn: Callable[[], Awaitable[object]], rounds: int = 50, warmup: int = 5,
+                      before_each: Optional[Callable[[], None]] = None) -> dict:
+    for _ in range(warmup):
+        if before_each:
+            before_each()
+        await fn()
+    samples = []
+    for _ in range(rounds):
+        if before_each:
+            before_each()
+        start = time.perf_counter()
+        await fn()
+        samples.append(time.perf_counter() - start)
+    return summarize(name, samples)
+
+
+def environment_info(scale: str) -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scale": scale,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def compare(current: Dict[str, dict], baseline: Dict[str, dict], threshold: float) -> List[dict]:
+    """
+    跟 baseline 比較 median；(current - baseline) / baseline > threshold 視為 regression。
+    只比較兩邊都有的 benchmark。
+    """
+    rows = []
+    for name, base in baseline.items():
+        cur = current.get(name)
+        if cur is None or not base.get("median_us"):
+            continue
+        change = (cur["median_us"] - base["median_us"]) / base["median_us"]
+        rows.append({
+            "name": name,
+            "baseline_us": base["median_us"],
+            "current_us": cur["median_us"],
+            "change_pct": round(change * 100, 2),
+            "regression": change > threshold,
+        })
+    return rows
+
+
+def load_results(path: str) -> Dict[str, dict]:
+    with open(path) as f:
+        return json.load(f)["results"]
@@ -0,0 +1,38 @@
+# benchmarks/endpoints.py
+"""透過 ASGI in-process 打 API，量測包含 routing / DB / 序列化的完整路徑。"""
+from typing import List
+
+from benchmarks.core import bench_async
+
+
+async def run_endpoints(harness, data, rounds: int) -> List[dict]:
+    date_from = min(y.timestamp for y in data.yields).date().isoformat()
+    date_to = max(y.timestamp for y in data.yields).date().isoformat()
+    station, product = "AOI-01", "PKG-A"
+    lots = [lot.lot_id for lot in data.lots if lot.station == station and lot.product == product]
+    trend_params = {"date_from": date_from, "date_to": date_to, "station": station, "product": product, "lots": lots}
+
+    def clear_cache():
+        harness.redis.store.clear()
+
+    results = []
+    async with harness.client() as client:
+        async def get(path, params=None):
+            resp = await client.get(path, params=params)
+            assert resp.status_code == 200, (path, resp.status_code, resp.text[:200])
+            return resp
+
+        results.append(await bench_async("api.filter_dates", lambda: get("/filter/dates"), rounds=rounds))
+        results.append(await bench_async(
+            "api.filter_lots",
+            lambda: get("/filter/lots", {"date_from": date_from, "date_to": date_to, "station": station, "product": product}),
+            rounds=rounds,
+        ))
+        results.append(await bench_async(
+            "api.yield_trend_cold", lambda: get("/yield/trend", trend_params), rounds=rounds, before_each=clear_cache,
+        ))
+        results.append(await bench_async("api.yield_trend_warm", lambda: get("/yield/trend", trend_params), rounds=rounds))
+        results.append(await bench_async(
+            "api.detail_by_lot", lambda: get("/detail/by_lot", {"lot_id": lots[0]}), rounds=rounds,
+        ))
+    return results
@@ -0,0 +1,244 @@
+# benchmarks/fakes.py
+"""
+本地跑 benchmark 用的 in-memory Redis / Mongo。
+跟 tests/conftest.py 的 Dummy 不同，這裡會真的依 filter 篩資料，讓結果跟 production 行為接近。
+"""
+import fnmatch
+import itertools
+
+
+class FakeRedis:
+    def __init__(self):
+        self.store: dict = {}
+
+    def ping(self):
+        return True
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+    def get(self, key):
+        return self.store.get(key)
+
+    def mget(self, keys):
+        return [self.store.get(k) for k in keys]
+
+    def set(self, key, value, ex=None, nx=False):
+        if nx and key in self.store:
+            return None
+        self.store[key] = value.encode() if isinstance(value, str) else value
+        return True
+
+    def hgetall(self, key):
+        return dict(self.store.get(key) or {})
+
+    def hset(self, key, mapping=None, **kwargs):
+        h = self.store.setdefault(key, {})
+        h.update(mapping or {})
+        return len(mapping or {})
+
+    def keys(self, pattern="*"):
+        return [k for k in self.store if fnmatch.fnmatch(k, pattern)]
+
+    def scan_iter(self, match="*", count=None):
+        return iter(self.keys(match))
+
+    def expire(self, key, seconds):
+        return key in self.store
+
+    def delete(self, *keys):
+        n = 0
+        for k in keys:
+            n += self.store.pop(k, None) is not None
+        return n
+
+    def sadd(self, key, *values):
+        members = self.store.setdefault(key, set())
+        before = len(members)
+        members.update(v.encode() if isinstance(v, str) else v for v in values)
+        return len(members) - before
+
+    def smembers(self, key):
+        return set(self.store.get(key) or ())
+
+    def spop(self, key, count=None):
+        members = self.store.get(key) or set()
+        popped = [members.pop() for _ in range(min(count or 1, len(members)))]
+        return popped if count is not None else (popped[0] if popped else None)
+
+    def register_script(self, script):
+        return UnlimitedScript(self)
+
+
+class UnlimitedScript:
+    """
+    rate_limit 的 token bucket script 換成全部放行：harness 量的是 API，不是 limiter 的額度
+    （匿名的 harness 會落在最小的 anonymous bucket，幾輪 /yield/trend 就 429）。
+    token bucket 本身的行為由 tests/test_rate_limit.py 驗證。
+    """
+
+    def __init__(self, redis):
+        self.registered_client = redis
+
+    def __call__(self, keys, args):
+        capacities = [args[2 + i * 2] for i in range(len(keys))]
+        return [1, 0, *(str(cap) for cap in capacities), "0"]
+
+
+class FakePipeline:
+    def __init__(self, redis: FakeRedis):
+        self.redis = redis
+        self.ops = []
+
+    def __getattr__(self, name):
+        def op(*args, **kwargs):
+            self.ops.append((name, args, kwargs))
+            return self
+        return op
+
+    def execute(self):
+        results = [getattr(self.redis, name)(*a, **kw) for name, a, kw in self.ops]
+        self.ops = []
+        return results
+
+
+def _within(location, shape: dict) -> bool:
+    """$geoWithin（legacy 平面座標）：$box / $center / $polygon。"""
+    if not isinstance(location, dict) or location.get("x") is None or location.get("y") is None:
+        return False
+    x, y = location["x"], location["y"]
+    if "$box" in shape:
+        (x1, y1), (x2, y2) = shape["$box"]
+        return x1 <= x <= x2 and y1 <= y <= y2
+    if "$center" in shape:
+        (cx, cy), r = shape["$center"]
+        return (x - cx) ** 2 + (y - cy) ** 2 <= r * r
+    # ray casting
+    inside, pts = False, shape["$polygon"]
+    for (ax, ay), (bx, by) in zip(pts, pts[1:] + pts[:1]):
+        if (ay > y) != (by > y) and x < (bx - ax) * (y - ay) / (by - ay) + ax:
+            inside = not inside
+    return inside
+
+
+def _match(doc: dict, flt: dict) -> bool:
+    for field, cond in flt.items():
+        if field == "$and":
+            if not all(_match(doc, f) for f in cond):
+                return False
+            continue
+        if field == "$nor":
+            if any(_match(doc, f) for f in cond):
+                return False
+            continue
+        value = doc
+        for part in field.split("."):
+            value = value.get(part) if isinstance(value, dict) else None
+        if isinstance(cond, dict):
+            if "$in" in cond and value not in cond["$in"]:
+                return False
+            if "$gt" in cond and not (value is not None and value > cond["$gt"]):
+                return False
+            if "$geoWithin" in cond and not _within(value, cond["$geoWithin"]):
+                return False
+        elif value != cond:
+            return False
+    return True
+
+
+class FakeCollection:
+    _ids = itertools.count(1)
+
+    def __init__(self):
+        self.docs = []
+
+    def find(self, flt=None, projection=None, sort=None, limit=0, hint=None):
+        docs = [dict(d) for d in self.docs if _match(d, flt or {})]
+        for field, direction in reversed(sort or []):
+            docs.sort(key=lambda d: d.get(field), reverse=direction < 0)
+        return docs[:limit] if limit else docs
+
+    def insert_one(self, doc):
+        doc.setdefault("_id", next(self._ids))
+        self.docs.append(doc)
+
+        class _Result:
+            inserted_id = doc["_id"]
+        return _Result()
+
+    def insert_many(self, docs):
+        for d in docs:
+            d.setdefault("_id", next(self._ids))
+        self.docs.extend(docs)
+        return True
+
+    def replace_one(self, flt, doc, upsert=False):
+        for i, d in enumerate(self.docs):
+            if _match(d, flt):
+                self.docs[i] = dict(doc, _id=d.get("_id"))
+                return True
+        if upsert:
+            self.insert_one(dict(doc))
+        return True
+
+    def delete_many(self, flt=None):
+        self.docs = [d for d in self.docs if not _match(d, flt or {})]
+        return True
+
+    def aggregate(self, pipeline):
+        # 只支援 $match 與單一欄位的 $group / $sum: 1
+        docs = self.docs
+        for stage in pipeline:
+            if "$match" in stage:
+                docs = [d for d in docs if _match(d, stage["$match"])]
+            elif "$group" in stage:
+                field = stage["$group"]["_id"].lstrip("$")
+                groups = {}
+                for d in docs:
+                    groups[d.get(field)] = groups.get(d.get(field), 0) + 1
+                docs = [{"_id": k, "count": v} for k, v in groups.items()]
+            else:
+                return []
+        return docs
+
+    def drop(self):
+        self.docs = []
+
+    def create_indexes(self, models):
+        return [m.document["name"] for m in models]
+
+
+class FakeMongoDB:
+    def __init__(self):
+        self.collections = {}
+
+    def __getitem__(self, name):
+        if name not in self.collections:
+            self.collections[name] = FakeCollection()
+        return self.collections[name]
+
+
+class FakeAsyncCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def to_list(self, length=None):
+        return self.docs if length is None else self.docs[:length]
+
+
+class FakeAsyncCollection:
+    def __init__(self, coll: FakeCollection):
+        self.coll = coll
+
+    def find(self, flt=None, projection=None):
+        return FakeAsyncCursor(self.coll.find(flt, projection))
+
+
+class FakeAsyncMongoDB:
+    """AsyncMongoClient 介面，資料跟 FakeMongoDB 共用。"""
+
+    def __init__(self, sync_db: FakeMongoDB):
+        self.sync_db = sync_db
+
+    def __getitem__(self, name):
+        return FakeAsyncCollection(self.sync_db[name])
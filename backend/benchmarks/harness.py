@@ -0,0 +1,85 @@
+# benchmarks/harness.py
+"""
+把 app.main.app 接到 SQLite in-memory + FakeRedis / FakeMongo，
+讓 benchmark 不需要 Postgres / Mongo / Redis container 也能在本機重現。
+"""
+from datetime import date
+
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app.services.seed_data import SeedData, generate_seed_data
+from benchmarks.fakes import FakeAsyncMongoDB, FakeMongoDB, FakeRedis
+
+# 固定結束日期，不用 date.today()，結果才不會隨執行日期改變
+SEED_END_DATE = date(2025, 1, 31)
+
+SCALES = {
+    "small": {"days": 7, "lots_per_combo": (1, 3)},
+    "medium": {"days": 30, "lots_per_combo": (2, 4)},
+    "large": {"days": 90, "lots_per_combo": (3, 6)},
+}
+
+
+class Harness:
+    def __init__(self):
+        from app.database.database import get_session, get_session_factory
+        from app.main import app
+
+        self.app = app
+        self.engine = create_async_engine(
+            "sqlite+aiosqlite:///:memory:",
+            poolclass=StaticPool,
+            connect_args={"check_same_thread": False},
+        )
+        self.sessionmaker = async_sessionmaker(bind=self.engine, class_=AsyncSession, expire_on_commit=False)
+        self.redis = FakeRedis()
+        self.mongo = FakeMongoDB()
+
+        async def override_get_session():
+            async with self.sessionmaker() as session:
+                yield session
+
+        app.dependency_overrides[get_session] = override_get_session
+        app.dependency_overrides[get_session_factory] = lambda: self.sessionmaker
+        self._patch_stores()
+
+    def _patch_stores(self):
+        from app.common import cache_key, rate_limit
+        from app.database import mongo as mongo_module
+        from app.routers import detail_router, seed_router, yield_router
+        from app.services import redis_client
+
+        redis_client.redis_cache = self.redis
+        redis_client.redis_ratelimit = self.redis
+        rate_limit.redis_ratelimit = self.redis
+        cache_key.redis_cache = self.redis
+        yield_router.redis_cache = self.redis
+        yield_router.mongo_db = self.mongo
+        yield_router.async_mongo_db = FakeAsyncMongoDB(self.mongo)
+        detail_router.mongo_db = self.mongo
+        seed_router.mongo_db = self.mongo
+        mongo_module.mongo_db = self.mongo
+
+    async def create_schema(self):
+        from app.models.base import Base
+
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    async def seed(self, scale: str = "small", seed: int = 42) -> SeedData:
+        """依 scale 產生固定 seed 的資料；同一個 scale 每次結果都一樣，跨 commit 可比較。"""
+        data = generate_seed_data(SEED_END_DATE, seed=seed, **SCALES[scale])
+
+        async with self.sessionmaker() as session:
+            session.add_all(data.lots)
+            await session.commit()
+            session.add_all(data.yields)
+            session.add_all(data.summaries)
+            await session.commit()
+        self.mongo["defect_detail"].insert_many([dict(d) for d in data.defect_docs])
+        return data
+
+    def client(self) -> AsyncClient:
+        return AsyncClient(transport=ASGITransport(app=self.app), base_url="http://bench")
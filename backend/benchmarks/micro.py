@@ -0,0 +1,53 @@
+# benchmarks/micro.py
+"""不經過 HTTP 的熱點函式 microbenchmark。"""
+import json
+from typing import List
+
+from benchmarks.core import bench_sync
+from benchmarks.fakes import FakeRedis
+
+
+def run_micro(data) -> List[dict]:
+    from app.common import rate_limit
+    from app.common.cache_key import make_cache_key
+    from app.routers.detail_router import DefectDetailOut
+    from app.services.clustering import cluster_points
+    from app.services.trend import aggregate_daily_yield, aggregate_pareto, to_defect_points
+    from benchmarks.clustering import synthetic_lot
+
+    yield_rows = [(y.timestamp.date().isoformat(), y.yield_rate) for y in data.yields]
+    summary_rows = [(s.defect_type, s.count) for s in data.summaries]
+    docs = data.defect_docs
+    points = to_defect_points(docs)
+    dates, avg_yield = aggregate_daily_yield(yield_rows)
+    trend_result = {
+        "dates": dates,
+        "avg_yield": avg_yield,
+        "defect_pareto": aggregate_pareto(summary_rows),
+        "defect_details": points,
+    }
+    trend_params = {
+        "date_from": dates[0],
+        "date_to": dates[-1],
+        "station": "AOI-01",
+        "product": "PKG-A",
+        "lots": data.lot_ids[:200],
+    }
+
+    fake_redis = FakeRedis()
+    rate_limit.redis_ratelimit = fake_redis
+    detail_docs = [dict(d, id=str(i)) for i, d in enumerate(docs[:500])]
+    # seed 資料每個 lot 的點不多，cluster 另外用 100k 點的合成 lot
+    big_lot, _planted = synthetic_lot(points=100_000, wafers=25)
+
+    return [
+        bench_sync("trend.aggregate_daily_yield", lambda: aggregate_daily_yield(yield_rows), number=10),
+        bench_sync("trend.aggregate_pareto", lambda: aggregate_pareto(summary_rows), number=10),
+        bench_sync("trend.to_defect_points", lambda: to_defect_points(docs), number=5),
+        bench_sync("cache_key.make_cache_key", lambda: make_cache_key("yield_trend", trend_params), number=1000),
+        bench_sync("rate_limit.rate_limiter", lambda: rate_limit.rate_limiter("bench", max_tokens=10**9, refill_rate=10**9),
+                   number=1000),
+        bench_sync("serialize.trend_json_dumps", lambda: json.dumps(trend_result), number=5),
+        bench_sync("serialize.detail_pydantic", lambda: [DefectDetailOut(**d) for d in detail_docs], number=2),
+        bench_sync("clustering.cluster_points_100k", lambda: cluster_points(big_lot), number=1, rounds=10),
+    ]
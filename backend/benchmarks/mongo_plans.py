@@ -0,0 +1,143 @@
+# benchmarks/mongo_plans.py
+"""
+用 explain() 檢查熱門 Mongo 查詢的執行計畫（需要 MongoDB）。
+
+    MONGO_URL=mongodb://localhost:27017 python -m benchmarks.mongo_plans --scale small
+
+在獨立的 database（bench_mongo_plans）灌入 seed 資料、建 app.database.mongo_indexes 的 index，
+逐一 explain 下面的查詢：任何一個出現 COLLSCAN、或有排序的查詢出現 SORT（index 沒辦法提供順序，
+要先讀完所有符合的 document 再排序）時 exit code = 1；標記 covered 的查詢若有 FETCH（讀了 document）也算失敗。
+跑完會 drop 掉該 database。
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+from typing import Iterable, List
+
+from app.database.mongo_indexes import DEFECT_POINT_PROJECTION, ensure_indexes
+from app.services.regions import (
+    POINT_PROJECTION, REGION_INDEX, REGION_SORT, page_queries, region_filter, shape_cells, shape_filter,
+)
+from app.services.seed_data import generate_seed_data
+from benchmarks.harness import SCALES, SEED_END_DATE
+
+DB_NAME = "bench_mongo_plans"
+
+
+def _region_page(name: str, lots: List[str] = None, **shape) -> dict:
+    """/defects/region 第一頁：跟 find_page 同樣的 filter / sort / limit / hint。"""
+    flt = page_queries(region_filter(shape_filter(**shape), lots), shape_cells(**shape))[0]
+    return {"name": name, "collection": "defect_detail", "covered": False, "filter": flt,
+            "projection": POINT_PROJECTION, "sort": REGION_SORT, "limit": 501, "hint": REGION_INDEX}
+
+
+def hot_queries(lot_ids: List[str], since: datetime) -> List[dict]:
+    """跟 router 裡的查詢同樣的 filter / projection（有分頁的查詢連 sort / limit 一起）。"""
+    lots = lot_ids[:50]
+    return [
+        {"name": "yield_trend.points", "collection": "defect_detail", "covered": True,
+         "filter": {"lot_id": {"$in": lots}}, "projection": DEFECT_POINT_PROJECTION},
+        {"name": "yield_trend.delta_points", "collection": "defect_detail", "covered": False,
+         "filter": {"lot_id": {"$in": lots}, "created_at": {"$gt": since}},
+         "projection": {**DEFECT_POINT_PROJECTION, "_id": 1}},
+        {"name": "yield_trend.aggregates", "collection": "defect_detail_agg", "covered": False,
+         "filter": {"lot_id": {"$in": lots}}, "projection": {"_id": 0, "cell": 0}},
+        {"name": "detail.by_lot", "collection": "defect_detail", "covered": False,
+         "filter": {"lot_id": lot_ids[0]}, "projection": None},
+        {"name": "retention.due", "collection": "defect_detail", "covered": False,
+         "filter": {"created_at": {"$lt": since}}, "projection": None},
+        _region_page("defects.region.ring", lots, ring=(40.0, 50.0)),
+        _region_page("defects.region.box", box=(50.0, 50.0, 100.0, 100.0)),
+    ]
+
+
+def plan_stages(plan: dict) -> List[str]:
+    """winningPlan 裡所有 stage 名稱（classic 的 inputStage(s) 與 SBE 的 queryPlan 都會走訪）。"""
+    stages = []
+
+    def walk(node):
+        if not isinstance(node, dict):
+            return
+        if "stage" in node:
+            stages.append(node["stage"])
+        for key in ("queryPlan", "inputStage"):
+            walk(node.get(key))
+        for child in node.get("inputStages", []):
+            walk(child)
+
+    walk(plan)
+    return stages
+
+
+def check_plan(query: dict, explain: dict) -> dict:
+    stages = plan_stages(explain["queryPlanner"]["winningPlan"])
+    stats = explain.get("executionStats", {})
+    problems = []
+    if "COLLSCAN" in stages:
+        problems.append("COLLSCAN")
+    if "SORT" in stages:
+        problems.append("SORT")
+    if query["covered"] and ("FETCH" in stages or stats.get("totalDocsExamined", 0) > 0):
+        problems.append("not covered")
+    return {
+        "name": query["name"],
+        "stages": stages,
+        "keys_examined": stats.get("totalKeysExamined"),
+        "docs_examined": stats.get("totalDocsExamined"),
+        "returned": stats.get("nReturned"),
+        "problems": problems,
+    }
+
+
+def run_checks(db, queries: Iterable[dict]) -> List[dict]:
+    rows = []
+    for q in queries:
+        cursor = db[q["collection"]].find(q["filter"], q["projection"], sort=q.get("sort"), limit=q.get("limit", 0))
+        if q.get("hint"):
+            cursor = cursor.hint(q["hint"])
+        rows.append(check_plan(q, cursor.explain()))
+    return rows
+
+
+def main(argv=None) -> int:
+    from pymongo import MongoClient
+
+    from app.services.retention import AGG, downsample
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo-url", default=os.getenv("MONGO_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="結果寫成 JSON 檔")
+    args = parser.parse_args(argv)
+
+    data = generate_seed_data(SEED_END_DATE, seed=args.seed, **SCALES[args.scale])
+    created_at = datetime.combine(SEED_END_DATE, datetime.min.time())
+    docs = [dict(d, created_at=created_at) for d in data.defect_docs]
+
+    client = MongoClient(args.mongo_url, serverSelectionTimeoutMS=5000)
+    db = client[DB_NAME]
+    try:
+        client.drop_database(DB_NAME)
+        db["defect_detail"].insert_many(docs)
+        db[AGG].insert_many(downsample(docs, cell_size=5.0))
+        ensure_indexes(db)
+        rows = run_checks(db, hot_queries(data.lot_ids, created_at - timedelta(days=1)))
+    finally:
+        client.drop_database(DB_NAME)
+        client.close()
+
+    for r in rows:
+        flag = ", ".join(r["problems"]) or "ok"
+        print(f"{r['name']:<28} {' <- '.join(reversed(r['stages'])):<40} "
+              f"keys {r['keys_examined']!s:>6}  docs {r['docs_examined']!s:>6}  {flag}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"dataset": {"defect_details": len(docs)}, "plans": rows}, f, indent=2)
+    return 1 if any(r["problems"] for r in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
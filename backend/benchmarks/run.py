@@ -0,0 +1,83 @@
+# benchmarks/run.py
+"""
+本機可重現的 benchmark suite（不需要 Postgres / Mongo / Redis，也不連外部 host）。
+
+    cd backend
+    python -m benchmarks.run --scale small --output bench.json
+    python -m benchmarks.run --scale small --baseline bench.json --threshold 0.15
+
+- 資料由 app.services.seed_data 以固定 seed / 固定日期產生，--scale 控制資料量。
+- 結果寫成 JSON（含 commit / python 版本），可存成 baseline 供下次比較。
+- 任何 benchmark 的 median 比 baseline 慢超過 threshold 時 exit code = 1。
+"""
+import argparse
+import asyncio
+import json
+import sys
+
+from benchmarks.core import compare, environment_info, load_results
+from benchmarks.harness import SCALES, Harness
+
+
+async def _run(args) -> dict:
+    harness = Harness()
+    await harness.create_schema()
+    data = await harness.seed(scale=args.scale, seed=args.seed)
+
+    results = []
+    if args.suite in ("all", "micro"):
+        from benchmarks.micro import run_micro
+
+        results += run_micro(data)
+    if args.suite in ("all", "api"):
+        from benchmarks.endpoints import run_endpoints
+
+        results += await run_endpoints(harness, data, rounds=args.rounds)
+
+    return {
+        "meta": environment_info(args.scale),
+        "dataset": {
+            "lots": len(data.lots),
+            "yield_records": len(data.yields),
+            "defect_summaries": len(data.summaries),
+            "defect_details": len(data.defect_docs),
+        },
+        "results": {r["name"]: r for r in results},
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--suite", choices=["all", "micro", "api"], default="all")
+    parser.add_argument("--rounds", type=int, default=50, help="API benchmark rounds")
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--baseline", help="compare against a previous results JSON")
+    parser.add_argument("--threshold", type=float, default=0.15, help="allowed slowdown ratio (0.15 = 15%%)")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(_run(args))
+
+    for r in report["results"].values():
+        print(f"{r['name']:<36} median {r['median_us']:>12.1f} us   p95 {r['p95_us']:>12.1f} us")
+
+    exit_code = 0
+    if args.baseline:
+        rows = compare(report["results"], load_results(args.baseline), args.threshold)
+        report["comparison"] = {"baseline": args.baseline, "threshold": args.threshold, "rows": rows}
+        print(f"\nvs {args.baseline} (threshold {args.threshold:.0%})")
+        for row in rows:
+            flag = "REGRESSION" if row["regression"] else "ok"
+            print(f"{row['name']:<36} {row['change_pct']:>+8.2f}%  {flag}")
+        if any(row["regression"] for row in rows):
+            exit_code = 1
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+# benchmarks/tracing_overhead.py
+"""
+量測 tracing 開啟時的額外延遲。
+
+    python -m benchmarks.tracing_overhead --rounds 5 --requests 300 --max-overhead 2.0
+
+off / on 兩種模式各自跑在獨立的 process（tracer provider 是全域的，無法在同一個 process 還原），
+交錯執行多輪後取中位數比較，超過 --max-overhead（%）時 exit code = 1。
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+
+class _NullExporter:
+    """不送出任何資料的 exporter，只量 SDK / instrumentation 本身的成本。"""
+
+    def export(self, spans):
+        from opentelemetry.sdk.trace.export import SpanExportResult
+
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self):
+        pass
+
+    def force_flush(self, timeout_millis=30000):
+        return True
+
+
+async def _run_worker(mode: str, requests: int) -> dict:
+    from benchmarks.harness import Harness
+
+    harness = Harness()
+    await harness.create_schema()
+    data = await harness.seed()
+
+    if mode == "on":
+        from app.common.db_tracing import setup_sqlalchemy_tracing
+        from app.common.tracing import instrument_fastapi, setup_tracing
+
+        setup_tracing("factory-backend-bench", exporter=_NullExporter())
+        instrument_fastapi(harness.app)
+        setup_sqlalchemy_tracing(harness.engine)
+
+    date_from = min(y.timestamp for y in data.yields).date()
+    date_to = max(y.timestamp for y in data.yields).date()
+    lots = [lot.lot_id for lot in data.lots if lot.station == "AOI-01" and lot.product == "PKG-A"]
+    calls = [
+        ("/filter/dates", {}),
+        ("/filter/machines", {"date_from": date_from, "date_to": date_to}),
+        ("/yield/trend", {"date_from": date_from, "date_to": date_to,
+                          "station": "AOI-01", "product": "PKG-A", "lots": lots}),
+    ]
+
+    async with harness.client() as client:
+        for path, params in calls * 10:  # warm up
+            await client.get(path, params=params)
+        harness.redis.store.clear()
+
+        samples = []
+        for i in range(requests):
+            path, params = calls[i % len(calls)]
+            if path == "/yield/trend":
+                harness.redis.store.clear()  # 量 cold path，避免只量到 cache hit
+            start = time.perf_counter()
+            resp = await client.get(path, params=params)
+            samples.append(time.perf_counter() - start)
+            assert resp.status_code == 200, (path, resp.status_code)
+
+    return {"mode": mode, "median_ms": statistics.median(samples) * 1000, "mean_ms": statistics.fmean(samples) * 1000}
+
+
+def _spawn(mode: str, requests: int) -> dict:
+    out = subprocess.run(
+        [sys.executable, "-m", "benchmarks.tracing_overhead", "--worker", mode, "--requests", str(requests)],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--max-overhead", type=float, default=2.0, help="percent")
+    parser.add_argument("--output", help="write JSON result to this path")
+    parser.add_argument("--worker", choices=["off", "on"], help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        print(json.dumps(asyncio.run(_run_worker(args.worker, args.requests))))
+        return 0
+
+    off, on = [], []
+    for _ in range(args.rounds):
+        off.append(_spawn("off", args.requests)["median_ms"])
+        on.append(_spawn("on", args.requests)["median_ms"])
+
+    off_ms, on_ms = statistics.median(off), statistics.median(on)
+    overhead = (on_ms - off_ms) / off_ms * 100
+    result = {
+        "benchmark": "tracing_overhead",
+        "off_median_ms": round(off_ms, 4),
+        "on_median_ms": round(on_ms, 4),
+        "overhead_pct": round(overhead, 2),
+        "max_overhead_pct": args.max_overhead,
+        "passed": overhead <= args.max_overhead,
+    }
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+    return 0 if result["passed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
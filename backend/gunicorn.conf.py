@@ -0,0 +1,42 @@
+# gunicorn.conf.py
+# 用法：python -m app.server（或 gunicorn app.main:app -c gunicorn.conf.py）
+import os
+
+from app.server import bootstrap_once, init_worker_process, prepare_metrics_dir, worker_count
+
+# python -m app.server 已經設定好時沿用（exec 前已清空），直接跑 gunicorn 時在這裡建立
+if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+    prepare_metrics_dir()
+
+from app.config.config import settings  # noqa: E402
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = worker_count()
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# 讓每個 worker 的 pool 依實際 worker 數切分（app.database.database.pool_options）
+settings.web_concurrency = workers
+
+# master 先 import 一次 app，worker fork 出來共用記憶體、啟動更快
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() == "true"
+
+# SIGTERM：停止接新連線，最多等 graceful_timeout 秒讓 in-flight request 做完
+graceful_timeout = settings.graceful_timeout
+timeout = 60
+keepalive = 5
+
+accesslog = None  # access log 由 app 自己的 middleware 抽樣輸出
+
+
+def on_starting(server):
+    bootstrap_once()
+
+
+def post_fork(server, worker):
+    init_worker_process()
+
+
+def child_exit(server, worker):
+    from app.common.metrics import mark_worker_dead
+
+    mark_worker_dead(worker.pid)
@@ -1,52 +1,302 @@
-from locust import HttpUser, task, between
+"""
+情境化的壓測腳本。
+
+    # 本機
+    LOAD_PROFILE=steady locust -f load_test/locustfile.py --host http://localhost:8000 \
+        --headless -u 50 -r 10 -t 5m
+
+環境變數：
+    LOAD_PROFILE     load_test/profiles.json 裡的 profile 名稱（預設 steady）
+    SEED_MANIFEST    可選，JSON 檔：{"queries": [{"date_from", "date_to", "station", "product", "lots"}]}
+                     沒給的話開始前會透過 /filter/* 探索真實的日期 / 機台 / recipe / lot
+    LOAD_USER / LOAD_PASSWORD   探索查詢組合時的登入帳號（預設 admin / admin）
+    LOAD_ROLE        每個模擬使用者各自建立一個帳號（/user/add，load-{RUN_ID}-{n}）的 role（預設 engineer）；
+                     rate limit 的 bucket 是每個帳號一個，全部共用同一個帳號量到的會是 limiter 而不是 API。
+                     使用者停止時（on_stop）刪掉自己的帳號；壓測被強制中斷留下的帳號都是 load- 開頭
+    SLO_REPORT       結束時輸出的 SLO 報告路徑（預設 slo_report.json）
+
+結束時依 profile 的 slo_ms 檢查每個 endpoint 的 p50 / p95 / p99，
+有任何一項不合格 locust 的 exit code 會是 1。
+"""
+import fnmatch
+import itertools
+import json
+import os
 import random
+import uuid
+
+import requests
+from locust import HttpUser, between, events
+
+PROFILE_PATH = os.path.join(os.path.dirname(__file__), "profiles.json")
+PROFILE_NAME = os.getenv("LOAD_PROFILE", "steady")
+
+with open(PROFILE_PATH) as f:
+    PROFILE = json.load(f)[PROFILE_NAME]
+
+USERNAME = os.getenv("LOAD_USER", "admin")
+PASSWORD = os.getenv("LOAD_PASSWORD", "admin")
+ROLE = os.getenv("LOAD_ROLE", "engineer")
+
+# test_start 時填入：[{"date_from", "date_to", "station", "product", "lots"}]
+CATALOG = []
+HOT_SET = []
+DEFECT_TYPES = ["Scratch", "Particle", "Bridge", "Crack"]
+RUN_ID = uuid.uuid4().hex[:6].upper()
+_lot_counter = itertools.count()
+_user_counter = itertools.count()
+
+
+def _login(base_url: str) -> dict:
+    resp = requests.post(f"{base_url}/auth/login", data={"username": USERNAME, "password": PASSWORD}, timeout=10)
+    if resp.status_code != 200:
+        return {}
+    return {"Authorization": f"Bearer {resp.json()['access_token']}"}
+
+
+def _discover(base_url: str, headers: dict) -> list:
+    """透過 /filter/* 找出真實存在的查詢組合。"""
+    dates = requests.get(f"{base_url}/filter/dates", headers=headers, timeout=30).json()
+    if not dates:
+        return []
+
+    queries = []
+    # 取最近 30 天內的幾種區間長度，模擬使用者選 1 天 / 1 週 / 1 個月
+    recent = dates[-30:]
+    for span in (1, 7, 30):
+        window = recent[-span:]
+        date_from, date_to = window[0], window[-1]
+        params = {"date_from": date_from, "date_to": date_to}
+        for station in requests.get(f"{base_url}/filter/machines", params=params, headers=headers, timeout=30).json():
+            recipes = requests.get(
+                f"{base_url}/filter/recipes", params={**params, "station": station}, headers=headers, timeout=30
+            ).json()
+            for product in recipes:
+                lots = requests.get(
+                    f"{base_url}/filter/lots",
+                    params={**params, "station": station, "product": product},
+                    headers=headers, timeout=30,
+                ).json()
+                if lots:
+                    queries.append(
+                        {"date_from": date_from, "date_to": date_to, "station": station, "product": product, "lots": lots}
+                    )
+    return queries
+
+
+@events.test_start.add_listener
+def on_test_start(environment, **kwargs):
+    manifest = os.getenv("SEED_MANIFEST")
+    if manifest:
+        with open(manifest) as f:
+            queries = json.load(f)["queries"]
+    else:
+        base_url = environment.host.rstrip("/")
+        queries = _discover(base_url, _login(base_url))
+
+    if not queries:
+        raise RuntimeError("No data found for load test; seed the database (/seed/sql) or pass SEED_MANIFEST")
+
+    CATALOG[:] = queries
+    rng = random.Random(0)
+    HOT_SET[:] = [_trim(q, rng) for q in rng.sample(queries, min(PROFILE["hot_set_size"], len(queries)))]
+
+
+def _trim(query: dict, rng: random.Random) -> dict:
+    lots = query["lots"]
+    limit = PROFILE["max_lots_per_query"]
+    if len(lots) > limit:
+        lots = sorted(rng.sample(lots, limit))
+    return {**query, "lots": lots}
+
+
+def _weighted(available: dict) -> dict:
+    """profile weights -> locust tasks；權重 0 的 task 不註冊。"""
+    return {available[name]: weight for name, weight in PROFILE["weights"].items() if weight > 0}
+
+
+def _cold_query() -> dict:
+    """隨機挑組合 + 隨機 lot 子集合，幾乎不會打到同一個 cache key。"""
+    query = random.choice(CATALOG)
+    lots = query["lots"]
+    k = random.randint(1, min(len(lots), PROFILE["max_lots_per_query"]))
+    return {**query, "lots": random.sample(lots, k)}
+
 
 class DashboardUser(HttpUser):
-    # host = "http://localhost:8000"  # <--- 你 backend 的 API 位置
-    host = "https://factory-yield-dashboard.onrender.com"  # <--- 你 backend 的 API 位置
     wait_time = between(1, 4)
 
     def on_start(self):
-        """ 每個使用者啟動時登入取得 JWT """
+        """ 每個使用者建立自己的帳號再登入取得 JWT（各自一個 rate limit bucket，跟真實的使用者一樣） """
+        username = f"load-{RUN_ID}-{next(_user_counter)}"
+        password = uuid.uuid4().hex
+        self.client.post(
+            "/user/add",
+            params={"username": username, "password": password, "role": ROLE},
+            name="/user/add",
+        )
         resp = self.client.post(
             "/auth/login",
-            data={"username": "admin", "password": "admin"}
+            data={"username": username, "password": password},
+            name="/auth/login",
         )
+        self.username = username
         if resp.status_code == 200:
-            self.token = resp.json()["access_token"]
-            self.headers = {"Authorization": f"Bearer {self.token}"}
+            self.headers = {"Authorization": f"Bearer {resp.json()['access_token']}"}
         else:
-            self.token = None
             self.headers = {}
 
-    @task(1)
-    def filter_machines(self):
-        self.client.get(
-            "/filter/machines",
-            params={"date_from": "2025-12-02", "date_to": "2025-12-07"},
-            headers=self.headers
+    def on_stop(self):
+        """ 壓測用的帳號不留在系統裡 """
+        self.client.delete(f"/user/delete/{self.username}", headers=self.headers, name="/user/delete/[username]")
+
+    # ---------------- read ----------------
+    def browse_filters(self):
+        q = random.choice(CATALOG)
+        params = {"date_from": q["date_from"], "date_to": q["date_to"]}
+        step = random.randint(0, 2)
+        if step == 0:
+            self.client.get("/filter/machines", params=params, headers=self.headers, name="/filter/machines")
+        elif step == 1:
+            self.client.get("/filter/recipes", params={**params, "station": q["station"]},
+                            headers=self.headers, name="/filter/recipes")
+        else:
+            self.client.get("/filter/lots", params={**params, "station": q["station"], "product": q["product"]},
+                            headers=self.headers, name="/filter/lots")
+
+    def trend(self):
+        if random.random() < PROFILE["cold_ratio"]:
+            q, name = _cold_query(), "/yield/trend (cold)"
+        else:
+            q, name = random.choice(HOT_SET), "/yield/trend (warm)"
+        self.client.get("/yield/trend", params=q, headers=self.headers, name=name)
+
+    def detail(self):
+        lot_id = random.choice(random.choice(CATALOG)["lots"])
+        self.client.get("/detail/by_lot", params={"lot_id": lot_id}, headers=self.headers, name="/detail/by_lot")
+
+    # ---------------- write（會觸發 cache invalidation） ----------------
+    def write_lot(self):
+        q = random.choice(CATALOG)
+        total = random.randint(500, 1200)
+        self.client.post(
+            "/add",
+            params={
+                "lot_id": f"LT{RUN_ID}{next(_lot_counter):06d}",
+                "product": q["product"],
+                "station": q["station"],
+                "total": total,
+                "good": total - random.randint(0, total // 5),
+            },
+            headers=self.headers,
+            name="/add",
         )
 
-    @task(2)
-    def filter_recipes(self):
-        self.client.get(
-            "/filter/recipes",
-            params={"date_from": "2025-12-02", "date_to": "2025-12-07",  "station": "AOI-01"},
-            headers=self.headers
+    def write_detail(self):
+        lot_id = random.choice(random.choice(CATALOG)["lots"])
+        self.client.post(
+            "/detail/add",
+            json={
+                "lot_id": lot_id,
+                "defect_type": random.choice(DEFECT_TYPES),
+                "location": {"x": round(random.uniform(0, 100), 2), "y": round(random.uniform(0, 100), 2)},
+                "wafer": random.randint(1, 25),
+                "severity": random.choice(["L", "M", "H"]),
+            },
+            headers=self.headers,
+            name="/detail/add",
         )
 
-    @task(3)
-    def filter_lots(self):
-        self.client.get(
-            "/filter/lots",
-            params={"date_from": "2025-12-02", "date_to": "2025-12-07", "station": "AOI-01", "product": "PKG-A"},
-            headers=self.headers
+    def update_lot(self):
+        lot_id = random.choice(random.choice(CATALOG)["lots"])
+        self.client.put(f"/update/{lot_id}", json={"good": random.randint(400, 1000)},
+                        headers=self.headers, name="/update/[lot_id]")
+
+    def ingest(self):
+        q = random.choice(CATALOG)
+        total = random.randint(500, 1200)
+        remain = random.randint(0, total // 5)
+        defects = []
+        for defect_type in DEFECT_TYPES:
+            count = random.randint(0, remain)
+            remain -= count
+            if count:
+                defects.append({
+                    "defect_type": defect_type,
+                    "count": count,
+                    "points": [
+                        {"x": round(random.uniform(0, 100), 2), "y": round(random.uniform(0, 100), 2),
+                         "wafer": random.randint(1, 25), "severity": random.choice(["L", "M", "H"])}
+                        for _ in range(min(count, 20))
+                    ],
+                })
+        self.client.post(
+            "/ingest/lot",
+            json={
+                "lot_id": f"IN{RUN_ID}{next(_lot_counter):06d}",
+                "station": q["station"],
+                "product": q["product"],
+                "total": total,
+                "good": total - sum(d["count"] for d in defects),
+                "defects": defects,
+            },
+            headers=self.headers,
+            name="/ingest/lot",
         )
 
-    @task(4)
-    def yield_trend(self):
-        self.client.get(
-            "/yield/trend",
-            params={"date_from": "2025-11-30", "date_to": "2025-12-06", "station": "AOI-01", "product": "PKG-A", "lots": "LOT01000"},
-            headers=self.headers
-        )
\ No newline at end of file
+    tasks = _weighted({
+        "filter": browse_filters,
+        "trend": trend,
+        "detail": detail,
+        "write_lot": write_lot,
+        "write_detail": write_detail,
+        "update_lot": update_lot,
+        "ingest": ingest,
+    })
+
+
+# ---------------- SLO report ----------------
+def _match_slo(name: str):
+    for pattern, slo in PROFILE.get("slo_ms", {}).items():
+        if fnmatch.fnmatchcase(name, pattern):
+            return pattern, slo
+    return None, None
+
+
+@events.quitting.add_listener
+def on_quitting(environment, **kwargs):
+    report = {"profile": PROFILE_NAME, "endpoints": [], "passed": True}
+
+    for (name, method), entry in sorted(environment.stats.entries.items()):
+        pattern, slo = _match_slo(name)
+        row = {
+            "name": name,
+            "method": method,
+            "requests": entry.num_requests,
+            "failures": entry.num_failures,
+            "p50_ms": entry.get_response_time_percentile(0.5),
+            "p95_ms": entry.get_response_time_percentile(0.95),
+            "p99_ms": entry.get_response_time_percentile(0.99),
+            "slo": pattern,
+            "checks": {},
+        }
+        if slo and entry.num_requests:
+            for pct, limit in slo.items():
+                actual = row[f"{pct}_ms"]
+                row["checks"][pct] = {"limit_ms": limit, "actual_ms": actual, "passed": actual <= limit}
+            row["passed"] = all(c["passed"] for c in row["checks"].values())
+            report["passed"] = report["passed"] and row["passed"]
+        report["endpoints"].append(row)
+
+    path = os.getenv("SLO_REPORT", "slo_report.json")
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\nSLO report ({PROFILE_NAME}) -> {path}")
+    for row in report["endpoints"]:
+        status = {True: "PASS", False: "FAIL"}.get(row.get("passed"), "-")
+        print(f"  {status:<4} {row['method']:<6} {row['name']:<28} "
+              f"p50={row['p50_ms']:.0f} p95={row['p95_ms']:.0f} p99={row['p99_ms']:.0f} ms")
+
+    if not report["passed"]:
+        environment.process_exit_code = 1
@@ -1,4 +1,6 @@
 # backend/tests/conftest.py
+import fnmatch
+
 import pytest
 from httpx import AsyncClient, ASGITransport
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
@@ -6,7 +8,7 @@ from sqlalchemy.orm import sessionmaker
 
 from app.main import app
 from app.models.base import Base
-from app.database.database import get_session as real_get_session
+from app.database.database import get_session as real_get_session, get_session_factory
 
 
 # ==============================
@@ -34,20 +36,52 @@ async def override_get_session() -> AsyncSession:
 #   Dummy Redis / Mongo
 # ==============================
 
+class TokenBucketScript:
+    """app.common.rate_limit.TOKEN_BUCKET_LUA 的 Python 版（只支援這一支 script）；跟 Lua 的一致性在 test_rate_limit 驗證。"""
+
+    def __init__(self, redis):
+        self.registered_client = redis
+
+    def __call__(self, keys, args):
+        now, cost = float(args[0]), float(args[1])
+        store = self.registered_client.store
+        state, denied, retry = [], 0, 0.0
+        for i, key in enumerate(keys):
+            cap, rate = float(args[2 + i * 2]), float(args[3 + i * 2])
+            h = store.get(key) or {}
+            tokens = float(h.get("tokens", cap))
+            ts = float(h.get("timestamp", now))
+            tokens = min(cap, tokens + max(0.0, now - ts) * rate)
+            need = min(cost, cap)
+            if tokens < need:
+                denied = denied or i + 1
+                retry = max(retry, (need - tokens) / rate)
+            state.append((key, tokens, need))
+        out = [0 if denied else 1, denied]
+        for key, tokens, need in state:
+            if not denied:
+                tokens -= need
+            store[key] = {"tokens": tokens, "timestamp": now}
+            out.append(str(tokens))
+        out.append(str(retry))
+        return out
+
+
 class DummyPipeline:
-    def __init__(self, store: dict):
-        self.store = store
+    """把呼叫記下來，execute 時照順序在 DummyRedis 上執行。"""
+
+    def __init__(self, redis: "DummyRedis"):
+        self.redis = redis
         self.ops = []
 
-    def hgetall(self, key: str):
-        self.ops.append(("hgetall", key))
-        return self
+    def __getattr__(self, name):
+        def op(*args, **kwargs):
+            self.ops.append((name, args, kwargs))
+            return self
+        return op
 
     def execute(self):
-        results = []
-        for op, key in self.ops:
-            if op == "hgetall":
-                results.append(self.store.get(key, {}))
+        results = [getattr(self.redis, name)(*a, **kw) for name, a, kw in self.ops]
         self.ops.clear()
         return results
 
@@ -62,24 +96,57 @@ class DummyRedis:
 
     # rate_limit 用
     def pipeline(self):
-        return DummyPipeline(self.store)
+        return DummyPipeline(self)
 
     def hset(self, key: str, mapping: dict):
         self.store[key] = mapping
 
+    def hgetall(self, key: str):
+        return self.store.get(key, {})
+
     # cache_key 用
     def keys(self, pattern="*"):
         return list(self.store.keys())
 
+    def scan_iter(self, match="*", count=None):
+        return iter([k for k in list(self.store) if fnmatch.fnmatchcase(k, match)])
+
+    def expire(self, key: str, seconds):
+        return key in self.store
+
     def delete(self, *keys):
         for k in keys:
             self.store.pop(k, None)
 
+    # clustering 的待算清單用
+    def sadd(self, key: str, *values):
+        members = self.store.setdefault(key, set())
+        before = len(members)
+        members.update(values)
+        return len(members) - before
+
+    def smembers(self, key: str):
+        return set(self.store.get(key) or ())
+
+    def spop(self, key: str, count=None):
+        members = self.store.get(key) or set()
+        popped = [members.pop() for _ in range(min(count or 1, len(members)))]
+        return popped if count is not None else (popped[0] if popped else None)
+
+    def register_script(self, script):
+        # 只有 rate_limit 的 token bucket script
+        return TokenBucketScript(self)
+
     # 一般 get/set
     def get(self, key: str):
         return self.store.get(key)
 
-    def set(self, key: str, value, ex=None):
+    def mget(self, keys):
+        return [self.store.get(k) for k in keys]
+
+    def set(self, key: str, value, ex=None, nx=False):
+        if nx and key in self.store:
+            return None
         self.store[key] = value
         return True
 
@@ -104,6 +171,12 @@ class DummyCollection:
         self.docs.clear()
         return True
 
+    def drop(self):
+        self.docs.clear()
+
+    def create_indexes(self, models):
+        return [m.document["name"] for m in models]
+
     def aggregate(self, pipeline):
         # 測試階段先回空，之後要真的驗證再加行為
         return []
@@ -119,12 +192,40 @@ class DummyMongoDB:
         return self.collections[name]
 
 
+class DummyAsyncCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def to_list(self, length=None):
+        return self.docs
+
+
+class DummyAsyncCollection:
+    def __init__(self, coll: DummyCollection):
+        self.coll = coll
+
+    def find(self, *args, **kwargs):
+        return DummyAsyncCursor(self.coll.find(*args, **kwargs))
+
+
+class DummyAsyncMongoDB:
+    """AsyncMongoClient 版本，跟同步版共用同一份資料。"""
+
+    def __init__(self, sync_db: DummyMongoDB):
+        self.sync_db = sync_db
+
+    def __getitem__(self, name: str):
+        return DummyAsyncCollection(self.sync_db[name])
+
+
 def mock_redis_and_mongo():
     """把專案裡用到的 Redis / Mongo 全部換成 Dummy 版本。"""
     from app.services import redis_client
     from app.common import rate_limit, cache_key
     from app.database import mongo as mongo_module
-    from app.routers import detail_router, seed_router, yield_router
+    from app.routers import (
+        cluster_router, detail_router, ingest_router, region_router, seed_router, wafermap_router, yield_router,
+    )
 
     dummy_redis = DummyRedis()
     dummy_mongo = DummyMongoDB()
@@ -142,10 +243,15 @@ def mock_redis_and_mongo():
     # 4) yield_router 裡 import 的 redis_cache / mongo_db
     yield_router.redis_cache = dummy_redis
     yield_router.mongo_db = dummy_mongo
+    yield_router.async_mongo_db = DummyAsyncMongoDB(dummy_mongo)
 
-    # 5) detail_router / seed_router 裡 import 的 mongo_db
+    # 5) 各 router 裡 import 的 mongo_db
     detail_router.mongo_db = dummy_mongo
     seed_router.mongo_db = dummy_mongo
+    ingest_router.mongo_db = dummy_mongo
+    wafermap_router.mongo_db = dummy_mongo
+    region_router.mongo_db = dummy_mongo
+    cluster_router.mongo_db = dummy_mongo
 
     # 6) database.mongo 裡的 mongo_db（有些地方直接用這個）
     mongo_module.mongo_db = dummy_mongo
@@ -170,6 +276,7 @@ async def prepare_database():
 async def client():
     # 覆寫 DB Session
     app.dependency_overrides[real_get_session] = override_get_session
+    app.dependency_overrides[get_session_factory] = lambda: TestSessionLocal
 
     # Mock Redis / Mongo，避免真的去連外部服務
     mock_redis_and_mongo()
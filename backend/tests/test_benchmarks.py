@@ -0,0 +1,55 @@
+from datetime import date
+
+from app.services.seed_data import generate_seed_data
+from benchmarks.core import compare
+
+
+def test_seed_data_is_reproducible():
+    a = generate_seed_data(date(2025, 1, 31), days=3, seed=7)
+    b = generate_seed_data(date(2025, 1, 31), days=3, seed=7)
+
+    assert a.lot_ids == b.lot_ids
+    assert [y.yield_rate for y in a.yields] == [y.yield_rate for y in b.yields]
+    assert a.defect_docs == b.defect_docs
+    assert min(y.timestamp for y in a.yields).date() == date(2025, 1, 29)
+
+
+def test_compare_flags_regressions_over_threshold():
+    baseline = {"a": {"median_us": 100.0}, "b": {"median_us": 100.0}, "gone": {"median_us": 1.0}}
+    current = {"a": {"median_us": 110.0}, "b": {"median_us": 130.0}}
+
+    rows = {r["name"]: r for r in compare(current, baseline, threshold=0.15)}
+    assert set(rows) == {"a", "b"}
+    assert rows["a"]["regression"] is False
+    assert rows["b"]["regression"] is True
+
+
+def test_mongo_plan_check_flags_collscan_sort_and_uncovered_fetch():
+    from benchmarks.mongo_plans import check_plan, plan_stages
+
+    ixscan = {"stage": "PROJECTION_COVERED", "inputStage": {"stage": "IXSCAN", "indexName": "lot_type_points"}}
+    fetch = {"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}}
+    collscan = {"queryPlan": {"stage": "COLLSCAN"}}  # SBE 格式
+
+    assert plan_stages({"stage": "OR", "inputStages": [fetch, ixscan]}) == ["OR", "FETCH", "IXSCAN",
+                                                                              "PROJECTION_COVERED", "IXSCAN"]
+
+    def explain(plan, docs=0):
+        return {"queryPlanner": {"winningPlan": plan}, "executionStats": {"totalDocsExamined": docs}}
+
+    covered = {"name": "q", "covered": True}
+    assert check_plan(covered, explain(ixscan))["problems"] == []
+    assert check_plan(covered, explain(fetch, docs=10))["problems"] == ["not covered"]
+    assert check_plan({"name": "q", "covered": False}, explain(collscan))["problems"] == ["COLLSCAN"]
+    # index 沒辦法提供排序：先讀完所有符合的 document 再排
+    blocking_sort = {"stage": "SORT", "inputStage": fetch}
+    assert check_plan({"name": "q", "covered": False}, explain(blocking_sort))["problems"] == ["SORT"]
+
+
+def test_trend_projection_is_covered_by_an_index():
+    from app.database.mongo_indexes import DEFECT_POINT_PROJECTION, INDEXES
+
+    projected = {f for f, v in DEFECT_POINT_PROJECTION.items() if v}
+    index_fields = [set(m.document["key"]) for m in INDEXES["defect_detail"]]
+    assert DEFECT_POINT_PROJECTION["_id"] == 0
+    assert any(projected <= fields for fields in index_fields)
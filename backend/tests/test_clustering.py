@@ -0,0 +1,83 @@
+# backend/tests/test_clustering.py
+import numpy as np
+import pytest
+
+from app.routers import cluster_router
+from app.services import clustering
+from app.services.clustering import CLUSTERS, cluster_points, label_components, run_pending, to_lot_points
+from benchmarks.clustering import found_signatures, synthetic_lot
+from benchmarks.fakes import FakeMongoDB, FakeRedis
+
+
+def test_label_components_is_8_connected_within_each_wafer():
+    dense = np.zeros((2, 6, 6), dtype=bool)
+    dense[0, 0, 0] = dense[0, 1, 1] = dense[0, 2, 2] = True  # 對角線相連
+    dense[0, 5, 5] = True
+    dense[1, 0, 0] = True  # 另一片 wafer 的同一格不會連起來
+    dense[1, 3, 0:6] = True  # 長條
+    labels = label_components(dense)
+
+    assert labels[0, 0, 0] == labels[0, 1, 1] == labels[0, 2, 2]
+    assert len({labels[0, 0, 0], labels[0, 5, 5], labels[1, 0, 0], labels[1, 3, 0]}) == 4
+    assert len(set(labels[1, 3].tolist())) == 1
+    assert labels.max() == 3 and (labels[~dense] == -1).all()
+
+
+def test_planted_signatures_are_found_on_a_100k_point_lot():
+    lot, planted = synthetic_lot(points=100_000, wafers=25)
+    found = found_signatures(cluster_points(lot))
+    assert all(kind in found.get(wafer, []) for wafer, kind in planted.items())
+
+
+def test_uniform_background_has_no_clusters():
+    rng = np.random.default_rng(3)
+    r, theta = 49 * np.sqrt(rng.random(2000)), rng.random(2000) * 2 * np.pi
+    lot = to_lot_points({"location": {"x": 50 + a * np.cos(b), "y": 50 + a * np.sin(b)}, "wafer": 1,
+                         "defect_type": "P"} for a, b in zip(r, theta))
+    assert cluster_points(lot) == []
+
+
+def test_aggregate_points_count_with_their_weight():
+    agg = [{"wafer": 2, "defect_type": "Crack", "count": 50, "sum_x": 50 * 50.5, "sum_y": 50 * 50.5}]
+    clusters = cluster_points(to_lot_points([], agg))
+    assert clusters[0]["count"] == 50 and clusters[0]["wafer"] == 2 and clusters[0]["signature"] == "center"
+
+
+def _mongo_with_lots(*lot_ids):
+    db = FakeMongoDB()
+    rng = np.random.default_rng(11)
+    for lot_id in lot_ids:
+        db["defect_detail"].insert_many([
+            {"lot_id": lot_id, "wafer": 1, "defect_type": "Edge",
+             "location": {"x": 50 + 46 * np.cos(t), "y": 50 + 46 * np.sin(t)}}
+            for t in rng.uniform(0, 0.5, 200)
+        ])
+    return db
+
+
+def test_pending_lots_are_clustered_once(monkeypatch):
+    monkeypatch.setattr(clustering.redis_client, "redis_cache", FakeRedis())
+    db = _mongo_with_lots("CL1", "CL2")
+    clustering.mark_pending("CL1", "CL2", "CL1")
+
+    result = run_pending(db)
+    assert sorted(result["lot_ids"]) == ["CL1", "CL2"]
+    stored = {d["lot_id"]: d for d in db[CLUSTERS].find()}
+    assert [c["signature"] for c in stored["CL1"]["clusters"]] == ["edge"]
+    assert run_pending(db)["lots"] == 0
+
+
+@pytest.mark.asyncio
+async def test_clusters_endpoint_computes_missing_lots(client, monkeypatch):
+    db = _mongo_with_lots("CL3")
+    monkeypatch.setattr(cluster_router, "mongo_db", db)
+
+    r = await client.get("/defects/clusters", params={"lots": ["CL3", "CL-EMPTY"]})
+    assert r.status_code == 200
+    body = r.json()
+    assert body["lots"]["CL3"]["clusters"][0]["signature"] == "edge"
+    assert body["lots"]["CL-EMPTY"]["clusters"] == [] and body["pending"] == []
+    assert len(db[CLUSTERS].find()) == 2
+
+    filtered = (await client.get("/defects/clusters", params={"lots": ["CL3"], "signature": "scratch"})).json()
+    assert filtered["lots"]["CL3"]["clusters"] == []
@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+from starlette.responses import Response
+
+from app.common.coalesce import coalesce
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_calls_run_once():
+    calls = []
+
+    @coalesce("test.identical")
+    async def handler(station: str, session=None):
+        calls.append(station)
+        await asyncio.sleep(0.01)
+        return [station]
+
+    # session 不同（dependency 物件）不影響 key；station 不同就是不同 key
+    results = await asyncio.gather(
+        handler(station="AOI-01", session=object()),
+        handler(station="AOI-01", session=object()),
+        handler(station="AOI-02", session=object()),
+    )
+    assert results == [["AOI-01"], ["AOI-01"], ["AOI-02"]]
+    assert sorted(calls) == ["AOI-01", "AOI-02"]
+
+    # 前一批結束後再呼叫會重新執行
+    await handler(station="AOI-01")
+    assert len(calls) == 3
+
+
+@pytest.mark.asyncio
+async def test_follower_survives_leader_cancel_and_gets_own_response():
+    @coalesce("test.cancel")
+    async def handler():
+        await asyncio.sleep(0.02)
+        return Response(content=b"[]", media_type="application/json")
+
+    leader = asyncio.ensure_future(handler())
+    await asyncio.sleep(0)
+    follower = asyncio.ensure_future(handler())
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    resp = await follower
+    assert resp.body == b"[]"
+    resp.headers["Server-Timing"] = "x"  # 不會影響其他 request 拿到的 Response
+
+
+@pytest.mark.asyncio
+async def test_shared_run_uses_its_own_session_after_leader_cancel():
+    from sqlalchemy import text
+
+    from tests.conftest import TestSessionLocal
+
+    started = asyncio.Event()
+    seen = []
+
+    @coalesce("test.session")
+    async def handler(session=None):
+        started.set()
+        await asyncio.sleep(0.02)
+        seen.append(session)
+        return (await session.execute(text("SELECT 1"))).scalar()
+
+    request_session = TestSessionLocal()
+    leader = asyncio.ensure_future(handler(session=request_session))
+    await started.wait()
+    follower = asyncio.ensure_future(handler(session=TestSessionLocal()))
+    await asyncio.sleep(0)
+
+    # leader 斷線：FastAPI 的 dependency teardown 關掉它的 session，共用的執行照樣完成
+    leader.cancel()
+    await request_session.close()
+    assert await follower == 1
+    assert seen[0] is not request_session
+    assert seen[0].bind is request_session.bind
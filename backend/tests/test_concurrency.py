@@ -0,0 +1,152 @@
+# backend/tests/test_concurrency.py
+import asyncio
+
+import pytest
+
+from app.common.concurrency import AdaptiveLimiter, Overloaded, mongo_bulkhead
+from app.common.circuit_breakers import mongo_breaker
+
+
+async def test_limit_backs_off_on_slow_calls_and_grows_back():
+    limiter = AdaptiveLimiter("t_aimd", max_limit=10, target_latency=0.05)
+    start = limiter.limit
+
+    limiter._adjust(latency=1.0, ok=True)
+    assert limiter.limit == pytest.approx(start * 0.9)
+    # 同一個時間窗內的第二個慢回應不會再降
+    limiter._adjust(latency=1.0, ok=True)
+    assert limiter.limit == pytest.approx(start * 0.9)
+
+    lowered = limiter.limit
+    limiter.in_flight = limiter.capacity
+    limiter._adjust(latency=0.001, ok=True)
+    assert limiter.limit > lowered
+
+
+async def test_sheds_when_queue_is_full_or_wait_times_out():
+    limiter = AdaptiveLimiter("t_shed", max_limit=2, target_latency=1, max_queue=1, queue_timeout=0.05)
+    assert limiter.capacity == 1
+
+    release = asyncio.Event()
+
+    async def hold():
+        async with limiter.slot():
+            await release.wait()
+
+    holder = asyncio.create_task(hold())
+    await asyncio.sleep(0)
+    waiter = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+
+    with pytest.raises(Overloaded) as exc:
+        await limiter.acquire()
+    assert exc.value.reason == "queue_full"
+
+    with pytest.raises(Overloaded) as exc:
+        await waiter
+    assert exc.value.reason == "queue_timeout"
+
+    release.set()
+    await holder
+    assert limiter.in_flight == 0
+
+
+async def test_queued_call_gets_the_released_slot():
+    limiter = AdaptiveLimiter("t_handoff", max_limit=2, target_latency=1, queue_timeout=1)
+    order = []
+
+    async def call(name):
+        async with limiter.slot():
+            order.append(name)
+            await asyncio.sleep(0.01)
+
+    await asyncio.gather(call("a"), call("b"), call("c"))
+    assert order == ["a", "b", "c"]
+    assert limiter.in_flight == 0 and limiter.queued == 0
+
+
+async def test_nested_slot_is_not_counted_twice():
+    limiter = AdaptiveLimiter("t_nested", max_limit=2, target_latency=1, max_queue=0)
+    async with limiter.slot():
+        async with limiter.slot():
+            assert limiter.in_flight == 1
+    assert limiter.in_flight == 0
+
+
+@pytest.fixture
+def saturated_mongo_bulkhead():
+    saved = (mongo_bulkhead.in_flight, mongo_bulkhead.max_queue)
+    mongo_bulkhead.in_flight, mongo_bulkhead.max_queue = mongo_bulkhead.capacity, 0
+    yield
+    mongo_bulkhead.in_flight, mongo_bulkhead.max_queue = saved
+
+
+@pytest.mark.asyncio
+async def test_saturated_bulkhead_sheds_but_health_answers(client, saturated_mongo_bulkhead):
+    shed = await client.get("/detail/by_lot", params={"lot_id": "LOT-1"})
+    assert shed.status_code == 503
+    assert shed.headers["Retry-After"] == "1"
+    # 被擋掉的呼叫沒碰到 Mongo，不算 breaker 的失敗
+    assert mongo_breaker.fail_counter == 0
+
+    health = await client.get("/health")
+    assert health.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_detail_add_survives_lot_lookup_failure(client, monkeypatch):
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+    from app.routers import detail_router
+    from benchmarks.fakes import FakeMongoDB
+
+    async def broken_get(self, *args, **kwargs):
+        raise ConnectionError("postgres down")
+
+    mongo = FakeMongoDB()
+    monkeypatch.setattr(detail_router, "mongo_db", mongo)
+    monkeypatch.setattr(AsyncSession, "get", broken_get)
+    r = await client.post("/detail/add", json={"lot_id": "LOT-PG-DOWN", "defect_type": "Crack",
+                                               "location": {"x": 1.0, "y": 2.0}})
+    # 點位已經寫入：照樣回 200（不會讓 client 重送出重複的點），也不算 Mongo 的失敗
+    assert r.status_code == 200
+    assert len(mongo["defect_detail"].docs) == 1
+    assert mongo_breaker.fail_counter == 0
+
+
+@pytest.mark.asyncio
+async def test_postgres_slot_follows_the_connection(monkeypatch):
+    from sqlalchemy import text
+
+    from app.database import database
+    from tests.conftest import test_engine
+
+    limiter = AdaptiveLimiter("t_pg", max_limit=4, target_latency=1, max_queue=0)
+    monkeypatch.setattr(database, "postgres_bulkhead", limiter)
+
+    async with database.BulkheadSession(bind=test_engine) as session:
+        assert limiter.in_flight == 0
+        await session.execute(text("SELECT 1"))
+        await session.scalar(text("SELECT 1"))
+        # 同一條連線上的多個查詢只佔一個 slot，查詢之間也不放
+        assert limiter.in_flight == 1
+        await session.commit()
+        assert limiter.in_flight == 0
+        async with session.begin():
+            await session.execute(text("SELECT 1"))
+            assert limiter.in_flight == 1
+        assert limiter.in_flight == 0
+        await session.execute(text("SELECT 1"))
+    assert limiter.in_flight == 0
+
+    # 同一個 task 裡平行開的 session 各自借一條連線、各佔一個 slot
+    async def query(session):
+        await session.execute(text("SELECT 1"))
+        return limiter.in_flight
+
+    sessions = [database.BulkheadSession(bind=test_engine) for _ in range(2)]
+    await query(sessions[0])
+    assert await query(sessions[1]) == 2
+    for session in sessions:
+        await session.close()
+    assert limiter.in_flight == 0
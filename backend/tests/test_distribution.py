@@ -0,0 +1,107 @@
+# backend/tests/test_distribution.py
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+from app.services.tdigest import TDigest
+from app.services.yield_sketch import add_lot
+from tests.conftest import TestSessionLocal
+
+RANK_ERROR = 0.01
+
+
+def _year_of_yields():
+    """一年、每天 60 ~ 150 個 lot；偏左的分佈（大多 95 上下，少數掉到 70 幾）。"""
+    rng = np.random.default_rng(46)
+    days = []
+    for i in range(365):
+        n = int(rng.integers(60, 150))
+        base = 100 - rng.gamma(2.0, 2.0 + (i % 30) / 30, size=n)
+        days.append(np.clip(base, 0, 100).round(2))
+    return days
+
+
+def test_merged_daily_digests_stay_within_rank_error():
+    days = _year_of_yields()
+    stored = []
+    for values in days:
+        d = TDigest()
+        for x in values:
+            d.add(x)
+        # 跟 DB 一樣：存成 bytes 再讀回來
+        stored.append(TDigest.from_bytes(d.to_bytes(), d.count, d.min, d.max))
+
+    merged = TDigest.merged(stored)
+    exact = np.sort(np.concatenate(days))
+    n = exact.size
+    assert merged.count == n
+    assert len(merged.centroids) <= 100
+
+    for q in (0.01, 0.05, 0.5, 0.95, 0.99):
+        estimate = merged.quantile(q)
+        rank = np.searchsorted(exact, estimate, side="right") / n
+        assert abs(rank - q) <= RANK_ERROR, q
+    assert merged.quantile(0) == exact[0] and merged.quantile(1) == exact[-1]
+
+    edges = list(np.linspace(70, 100, 16))
+    approx = merged.histogram(edges)
+    actual, _ = np.histogram(exact, bins=edges)
+    assert np.all(np.abs(np.array(approx) - actual) <= 2 * RANK_ERROR * n)
+
+
+def test_empty_digest():
+    d = TDigest.merged([TDigest(), TDigest()])
+    assert d.count == 0 and d.quantile(0.5) is None and d.cdf(1.0) == 0.0
+
+
+@pytest.mark.asyncio
+async def test_percentile_and_histogram_endpoints(client):
+    values = [80.0, 90.0, 95.0, 97.0, 99.0]
+    async with TestSessionLocal() as session:
+        for i, x in enumerate(values * 4):
+            await add_lot(session, "ST-DIST", "P-DIST", date(2025, 7, 1) + timedelta(days=i % 3), x)
+        await add_lot(session, "ST-DIST", "P-OTHER", date(2025, 7, 1), 50.0)
+        await session.commit()
+
+    params = {"station": "ST-DIST", "product": "P-DIST", "date_from": "2025-07-01", "date_to": "2025-07-31"}
+    r = await client.get("/distribution/percentiles", params={**params, "q": [0.0, 0.5, 1.0]})
+    assert r.status_code == 200
+    body = r.json()
+    assert body["count"] == 20 and body["days"] == 3
+    assert body["percentiles"]["p0"] == 80.0 and body["percentiles"]["p100"] == 99.0
+    assert 90.0 <= body["percentiles"]["p50"] <= 97.0
+    assert body["approximate"] is True
+
+    # 不指定 product：合併同 station 的所有 product
+    all_products = (await client.get("/distribution/percentiles",
+                                     params={k: v for k, v in params.items() if k != "product"})).json()
+    assert all_products["count"] == 21 and all_products["min"] == 50.0
+
+    h = (await client.get("/distribution/histogram", params={**params, "bins": 4, "lo": 80, "hi": 100})).json()
+    assert h["edges"] == [80.0, 85.0, 90.0, 95.0, 100.0]
+    assert sum(h["counts"]) == pytest.approx(20, abs=0.5)
+
+    assert (await client.get("/distribution/percentiles", params={**params, "q": 1.5})).status_code == 400
+    assert (await client.get("/distribution/histogram", params={**params, "lo": 100, "hi": 90})).status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_moved_lot_leaves_the_old_days_digest(client):
+    await client.post("/user/add", params={"username": "dist_eng", "password": "pw", "role": "engineer"})
+    token = (await client.post("/auth/login", data={"username": "dist_eng", "password": "pw"})).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    for lot_id, good in [("DSM1", 90), ("DSM2", 60)]:
+        r = await client.post("/ingest/lot", headers=headers, json={
+            "lot_id": lot_id, "station": "ST-DSM", "product": "P-DSM", "total": 100, "good": good,
+            "timestamp": "2025-08-01T08:00:00",
+        })
+        assert r.status_code == 200
+
+    assert (await client.put("/update/DSM2", json={"station": "ST-DSM-B"})).status_code == 200
+
+    params = {"product": "P-DSM", "date_from": "2025-08-01", "date_to": "2025-08-01", "q": [0.0, 1.0]}
+    old = (await client.get("/distribution/percentiles", params={**params, "station": "ST-DSM"})).json()
+    assert old["count"] == 1 and old["min"] == 90.0
+    new = (await client.get("/distribution/percentiles", params={**params, "station": "ST-DSM-B"})).json()
+    assert new["count"] == 1 and new["min"] == 60.0
@@ -0,0 +1,63 @@
+# backend/tests/test_fanout.py
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from aiobreaker import CircuitBreaker
+
+from app.common.fanout import branch
+from app.models.defect_summary import DefectSummary
+from app.models.lot import Lot
+from app.models.yield_record import YieldRecord
+from app.routers import yield_router
+from tests.conftest import TestSessionLocal
+
+
+async def test_branch_returns_default_on_timeout_error_and_open_circuit():
+    async def slow():
+        await asyncio.sleep(1)
+
+    async def boom():
+        raise RuntimeError("down")
+
+    async def ok():
+        return [1]
+
+    assert (await branch("ok", ok)).value == [1]
+
+    result = await branch("slow", slow, timeout=0.01, default=[])
+    assert (result.value, result.degraded) == ([], "timeout")
+    assert (await branch("boom", boom, default=[])).degraded == "error"
+
+    breaker = CircuitBreaker(fail_max=1, timeout_duration=timedelta(seconds=60), name="test_breaker")
+    await branch("boom", boom, breaker=breaker)
+    assert (await branch("ok", ok, breaker=breaker, default=[])).degraded == "circuit_open"
+
+
+@pytest.mark.asyncio
+async def test_trend_returns_partial_result_when_mongo_fails(client, monkeypatch):
+    async with TestSessionLocal() as session:
+        session.add(Lot(lot_id="FO1", station="ST-FO", product="P-FO", total=100, good=95))
+        await session.flush()
+        session.add_all([
+            YieldRecord(lot_id="FO1", total=100, good=95, yield_rate=95.0, timestamp=datetime(2025, 4, 1, 12)),
+            DefectSummary(lot_id="FO1", defect_type="Crack", count=5, timestamp=datetime(2025, 4, 1, 12)),
+        ])
+        await session.commit()
+
+    class BrokenMongo:
+        def __getitem__(self, name):
+            raise ConnectionError("mongo down")
+
+    monkeypatch.setattr(yield_router, "async_mongo_db", BrokenMongo())
+    params = {"date_from": "2025-04-01", "date_to": "2025-04-01", "station": "ST-FO", "product": "P-FO",
+              "lots": ["FO1"]}
+
+    body = (await client.get("/yield/trend", params=params)).json()
+    assert body["avg_yield"] == [95.0]
+    assert body["defect_pareto"] == [{"defect_type": "Crack", "count": 5}]
+    assert body["defect_details"] == []
+    assert body["partial"] is True
+    assert body["degraded"] == ["mongo_detail"]
+    # 部分結果不進 cache
+    assert not any(k.startswith("yield_trend") for k in yield_router.redis_cache.store)
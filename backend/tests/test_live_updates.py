@@ -0,0 +1,53 @@
+import pytest
+
+from app.services import live_updates
+from app.services.live_updates import YieldFilter, hub
+
+
+@pytest.fixture
+def local_hub(monkeypatch):
+    # 測試環境沒有 Redis：只做 process 內分送
+    monkeypatch.setattr(hub, "use_redis", False)
+    return hub
+
+
+@pytest.mark.asyncio
+async def test_filter_and_overflow(local_hub, monkeypatch):
+    monkeypatch.setattr(live_updates.settings, "live_queue_size", 2)
+    sub = local_hub.subscribe(YieldFilter(station="AOI-01", date_from="2025-01-01"))
+    try:
+        live_updates.publish_update({"kind": "lot", "lot_id": "L1", "station": "AOI-02"})
+        live_updates.publish_update({"kind": "ingest", "lot_id": "L1", "station": "AOI-01", "date": "2024-12-31"})
+        assert sub.queue.empty()
+
+        for i in range(3):
+            live_updates.publish_update({"kind": "ingest", "lot_id": f"L{i}", "station": "AOI-01", "date": "2025-01-02"})
+        # 超過 queue 上限：改成一個 reset，client 重新查詢
+        assert sub.queue.get_nowait() == {"kind": "reset", "reason": "overflow"}
+    finally:
+        local_hub.unsubscribe(sub)
+
+
+@pytest.mark.asyncio
+async def test_ingest_publishes_incremental_update(client, local_hub):
+    await client.post("/user/add", params={"username": "ingest_admin", "password": "pw", "role": "admin"})
+    token = (await client.post("/auth/login", data={"username": "ingest_admin", "password": "pw"})).json()["access_token"]
+
+    sub = local_hub.subscribe(YieldFilter(station="ST-LIVE", product="P-LIVE"))
+    try:
+        resp = await client.post(
+            "/ingest/lot",
+            json={
+                "lot_id": "LIVE0001", "station": "ST-LIVE", "product": "P-LIVE", "total": 100, "good": 90,
+                "defects": [{"defect_type": "Scratch", "count": 10, "points": [{"x": 1.0, "y": 2.0}]}],
+            },
+            headers={"Authorization": f"Bearer {token}"},
+        )
+        assert resp.status_code == 200
+
+        update = sub.queue.get_nowait()
+        assert update["yield_point"]["yield_rate"] == 90.0
+        assert update["pareto_delta"] == [{"defect_type": "Scratch", "delta": 10}]
+        assert update["defect_points"][0]["x"] == 1.0
+    finally:
+        local_hub.unsubscribe(sub)
@@ -0,0 +1,31 @@
+import json
+import logging
+from logging.handlers import QueueHandler
+
+from app.common import logging_setup
+from app.common.logging_setup import JsonFormatter, should_log_access
+from app.config.config import settings
+
+
+def test_json_formatter_includes_extra_fields():
+    record = logging.LogRecord("app.test", logging.INFO, __file__, 1, "hello %s", ("lot",), None)
+    record.route = "/yield/trend"
+
+    data = json.loads(JsonFormatter().format(record))
+    assert data["msg"] == "hello lot"
+    assert data["level"] == "INFO"
+    assert data["route"] == "/yield/trend"
+
+
+def test_should_log_access_per_route(monkeypatch):
+    monkeypatch.setattr(settings, "log_access_sample_rate", 0.0)
+    monkeypatch.setattr(settings, "log_route_sample_rates", {"/yield/trend": 1.0})
+
+    assert should_log_access("/yield/trend") is True
+    assert should_log_access("/filter/dates") is False
+
+
+def test_setup_logging_uses_queue_handler():
+    logging_setup.setup_logging()
+    root = logging.getLogger()
+    assert any(isinstance(h, QueueHandler) for h in root.handlers)
@@ -0,0 +1,24 @@
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_metrics_use_route_template(client):
+    # 不存在的 lot 會回 404，但 label 應該是 route template 而不是實際 path
+    resp = await client.put("/update/LOT_NOT_EXIST_123", json={})
+    assert resp.status_code == 404
+
+    resp = await client.get("/metrics")
+    assert resp.status_code == 200
+    body = resp.text
+    assert 'endpoint="/update/{lot_id}"' in body
+    assert "LOT_NOT_EXIST_123" not in body
+
+
+@pytest.mark.asyncio
+async def test_metrics_unmatched_path_is_bounded(client):
+    resp = await client.get("/no/such/path/abc123")
+    assert resp.status_code == 404
+
+    body = (await client.get("/metrics")).text
+    assert 'endpoint="<unmatched>"' in body
+    assert "abc123" not in body
@@ -0,0 +1,58 @@
+# backend/tests/test_partitions.py
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.schema import CreateTable
+
+from app.models.defect_summary import DefectSummary
+from app.models.lot import Lot
+from app.models.partitioning import timestamp_range
+from app.models.yield_record import YieldRecord
+from app.services.partitions import add_months, partition_month, partition_name, partitioned_tables
+from app.tools.bootstrap import POSTGRES_MIGRATIONS
+from tests.conftest import TestSessionLocal
+
+
+def test_postgres_ddl_is_partitioned_by_timestamp():
+    for model in (YieldRecord, DefectSummary):
+        ddl = str(CreateTable(model.__table__).compile(dialect=postgresql.dialect()))
+        assert "PRIMARY KEY (id, timestamp)" in ddl
+        assert ddl.rstrip().endswith("PARTITION BY RANGE (timestamp)")
+
+    assert partitioned_tables() == {"yield_record": "timestamp", "defect_summary": "timestamp"}
+
+
+def test_timestamp_range_is_half_open_over_whole_days():
+    start, end = timestamp_range(date(2025, 1, 30), date(2025, 1, 31))
+    assert start == datetime(2025, 1, 30)
+    assert end == datetime(2025, 2, 1)
+
+
+def test_partition_names_and_months():
+    assert add_months(date(2025, 11, 1), 3) == date(2026, 2, 1)
+    assert add_months(date(2025, 1, 1), -1) == date(2024, 12, 1)
+
+    name = partition_name("yield_record", date(2025, 3, 1))
+    assert name == "yield_record_y2025m03"
+    assert partition_month(name) == date(2025, 3, 1)
+    assert partition_month("yield_record_default") is None
+
+
+@pytest.mark.asyncio
+async def test_defect_summary_requires_measurement_time():
+    async with TestSessionLocal() as session:
+        session.add(Lot(lot_id="PT1", station="ST", product="P", total=1, good=1))
+        await session.commit()
+        session.add(DefectSummary(lot_id="PT1", defect_type="Crack", count=1))
+        with pytest.raises(IntegrityError):
+            await session.commit()
+
+
+def test_bootstrap_backfills_defect_summary_timestamp_after_adding_it():
+    statements = list(POSTGRES_MIGRATIONS)
+    added = statements.index("ALTER TABLE defect_summary ADD COLUMN IF NOT EXISTS timestamp TIMESTAMP")
+    backfill = next(i for i, s in enumerate(statements) if s.startswith("UPDATE defect_summary"))
+    assert backfill > added
+    assert "IS NULL" in statements[backfill] and "yield_record" in statements[backfill]
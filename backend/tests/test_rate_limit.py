@@ -0,0 +1,95 @@
+# backend/tests/test_rate_limit.py
+import pytest
+from starlette.datastructures import QueryParams
+
+from app.auth.security import create_access_token
+from app.common import rate_limit
+from app.common.rate_limit import Bucket, consume, request_cost
+from app.config.config import settings
+from tests.conftest import DummyRedis
+
+
+@pytest.fixture
+def small_tiers(monkeypatch):
+    monkeypatch.setattr(settings, "rate_limit_tiers", {
+        "anonymous": {"capacity": 2, "refill_per_sec": 0.001},
+        "viewer": {"capacity": 3, "refill_per_sec": 0.001},
+        "engineer": {"capacity": 100, "refill_per_sec": 0.001},
+        "admin": {"capacity": 100, "refill_per_sec": 0.001},
+    })
+
+
+def _auth(sub: str, role: str) -> dict:
+    return {"Authorization": f"Bearer {create_access_token({'sub': sub, 'role': role})}"}
+
+
+def test_trend_cost_scales_with_span_and_lots():
+    short = request_cost("/yield/trend", QueryParams("date_from=2025-01-01&date_to=2025-01-01&lots=A"))
+    wide = request_cost("/yield/trend", QueryParams(
+        "date_from=2025-01-01&date_to=2025-03-31&" + "&".join(f"lots=L{i}" for i in range(500))))
+    assert wide > short > request_cost("/filter/dates", QueryParams(""))
+    assert request_cost("/filter/dates", QueryParams("")) == 1
+
+
+@pytest.mark.asyncio
+async def test_buckets_are_per_user_and_sized_by_role(client, small_tiers):
+    alice, bob = _auth("alice", "viewer"), _auth("bob", "viewer")
+    for remaining in (2, 1, 0):
+        r = await client.get("/filter/dates", headers=alice)
+        assert r.status_code == 200
+        assert r.headers["X-RateLimit-Remaining"] == str(remaining)
+
+    limited = await client.get("/filter/dates", headers=alice)
+    assert limited.status_code == 429
+    assert int(limited.headers["Retry-After"]) >= 1
+
+    # 同一台機器（同一個 IP）上的其他使用者不受影響
+    assert (await client.get("/filter/dates", headers=bob)).status_code == 200
+    # 不同 path 共用同一個 bucket
+    assert (await client.get("/filter/machines", headers=alice)).status_code == 429
+
+    carol = _auth("carol", "engineer")
+    r = await client.get("/filter/dates", headers=carol)
+    assert r.headers["X-RateLimit-Limit"] == "100"
+
+
+@pytest.mark.asyncio
+async def test_heavy_queries_share_a_pool_that_cheap_queries_do_not_use(client, small_tiers, monkeypatch):
+    monkeypatch.setattr(settings, "rate_limit_heavy_pool", {"capacity": 60, "refill_per_sec": 0.001})
+    engineer, admin = _auth("eve", "engineer"), _auth("root", "admin")
+
+    # /seed/sql 一次 cost 50：第一次用掉大半個 heavy pool，其他人的下一次就不夠了
+    assert (await client.get("/seed/sql", headers=engineer)).status_code != 429
+    heavy = await client.get("/seed/sql", headers=admin)
+    assert heavy.status_code == 429
+
+    r = await client.get("/filter/dates", headers=engineer)
+    assert r.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_invalid_token_falls_back_to_ip_bucket(client, small_tiers):
+    bad = {"Authorization": "Bearer not-a-token"}
+    assert (await client.get("/filter/dates", headers=bad)).headers["X-RateLimit-Limit"] == "2"
+
+
+def test_lua_token_bucket_matches_python_port(monkeypatch):
+    """真的執行 TOKEN_BUCKET_LUA（需要 fakeredis[lua]），並確認 conftest 的 Python 版結果一樣。"""
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+
+    buckets = [Bucket("rl:user:lua", 10, 1), Bucket("rl:heavy", 6, 0.5, name="heavy")]
+    steps = [(1000.0, 4), (1000.0, 4), (1004.0, 4), (1020.0, 20)]
+
+    def run(client):
+        monkeypatch.setattr(rate_limit, "redis_ratelimit", client)
+        return [consume(buckets, cost, now=now) for now, cost in steps]
+
+    lua, port = run(fakeredis.FakeRedis()), run(DummyRedis())
+    assert lua == port
+    # heavy 用完時整個 request 被擋、user bucket 也不扣；之後照 refill_per_sec 補回；cost 超過 capacity 時只扣 capacity
+    assert [(d.allowed, d.denied_by) for d in lua] == [
+        (True, None), (False, "heavy"), (True, None), (True, None),
+    ]
+    assert [d.remaining for d in lua] == [6.0, 6.0, 6.0, 0.0]
+    assert lua[1].retry_after == pytest.approx(4.0)
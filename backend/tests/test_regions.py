@@ -0,0 +1,77 @@
+# backend/tests/test_regions.py
+import pytest
+
+from app.routers import region_router
+from app.services.regions import find_page, region_cell, region_filter, shape_cells, shape_filter
+from benchmarks.fakes import FakeMongoDB
+
+
+def _mongo():
+    db = FakeMongoDB()
+    db["defect_detail"].insert_many([
+        {"lot_id": lot, "wafer": 1, "defect_type": t, "location": {"x": x, "y": y}, "severity": "M",
+         "region_cell": region_cell(x, y)}
+        for lot in ("RG1", "RG2", "RG3")
+        for t, x, y in [("Edge", 50.0, 98.0), ("Edge", 2.0, 50.0), ("Center", 50.0, 50.0), ("Q1", 80.0, 80.0)]
+    ])
+    return db
+
+
+def test_shapes():
+    db = _mongo()
+
+    def lots_types(shape, **kw):
+        items, _ = find_page(db, region_filter(shape_filter(**shape), **kw), shape_cells(**shape), limit=100)
+        return sorted({i["defect_type"] for i in items}), len(items)
+
+    assert lots_types({"ring": (45.0, 50.0)}) == (["Edge"], 6)
+    assert lots_types({"box": (50.0, 50.0, 100.0, 100.0)}, lot_ids=["RG1"]) == (["Center", "Edge", "Q1"], 3)
+    assert lots_types({"circle": (80.0, 80.0, 1.0)}) == (["Q1"], 3)
+    triangle = [(60.0, 60.0), (100.0, 60.0), (100.0, 100.0)]
+    assert lots_types({"polygon": triangle}, defect_types=["Q1", "Edge"]) == (["Q1"], 3)
+
+
+def test_shape_cells_cover_every_point_in_the_shape():
+    # edge ring 不含 wafer 中間整格都在內圓裡的格子
+    ring = shape_cells(ring=(45.0, 50.0))
+    assert region_cell(50.0, 50.0) not in ring
+    assert {region_cell(50.0, 98.0), region_cell(2.0, 50.0)} <= set(ring)
+    # 剛好在格線上的點（x = 10）歸到右邊那一格，box 邊界在格線上時也要涵蓋
+    assert region_cell(10.0, 0.0) in shape_cells(box=(0.0, 0.0, 10.0, 5.0))
+    assert shape_cells(circle=(5.0, 5.0, 1.0)) == [region_cell(5.0, 5.0)]
+
+
+def test_keyset_pagination_visits_every_point_once():
+    db = _mongo()
+    shape = {"ring": (0.0, 50.0)}
+    flt, cells = region_filter(shape_filter(**shape), lot_ids=["RG3", "RG1", "RG2"]), shape_cells(**shape)
+    seen, cursor = [], None
+    while True:
+        items, cursor = find_page(db, flt, cells, limit=5, after=cursor)
+        seen += [i["id"] for i in items]
+        if cursor is None:
+            break
+    assert len(seen) == len(set(seen)) == 12
+
+
+@pytest.mark.asyncio
+async def test_region_endpoint(client, monkeypatch):
+    monkeypatch.setattr(region_router, "mongo_db", _mongo())
+
+    body = {"ring": {"r_min": 45, "r_max": 50}, "lots": ["RG1", "RG2"], "limit": 3}
+    first = (await client.post("/defects/region", json=body)).json()
+    assert first["count"] == 4 and first["by_defect_type"] == {"Edge": 4}
+    assert len(first["items"]) == 3 and first["next_cursor"]
+
+    second = (await client.post("/defects/region", json={**body, "cursor": first["next_cursor"]})).json()
+    assert len(second["items"]) == 1 and second["next_cursor"] is None
+    assert second["count"] is None
+
+    # station 沒有任何 lot：不查 Mongo
+    empty = (await client.post("/defects/region", json={"box": {"x_min": 0, "y_min": 0, "x_max": 100, "y_max": 100},
+                                                        "station": "NO-SUCH-STATION"})).json()
+    assert empty["count"] == 0 and empty["items"] == []
+
+    two_shapes = {"ring": {"r_max": 50}, "circle": {"x": 1, "y": 1, "r": 1}}
+    assert (await client.post("/defects/region", json=two_shapes)).status_code == 422
+    assert (await client.post("/defects/region", json={"ring": {"r_max": 50}, "cursor": "???"})).status_code == 400
@@ -0,0 +1,111 @@
+# backend/tests/test_reports.py
+import gzip
+import json
+from datetime import date, datetime
+
+import pytest
+
+from app.common import tasks
+from app.config.config import settings
+from app.models.defect_summary import DefectSummary
+from app.models.lot import Lot
+from app.models.yield_record import YieldRecord
+from app.services.reports import compute_trend_report, day_chunks, store_report
+from benchmarks.fakes import FakeMongoDB
+from tests.conftest import TestSessionLocal
+
+
+def test_day_chunks_cover_the_range_once():
+    chunks = list(day_chunks(date(2025, 1, 1), date(2025, 1, 17), 7))
+    assert chunks == [
+        (date(2025, 1, 1), date(2025, 1, 7)),
+        (date(2025, 1, 8), date(2025, 1, 14)),
+        (date(2025, 1, 15), date(2025, 1, 17)),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_chunked_report_matches_unchunked_result(monkeypatch):
+    async with TestSessionLocal() as session:
+        session.add_all([
+            Lot(lot_id="RP1", station="ST-RP", product="P-RP", total=100, good=90),
+            Lot(lot_id="RP2", station="ST-RP", product="P-RP", total=100, good=80),
+        ])
+        await session.flush()
+        for day, lot_id, rate in [(1, "RP1", 90.0), (2, "RP1", 92.0), (2, "RP2", 80.0), (3, "RP2", 85.0)]:
+            ts = datetime(2025, 5, day, 8)
+            session.add(YieldRecord(lot_id=lot_id, total=100, good=int(rate), yield_rate=rate, timestamp=ts))
+            session.add(DefectSummary(lot_id=lot_id, defect_type="Crack" if day < 3 else "Scratch",
+                                      count=day * 3 + (lot_id == "RP2"), timestamp=ts))
+        await session.commit()
+    # 會依 $in 篩選的 fake：分批查詢時每個點只會出現在自己那批
+    mongo = FakeMongoDB()
+    mongo["defect_detail"].insert_many([
+        {"lot_id": lot_id, "defect_type": "Crack", "location": {"x": 1.0, "y": 2.0}, "severity": "high", "wafer": 1}
+        for lot_id in ("RP1", "RP2")
+    ])
+
+    params = {"date_from": "2025-05-01", "date_to": "2025-05-03", "station": "ST-RP", "product": "P-RP",
+              "lots": ["RP1", "RP2"]}
+    whole = await compute_trend_report(params, TestSessionLocal, mongo)
+    assert whole["avg_yield"] == [90.0, 86.0, 85.0]
+    assert whole["daily_counts"] == [1, 2, 1]
+    assert whole["defect_pareto"] == [{"defect_type": "Crack", "count": 16}, {"defect_type": "Scratch", "count": 10}]
+    assert len(whole["defect_details"]) == 2
+
+    monkeypatch.setattr(settings, "report_chunk_days", 1)
+    monkeypatch.setattr(settings, "report_lot_batch", 1)
+    steps = []
+    report = await compute_trend_report(params, TestSessionLocal, mongo,
+                                        progress=lambda done, total, stage: steps.append((done, total, stage)))
+
+    for key in ("dates", "avg_yield", "daily_counts", "defect_pareto", "defect_details"):
+        assert report[key] == whole[key], key
+    # 3 天 yield + 3 天 summary + 2 批 lot
+    assert steps[-1][:2] == (8, 8)
+
+
+@pytest.mark.asyncio
+async def test_identical_requests_share_one_job(client, monkeypatch):
+    sent = []
+    monkeypatch.setattr(tasks.build_trend_report, "apply_async", lambda args, task_id: sent.append(task_id))
+
+    body = {"date_from": "2025-01-01", "date_to": "2025-03-31", "station": "S", "product": "P",
+            "lots": ["B", "A"]}
+    first = await client.post("/reports/trend", json=body)
+    second = await client.post("/reports/trend", json={**body, "lots": ["A", "B", "A"]})
+
+    assert first.status_code == second.status_code == 202
+    assert first.json()["job_id"] == second.json()["job_id"] == sent[0]
+    assert second.json()["deduplicated"] is True
+    assert len(sent) == 1
+
+    assert (await client.post("/reports/trend", json={**body, "date_to": "2024-12-31"})).status_code == 400
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("storage", ["redis", "disk"])
+async def test_download_serves_stored_blob(client, monkeypatch, tmp_path, storage):
+    monkeypatch.setattr(settings, "report_storage", storage)
+    monkeypatch.setattr(settings, "report_dir", str(tmp_path))
+    result = {"dates": ["2025-01-01"], "avg_yield": [99.0]}
+    store_report("job1", result)
+
+    raw = await client.get("/reports/trend/job1", headers={"Accept-Encoding": "identity"})
+    assert raw.json() == result
+
+    zipped = await client.get("/reports/trend/job1", headers={"Accept-Encoding": "gzip"})
+    assert zipped.headers["Content-Encoding"] == "gzip"
+    assert zipped.json() == result  # httpx 會自動解壓
+
+    assert (await client.get("/reports/trend/missing")).status_code == 404
+
+
+def test_stored_blob_is_gzip(monkeypatch):
+    from app.services import redis_client
+    from tests.conftest import DummyRedis
+
+    monkeypatch.setattr(redis_client, "redis_cache", DummyRedis())
+    monkeypatch.setattr(settings, "report_storage", "redis")
+    store_report("job2", {"x": 1})
+    assert json.loads(gzip.decompress(redis_client.redis_cache.get("report:blob:job2"))) == {"x": 1}
@@ -0,0 +1,90 @@
+# backend/tests/test_retention.py
+from bson import ObjectId
+
+from app.services.retention import AGG, COLD, HOT, LOG, compact_lot, downsample, read_archive
+from app.services.trend import to_aggregate_points
+
+
+def _doc(lot_id, x, y, severity="M", defect_type="Scratch", wafer=1):
+    return {"_id": ObjectId(), "lot_id": lot_id, "defect_type": defect_type, "wafer": wafer,
+            "location": {"x": x, "y": y}, "severity": severity, "image_path": "/img.png", "extra": {}}
+
+
+class _Collection:
+    """compact_lot 用到的最小 pymongo 介面（會看 filter）。"""
+
+    def __init__(self):
+        self.docs = []
+
+    def find(self, flt):
+        return [d for d in self.docs if d["lot_id"] == flt["lot_id"]]
+
+    def insert_many(self, docs, ordered=True):
+        self.docs.extend(docs)
+
+    def insert_one(self, doc):
+        self.docs.append(doc)
+
+    def delete_many(self, flt):
+        ids = set(flt["_id"]["$in"])
+        self.docs = [d for d in self.docs if d["_id"] not in ids]
+
+    def bulk_write(self, ops, ordered=True):
+        for op in ops:
+            flt, update = op._filter, op._doc["$inc"]
+            doc = next((d for d in self.docs if all(d.get(k) == v for k, v in flt.items())), None)
+            if doc is None:
+                doc = dict(flt)
+                self.docs.append(doc)
+            for key, value in update.items():
+                if key.startswith("severity."):
+                    sev = doc.setdefault("severity", {})
+                    sev[key[9:]] = sev.get(key[9:], 0) + value
+                else:
+                    doc[key] = doc.get(key, 0) + value
+
+
+class _DB(dict):
+    def __missing__(self, name):
+        self[name] = _Collection()
+        return self[name]
+
+
+def test_downsample_groups_points_by_cell():
+    docs = [_doc("L1", 1, 1, "H"), _doc("L1", 3, 4, "M"), _doc("L1", 50, 50), _doc("L1", 2, 2, wafer=2)]
+    cells = downsample(docs, cell_size=5)
+
+    assert len(cells) == 3
+    first = next(c for c in cells if c["cell"] == "0,0" and c["wafer"] == 1)
+    assert first["count"] == 2
+    assert first["severity"] == {"H": 1, "M": 1}
+
+    point = to_aggregate_points([first])[0]
+    assert (point["x"], point["y"], point["count"]) == (2.0, 2.5, 2)
+
+
+def test_compact_lot_moves_raw_points_and_merges_late_points(tmp_path):
+    db = _DB()
+    db[HOT].docs = [_doc("L1", 1, 1), _doc("L1", 2, 2), _doc("L2", 1, 1)]
+
+    entry = compact_lot(db, "L1", "collection", str(tmp_path), cell_size=5)
+    assert entry["raw_count"] == 2
+    assert [d["lot_id"] for d in db[HOT].docs] == ["L2"]
+    assert len(db[COLD].docs) == 2
+    assert db[AGG].docs[0]["count"] == 2
+
+    # 晚到的點位：合併進既有格子，改寫成 archive 檔
+    db[HOT].docs.append(_doc("L1", 3, 3, "H"))
+    entry = compact_lot(db, "L1", "archive", str(tmp_path), cell_size=5)
+    assert db[AGG].docs[0]["count"] == 3
+    assert db[AGG].docs[0]["severity"] == {"M": 2, "H": 1}
+    assert [d["lot_id"] for d in read_archive(entry["archive_path"])] == ["L1"]
+    assert len(db[LOG].docs) == 2
+
+    assert compact_lot(db, "L1", "collection", str(tmp_path), cell_size=5) is None
+
+
+async def test_detail_aggregate_endpoint(client):
+    r = await client.get("/detail/aggregate", params={"lot_id": "LOT00001"})
+    assert r.status_code == 200
+    assert r.json() == []
@@ -0,0 +1,20 @@
+from app import server
+from app.config.config import settings
+from app.database.database import pool_options
+
+
+def test_worker_count_follows_cpus_and_override(monkeypatch):
+    monkeypatch.setattr(settings, "web_concurrency", 0)
+    monkeypatch.setattr(settings, "max_workers", 4)
+    monkeypatch.setattr(server, "available_cpus", lambda: 8)
+    assert server.worker_count() == 4
+
+    monkeypatch.setattr(settings, "web_concurrency", 3)
+    assert server.worker_count() == 3
+
+
+def test_pool_split_across_workers(monkeypatch):
+    monkeypatch.setattr(settings, "web_concurrency", 4)
+    monkeypatch.setattr(settings, "db_total_connections", 40)
+    assert pool_options("postgresql+asyncpg://x/y") == {"pool_size": 10, "max_overflow": 0}
+    assert pool_options("sqlite+aiosqlite:///:memory:") == {}
@@ -0,0 +1,141 @@
+# backend/tests/test_spc.py
+from datetime import date, datetime
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from sqlalchemy import select
+
+from app.models.spc import SpcDailyStat
+from app.services import spc
+from app.services.spc_stats import fold, rebuild
+from tests.conftest import TestSessionLocal
+
+
+def _daily(groups):
+    """每天的原始 yield 值 -> 跟 spc_daily_stat 一樣的 row。"""
+    stats = {}
+    for i, values in enumerate(groups):
+        for x in values:
+            fold(stats, "S", "P", date(2025, 1, i + 1), x, 100, int(x))
+    return [SimpleNamespace(**s) for s in stats.values()]
+
+
+def test_xbar_r_and_capability_match_raw_computation():
+    rng = np.random.default_rng(7)
+    groups = [rng.normal(95, 1.5, size=5).round(2).tolist() for _ in range(20)]
+    a = spc.to_arrays(_daily(groups))
+
+    chart = spc.xbar_r(a)
+    raw = np.array(groups)
+    sigma = np.mean(np.ptp(raw, axis=1)) / 2.326  # d2(5)
+    assert chart["center"] == pytest.approx(raw.mean())
+    assert chart["sigma"] == pytest.approx(sigma)
+    assert chart["ucl"][0] == pytest.approx(raw.mean() + 3 * sigma / np.sqrt(5))
+    assert chart["r_ucl"][0] == pytest.approx((2.326 + 3 * 0.864) * sigma)
+
+    cap = spc.capability(a, lsl=90, usl=100)
+    assert cap["sigma_overall"] == pytest.approx(raw.std(ddof=1))
+    assert cap["cp"] == pytest.approx(10 / (6 * sigma))
+    assert cap["ppk"] == pytest.approx(min(100 - raw.mean(), raw.mean() - 90) / (3 * raw.std(ddof=1)))
+
+
+def test_individuals_fall_back_to_moving_range():
+    a = spc.to_arrays(_daily([[90.0], [92.0], [91.0], [95.0]]))
+    # MR = 2, 1, 4 -> MR̄ = 7/3
+    assert spc.sigma_within(a) == pytest.approx(7 / 3 / 1.128)
+
+
+def test_western_electric_rules():
+    z = np.array([0.5, 3.5, 0.2, 2.5, -0.1, 2.4, 1.2, 1.1, 0.3, 1.5, 1.4, 0.2, 0.1, 0.3])
+    rules = spc.western_electric(z)
+    assert 1 in rules[1]
+    assert 2 in rules[5]  # 3, 4, 5 裡有兩點 > 2σ
+    assert 3 in rules[10]  # 6..10 裡有四點 > 1σ
+    assert 4 in rules[13]  # 6..13 連續 8 點在中心線上方
+    assert rules[0] == [] and 4 not in rules[4]
+
+
+def test_p_chart_limits():
+    a = spc.to_arrays(_daily([[90.0, 80.0], [95.0]]))
+    chart = spc.p_chart(a)
+    assert chart["center"] == pytest.approx(35 / 300)
+    assert chart["p"][0] == pytest.approx(30 / 200)
+    assert chart["ucl"][1] == pytest.approx(35 / 300 + 3 * np.sqrt((35 / 300) * (265 / 300) / 100))
+
+
+@pytest.mark.asyncio
+async def test_ingest_accumulates_the_same_stats_as_rebuild(client):
+    await client.post("/user/add", params={"username": "spc_eng", "password": "pw", "role": "engineer"})
+    token = (await client.post("/auth/login", data={"username": "spc_eng", "password": "pw"})).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    for i, good in enumerate([97, 93, 95, 99]):
+        r = await client.post("/ingest/lot", headers=headers, json={
+            "lot_id": f"SPC{i}", "station": "ST-SPC", "product": "P-SPC", "total": 100, "good": good,
+            "timestamp": datetime(2025, 6, 1 + i // 2, 8 + i).isoformat(),
+        })
+        assert r.status_code == 200
+
+    async with TestSessionLocal() as session:
+        stmt = select(SpcDailyStat).where(SpcDailyStat.station == "ST-SPC").order_by(SpcDailyStat.day)
+        incremental = [(s.day, s.n, s.sum_yield, s.sumsq_yield, s.min_yield, s.max_yield, s.sum_mr, s.defective)
+                       for s in (await session.execute(stmt)).scalars()]
+        await rebuild(session)
+        await session.commit()
+    async with TestSessionLocal() as session:
+        rebuilt = [(s.day, s.n, s.sum_yield, s.sumsq_yield, s.min_yield, s.max_yield, s.sum_mr, s.defective)
+                   for s in (await session.execute(stmt)).scalars()]
+
+    assert incremental == rebuilt
+    assert incremental[0][1:3] == (2, 190.0)
+    assert incremental[0][6] == 4.0  # |93 - 97|
+
+    params = {"station": "ST-SPC", "product": "P-SPC", "date_from": "2025-06-01", "date_to": "2025-06-30"}
+    chart = (await client.get("/spc/xbar_r", params=params)).json()
+    assert [p["mean"] for p in chart["points"]] == [95.0, 97.0]
+    assert [p["range"] for p in chart["points"]] == [4.0, 4.0]
+
+    cap = (await client.get("/spc/capability", params={**params, "lsl": 90, "usl": 100})).json()
+    assert cap["n"] == 4 and cap["mean"] == 96.0
+
+    p = (await client.get("/spc/p_chart", params=params)).json()
+    assert [pt["defective"] for pt in p["points"]] == [10, 6]
+
+
+async def _stats(station):
+    async with TestSessionLocal() as session:
+        stmt = select(SpcDailyStat).where(SpcDailyStat.station == station).order_by(SpcDailyStat.product, SpcDailyStat.day)
+        return [(s.product, s.day, s.n, s.sum_yield, s.first_yield, s.last_yield, s.sum_mr, s.n_mr, s.defective)
+                for s in (await session.execute(stmt)).scalars()]
+
+
+@pytest.mark.asyncio
+async def test_backfilled_and_moved_lots_match_rebuild(client):
+    await client.post("/user/add", params={"username": "spc_eng2", "password": "pw", "role": "engineer"})
+    token = (await client.post("/auth/login", data={"username": "spc_eng2", "password": "pw"})).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    # 同一天補送一個比較早的 lot：moving range 依 timestamp 排（90, 96, 93），不是寫入順序
+    for lot_id, hour, good in [("SPCB1", 8, 90), ("SPCB2", 12, 93), ("SPCB3", 10, 96)]:
+        r = await client.post("/ingest/lot", headers=headers, json={
+            "lot_id": lot_id, "station": "ST-SPCB", "product": "P-SPCB", "total": 100, "good": good,
+            "timestamp": datetime(2025, 7, 1, hour).isoformat(),
+        })
+        assert r.status_code == 200
+    incremental = await _stats("ST-SPCB")
+    assert incremental == [("P-SPCB", date(2025, 7, 1), 3, 279.0, 90.0, 93.0, 9.0, 2, 21)]
+
+    # lot 換到別的 product：兩邊的每日統計都跟著改
+    r = await client.put("/update/SPCB3", json={"product": "P-SPCB-2"})
+    assert r.status_code == 200
+    moved = await _stats("ST-SPCB")
+    assert moved == [
+        ("P-SPCB", date(2025, 7, 1), 2, 183.0, 90.0, 93.0, 3.0, 1, 17),
+        ("P-SPCB-2", date(2025, 7, 1), 1, 96.0, 96.0, 96.0, 0.0, 0, 4),
+    ]
+
+    async with TestSessionLocal() as session:
+        await rebuild(session)
+        await session.commit()
+    assert await _stats("ST-SPCB") == moved
@@ -0,0 +1,78 @@
+# backend/tests/test_stale_cache.py
+from datetime import datetime
+
+import pytest
+
+from app.common.circuit_breakers import postgres_breaker
+from app.common.stale_cache import DEGRADED_RESPONSES
+from app.routers import yield_router
+from app.services import redis_client
+from app.services.trend_fragments import build_fragments
+
+
+@pytest.fixture
+def open_postgres_breaker():
+    yield postgres_breaker.open
+    postgres_breaker.close()
+
+
+def _degraded(endpoint: str, reason: str) -> float:
+    return DEGRADED_RESPONSES.labels(endpoint=endpoint, reason=reason)._value.get()
+
+
+@pytest.mark.asyncio
+async def test_open_breaker_serves_last_known_good(client, open_postgres_breaker):
+    fresh = await client.get("/filter/dates")
+    assert fresh.status_code == 200
+    assert "Warning" not in fresh.headers
+
+    before = _degraded("filter.dates", "stale")
+    open_postgres_breaker()
+
+    stale = await client.get("/filter/dates")
+    assert stale.status_code == 200
+    assert stale.json() == fresh.json()
+    assert stale.headers["Warning"].startswith("110")
+    assert int(stale.headers["X-Data-Staleness"]) >= 0
+    assert _degraded("filter.dates", "stale") == before + 1
+
+    # 沒有 last known good 的參數組合：照樣 503（不是 500）
+    missing = await client.get("/filter/machines", params={"date_from": "1999-01-01", "date_to": "1999-01-02"})
+    assert missing.status_code == 503
+
+
+@pytest.mark.asyncio
+async def test_login_failures_do_not_open_the_breaker(client):
+    for _ in range(postgres_breaker.fail_max + 1):
+        r = await client.post("/auth/login", data={"username": "nobody", "password": "wrong"})
+        assert r.status_code == 400
+    assert postgres_breaker.fail_counter == 0
+
+
+@pytest.mark.asyncio
+async def test_only_fresh_results_store_last_known_good(client, monkeypatch):
+    async def compute(session, session_factory, lot_ids, start, end):
+        rows = [(lot_id, datetime(2031, 1, 1, 12), 90.0, "ST-LKG", "P-LKG") for lot_id in lot_ids]
+        return build_fragments(lot_ids, rows, [], [], [], []), []
+
+    monkeypatch.setattr(yield_router, "_compute_fragments", compute)
+    writes = []
+    real_set = redis_client.redis_cache.set
+
+    def set_spy(key, value, **kwargs):
+        if key.startswith("lkg:"):
+            writes.append(key)
+        return real_set(key, value, **kwargs)
+
+    monkeypatch.setattr(redis_client.redis_cache, "set", set_spy)
+    params = {"date_from": "2031-01-01", "date_to": "2031-01-01", "station": "ST-LKG", "product": "P-LKG",
+              "lots": ["LKG1"]}
+
+    first = await client.get("/yield/trend", params=params)
+    assert first.status_code == 200
+    assert len(writes) == 1
+
+    # 第二次是一般快取的 hit：內容一樣，不再寫一份 copy
+    again = await client.get("/yield/trend", params=params)
+    assert again.json() == first.json()
+    assert len(writes) == 1
@@ -0,0 +1,51 @@
+import pytest
+
+from app.models.user import Role
+from app.tools import bootstrap
+from tests.conftest import TestSessionLocal
+
+
+@pytest.mark.asyncio
+async def test_ensure_default_users_only_hashes_missing(monkeypatch):
+    hashed = []
+    monkeypatch.setattr(bootstrap, "hash_password", lambda pw: hashed.append(pw) or f"hash:{pw}")
+    users = (("boot_a", "pw_a", Role.viewer), ("boot_b", "pw_b", Role.engineer))
+
+    created = await bootstrap.ensure_default_users(TestSessionLocal, users[:1])
+    assert created == ["boot_a"]
+
+    created = await bootstrap.ensure_default_users(TestSessionLocal, users)
+    assert created == ["boot_b"]
+    assert hashed == ["pw_a", "pw_b"]
+
+    # 全部都存在時不做任何 hash
+    assert await bootstrap.ensure_default_users(TestSessionLocal, users) == []
+    assert len(hashed) == 2
+
+
+@pytest.mark.asyncio
+async def test_health_startup_reports_phases(client):
+    resp = await client.get("/health/startup")
+    assert resp.status_code == 200
+    assert "imports" in resp.json()["phases_ms"]
+
+
+@pytest.mark.asyncio
+async def test_wait_for_postgres_retries_then_gives_up():
+    class Flaky:
+        def __init__(self, failures):
+            self.failures = failures
+            self.calls = 0
+
+        def connect(self):
+            self.calls += 1
+            if self.calls <= self.failures:
+                raise ConnectionRefusedError("starting up")
+            return TestSessionLocal.kw["bind"].connect()
+
+    flaky = Flaky(failures=2)
+    await bootstrap.wait_for_postgres(flaky, attempts=3, delay=0)
+    assert flaky.calls == 3
+
+    with pytest.raises(ConnectionRefusedError):
+        await bootstrap.wait_for_postgres(Flaky(failures=5), attempts=3, delay=0)
@@ -0,0 +1,34 @@
+import pytest
+
+from app.common.timing import phase, server_timing_header, start_request_timing
+
+
+def test_phase_accumulates_and_formats():
+    phases = start_request_timing()
+    with phase("db_yield"):
+        pass
+    with phase("db_yield"):
+        pass
+    with phase("serialize"):
+        pass
+
+    assert set(phases) == {"db_yield", "serialize"}
+    header = server_timing_header(phases, total=0.01)
+    assert header.startswith("db_yield;dur=")
+    assert header.endswith("total;dur=10.00")
+
+
+@pytest.mark.asyncio
+async def test_yield_trend_returns_server_timing(client):
+    resp = await client.get(
+        "/yield/trend",
+        params={"date_from": "2025-11-30", "date_to": "2025-12-06", "station": "AOI-01", "product": "PKG-A", "lots": "LOT01000"}
+    )
+    assert resp.status_code == 200
+    assert "db_yield;dur=" in resp.headers["Server-Timing"]
+
+
+@pytest.mark.asyncio
+async def test_profile_endpoints_require_auth(client):
+    resp = await client.post("/debug/profile/window", params={"seconds": 1})
+    assert resp.status_code == 401
@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+from app.common.tracing import TailSamplingSpanProcessor, build_sampler
+from app.config.config import settings
+
+
+def _provider(exporter):
+    provider = TracerProvider(resource=Resource.create({"service.name": "test"}), sampler=build_sampler())
+    provider.add_span_processor(TailSamplingSpanProcessor(SimpleSpanProcessor(exporter)))
+    return provider
+
+
+def test_ratio_zero_drops_fast_traces(monkeypatch):
+    monkeypatch.setattr(settings, "trace_sample_ratio", 0.0)
+    monkeypatch.setattr(settings, "trace_tail_sampling", True)
+    monkeypatch.setattr(settings, "trace_tail_latency_ms", 60_000)
+
+    exporter = InMemorySpanExporter()
+    tracer = _provider(exporter).get_tracer("test")
+    with tracer.start_as_current_span("root"):
+        with tracer.start_as_current_span("child"):
+            pass
+
+    assert exporter.get_finished_spans() == ()
+
+
+def test_tail_sampling_keeps_slow_trace(monkeypatch):
+    monkeypatch.setattr(settings, "trace_sample_ratio", 0.0)
+    monkeypatch.setattr(settings, "trace_tail_sampling", True)
+    monkeypatch.setattr(settings, "trace_tail_latency_ms", 0)
+
+    exporter = InMemorySpanExporter()
+    tracer = _provider(exporter).get_tracer("test")
+    with tracer.start_as_current_span("root"):
+        with tracer.start_as_current_span("child"):
+            pass
+
+    names = sorted(s.name for s in exporter.get_finished_spans())
+    assert names == ["child", "root"]
+
+
+@pytest.mark.asyncio
+async def test_lifespan_startup_with_lean_tracing(monkeypatch):
+    from httpx import ASGITransport, AsyncClient
+    from opentelemetry.instrumentation.redis import RedisInstrumentor
+
+    from app import main
+    from app.common import db_tracing, tracing
+
+    monkeypatch.setattr(main, "DISABLE_TRACING", False)
+    monkeypatch.setattr(settings, "trace_mode", "lean")
+    monkeypatch.setattr(settings, "fast_boot", True)
+    # 不真的設定 exporter / instrument 全域的 redis、engine
+    monkeypatch.setattr(tracing, "setup_tracing", lambda name: None)
+    monkeypatch.setattr(db_tracing, "setup_sqlalchemy_tracing", lambda engine: None)
+    monkeypatch.setattr(RedisInstrumentor, "instrument", lambda self, **kwargs: None)
+    # 從還沒啟動的狀態開始，結束後還原；shutdown 不關掉其他測試共用的連線
+    monkeypatch.setattr(main.app, "middleware_stack", None)
+    monkeypatch.setattr(main.app, "build_middleware_stack", main.app.build_middleware_stack)
+    monkeypatch.setattr(main.app.router, "on_shutdown", [])
+
+    inbox = asyncio.Queue()
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    await inbox.put({"type": "lifespan.startup"})
+    lifespan = asyncio.create_task(main.app({"type": "lifespan", "asgi": {"version": "3.0"}}, inbox.get, send))
+    while not sent:
+        await asyncio.sleep(0.01)
+    assert sent[0]["type"] == "lifespan.startup.complete", sent[0]
+    assert isinstance(main.app.middleware_stack, tracing.LeanTracingMiddleware)
+
+    async with AsyncClient(transport=ASGITransport(app=main.app), base_url="http://test") as ac:
+        assert (await ac.get("/health")).status_code == 200
+
+    await inbox.put({"type": "lifespan.shutdown"})
+    await lifespan
+    assert sent[-1]["type"] == "lifespan.shutdown.complete"
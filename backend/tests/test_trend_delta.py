@@ -0,0 +1,98 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models.defect_summary import DefectSummary
+from app.models.lot import Lot
+from app.models.yield_record import YieldRecord
+from tests.conftest import TestSessionLocal
+
+PARAMS = {"date_from": "2025-03-01", "date_to": "2025-03-07", "station": "ST-DELTA", "product": "P-DELTA"}
+
+
+@pytest.mark.asyncio
+async def test_trend_since_returns_only_changes(client):
+    old = datetime.utcnow() - timedelta(hours=1)
+    async with TestSessionLocal() as session:
+        session.add_all([
+            Lot(lot_id="DL1", station="ST-DELTA", product="P-DELTA", total=100, good=90),
+            Lot(lot_id="DL2", station="ST-DELTA", product="P-DELTA", total=100, good=80),
+        ])
+        await session.flush()
+        session.add_all([
+            YieldRecord(lot_id="DL1", total=100, good=90, yield_rate=90.0,
+                        timestamp=datetime(2025, 3, 1, 12), updated_at=old),
+            YieldRecord(lot_id="DL2", total=100, good=80, yield_rate=80.0,
+                        timestamp=datetime(2025, 3, 2, 12), updated_at=old),
+            DefectSummary(lot_id="DL1", defect_type="Scratch", count=5,
+                          timestamp=datetime(2025, 3, 1, 12), updated_at=old),
+        ])
+        await session.commit()
+
+    full = (await client.get("/yield/trend", params={**PARAMS, "lots": ["DL1", "DL2"]})).json()
+    assert full["dates"] == ["2025-03-01", "2025-03-02"]
+
+    # 之後 DL2 那天多一筆、多一筆 defect summary
+    async with TestSessionLocal() as session:
+        session.add(YieldRecord(lot_id="DL2", total=100, good=70, yield_rate=70.0,
+                                timestamp=datetime(2025, 3, 2, 18)))
+        session.add(DefectSummary(lot_id="DL2", defect_type="Scratch", count=3, timestamp=datetime(2025, 3, 2, 18)))
+        await session.commit()
+
+    delta = (await client.get(
+        "/yield/trend", params={**PARAMS, "lots": ["DL1", "DL2"], "since": full["version"]}
+    )).json()
+    assert delta["delta"] is True
+    assert delta["version"] >= full["version"]
+    assert delta["dates"] == ["2025-03-02"]
+    assert delta["avg_yield"] == [75.0]
+    assert delta["daily_counts"] == [2]
+    assert delta["defect_pareto"] == [{"defect_type": "Scratch", "count": 8}]
+
+
+@pytest.mark.asyncio
+async def test_trend_since_rejects_garbage(client):
+    resp = await client.get("/yield/trend", params={**PARAMS, "lots": ["DL1"], "since": "yesterday"})
+    assert resp.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_trend_since_resets_when_a_lot_moves_station(client, monkeypatch):
+    from app.routers import lot_router
+
+    published = []
+    monkeypatch.setattr(lot_router, "publish_update", published.append)
+    old = datetime.utcnow() - timedelta(hours=1)
+    async with TestSessionLocal() as session:
+        session.add_all([
+            Lot(lot_id="MV1", station="ST-MV-A", product="P-MV", total=100, good=90),
+            Lot(lot_id="MV2", station="ST-MV-A", product="P-MV", total=100, good=80),
+        ])
+        await session.flush()
+        session.add_all([
+            YieldRecord(lot_id="MV1", total=100, good=90, yield_rate=90.0,
+                        timestamp=datetime(2025, 3, 3, 12), updated_at=old),
+            YieldRecord(lot_id="MV2", total=100, good=80, yield_rate=80.0,
+                        timestamp=datetime(2025, 3, 4, 12), updated_at=old),
+        ])
+        await session.commit()
+
+    params = {**PARAMS, "station": "ST-MV-A", "product": "P-MV", "lots": ["MV1", "MV2"]}
+    version = (await client.get("/yield/trend", params=params)).json()["version"]
+
+    # 只改良率不影響條件：delta 照常
+    await client.put("/update/MV2", json={"good": 85})
+    assert "reset" not in (await client.get("/yield/trend", params={**params, "since": version})).json()
+    assert [u["kind"] for u in published] == ["lot"]
+
+    await client.put("/update/MV1", json={"station": "ST-MV-B"})
+    assert [u["kind"] for u in published] == ["lot", "lot", "reset"]
+
+    # 原本條件的 client：MV1 要被拿掉，delta 表示不了 -> reset
+    delta = (await client.get("/yield/trend", params={**params, "since": version})).json()
+    assert delta["reset"] is True
+    # 新條件的 client：MV1 的那天出現在 delta 裡
+    delta = (await client.get(
+        "/yield/trend", params={**params, "station": "ST-MV-B", "lots": ["MV1"], "since": version})).json()
+    assert delta["dates"] == ["2025-03-03"]
+    assert delta["avg_yield"] == [90.0]
@@ -0,0 +1,94 @@
+# backend/tests/test_trend_fragments.py
+from datetime import datetime
+
+import pytest
+
+from app.common import cache_key
+from app.routers import yield_router
+from app.services import redis_client
+from app.services.trend_fragments import (
+    build_fragments, empty_fragment, fragment_counter, merge_fragments, store_fragments,
+)
+from tests.conftest import DummyRedis
+
+
+def _count(result: str) -> float:
+    return fragment_counter.labels(result=result)._value.get()
+
+
+def test_merge_matches_direct_aggregation_and_filters_yield_by_station():
+    rows = [
+        ("M1", datetime(2025, 4, 1, 8), 90.0, "ST-A", "P"),
+        ("M1", datetime(2025, 4, 2, 8), 80.0, "ST-A", "P"),
+        ("M2", datetime(2025, 4, 1, 9), 95.0, "ST-A", "P"),
+        ("M3", datetime(2025, 4, 1, 9), 10.0, "ST-B", "P"),
+    ]
+    summary = [("M1", "Crack", 3), ("M2", "Crack", 2), ("M3", "Scratch", 4)]
+    docs = [{"lot_id": "M2", "defect_type": "Crack", "location": {"x": 1, "y": 2}, "wafer": 1}]
+    clusters = [{"lot_id": "M1", "clusters": [{"wafer": 1, "signature": "edge"}]}]
+    fragments = build_fragments(["M1", "M2", "M3"], rows, summary, docs, [], clusters)
+
+    merged = merge_fragments([fragments[k] for k in ("M1", "M2", "M3")], "ST-A", "P")
+    # M3 是別的 station：yield 不計入，Pareto / 點位照原本涵蓋所有指定的 lot
+    assert merged["dates"] == ["2025-04-01", "2025-04-02"]
+    assert merged["avg_yield"] == [92.5, 80.0]
+    assert merged["daily_counts"] == [2, 1]
+    assert merged["defect_pareto"] == [{"defect_type": "Crack", "count": 5}, {"defect_type": "Scratch", "count": 4}]
+    assert [p["lot_id"] for p in merged["defect_details"]] == ["M2"]
+    assert merged["defect_clusters"] == [{"lot_id": "M1", "wafer": 1, "signature": "edge"}]
+
+    assert merge_fragments([fragments["M3"]], "ST-A", "P") is None
+
+
+@pytest.mark.asyncio
+async def test_overlapping_lot_sets_only_compute_new_lots(client, monkeypatch):
+    rates = {"TF1": 90.0, "TF2": 91.0, "TF3": 92.0}
+    computed = []
+
+    async def compute(session, session_factory, lot_ids, start, end):
+        computed.append(list(lot_ids))
+        rows = [(lot_id, datetime(2025, 5, 1, 12), rates[lot_id], "ST-TF", "P-TF") for lot_id in lot_ids]
+        summary = [(lot_id, "Crack", 1) for lot_id in lot_ids]
+        return build_fragments(lot_ids, rows, summary, [], [], []), []
+
+    monkeypatch.setattr(yield_router, "_compute_fragments", compute)
+    params = {"date_from": "2025-05-01", "date_to": "2025-05-01", "station": "ST-TF", "product": "P-TF"}
+
+    hits, misses = _count("hit"), _count("miss")
+    first = (await client.get("/yield/trend", params={**params, "lots": ["TF2", "TF1"]})).json()
+    assert first["avg_yield"] == [90.5]
+
+    second = (await client.get("/yield/trend", params={**params, "lots": ["TF3", "TF1", "TF2"]})).json()
+    assert second["avg_yield"] == [91.0]
+    assert second["daily_counts"] == [3]
+    assert second["defect_pareto"] == [{"defect_type": "Crack", "count": 3}]
+    # 第二次只算新加入的 TF3，TF1 / TF2 來自 fragment
+    assert computed == [["TF1", "TF2"], ["TF3"]]
+    assert (_count("hit") - hits, _count("miss") - misses) == (2, 3)
+
+    # lot 順序不同、有重複：同一個 cache key，整個回應直接從快取回傳
+    again = (await client.get("/yield/trend", params={**params, "lots": ["TF1", "TF2", "TF1"]})).json()
+    assert again["avg_yield"] == first["avg_yield"]
+    assert len(computed) == 2
+
+
+def test_clearing_a_lot_drops_only_its_fragments(monkeypatch):
+    redis = DummyRedis()
+    monkeypatch.setattr(redis_client, "redis_cache", redis)
+    monkeypatch.setattr(cache_key, "redis_cache", redis)
+    store_fragments({"CA": empty_fragment(), "CB": empty_fragment()}, "2025-05-01", "2025-05-01")
+    store_fragments({"CA": empty_fragment()}, "2025-05-01", "2025-05-07")
+    cache_key.store_yield_trend("yield_trend:abc", "{}")
+    redis.set("wafermap:tile:CA", b"png")
+
+    # 一般的 ingest / lot 修改：只從 index set 取 key，不掃 keyspace
+    monkeypatch.setattr(redis, "scan_iter", lambda *a, **kw: pytest.fail("scanned the keyspace"))
+    cache_key.clear_yield_trend_cache("CA")
+    assert sorted(redis.store) == ["trend:frag-index:CB", "trend:frag:CB:2025-05-01:2025-05-01", "wafermap:tile:CA"]
+    monkeypatch.undo()
+
+    # 沒給 lot（seed）：全部清掉
+    monkeypatch.setattr(cache_key, "redis_cache", redis)
+    cache_key.store_yield_trend("yield_trend:def", "{}")
+    cache_key.clear_yield_trend_cache()
+    assert sorted(redis.store) == ["wafermap:tile:CA"]
@@ -0,0 +1,170 @@
+# backend/tests/test_wafermap.py
+import struct
+import zlib
+
+import numpy as np
+import pytest
+
+from app.config.config import settings
+from app.routers import wafermap_router
+from app.services import wafermap
+from app.services.wafermap import SEVERITY_COLORS, Points, encode_png, render_tile, to_points, type_color
+from benchmarks.fakes import FakeMongoDB
+
+
+def _decode_png(png: bytes) -> np.ndarray:
+    assert png[:8] == b"\x89PNG\r\n\x1a\n"
+    chunks, pos = {}, 8
+    while pos < len(png):
+        length, tag = struct.unpack(">I4s", png[pos:pos + 8])
+        data = png[pos + 8:pos + 8 + length]
+        assert struct.unpack(">I", png[pos + 8 + length:pos + 12 + length])[0] == zlib.crc32(tag + data)
+        chunks[tag] = data
+        pos += 12 + length
+    width, height = struct.unpack(">II", chunks[b"IHDR"][:8])
+    rows = np.frombuffer(zlib.decompress(chunks[b"IDAT"]), dtype=np.uint8).reshape(height, width * 3 + 1)
+    assert not rows[:, 0].any()  # filter type 0
+    return rows[:, 1:].reshape(height, width, 3)
+
+
+def _points(*pts):
+    """(x, y, defect_type, severity)"""
+    return to_points([{"location": {"x": x, "y": y}, "defect_type": t, "severity": s} for x, y, t, s in pts], [])
+
+
+def test_png_round_trip():
+    img = np.random.default_rng(1).integers(0, 256, size=(7, 5, 3), dtype=np.uint8)
+    assert np.array_equal(_decode_png(encode_png(img)), img)
+
+
+def test_points_land_on_the_right_tile():
+    pts = _points((50.0, 50.0, "Crack", "L"), (90.0, 90.0, "Scratch", "H"))
+    whole = render_tile(pts, size=100, radius=0)
+    assert tuple(whole[50, 50]) == type_color("Crack")
+    assert tuple(whole[10, 90]) == type_color("Scratch")  # y 軸朝上
+
+    # z = 1：(90, 90) 在右上那張（x = 1, y = 0）
+    upper_right = render_tile(pts, 1, 1, 0, size=100, radius=0)
+    assert tuple(upper_right[20, 80]) == type_color("Scratch")
+    lower_left = render_tile(pts, 1, 0, 1, size=100, radius=0)
+    assert not any(tuple(p) == type_color("Scratch") for p in lower_left.reshape(-1, 3))
+
+
+def test_severity_coloring_draws_severe_points_on_top():
+    pts = _points((50.0, 50.0, "A", "H"), (50.0, 50.0, "A", "L"))
+    img = render_tile(pts, size=100, radius=2, color_by="severity")
+    assert tuple(img[50, 50]) == SEVERITY_COLORS["H"]
+
+
+def test_aggregate_points_use_cell_centroid():
+    pts = to_points([], [{"defect_type": "A", "count": 4, "sum_x": 100.0, "sum_y": 100.0, "severity": {"M": 4}}])
+    assert isinstance(pts, Points) and pts.x[0] == 25.0 and pts.severity == ["M"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("storage", ["redis", "disk"])
+async def test_tiles_are_cached_by_content_version(client, monkeypatch, tmp_path, storage):
+    monkeypatch.setattr(settings, "wafermap_cache", storage)
+    monkeypatch.setattr(settings, "wafermap_dir", str(tmp_path))
+    mongo = FakeMongoDB()
+    mongo["defect_detail"].insert_many([
+        {"lot_id": f"WM-{storage}", "wafer": 3, "defect_type": "Crack", "location": {"x": 40.0, "y": 60.0},
+         "severity": "H"},
+        {"lot_id": "OTHER", "wafer": 3, "defect_type": "Crack", "location": {"x": 10.0, "y": 10.0}},
+    ])
+    monkeypatch.setattr(wafermap_router, "mongo_db", mongo)
+    loads = []
+    real_load = wafermap_router.load_points
+    monkeypatch.setattr(wafermap_router, "load_points", lambda *a: loads.append(a) or real_load(*a))
+
+    url = f"/wafermap/WM-{storage}/3.png"
+    first = await client.get(url)
+    assert first.status_code == 200 and first.headers["content-type"] == "image/png"
+    img = _decode_png(first.content)
+    assert img.shape == (settings.wafermap_tile_size,) * 2 + (3,)
+
+    second = await client.get(url)
+    assert second.content == first.content and second.headers["etag"] == first.headers["etag"]
+    assert len(loads) == 1
+
+    not_modified = await client.get(url, headers={"If-None-Match": first.headers["etag"]})
+    assert not_modified.status_code == 304
+
+    wafermap.bump_version(f"WM-{storage}")
+    third = await client.get(url, headers={"If-None-Match": first.headers["etag"]})
+    assert third.status_code == 200 and third.headers["etag"] != first.headers["etag"]
+    assert len(loads) == 2
+
+    assert (await client.get(f"/wafermap/WM-{storage}/3/2/3/0.png")).status_code == 200
+    assert (await client.get(f"/wafermap/WM-{storage}/3/2/4/0.png")).status_code == 404
+    assert (await client.get(f"/wafermap/WM-{storage}/x.png")).status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_legend(client):
+    body = (await client.get("/wafermap/legend", params={"defect_type": ["Crack"]})).json()
+    assert body["defect_type"]["Crack"] == "#%02x%02x%02x" % type_color("Crack")
+    assert set(body["severity"]) == set(SEVERITY_COLORS)
+
+
+def test_concurrent_disk_writes_of_the_same_tile(monkeypatch, tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+
+    monkeypatch.setattr(settings, "wafermap_cache", "disk")
+    monkeypatch.setattr(settings, "wafermap_dir", str(tmp_path))
+    key = wafermap.tile_key("RACE", "v1", "all", "defect_type", 0, 0, 0)
+    pngs = [bytes([i]) * 200_000 for i in range(8)]
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda png: wafermap.store_tile(key, png), pngs))
+
+    # 最後留下的是其中一個完整的版本，沒有殘留的暫存檔
+    assert wafermap.load_tile(key) in pngs
+    assert [p.suffix for p in tmp_path.iterdir()] == [".png"]
+
+
+def test_sweep_removes_expired_disk_tiles(monkeypatch, tmp_path):
+    import os
+    import time
+
+    monkeypatch.setattr(settings, "wafermap_cache", "disk")
+    monkeypatch.setattr(settings, "wafermap_dir", str(tmp_path))
+    old = wafermap.tile_key("SW", "v1", "all", "defect_type", 0, 0, 0)
+    new = wafermap.tile_key("SW", "v2", "all", "defect_type", 0, 0, 0)
+    wafermap.store_tile(old, b"old")
+    wafermap.store_tile(new, b"new")
+    expired = time.time() - settings.wafermap_ttl_seconds - 60
+    os.utime(wafermap._tile_path(old), (expired, expired))
+    (tmp_path / "leftover.tmp").write_bytes(b"")
+    os.utime(tmp_path / "leftover.tmp", (expired, expired))
+
+    # bump 之後舊版本的 tile 不會再被讀到，只能靠 sweep 刪掉
+    assert wafermap.sweep_tiles() == 2
+    assert [p.name for p in tmp_path.iterdir()] == [os.path.basename(wafermap._tile_path(new))]
+    assert wafermap.load_tile(new) == b"new"
+
+
+def test_version_keys_expire(monkeypatch):
+    from tests.conftest import DummyRedis
+
+    class RecordingRedis(DummyRedis):
+        def __init__(self):
+            super().__init__()
+            self.ttl = {}
+
+        def set(self, key, value, ex=None, nx=False):
+            if super().set(key, value, ex=ex, nx=nx):
+                self.ttl[key] = ex
+                return True
+            return None
+
+    redis = RecordingRedis()
+    monkeypatch.setattr(wafermap.redis_client, "redis_cache", redis)
+
+    # 沒登入也能打的 URL：隨便一個 lot_id 建立的版本不會永久留著
+    wafermap.get_version("NO-SUCH-LOT")
+    wafermap.bump_version("WM-TTL")
+    assert redis.ttl == {
+        "wafermap:version:NO-SUCH-LOT": settings.wafermap_ttl_seconds,
+        "wafermap:version:WM-TTL": settings.wafermap_ttl_seconds,
+    }
@@ -251,16 +251,126 @@ async function loadDashboard() {
       return;
     }
     const data = await res.json();
-    updateYieldTrendChart(data);
-    updateDefectParetoChart(data);
-    updateDefectMapChart(data);
-    updateDetailTable(data);
-    messageEl.textContent = `共 ${data.defect_details?.length || 0} 筆 defect`;
+    renderDashboard(data);
+    subscribeLive(qs, data);
   } catch (e) {
     messageEl.textContent = "無法連線到伺服器 (trend)";
   }
 }
 
+function renderDashboard(data) {
+  updateYieldTrendChart(data);
+  updateDefectParetoChart(data);
+  updateDefectMapChart(data);
+  updateDetailTable(data);
+  messageEl.textContent = `共 ${data.defect_details?.length || 0} 筆 defect`;
+}
+
+// ------- 即時更新（SSE /stream/yield），不用重新查整段 trend -------
+
+let liveSource = null;
+
+function subscribeLive(qs, data) {
+  if (liveSource) liveSource.close();
+  liveSource = new EventSource(`${API_BASE}/stream/yield?${qs}`);
+
+  let disconnected = false;
+
+  liveSource.addEventListener("update", (e) => {
+    applyLiveUpdate(data, JSON.parse(e.data));
+    renderDashboard(data);
+  });
+  // 資料被重建時整個重新查詢；只是跟不上（overflow）時用 delta 補齊
+  liveSource.addEventListener("reset", (e) => {
+    const reason = JSON.parse(e.data).reason;
+    if (reason === "overflow") loadDelta(qs, data);
+    else loadDashboard();
+  });
+  // 斷線重連後，把斷線期間的變動用 delta 補回來
+  liveSource.addEventListener("error", () => (disconnected = true));
+  liveSource.addEventListener("open", () => {
+    if (disconnected) loadDelta(qs, data);
+    disconnected = false;
+  });
+}
+
+// ------- Delta sync：只拿 data.version 之後變動的日期 / Pareto / defect 點位 -------
+
+async function loadDelta(qs, data) {
+  try {
+    const res = await fetch(`${API_BASE}/yield/trend?${qs}&since=${data.version}`, {
+      headers: authHeaders(),
+    });
+    if (!res.ok) return loadDashboard();
+    const delta = await res.json();
+    // 選的 lot 換了 station / product：delta 沒辦法拿掉舊資料，整個重新查詢
+    if (delta.reset) return loadDashboard();
+    applyDelta(data, delta);
+    renderDashboard(data);
+  } catch (e) {
+    messageEl.textContent = "無法連線到伺服器 (delta)";
+  }
+}
+
+function applyDelta(data, delta) {
+  data.daily_counts = data.daily_counts || data.dates.map(() => 1);
+  delta.dates.forEach((d, k) => {
+    const i = data.dates.indexOf(d);
+    if (i >= 0) {
+      data.avg_yield[i] = delta.avg_yield[k];
+      data.daily_counts[i] = delta.daily_counts[k];
+    } else {
+      const at = data.dates.findIndex((x) => x > d);
+      const pos = at < 0 ? data.dates.length : at;
+      data.dates.splice(pos, 0, d);
+      data.avg_yield.splice(pos, 0, delta.avg_yield[k]);
+      data.daily_counts.splice(pos, 0, delta.daily_counts[k]);
+    }
+  });
+
+  // delta 裡的 Pareto 是該 defect_type 目前的總數，直接覆蓋
+  delta.defect_pareto.forEach((d) => {
+    const row = data.defect_pareto.find((r) => r.defect_type === d.defect_type);
+    if (row) row.count = d.count;
+    else data.defect_pareto.push({ ...d });
+  });
+  data.defect_pareto.sort((a, b) => b.count - a.count);
+
+  const seen = new Set((data.defect_details || []).map((p) => p.id).filter(Boolean));
+  data.defect_details = (data.defect_details || []).concat(
+    delta.defect_details.filter((p) => !seen.has(p.id))
+  );
+  data.version = delta.version;
+}
+
+function applyLiveUpdate(data, update) {
+  const p = update.yield_point;
+  if (p) {
+    data.daily_counts = data.daily_counts || data.dates.map(() => 1);
+    const i = data.dates.indexOf(p.date);
+    if (i >= 0) {
+      const n = data.daily_counts[i];
+      data.avg_yield[i] = Math.round(((data.avg_yield[i] * n + p.yield_rate) / (n + 1)) * 100) / 100;
+      data.daily_counts[i] = n + 1;
+    } else {
+      const at = data.dates.findIndex((d) => d > p.date);
+      const pos = at < 0 ? data.dates.length : at;
+      data.dates.splice(pos, 0, p.date);
+      data.avg_yield.splice(pos, 0, p.yield_rate);
+      data.daily_counts.splice(pos, 0, 1);
+    }
+  }
+
+  (update.pareto_delta || []).forEach((d) => {
+    const row = data.defect_pareto.find((r) => r.defect_type === d.defect_type);
+    if (row) row.count += d.delta;
+    else data.defect_pareto.push({ defect_type: d.defect_type, count: d.delta });
+  });
+  data.defect_pareto.sort((a, b) => b.count - a.count);
+
+  data.defect_details = (data.defect_details || []).concat(update.defect_points || []);
+}
+
 // ------- Chart 更新 -------
 
 function updateYieldTrendChart(data) {